@@ -1,3 +1,14 @@
 from django.contrib import admin
 
-# Register your models here.
+from apps.common.admin_mixins import SysPermissionMixin
+from .models import ClaveIdempotencia
+
+
+@admin.register(ClaveIdempotencia)
+class ClaveIdempotenciaAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('clave', 'usuario', 'estado_respuesta', 'fecha_creacion')
+    list_filter = ('estado_respuesta', 'fecha_creacion')
+    list_select_related = ('usuario',)
+    search_fields = ('clave', 'usuario__rut', 'usuario__email')
+    raw_id_fields = ('usuario',)
+    readonly_fields = ('huella_peticion', 'fecha_creacion')
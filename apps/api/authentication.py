@@ -0,0 +1,122 @@
+"""
+Access tokens con permisos embebidos (modo opcional, API_JWT_PERMISOS).
+
+Al emitir el access token (login y refresh) se agregan dos claims:
+- 'perms': {estacion_id: mapa de bits} con los permisos efectivos del usuario en su estación
+  activa. El bit N corresponde al Permission con pk N (base64url, little-endian).
+- 'perms_v': versión del contexto de acceso del usuario (ver gestion_usuarios.versiones).
+
+Con esos claims las clases Can* de la API resuelven los permisos con un test de bits en memoria
+(ver permissions.tiene_permiso) en lugar de consultar roles y membresías en cada petición.
+Si la versión cambió (roles, permisos o membresías modificados) el token se rechaza como no
+autenticado y la App debe renovarlo en /api/v1/auth/refresh/, que emite el mapa actualizado.
+"""
+import base64
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.gestion_usuarios.models import Membresia, Rol
+from apps.gestion_usuarios.versiones import version_contexto, version_contexto_vigente
+
+CLAIM_PERMISOS = 'perms'
+CLAIM_VERSION = 'perms_v'
+
+# 'app_label.codename' -> pk. Los permisos solo cambian con migraciones: basta un mapa por proceso
+_pks_permisos = {}
+
+
+
+
+def codificar_mapa(pks):
+    """Mapa de bits de un conjunto de pks de Permission, como texto base64url sin relleno."""
+    valor = 0
+    for pk in pks:
+        valor |= 1 << pk
+    crudo = valor.to_bytes((valor.bit_length() + 7) // 8, 'little')
+    return base64.urlsafe_b64encode(crudo).rstrip(b'=').decode()
+
+
+def tiene_bit(mapa, pk):
+    crudo = base64.urlsafe_b64decode(mapa + '=' * (-len(mapa) % 4))
+    byte = pk >> 3
+    return byte < len(crudo) and bool(crudo[byte] & (1 << (pk & 7)))
+
+
+def pk_permiso(permiso):
+    """pk del permiso 'app_label.codename', o None si no existe."""
+    if permiso not in _pks_permisos:
+        app_label, _sep, codename = permiso.partition('.')
+        _pks_permisos[permiso] = Permission.objects.filter(
+            content_type__app_label=app_label, codename=codename
+        ).values_list('pk', flat=True).first()
+    return _pks_permisos[permiso]
+
+
+
+
+def claims_permisos(usuario):
+    """
+    Claims de permisos para el access token del usuario. Replica lo que concede RolBackend sin
+    objeto: permisos directos y de grupos más los de los roles de la membresía activa.
+    Los superusuarios no llevan mapa (has_perm ya los resuelve sin consultas).
+    """
+    claims = {CLAIM_VERSION: version_contexto(usuario.pk)}
+    if usuario.is_superuser:
+        return claims
+
+    membresia = Membresia.objects.filter(usuario=usuario, estado=Membresia.Estado.ACTIVO).first()
+    if membresia is None:
+        return claims
+
+    pks = set(usuario.user_permissions.values_list('pk', flat=True))
+    pks.update(Permission.objects.filter(group__user=usuario).values_list('pk', flat=True))
+    pks.update(Rol.objects.filter(asignaciones=membresia, permisos__isnull=False).values_list('permisos', flat=True))
+    claims[CLAIM_PERMISOS] = {str(membresia.estacion_id): codificar_mapa(pks)}
+    return claims
+
+
+def agregar_permisos_al_access(data, usuario):
+    """Vuelve a firmar data['access'] con los claims de permisos si el modo está activo."""
+    if not settings.API_JWT_PERMISOS:
+        return data
+    access = AccessToken(data['access'])
+    for claim, valor in claims_permisos(usuario).items():
+        access[claim] = valor
+    data['access'] = str(access)
+    return data
+
+
+
+
+class JWTPermisosAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que además rechaza los access tokens con permisos embebidos cuya
+    versión ya no es la vigente. Los tokens sin el claim se aceptan igual que antes.
+    """
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is None:
+            return None
+
+        usuario, token = resultado
+        version = token.get(CLAIM_VERSION)
+        if version is not None and not version_contexto_vigente(usuario.pk, version):
+            raise AuthenticationFailed(
+                _("Los permisos del token ya no están vigentes. Renueve el token."),
+                code='permisos_desactualizados',
+            )
+        return resultado
+
+
+
+
+class JWTPermisosScheme(SimpleJWTScheme):
+    """Documenta JWTPermisosAuthentication en el esquema OpenAPI igual que el JWT estándar."""
+    target_class = 'apps.api.authentication.JWTPermisosAuthentication'
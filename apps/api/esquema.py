@@ -0,0 +1,57 @@
+"""
+Esquema OpenAPI precalculado.
+
+drf-spectacular genera el esquema recorriendo todas las rutas de la API, lo que toma varios
+segundos de CPU. Fuera de DEBUG el esquema se genera una vez (manage.py generar_esquema_api, al
+construir o al iniciar el contenedor) y /api/v1/schema/ sirve los archivos resultantes como
+contenido estático, con un ETag derivado del hash SHA-256 del contenido.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+# formato -> (archivo, content type), los mismos tipos que usa SpectacularAPIView
+FORMATOS = {
+    'yaml': ('schema.yml', 'application/vnd.oai.openapi'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json'),
+}
+
+# ruta -> (mtime, contenido, hash). Se relee el archivo solo si cambió en disco
+_esquemas = {}
+
+
+def ruta_esquema(formato):
+    return os.path.join(settings.API_ESQUEMA_DIR, FORMATOS[formato][0])
+
+
+def hash_contenido(contenido):
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def generar_esquema():
+    """{formato: bytes} del esquema actual, igual al que entrega SpectacularAPIView."""
+    generador = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    esquema = generador.get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(esquema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(esquema, renderer_context={}),
+    }
+
+
+def cargar_esquema(formato):
+    """(contenido, hash) del archivo precalculado en el formato indicado, o None si no existe."""
+    ruta = ruta_esquema(formato)
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    guardado = _esquemas.get(ruta)
+    if guardado is None or guardado[0] != mtime:
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        guardado = _esquemas[ruta] = (mtime, contenido, hash_contenido(contenido))
+    return guardado[1], guardado[2]
@@ -0,0 +1,41 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.api.esquema import FORMATOS, generar_esquema, hash_contenido, ruta_esquema
+
+
+class Command(BaseCommand):
+    """
+    Genera el esquema OpenAPI de la API (YAML y JSON) en API_ESQUEMA_DIR, que es lo que sirve
+    /api/v1/schema/ fuera de DEBUG. Los archivos solo se reescriben si el contenido cambió, así
+    su hash (y el ETag que ven los clientes) se mantiene entre despliegues sin cambios.
+
+    Uso: python manage.py generar_esquema_api [--check]
+    Con --check no escribe nada y termina con error si los archivos no están al día (útil en CI).
+    """
+    help = "Genera el esquema OpenAPI precalculado que se sirve en /api/v1/schema/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Solo verifica que los archivos estén al día.")
+
+    def handle(self, *args, **options):
+        desactualizados = []
+        for formato, contenido in generar_esquema().items():
+            ruta = ruta_esquema(formato)
+            actual = None
+            if os.path.exists(ruta):
+                with open(ruta, 'rb') as archivo:
+                    actual = archivo.read()
+
+            if actual == contenido:
+                self.stdout.write(f"{FORMATOS[formato][0]}: sin cambios ({hash_contenido(contenido)[:12]})")
+                continue
+            desactualizados.append(FORMATOS[formato][0])
+            if not options['check']:
+                with open(ruta, 'wb') as archivo:
+                    archivo.write(contenido)
+                self.stdout.write(self.style.SUCCESS(f"{FORMATOS[formato][0]}: actualizado ({hash_contenido(contenido)[:12]})"))
+
+        if options['check'] and desactualizados:
+            raise CommandError(f"Esquema desactualizado: {', '.join(desactualizados)}. Ejecute manage.py generar_esquema_api.")
@@ -0,0 +1,65 @@
+import datetime
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.renderers import JSONRenderer
+
+from apps.api.renderers import ORJSONRenderer
+
+
+def _fila_catalogo(i):
+    """Fila con la forma de InventarioCatalogoStockAPIView / deltas de sincronización."""
+    return {
+        'id': uuid.uuid4(),
+        'sku': f"SKU-{i:06d}",
+        'nombre': f"Producto de prueba {i} — ñandú",
+        'categoria': _("Rescate"),
+        'es_serializado': bool(i % 2),
+        'cantidad': i % 37,
+        'costo_unitario': Decimal(f"{i % 1000}.{i % 100:02d}"),
+        'fecha_vencimiento': datetime.date(2030, 1, 1) + datetime.timedelta(days=i % 365),
+        'actualizado': timezone.now(),
+        'imagen': None,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Benchmark de serialización de respuestas de la API: compara el JSONRenderer de DRF
+    (json estándar) con ORJSONRenderer sobre listados sintéticos de distintos tamaños, con
+    los tipos que aparecen en los endpoints grandes (UUID, Decimal, fechas, textos traducibles).
+    No toca la base de datos.
+
+    Uso: python manage.py medir_serializacion_json [--filas 10 100 1000 10000] [--repeticiones 20]
+    """
+    help = "Mide el costo de serializar respuestas JSON con el renderer estándar de DRF y con orjson."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[10, 100, 1000, 10000], help="Tamaños de listado a medir.")
+        parser.add_argument('--repeticiones', type=int, default=20, help="Repeticiones por medición (se reporta la mejor).")
+
+    def _medir(self, renderer, datos, repeticiones):
+        mejor = None
+        for _i in range(repeticiones):
+            inicio = time.perf_counter()
+            salida = renderer.render(datos)
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor, len(salida)
+
+    def handle(self, *args, **options):
+        estandar, rapido = JSONRenderer(), ORJSONRenderer()
+
+        self.stdout.write(f"{'filas':>8} {'bytes':>12} {'json (ms)':>12} {'orjson (ms)':>12} {'µs/fila json':>14} {'µs/fila orjson':>15} {'factor':>8}")
+        for filas in options['filas']:
+            datos = {'count': filas, 'results': [_fila_catalogo(i) for i in range(filas)]}
+            t_json, tamano = self._medir(estandar, datos, options['repeticiones'])
+            t_orjson, _tamano = self._medir(rapido, datos, options['repeticiones'])
+            self.stdout.write(
+                f"{filas:>8} {tamano:>12} {t_json * 1000:>12.2f} {t_orjson * 1000:>12.2f} "
+                f"{t_json * 1e6 / filas:>14.2f} {t_orjson * 1e6 / filas:>15.2f} {t_json / t_orjson:>7.1f}x"
+            )
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+RUTAS_POR_DEFECTO = [
+    '/api/v1/auth/me/',
+    '/api/v1/gestion_inventario/catalogo/stock/',
+    '/api/v1/gestion_inventario/graficos/',
+]
+
+
+def _memoria_mb(pid):
+    """RSS (MB) del proceso y sus hijos directos, leído de /proc. None si no está disponible."""
+    try:
+        pids = [pid]
+        with open(f"/proc/{pid}/task/{pid}/children") as archivo:
+            pids += [int(hijo) for hijo in archivo.read().split()]
+        total = 0
+        for proceso in pids:
+            with open(f"/proc/{proceso}/status") as archivo:
+                for linea in archivo:
+                    if linea.startswith('VmRSS:'):
+                        total += int(linea.split()[1])
+        return total / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Prueba de carga de las lecturas de la API contra un servidor ya levantado. Sirve para comparar
+    los modos de gunicorn.conf.py con la misma cantidad de workers (misma memoria):
+
+        GUNICORN_MODO=wsgi GUNICORN_WORKERS=2 gunicorn
+        GUNICORN_MODO=asgi GUNICORN_WORKERS=2 gunicorn
+
+    Para cada nivel de concurrencia lanza N clientes que piden en bucle las rutas indicadas
+    durante --duracion segundos y reporta peticiones/s, latencias p50/p95/máx y errores. Con
+    --pid (el del master de gunicorn) agrega la memoria RSS del master y sus workers.
+
+    Uso: python manage.py prueba_carga_api --url http://localhost:8000 --token <access>
+         [--rutas ...] [--concurrencia 1 10 50 200] [--duracion 15] [--pid <pid>]
+    """
+    help = "Mide throughput y latencia de las lecturas de la API a distintos niveles de concurrencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help="URL base del servidor.")
+        parser.add_argument('--token', default=os.getenv('API_TOKEN'), help="Access token JWT (o variable API_TOKEN).")
+        parser.add_argument('--rutas', nargs='+', default=RUTAS_POR_DEFECTO, help="Rutas GET a recorrer.")
+        parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 10, 50, 200], help="Clientes simultáneos por ronda.")
+        parser.add_argument('--duracion', type=float, default=15, help="Segundos por ronda.")
+        parser.add_argument('--pid', type=int, help="PID del master de gunicorn, para reportar memoria.")
+
+    async def _cliente(self, http, rutas, fin, latencias, errores):
+        i = 0
+        while time.monotonic() < fin:
+            ruta = rutas[i % len(rutas)]
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                respuesta = await http.get(ruta)
+                if respuesta.status_code >= 400:
+                    errores.append(respuesta.status_code)
+                    continue
+            except httpx.HTTPError as error:
+                errores.append(type(error).__name__)
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    async def _ronda(self, opciones, concurrencia):
+        latencias, errores = [], []
+        limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+        encabezados = {'Authorization': f"Bearer {opciones['token']}"} if opciones['token'] else {}
+        async with httpx.AsyncClient(base_url=opciones['url'], headers=encabezados, limits=limites, timeout=60) as http:
+            fin = time.monotonic() + opciones['duracion']
+            await asyncio.gather(*(
+                self._cliente(http, opciones['rutas'], fin, latencias, errores) for _i in range(concurrencia)
+            ))
+        return latencias, errores
+
+    def handle(self, *args, **options):
+        if not options['token']:
+            raise CommandError("Se requiere --token (o la variable API_TOKEN) con un access token válido.")
+
+        self.stdout.write(f"{'clientes':>8} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9} {'errores':>8} {'RSS (MB)':>9}")
+        for concurrencia in options['concurrencia']:
+            latencias, errores = asyncio.run(self._ronda(options, concurrencia))
+            memoria = _memoria_mb(options['pid']) if options['pid'] else None
+            if len(latencias) >= 2:
+                cuantiles = statistics.quantiles(latencias, n=100)
+                p50, p95, maximo = cuantiles[49] * 1000, cuantiles[94] * 1000, max(latencias) * 1000
+            else:
+                p50 = p95 = maximo = float('nan')
+            self.stdout.write(
+                f"{concurrencia:>8} {len(latencias) / options['duracion']:>9.1f} {p50:>9.1f} {p95:>9.1f} "
+                f"{maximo:>9.1f} {len(errores):>8} {f'{memoria:.0f}' if memoria is not None else '-':>9}"
+            )
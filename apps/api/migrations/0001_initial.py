@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 08:07
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255)),
+                ('huella_peticion', models.CharField(help_text='SHA-256 del método, la ruta y el cuerpo de la petición original.', max_length=64)),
+                ('estado_respuesta', models.PositiveSmallIntegerField(blank=True, help_text='Vacío mientras la petición original está en curso.', null=True)),
+                ('respuesta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'permissions': [('sys_view_claveidempotencia', 'System: Puede ver Claves de Idempotencia'), ('sys_add_claveidempotencia', 'System: Puede agregar Claves de Idempotencia'), ('sys_change_claveidempotencia', 'System: Puede cambiar Claves de Idempotencia'), ('sys_delete_claveidempotencia', 'System: Puede eliminar Claves de Idempotencia')],
+                'default_permissions': [],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='api_clave_idempotencia_unica')],
+            },
+        ),
+    ]
@@ -1,9 +1,18 @@
+import datetime
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth.mixins import AccessMixin
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
 from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
 from apps.gestion_mantenimiento.models import OrdenMantenimiento
 from apps.gestion_inventario.models import Estacion
+from .models import ClaveIdempotencia
 
 class ApiSecurityMixin(AccessMixin):
     """
@@ -93,4 +102,109 @@ class OrdenValidacionMixin:
         # pero para editar tareas/activos, esta regla es general.
         if accion not in ['finalizar', 'cancelar', 'cambiar_estado']: # Acciones que cambian el estado per se
             if orden.estado in [OrdenMantenimiento.EstadoOrden.REALIZADA, OrdenMantenimiento.EstadoOrden.CANCELADA]:
-                raise ValidationError("No se pueden modificar registros en una orden finalizada o cancelada.")
\ No newline at end of file
+                raise ValidationError("No se pueden modificar registros en una orden finalizada o cancelada.")
+
+
+
+
+class RespuestaIdempotente(Exception):
+    """Corta el flujo de la vista para entregar una respuesta ya resuelta por IdempotenciaMixin."""
+
+    def __init__(self, respuesta):
+        super().__init__()
+        self.respuesta = respuesta
+
+
+class IdempotenciaMixin:
+    """
+    Soporte de la cabecera 'Idempotency-Key' para las vistas DRF que escriben (préstamos,
+    recepciones, consumos, tareas de mantenimiento...), pensada para los reintentos de la App
+    en redes inestables.
+
+    La primera petición con una clave la reserva (única por usuario y clave), ejecuta la vista y
+    guarda el estado y el cuerpo de la respuesta. Un reintento con la misma clave dentro de
+    API_IDEMPOTENCIA_TTL_HORAS recibe esa misma respuesta (cabecera 'Idempotent-Replayed: true')
+    sin volver a ejecutar la escritura: cuesta una lectura por índice.
+
+    - Misma clave con otro método, ruta o cuerpo: 422.
+    - Reintento mientras la petición original sigue en curso: 409.
+    - Errores 5xx y excepciones no se guardan: la clave se libera y el reintento se ejecuta.
+    Sin la cabecera la vista se comporta como siempre.
+    """
+    cabecera_idempotencia = 'Idempotency-Key'
+    metodos_idempotentes = ('POST', 'PUT', 'PATCH', 'DELETE')
+    # Una reserva sin respuesta más antigua que esto se considera abandonada (proceso caído)
+    plazo_en_curso = datetime.timedelta(minutes=2)
+    clave_idempotencia = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        clave = request.headers.get(self.cabecera_idempotencia)
+        if not clave or request.method not in self.metodos_idempotentes:
+            return
+        if len(clave) > ClaveIdempotencia._meta.get_field('clave').max_length:
+            raise self._respuesta_error("La cabecera Idempotency-Key es demasiado larga.", status.HTTP_400_BAD_REQUEST)
+
+        huella = hashlib.sha256(b'\n'.join([
+            request.method.encode(), request.path.encode(), request.body
+        ])).hexdigest()
+
+        ahora = timezone.now()
+        registro = ClaveIdempotencia.objects.filter(usuario=request.user, clave=clave).first()
+        if registro is not None:
+            vencida = registro.fecha_creacion < ahora - datetime.timedelta(hours=settings.API_IDEMPOTENCIA_TTL_HORAS)
+            abandonada = registro.estado_respuesta is None and registro.fecha_creacion < ahora - self.plazo_en_curso
+            if vencida or abandonada:
+                registro.delete()
+            elif registro.huella_peticion != huella:
+                raise self._respuesta_error(
+                    "Esta Idempotency-Key ya se usó con otra petición.", status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            elif registro.estado_respuesta is None:
+                raise self._respuesta_error(
+                    "La petición original con esta Idempotency-Key aún se está procesando.", status.HTTP_409_CONFLICT
+                )
+            else:
+                raise RespuestaIdempotente(Response(
+                    registro.respuesta, status=registro.estado_respuesta, headers={'Idempotent-Replayed': 'true'}
+                ))
+
+        # Reserva de la clave: el índice único resuelve la carrera entre dos reintentos simultáneos
+        try:
+            with transaction.atomic():
+                self.clave_idempotencia = ClaveIdempotencia.objects.create(
+                    usuario=request.user, clave=clave, huella_peticion=huella
+                )
+        except IntegrityError:
+            raise self._respuesta_error(
+                "La petición original con esta Idempotency-Key aún se está procesando.", status.HTTP_409_CONFLICT
+            )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, RespuestaIdempotente):
+            return exc.respuesta
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            self._liberar_clave()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        registro = self.clave_idempotencia
+        if registro is not None:
+            if response.status_code >= 500 or not hasattr(response, 'data'):
+                self._liberar_clave()
+            else:
+                registro.estado_respuesta = response.status_code
+                registro.respuesta = response.data
+                registro.save(update_fields=['estado_respuesta', 'respuesta'])
+                self.clave_idempotencia = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def _liberar_clave(self):
+        if self.clave_idempotencia is not None:
+            self.clave_idempotencia.delete()
+            self.clave_idempotencia = None
+
+    def _respuesta_error(self, detalle, codigo):
+        return RespuestaIdempotente(Response({"detail": detalle}, status=codigo))
@@ -1,3 +1,36 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class ClaveIdempotencia(models.Model):
+    """
+    Respuesta guardada de una petición de la API enviada con la cabecera 'Idempotency-Key'.
+    Un reintento con la misma clave devuelve esta respuesta sin volver a ejecutar la escritura
+    (ver IdempotenciaMixin). Las claves vencidas se purgan con una tarea programada.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='claves_idempotencia')
+    clave = models.CharField(max_length=255)
+    huella_peticion = models.CharField(max_length=64, help_text="SHA-256 del método, la ruta y el cuerpo de la petición original.")
+    estado_respuesta = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Vacío mientras la petición original está en curso.")
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    fecha_creacion = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+        constraints = [
+            # El reintento se resuelve con una lectura por este índice
+            models.UniqueConstraint(fields=['usuario', 'clave'], name='api_clave_idempotencia_unica'),
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_claveidempotencia", "System: Puede ver Claves de Idempotencia"),
+            ("sys_add_claveidempotencia", "System: Puede agregar Claves de Idempotencia"),
+            ("sys_change_claveidempotencia", "System: Puede cambiar Claves de Idempotencia"),
+            ("sys_delete_claveidempotencia", "System: Puede eliminar Claves de Idempotencia"),
+        ]
+
+    def __str__(self):
+        return f"{self.clave} ({self.usuario_id}) -> {self.estado_respuesta or 'en curso'}"
@@ -0,0 +1,196 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, inline_serializer
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorPaginacion(BasePagination):
+    """
+    Paginación por cursor (keyset) compartida por los listados de la App móvil.
+
+    A diferencia del OFFSET, la página siguiente se pide con un cursor opaco que codifica
+    los valores de orden del último registro entregado, por lo que el costo de cada página
+    no crece con la profundidad y las altas/bajas concurrentes no duplican ni saltan filas.
+
+    El `ordering` debe terminar en un campo único (normalmente 'id' o '-id') para que la
+    posición sea exacta, y sus campos no deben admitir NULL.
+
+    Uso en una APIView:
+        paginador = CursorPaginacion(ordering=('-fecha_prestamo', '-id'))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+        return paginador.get_paginated_response([... for obj in pagina])
+    """
+    page_size = 25
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def __init__(self, ordering=('-id',), page_size=None):
+        self.ordering = tuple(ordering)
+        if page_size:
+            self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._cerrar_pagina(list(self._consulta_pagina(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Igual que paginate_queryset, con el ORM asíncrono (vistas async bajo ASGI)."""
+        return self._cerrar_pagina([obj async for obj in self._consulta_pagina(queryset, request)])
+
+    def _consulta_pagina(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        posicion = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if posicion is not None:
+            posicion = self._convertir_posicion(queryset.model, posicion)
+            queryset = queryset.filter(self._filtro_despues_de(posicion))
+
+        # Se pide un registro extra para saber si existe una página siguiente sin hacer COUNT
+        return queryset[:self.page_size + 1]
+
+    def _cerrar_pagina(self, resultados):
+        self.has_next = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        self.next_position = self._posicion(resultados[-1]) if self.has_next else None
+        return resultados
+
+    def get_page_size(self, request):
+        try:
+            solicitado = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(solicitado, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data, **extra):
+        """`extra` permite adjuntar metadatos del listado (p.ej. contadores) al sobre."""
+        return Response({
+            **extra,
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # --- Codificación del cursor ---
+
+    def encode_cursor(self, posicion):
+        crudo = json.dumps(posicion, default=_serializar_valor, separators=(',', ':'))
+        return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            posicion = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(posicion, list) or len(posicion) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return posicion
+
+    def _convertir_posicion(self, modelo, posicion):
+        """
+        Convierte los valores del cursor al tipo de cada campo de orden (to_python). Un cursor
+        manipulado con valores de otro tipo se rechaza aquí con 404 en vez de fallar en la consulta.
+        """
+        convertidos = []
+        for campo, valor in zip(self.ordering, posicion):
+            partes = campo.lstrip('-').split('__')
+            actual = modelo
+            for parte in partes[:-1]:
+                actual = actual._meta.get_field(parte).related_model
+            try:
+                convertidos.append(actual._meta.get_field(partes[-1]).to_python(valor))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return convertidos
+
+    # --- Keyset ---
+
+    def _posicion(self, obj):
+        valores = []
+        for campo in self.ordering:
+            valor = obj
+            for parte in campo.lstrip('-').split('__'):
+                valor = getattr(valor, parte)
+            valores.append(valor)
+        return valores
+
+    def _filtro_despues_de(self, posicion):
+        """
+        Construye la condición lexicográfica "fila > posición" respetando la dirección de cada campo:
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        condicion = Q()
+        iguales = Q()
+        for campo, valor in zip(self.ordering, posicion):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+            iguales &= Q(**{nombre: valor})
+        return condicion
+
+
+
+
+def _serializar_valor(valor):
+    # A diferencia de DjangoJSONEncoder, conserva los microsegundos: el cursor debe
+    # reproducir exactamente el valor de orden o se saltarían filas en el borde de la página.
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    return str(valor)
+
+
+
+
+# Parámetros y esquema de respuesta para documentar en drf-spectacular las APIView paginadas
+PARAMETROS_CURSOR = [
+    OpenApiParameter(
+        'cursor', OpenApiTypes.STR, required=False,
+        description="Cursor opaco de la página siguiente (tomado del campo 'next' de la respuesta anterior)."
+    ),
+    OpenApiParameter(
+        'page_size', OpenApiTypes.INT, required=False,
+        description=f"Cantidad de registros por página (por defecto {CursorPaginacion.page_size}, máximo {CursorPaginacion.max_page_size})."
+    ),
+]
+
+
+def respuesta_paginada(nombre, **extra_fields):
+    """Serializer inline con el sobre estándar de los listados paginados por cursor (más campos extra)."""
+    return inline_serializer(
+        name=nombre,
+        fields={
+            **extra_fields,
+            'next': serializers.URLField(allow_null=True, help_text="URL de la página siguiente o null si no hay más."),
+            'results': serializers.ListField(child=serializers.DictField()),
+        }
+    )
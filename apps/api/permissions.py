@@ -1,6 +1,23 @@
 from rest_framework import permissions
-from apps.gestion_inventario.models import Estacion
 from apps.gestion_usuarios.models import Membresia
+from .authentication import CLAIM_PERMISOS, pk_permiso, tiene_bit
+from .utils import resolver_estacion_activa
+
+
+def tiene_permiso(request, permiso):
+    """
+    Evalúa un permiso de la API. Si el access token trae el mapa de permisos de la estación
+    activa (API_JWT_PERMISOS) se resuelve con un test de bits en memoria; en otro caso
+    (sesión web, tokens sin mapa, otra estación) se delega en request.user.has_perm.
+    """
+    token = request.auth
+    estacion = getattr(request, 'estacion_activa', None)
+    if estacion is not None and hasattr(token, 'get'):
+        mapa = (token.get(CLAIM_PERMISOS) or {}).get(str(estacion.id))
+        pk = pk_permiso(permiso) if mapa is not None else None
+        if pk is not None:
+            return tiene_bit(mapa, pk)
+    return request.user.has_perm(permiso)
 
 
 class IsEstacionActiva(permissions.BasePermission):
@@ -8,51 +25,42 @@ class IsEstacionActiva(permissions.BasePermission):
     Verifica que el usuario tenga una estación activa.
     Estrategia Híbrida: Web (Sesión) -> Móvil (Header) -> BD (Membresía).
     Inyecta 'request.estacion_activa' para optimizar las vistas.
+    La resolución se cachea entre peticiones (ver resolver_estacion_activa): en régimen
+    normal no consulta la base de datos.
     """
     message = 'No se ha seleccionado una estación activa válida o no tiene acceso.'
 
     def has_permission(self, request, view):
-        estacion_id = None
+        # 0. Operación dentro de un lote (/api/v1/lote/): la estación ya se resolvió para toda la petición
+        if getattr(request, 'estacion_activa', None) is not None:
+            return True
 
         # 1. Estrategia WEB: Buscar en la sesión (Cookie)
+        # La sesión solo guarda estaciones validadas al entrar (login o cambio de estación).
         if 'active_estacion_id' in request.session:
-            estacion_id = request.session.get('active_estacion_id')
+            estacion = resolver_estacion_activa(
+                request.user, request.session.get('active_estacion_id'), validar_membresia=False
+            )
 
         # 2. Estrategia MÓVIL (API): Buscar en Headers
         # Útil si la App permite cambiar de estación y envía el ID explícitamente.
+        # El header lo controla el cliente: se exige membresía activa en esa estación.
         elif 'X-Estacion-ID' in request.headers:
-            estacion_id = request.headers.get('X-Estacion-ID')
+            estacion = resolver_estacion_activa(request.user, request.headers.get('X-Estacion-ID'))
 
         # 3. Estrategia FALLBACK (Membresía única):
-        # Si no hay sesión ni header, buscamos si el usuario tiene una membresía ACTIVA.
+        # Si no hay sesión ni header, usamos la membresía ACTIVA del usuario
+        # ("Un usuario solo puede tener una membresía activa a la vez").
         # Esto permite que la App funcione solo con el Token de Auth.
         else:
-            try:
-                #  "Un usuario solo puede tener una membresía activa a la vez"
-                membresia = Membresia.objects.filter(
-                    usuario=request.user, 
-                    estado='ACTIVO'
-                ).select_related('estacion').first()
-                
-                if membresia:
-                    request.estacion_activa = membresia.estacion
-                    return True # ¡Acceso concedido directo!
-            except Exception:
-                pass
-
-        if not estacion_id:
-            return False
+            estacion = resolver_estacion_activa(request.user)
 
-        # 4. Validar ID y asignar objeto al request
-        try:
-            # Validamos que el ID exista y (opcionalmente) que el usuario tenga acceso a ella
-            # Si ya validaste acceso en el login, aquí basta con obtener el objeto.
-            estacion = Estacion.objects.get(id=estacion_id)
-            request.estacion_activa = estacion # ¡Magia! Disponible en toda la vista
-            return True
-        except (Estacion.DoesNotExist, ValueError):
+        if estacion is None:
             return False
 
+        request.estacion_activa = estacion # ¡Magia! Disponible en toda la vista
+        return True
+
 
 
 
@@ -87,53 +95,57 @@ class IsSelfOrStationAdmin(permissions.BasePermission):
 # --- PERMISOS DE GESTIÓN DE INVENTARIO ---
 class CanVerCatalogos(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_ver_catalogos')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_ver_catalogos')
 
 class CanGestionarCatalogoLocal(permissions.BasePermission):
     """
     Permite añadir productos existentes en el global al catálogo local de la estación.
     """
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_gestionar_catalogo_local')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_gestionar_catalogo_local')
 
 class CanCrearProductoGlobal(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_crear_producto_global')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_crear_producto_global')
     
 class CanVerStock(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_ver_stock')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_ver_stock')
     
 class CanRecepcionarStock(permissions.BasePermission):
     def has_permission(self, request, view):
         # El mismo permiso que usa tu vista web
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_recepcionar_stock')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_recepcionar_stock')
 
 class CanVerUbicaciones(permissions.BasePermission):
     def has_permission(self, request, view):
         # El mismo permiso que usa tu vista web
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_ver_ubicaciones')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_ver_ubicaciones')
 
 class CanVerProveedores(permissions.BasePermission):
     def has_permission(self, request, view):
         # El mismo permiso que usa tu vista web
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_ver_proveedores')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_ver_proveedores')
 
 class CanGestionarBajasStock(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_gestionar_bajas_stock')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_gestionar_bajas_stock')
 
 class CanGestionarStockInterno(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_gestionar_stock_interno')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_gestionar_stock_interno')
     
 class CanGestionarPrestamos(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_gestionar_prestamos')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_gestionar_prestamos')
 
 class CanVerPrestamos(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_inventario_ver_prestamos')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_ver_prestamos')
+
+class CanGenerarReportesInventario(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_inventario_generar_reportes')
 
 
 
@@ -141,15 +153,15 @@ class CanVerPrestamos(permissions.BasePermission):
 # --- PERMISOS DE GESTIÓN DE MANTENIMIENTO ---
 class CanGestionarPlanes(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_mantenimiento_gestionar_planes')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_mantenimiento_gestionar_planes')
     
 class CanVerOrdenes(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_mantenimiento_ver_ordenes')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_mantenimiento_ver_ordenes')
 
 class CanGestionarOrdenes(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_mantenimiento_gestionar_ordenes')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_mantenimiento_gestionar_ordenes')
 
 
 
@@ -157,19 +169,19 @@ class CanGestionarOrdenes(permissions.BasePermission):
 # --- PERMISOS DE GESTIÓN USUARIOS ---
 class CanCrearUsuario(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_usuarios_crear_usuario')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_usuarios_crear_usuario')
     
 class CanVerUsuarios(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_usuarios_ver_usuarios')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_usuarios_ver_usuarios')
     
 class CanVerHojaVida(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_voluntarios_ver_voluntarios')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_voluntarios_ver_voluntarios')
     
 class CanVerFichaMedica(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_medica_ver_fichas_medicas')
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_medica_ver_fichas_medicas')
     
 
 
@@ -177,4 +189,4 @@ class CanVerFichaMedica(permissions.BasePermission):
 # --- PERMISOS DE GESTIÓN DOCUMENTAL ---
 class CanVerDocumentos(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.has_perm('gestion_usuarios.accion_gestion_documental_ver_documentos')
\ No newline at end of file
+        return tiene_permiso(request, 'gestion_usuarios.accion_gestion_documental_ver_documentos')
\ No newline at end of file
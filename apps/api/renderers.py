@@ -0,0 +1,51 @@
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Permite que la negociación de contenido de DRF acepte 'Accept: text/event-stream'
+    (EventSource). Las vistas SSE devuelven directamente un StreamingHttpResponse; este
+    renderer solo se usa para las respuestas de error (401/403), que se emiten como un
+    evento 'error' para que el cliente pueda leerlas.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return f"event: error\ndata: {json.dumps(data, default=str)}\n\n".encode(self.charset)
+
+
+
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer sobre orjson (varias veces más rápido que el json estándar en listados grandes).
+    orjson serializa nativamente str, números, UUID y fechas; el resto (Decimal, textos
+    traducibles perezosos, QuerySets, timedelta) pasa por el mismo encoder de DRF. El JSON es
+    equivalente al del JSONRenderer por defecto, aunque no siempre idéntico byte a byte: los
+    floats grandes salen como 1e16 (no 1e+16) y los enteros de más de 64 bits no se serializan.
+    Se activa con API_JSON_ORJSON (ver REST_FRAMEWORK en settings).
+    """
+    _default = JSONEncoder().default
+    _opciones = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        opciones = self._opciones
+        # orjson solo indenta a 2 espacios: se usa para cualquier indentación pedida (API navegable)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            opciones |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=self._default, option=opciones)
+        # Igual que JSONRenderer: U+2028/U+2029 son válidos en JSON pero no en JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import agregar_permisos_al_access
 from .utils import obtener_contexto_bomberil
-from apps.gestion_inventario.models import Comuna
+from apps.gestion_inventario.models import Comuna, MovimientoInventario
 from apps.gestion_usuarios.models import Membresia, Usuario
 
 
@@ -21,6 +22,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # 2. Inyecta la lógica de negocio
         contexto = obtener_contexto_bomberil(self.user)
         data.update(contexto)
+
+        # 3. Permisos embebidos en el access token (si API_JWT_PERMISOS está activo)
+        agregar_permisos_al_access(data, self.user)
         
         return data
 
@@ -52,6 +56,9 @@ class CustomTokenRefreshSerializer(TokenRefreshSerializer):
         contexto = obtener_contexto_bomberil(user)
         data.update(contexto)
 
+        # 4. El nuevo access lleva el mapa de permisos vigente (si API_JWT_PERMISOS está activo)
+        agregar_permisos_al_access(data, user)
+
         return data
 
 
@@ -69,6 +76,36 @@ class ComunaSerializer(serializers.ModelSerializer):
 
 
 
+class MovimientoHistorialSerializer(serializers.ModelSerializer):
+    """
+    Fila del historial de movimientos de una existencia (detalle por código e historial paginado).
+    Requiere select_related de 'usuario' y de los compartimentos de origen/destino con su ubicación.
+    """
+    fecha = serializers.SerializerMethodField()
+    tipo = serializers.CharField(source='get_tipo_movimiento_display')
+    usuario = serializers.SerializerMethodField()
+    origen = serializers.SerializerMethodField()
+    destino = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'fecha', 'tipo', 'usuario', 'origen', 'destino']
+
+    def get_fecha(self, obj):
+        return obj.fecha_hora.isoformat()
+
+    def get_usuario(self, obj):
+        return obj.usuario.get_full_name if obj.usuario else "Sistema"
+
+    def get_origen(self, obj):
+        return str(obj.compartimento_origen) if obj.compartimento_origen else "N/A"
+
+    def get_destino(self, obj):
+        return str(obj.compartimento_destino) if obj.compartimento_destino else "Externo/Baja"
+
+
+
+
 class ProductoLocalInputSerializer(serializers.Serializer):
     productoglobal_id = serializers.IntegerField(required=True)
     sku = serializers.CharField(required=True, max_length=100)
@@ -0,0 +1,21 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from .utils import purgar_claves_idempotencia
+
+logger = get_task_logger(__name__)
+
+@shared_task(bind=True, max_retries=3)
+def tarea_purgar_claves_idempotencia(self):
+    """
+    Tarea programada (Beat) que elimina las claves de idempotencia más antiguas
+    que su vigencia (API_IDEMPOTENCIA_TTL_HORAS).
+    """
+    try:
+        eliminadas = purgar_claves_idempotencia()
+        mensaje = f"Claves de idempotencia purgadas: {eliminadas} eliminadas."
+        logger.info(mensaje)
+        return mensaje
+
+    except Exception as e:
+        logger.error(f"Error al purgar las claves de idempotencia: {e}")
+        raise self.retry(exc=e, countdown=60 * 5)
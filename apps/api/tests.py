@@ -1,14 +1,19 @@
 # apps/api/tests.py
+from datetime import timedelta
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from django.contrib.auth.models import Permission
+from django.test import override_settings
 from django.contrib.auth import get_user_model
 from apps.gestion_inventario.models import (
     Estacion, Comuna, Region, Ubicacion, TipoUbicacion, 
     Categoria, ProductoGlobal, Producto, Activo, 
-    TipoEstado, Estado, Proveedor, Compartimento
+    TipoEstado, Estado, Proveedor, Compartimento, MovimientoInventario, TipoMovimiento
 )
-from apps.gestion_usuarios.models import Membresia
+from apps.gestion_usuarios.models import Membresia, Rol
 
 User = get_user_model()
 
@@ -122,4 +127,352 @@ class InventarioAPITest(APITestCase):
         """CP-INT-03: Validar que la API exige el ID del producto (Bad Request)."""
         self.client.force_authenticate(user=self.user)
         response = self.client.get(self.url_existencias)
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+    def test_listado_paginado_por_cursor(self):
+        """CP-INT-04: Los listados entregan páginas acotadas y el cursor 'next' recorre todo sin repetir."""
+        self.client.force_authenticate(user=self.user)
+        for i in range(4):
+            Proveedor.objects.create(nombre="Proveedor Test", rut=f"1000000{i}-1")
+
+        esperados = set(Proveedor.objects.values_list('id', flat=True))
+        vistos = []
+        url = '/api/v1/gestion_inventario/core/proveedores/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, f"Error API: {response.data}")
+            self.assertLessEqual(len(response.data['results']), 2)
+            vistos += [p['id'] for p in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(len(vistos), len(set(vistos)))
+        self.assertEqual(set(vistos), esperados)
+
+        response = self.client.get('/api/v1/gestion_inventario/core/proveedores/?cursor=no-valido')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_con_valores_de_otro_tipo(self):
+        """CP-INT-19: Un cursor bien codificado pero con valores que no calzan con los campos de orden responde 404, no 500."""
+        from apps.api.pagination import CursorPaginacion
+        self.client.force_authenticate(user=self.user)
+        paginador = CursorPaginacion(ordering=('nombre', 'id'))
+        for posicion in (['Proveedor Test', 'no-es-un-id'], ['Proveedor Test', {'id': 1}]):
+            response = self.client.get(f'/api/v1/gestion_inventario/core/proveedores/?cursor={paginador.encode_cursor(posicion)}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_historial_existencia_por_cursor(self):
+        """CP-INT-05: El detalle entrega los últimos movimientos y el cursor continúa el historial sin repetir, aun con fechas empatadas."""
+        self.client.force_authenticate(user=self.user)
+        fecha = timezone.now()
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                tipo_movimiento=TipoMovimiento.AJUSTE, estacion=self.estacion, usuario=self.user,
+                activo=self.activo, cantidad_movida=0, fecha_hora=fecha - timedelta(days=i // 3)
+            ) for i in range(25)
+        ])
+        esperados = list(MovimientoInventario.objects.filter(activo=self.activo).order_by('-fecha_hora', '-id').values_list('id', flat=True))
+
+        response = self.client.get('/api/v1/gestion_inventario/existencias/buscar/?codigo=TEST-ACT-001')
+        self.assertEqual(response.status_code, 200, f"Error API: {response.data}")
+        vistos = [m['id'] for m in response.data['historial_movimientos']]
+        self.assertEqual(len(vistos), 20)
+
+        url = response.data['historial_siguiente'] + '&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, f"Error API: {response.data}")
+            vistos += [m['id'] for m in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(vistos, esperados)
+
+    def test_lote_de_operaciones_es_atomico(self):
+        """CP-INT-06: El lote ejecuta las operaciones en orden y, si una falla, revierte las anteriores."""
+        self.client.force_authenticate(user=self.user)
+        Estado.objects.get_or_create(nombre="ANULADO POR ERROR", defaults={'tipo_estado': self.activo.estado.tipo_estado})
+        anular = {"metodo": "POST", "ruta": "/api/v1/gestion_inventario/movimientos/anular/", "cuerpo": {"tipo": "ACTIVO", "id": str(self.activo.id)}}
+        detalle = {"metodo": "GET", "ruta": "/api/v1/gestion_inventario/existencias/buscar/?codigo=TEST-ACT-001"}
+
+        # La segunda anulación choca con la primera (el activo ya no está DISPONIBLE): nada se aplica
+        response = self.client.post('/api/v1/lote/', {"operaciones": [anular, anular, detalle]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.data['aplicado'])
+        self.assertEqual([r['estado'] for r in response.data['resultados']], [200, 409])
+        self.activo.refresh_from_db()
+        self.assertEqual(self.activo.estado.nombre, "DISPONIBLE")
+
+        response = self.client.post('/api/v1/lote/', {"operaciones": [anular, detalle]}, format='json')
+        self.assertEqual(response.status_code, 200, f"Error API: {response.data}")
+        self.assertEqual(response.data['resultados'][1]['respuesta']['estado'], "ANULADO POR ERROR")
+
+        # Solo rutas de la lista permitida
+        response = self.client.post('/api/v1/lote/', {"operaciones": [{"metodo": "POST", "ruta": "/api/v1/auth/logout/"}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_reintento_con_idempotency_key(self):
+        """CP-INT-07: Un reintento con la misma Idempotency-Key devuelve la respuesta original sin repetir la escritura."""
+        self.client.force_authenticate(user=self.user)
+        Estado.objects.get_or_create(nombre="ANULADO POR ERROR", defaults={'tipo_estado': self.activo.estado.tipo_estado})
+        url = '/api/v1/gestion_inventario/movimientos/anular/'
+        cuerpo = {"tipo": "ACTIVO", "id": str(self.activo.id)}
+
+        primera = self.client.post(url, cuerpo, format='json', HTTP_IDEMPOTENCY_KEY='anular-1')
+        self.assertEqual(primera.status_code, 200, f"Error API: {primera.data}")
+
+        # Sin la clave, repetir chocaría con el estado ya anulado (409); con ella se reentrega el 200
+        reintento = self.client.post(url, cuerpo, format='json', HTTP_IDEMPOTENCY_KEY='anular-1')
+        self.assertEqual(reintento.status_code, 200)
+        self.assertEqual(reintento['Idempotent-Replayed'], 'true')
+        self.assertEqual(reintento.json(), primera.json())
+        self.assertEqual(MovimientoInventario.objects.filter(activo=self.activo).count(), 1)
+
+        otra = self.client.post(url, {**cuerpo, "motivo": "Otro"}, format='json', HTTP_IDEMPOTENCY_KEY='anular-1')
+        self.assertEqual(otra.status_code, 422)
+
+    def test_estacion_activa_cacheada_e_invalidada(self):
+        """CP-INT-08: La estación del header se valida contra la membresía una vez y se invalida al cambiar la membresía."""
+        from apps.api.utils import resolver_estacion_activa
+        voluntario = User.objects.create(email='voluntario_api@bomberos.cl', rut='12345678-5', first_name='Vol', last_name='API')
+        membresia = Membresia.objects.create(usuario=voluntario, estacion=self.estacion, estado='ACTIVO', fecha_inicio=timezone.now().date())
+
+        self.assertEqual(resolver_estacion_activa(voluntario, str(self.estacion.id)), self.estacion)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver_estacion_activa(voluntario, str(self.estacion.id)), self.estacion)
+        # Una estación sin membresía no se acepta aunque venga en el header
+        self.assertIsNone(resolver_estacion_activa(voluntario, self.estacion.id + 1))
+
+        membresia.estado = 'FINALIZADO'
+        membresia.save()
+        self.assertIsNone(resolver_estacion_activa(voluntario, str(self.estacion.id)))
+
+    @override_settings(API_JWT_PERMISOS=True)
+    def test_token_con_permisos_embebidos(self):
+        """CP-INT-09: El access token lleva el mapa de permisos y se rechaza al cambiar los permisos del rol."""
+        from apps.api.authentication import CLAIM_PERMISOS, pk_permiso, tiene_bit
+        voluntario = User.objects.create(email='bitmap_api@bomberos.cl', rut='11111111-1', first_name='Bit', last_name='API')
+        voluntario.set_password('password123')
+        voluntario.save()
+        rol = Rol.objects.create(nombre='Bodeguero API', estacion=self.estacion)
+        permiso = Permission.objects.get(codename='accion_gestion_inventario_ver_catalogos')
+        rol.permisos.add(permiso)
+        membresia = Membresia.objects.create(usuario=voluntario, estacion=self.estacion, estado='ACTIVO', fecha_inicio=timezone.now().date())
+        membresia.roles.add(rol)
+
+        cliente = APIClient()
+        tokens = cliente.post('/api/v1/auth/login/', {'rut': '11111111-1', 'password': 'password123'}, format='json').json()
+        mapa = AccessToken(tokens['access'])[CLAIM_PERMISOS][str(self.estacion.id)]
+        self.assertTrue(tiene_bit(mapa, pk_permiso('gestion_usuarios.accion_gestion_inventario_ver_catalogos')))
+        self.assertFalse(tiene_bit(mapa, pk_permiso('gestion_usuarios.accion_gestion_inventario_ver_stock')))
+
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(cliente.get('/api/v1/gestion_inventario/catalogo/stock/').status_code, status.HTTP_200_OK)
+
+        # Quitar el permiso al rol deja obsoleto el token emitido
+        rol.permisos.remove(permiso)
+        response = cliente.get('/api/v1/gestion_inventario/catalogo/stock/')
+        self.assertIn(response.status_code, [401, 403])
+        self.assertIn('Renueve el token', response.json()['detail'])
+
+        # El refresh emite el mapa vigente, ya sin el permiso
+        nuevo = cliente.post('/api/v1/auth/refresh/', {'refresh': tokens['refresh']}, format='json').json()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {nuevo['access']}")
+        self.assertEqual(cliente.get('/api/v1/gestion_inventario/catalogo/stock/').status_code, status.HTTP_403_FORBIDDEN)
+
+        # Si la caché pierde las versiones (expulsión, reinicio) el token vigente se sigue aceptando
+        from django.core.cache import cache
+        from apps.gestion_usuarios.versiones import CLAVE_VERSION_GLOBAL
+        cache.delete_many([CLAVE_VERSION_GLOBAL, f'contexto:version:{voluntario.pk}'])
+        self.assertEqual(cliente.get('/api/v1/gestion_inventario/catalogo/stock/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_contexto_bomberil_cacheado_e_invalidado(self):
+        """CP-INT-10: El contexto (estación y permisos) se cachea y se invalida al cambiar los permisos del rol."""
+        from apps.api.utils import obtener_contexto_bomberil
+        voluntario = User.objects.create(email='contexto_api@bomberos.cl', rut='22222222-2', first_name='Ctx', last_name='API')
+        rol = Rol.objects.create(nombre='Bodeguero Contexto', estacion=self.estacion)
+        membresia = Membresia.objects.create(usuario=voluntario, estacion=self.estacion, estado='ACTIVO', fecha_inicio=timezone.now().date())
+        membresia.roles.add(rol)
+
+        self.assertEqual(obtener_contexto_bomberil(voluntario)['permisos'], [])
+        with self.assertNumQueries(0):
+            contexto = obtener_contexto_bomberil(voluntario)
+        self.assertEqual(contexto['estacion']['id'], self.estacion.id)
+
+        rol.permisos.add(Permission.objects.get(codename='accion_gestion_inventario_ver_catalogos'))
+        self.assertEqual(obtener_contexto_bomberil(voluntario)['permisos'], ['accion_gestion_inventario_ver_catalogos'])
+
+    def test_renderer_orjson_equivale_al_estandar(self):
+        """CP-INT-11: ORJSONRenderer produce el mismo JSON que el JSONRenderer de DRF."""
+        import io
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from apps.api.parsers import ORJSONParser
+        from apps.api.renderers import ORJSONRenderer
+        datos = {
+            'id': self.activo.id, 'costo': Decimal('10.50'), 'fecha': timezone.now().replace(microsecond=0),
+            'estado': gettext_lazy('Disponible'), 'nombre': 'Hacha ñ', 'filas': [1, None, True],
+        }
+        salida = ORJSONRenderer().render(datos)
+        self.assertEqual(salida, JSONRenderer().render(datos))
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(salida))['nombre'], 'Hacha ñ')
+
+    def test_resolver_codigos_en_bloque(self):
+        """CP-INT-12: Varios códigos escaneados se resuelven con una consulta = ANY(...) por tabla."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(
+                '/api/v1/gestion_inventario/existencias/resolver/',
+                {'codigos': ['NO-EXISTE', 'TEST-ACT-001', 'TEST-ACT-001']}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['codigo'] for r in response.data['resultados']], ['TEST-ACT-001'])
+        self.assertEqual(response.data['no_encontrados'], ['NO-EXISTE'])
+        self.assertEqual(sum('= ANY(' in q['sql'] for q in consultas.captured_queries), 2)
+
+    def test_graficos_cacheados_e_invalidados(self):
+        """CP-INT-13: Los gráficos salen de una consulta cacheada por estación que se invalida al escribir en el inventario."""
+        from apps.gestion_inventario.graficos import graficos_inventario
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/gestion_inventario/graficos/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['categorias'], {'labels': ['Rescate'], 'values': [1]})
+        self.assertEqual(response.data['estados'], {'labels': ['Operativo'], 'values': [1]})
+
+        # Los endpoints por serie leen del mismo resultado cacheado
+        with self.assertNumQueries(0):
+            graficos_inventario(self.estacion.id)
+        self.assertEqual(self.client.get('/api/v1/gestion_inventario/existencias-por-estado/').data, response.data['estados'])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Activo.objects.create(
+                producto=self.producto, estacion=self.estacion, estado=self.activo.estado,
+                compartimento=self.activo.compartimento, proveedor=self.activo.proveedor
+            )
+        # Solo la invalidación de gráficos (la bitácora de sincronización no interesa aquí)
+        for callback in callbacks:
+            if callback.__module__ == 'apps.gestion_inventario.graficos':
+                callback()
+        self.assertEqual(graficos_inventario(self.estacion.id)['categorias']['values'], [2])
+
+        # Editar el catálogo también cambia la versión de los gráficos
+        categoria = self.producto.producto_global.categoria
+        categoria.nombre = "Rescate Vehicular"
+        categoria.save()
+        self.assertEqual(graficos_inventario(self.estacion.id)['categorias']['labels'], ['Rescate Vehicular'])
+
+    async def test_lecturas_async_bajo_asgi(self):
+        """CP-INT-14: Las lecturas async (perfil, catálogo, detalle por código) responden igual atendidas por el handler ASGI."""
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        encabezados = {'Authorization': f'Bearer {token}'}
+        me = await self.async_client.get('/api/v1/auth/me/', headers=encabezados)
+        self.assertEqual(me.status_code, status.HTTP_200_OK)
+        self.assertEqual(me.json()['usuario']['email'], self.user.email)
+
+        catalogo = await self.async_client.get('/api/v1/gestion_inventario/catalogo/stock/', headers=encabezados)
+        self.assertEqual(catalogo.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['sku'] for p in catalogo.json()['results']], ['HACHA-001'])
+
+        detalle = await self.async_client.get('/api/v1/gestion_inventario/existencias/buscar/?codigo=TEST-ACT-001', headers=encabezados)
+        self.assertEqual(detalle.status_code, status.HTTP_200_OK)
+
+    def test_esquema_precalculado_con_etag(self):
+        """CP-INT-15: Fuera de DEBUG el esquema se sirve desde el archivo precalculado, con ETag del contenido y 304 al revalidar."""
+        import tempfile
+        from pathlib import Path
+        from apps.api.esquema import hash_contenido
+        with tempfile.TemporaryDirectory() as directorio, override_settings(API_ESQUEMA_DIR=directorio):
+            self.assertEqual(self.client.get('/api/v1/schema/').status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+            yaml = b'openapi: 3.0.3\n'
+            Path(directorio, 'schema.yml').write_bytes(yaml)
+            Path(directorio, 'schema.json').write_bytes(b'{"openapi": "3.0.3"}')
+            response = self.client.get('/api/v1/schema/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, yaml)
+            self.assertEqual(response['ETag'], f'"{hash_contenido(yaml)}"')
+            self.assertIn('max-age=', response['Cache-Control'])
+
+            revalidacion = self.client.get('/api/v1/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(revalidacion.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(revalidacion.content, b'')
+
+            self.assertEqual(self.client.get('/api/v1/schema/?format=json').content, b'{"openapi": "3.0.3"}')
+
+    @override_settings(
+        DOCUMENTOS_PDF_ASINCRONO=False,
+        STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'documentos_privados': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        },
+    )
+    def test_pdf_cacheado_por_contenido_e_invalidado(self):
+        """CP-INT-16: El PDF de la hoja de vida se genera una vez por contenido, se reutiliza y se descarta al cambiar el voluntario."""
+        from django.core.files.storage import storages
+        from apps.gestion_voluntarios.models import Voluntario
+        privados = storages['documentos_privados']
+        token = str(AccessToken.for_user(self.user))
+        voluntario = Voluntario.objects.get(usuario=self.user)
+        directorio = f'documentos_pdf/hoja_vida/{voluntario.pk}'
+
+        for _intento in range(2):
+            response = self.client.get(f'/api/v1/perfil/descargar-hoja-vida/?token={token}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+            self.assertEqual(len(privados.listdir(directorio)[1]), 1)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            voluntario.lugar_nacimiento = 'Iquique'
+            voluntario.save()
+        for callback in callbacks:
+            if callback.__module__ == 'apps.common.pdf':
+                callback()
+        self.assertEqual(privados.listdir(directorio)[1], [])
+
+        ficha = self.client.get(f'/api/v1/perfil/descargar-ficha-medica/?token={token}')
+        self.assertEqual(ficha.status_code, status.HTTP_200_OK)
+        self.assertEqual(ficha['Content-Type'], 'application/pdf')
+
+        # Un trabajo ajeno o expirado no se puede consultar
+        response = self.client.get(f'/api/v1/perfil/documentos/{"0" * 64}/?token={token}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        DOCUMENTOS_PDF_ASINCRONO=True,
+        STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'documentos_privados': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        },
+    )
+    def test_pdf_fallido_no_se_reencola(self):
+        """CP-INT-17: Si la conversión falló, la descarga informa el error en vez de reencolar el mismo documento."""
+        from django.core.cache import cache
+        from apps.common.pdf import ERROR, HOJA_VIDA, id_trabajo
+        from apps.gestion_voluntarios.documentos import html_hoja_vida
+        from apps.gestion_voluntarios.models import Voluntario
+        voluntario = Voluntario.objects.get(usuario=self.user)
+        membresia = Membresia.objects.filter(usuario=self.user, estado='ACTIVO').first()
+        trabajo = id_trabajo(HOJA_VIDA, html_hoja_vida(voluntario, membresia))
+        cache.set(f'pdf:trabajo:{trabajo}', {
+            'tipo': HOJA_VIDA, 'voluntario_id': str(voluntario.pk), 'ruta': 'x.pdf', 'nombre': 'x.pdf', 'estado': ERROR,
+        })
+        try:
+            token = str(AccessToken.for_user(self.user))
+            response = self.client.get(f'/api/v1/perfil/descargar-hoja-vida/?token={token}')
+            self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+            self.assertEqual(cache.get(f'pdf:trabajo:{trabajo}')['estado'], ERROR)
+        finally:
+            cache.delete(f'pdf:trabajo:{trabajo}')
+
+    @override_settings(INVENTARIO_TIEMPO_REAL_REDIS_URL='redis://localhost:6379/15')
+    def test_canal_en_vivo_bajo_wsgi_es_long_poll(self):
+        """CP-INT-18: Bajo WSGI el canal en vivo entrega solo el snapshot aunque haya Redis, sin retener el hilo."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/gestion_inventario/en-vivo/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        eventos = [parte.decode() for parte in response.streaming_content]
+        self.assertEqual(len(eventos), 2)
+        self.assertTrue(eventos[1].startswith('event: snapshot\n'))
@@ -1,17 +1,22 @@
 from django.urls import path
+from django.conf import settings
 from .views import (
     AlternarTemaOscuroAPIView,
     BuscarUsuarioAPIView, 
     ActualizarAvatarUsuarioAPIView, 
     ComunasPorRegionAPIView, 
     InventarioGraficoEstadosAPIView, 
+    InventarioGraficosAPIView,
     InventarioGraficoExistenciasCategoriaAPIView,
     InventarioProductoGlobalSKUAPIView,
+    InventarioProductoGlobalSimilaresAPIView,
     InventarioAnadirProductoLocalAPIView,
     InventarioBuscarExistenciasPrestablesAPI,
     InventarioCrearPrestamoAPIView,
     InventarioDestinatarioListAPIView,
     InventarioDetalleExistenciaAPIView,
+    InventarioHistorialExistenciaAPIView,
+    InventarioResolverCodigosAPIView,
     InventarioCatalogoStockAPIView,
     InventarioExistenciasPorProductoAPIView,
     InventarioRecepcionStockAPIView,
@@ -21,10 +26,20 @@ from .views import (
     InventarioAnularExistenciaAPIView,
     InventarioAjustarStockAPIView,
     InventarioConsumirStockAPIView,
+    InventarioConsumoFEFOAPIView,
     InventarioBajaExistenciaAPIView,
     InventarioExtraviarActivoAPIView,
+    InventarioCambioEstadoMasivoAPIView,
     InventarioHistorialPrestamosAPIView,
     InventarioGestionarDevolucionAPIView,
+    InventarioAbrirSesionConteoAPIView,
+    InventarioRegistrarLecturasConteoAPIView,
+    InventarioSesionConteoDetalleAPIView,
+    InventarioCerrarSesionConteoAPIView,
+    InventarioSincronizacionAPIView,
+    InventarioValorizacionAPIView,
+    InventarioEnVivoAPIView,
+    InventarioVerificacionCargaAPIView,
     MantenimientoBuscarActivoParaPlanAPIView,
     MantenimientoAnadirActivoEnPlanAPIView,
     MantenimientoQuitarActivoDePlanAPIView,
@@ -49,7 +64,10 @@ from .views import (
     PasswordResetRequestView,
     DescargarHojaVidaPropiaAPIView,
     DescargarFichaMedicaPropiaAPIView,
-    TestConnectionView
+    DocumentoPDFEstadoAPIView,
+    TestConnectionView,
+    EsquemaAPIView,
+    LoteOperacionesAPIView
 )
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
@@ -59,10 +77,12 @@ urlpatterns = [
     # Alternar tema oscuro
     path('alternar-tema-oscuro/', AlternarTemaOscuroAPIView.as_view(), name='api_alternar_tema'),
     path('test-connection/', TestConnectionView.as_view(), name='test_connection'),
+    # Varias operaciones en una sola petición y transacción
+    path('lote/', LoteOperacionesAPIView.as_view(), name='api_lote_operaciones'),
 
 
-    # Documentación
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Documentación. Fuera de DEBUG el esquema se sirve precalculado (manage.py generar_esquema_api)
+    path('schema/', SpectacularAPIView.as_view() if settings.DEBUG else EsquemaAPIView.as_view(), name='schema'),
     path('schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='api:schema'), name='swagger-ui'),
     path('schema/redoc/', SpectacularRedocView.as_view(url_name='api:schema'), name='redoc'),
 
@@ -83,6 +103,8 @@ urlpatterns = [
 
     path('perfil/descargar-hoja-vida/', DescargarHojaVidaPropiaAPIView.as_view(), name='api_descargar_hoja_vida'),
     path('perfil/descargar-ficha-medica/', DescargarFichaMedicaPropiaAPIView.as_view(), name='api_descargar_ficha_medica'),
+    # Estado de un PDF que se genera en segundo plano (lo entrega cuando está listo)
+    path('perfil/documentos/<str:trabajo>/', DocumentoPDFEstadoAPIView.as_view(), name='api_documento_pdf_estado'),
 
 
 
@@ -99,6 +121,8 @@ urlpatterns = [
     # --- INVENTARIO ---
     # Obtener comunas por región
     path('gestion_inventario/comunas-por-region/<int:region_id>/', ComunasPorRegionAPIView.as_view(), name='api_comunas_por_region'),
+    # Obtener todos los gráficos de inventario en una sola llamada
+    path('gestion_inventario/graficos/', InventarioGraficosAPIView.as_view(), name="api_graficos_inventario"),
     # Obtener gráfico de existencias por categoría
     path('gestion_inventario/existencias-por-categoria/', InventarioGraficoExistenciasCategoriaAPIView.as_view(), name="api_obtener_grafico_categoria"),
     # Obtener gráfico existencias por estado
@@ -107,6 +131,8 @@ urlpatterns = [
     path('gestion_inventario/detalle-existencia/<int:pk>/', InventarioProductoGlobalSKUAPIView.as_view(), name="api_get_producto_global_sku"),
     # Agregar producto al catálogo local
     path('gestion_inventario/anadir-producto-local/', InventarioAnadirProductoLocalAPIView.as_view(), name="api_anadir_producto_local"),
+    # Sugerencias de productos globales similares (evitar duplicados al crear)
+    path('gestion_inventario/catalogo-global/similares/', InventarioProductoGlobalSimilaresAPIView.as_view(), name="api_productos_globales_similares"),
 
     # --- INVENTARIO: PRÉSTAMOS ---
     # Buscar existencias disponibles para préstamo
@@ -122,6 +148,10 @@ urlpatterns = [
 
     # Obtener detalle de una existencia
     path('gestion_inventario/existencias/buscar/', InventarioDetalleExistenciaAPIView.as_view(), name='api_existencia_detalle'),
+    # Resolver en bloque los códigos escaneados (activos y lotes)
+    path('gestion_inventario/existencias/resolver/', InventarioResolverCodigosAPIView.as_view(), name='api_existencias_resolver'),
+    # Historial de movimientos de una existencia (paginado por cursor)
+    path('gestion_inventario/existencias/<str:tipo_item>/<uuid:item_id>/movimientos/', InventarioHistorialExistenciaAPIView.as_view(), name='api_existencia_historial'),
     # Obtener catálogo local de productos (con existencias)
     path('gestion_inventario/catalogo/stock/', InventarioCatalogoStockAPIView.as_view(), name='api_catalogo_stock'),
     # Lista de Existencias por Producto
@@ -136,6 +166,8 @@ urlpatterns = [
     path('gestion_inventario/movimientos/ajustar/', InventarioAjustarStockAPIView.as_view(), name='api_ajustar_stock'),
     # Ruta para consumo de stock (salida interna)
     path('gestion_inventario/movimientos/consumir/', InventarioConsumirStockAPIView.as_view(), name='api_consumir_stock'),
+    # Ruta para consumo repartido por vencimiento (FEFO)
+    path('gestion_inventario/movimientos/consumir-fefo/', InventarioConsumoFEFOAPIView.as_view(), name='api_consumir_stock_fefo'),
     # Mover/Trasferir existencias (interno) (PENDIENTE)
     # Ruta para anular (dar de baja lógica por error)
     path('gestion_inventario/movimientos/anular/', InventarioAnularExistenciaAPIView.as_view(), name='api_anular_existencia'),
@@ -143,6 +175,26 @@ urlpatterns = [
     path('gestion_inventario/movimientos/baja/', InventarioBajaExistenciaAPIView.as_view(), name='api_baja_existencia'),
     # Ruta para reportar extravío (pérdida accidental)
     path('gestion_inventario/movimientos/extravio/', InventarioExtraviarActivoAPIView.as_view(), name='api_extravio_activo'),
+    # Ruta para anular / dar de baja / reportar extravío de muchas existencias a la vez
+    path('gestion_inventario/movimientos/cambio-estado-masivo/', InventarioCambioEstadoMasivoAPIView.as_view(), name='api_cambio_estado_masivo'),
+
+    # --- INVENTARIO: TOMA DE INVENTARIO FÍSICO ---
+    # Abrir sesión de conteo sobre una ubicación
+    path('gestion_inventario/inventario-fisico/abrir/', InventarioAbrirSesionConteoAPIView.as_view(), name='api_inventario_fisico_abrir'),
+    # Diff acumulado de la sesión
+    path('gestion_inventario/inventario-fisico/<int:sesion_id>/', InventarioSesionConteoDetalleAPIView.as_view(), name='api_inventario_fisico_detalle'),
+    # Envío de lecturas QR por lotes
+    path('gestion_inventario/inventario-fisico/<int:sesion_id>/lecturas/', InventarioRegistrarLecturasConteoAPIView.as_view(), name='api_inventario_fisico_lecturas'),
+    # Cerrar (aplicar) o cancelar la sesión
+    path('gestion_inventario/inventario-fisico/<int:sesion_id>/cerrar/', InventarioCerrarSesionConteoAPIView.as_view(), name='api_inventario_fisico_cerrar'),
+
+    # --- INVENTARIO: SINCRONIZACIÓN INCREMENTAL (APP MÓVIL) ---
+    path('gestion_inventario/sync/', InventarioSincronizacionAPIView.as_view(), name='api_inventario_sync'),
+    path('gestion_inventario/valorizacion/', InventarioValorizacionAPIView.as_view(), name='api_inventario_valorizacion'),
+    # Canal en vivo del inventario (SSE)
+    path('gestion_inventario/en-vivo/', InventarioEnVivoAPIView.as_view(), name='api_inventario_en_vivo'),
+    # Carga esperada vs. real de los vehículos (plantillas de carga)
+    path('gestion_inventario/vehiculos/verificacion-carga/', InventarioVerificacionCargaAPIView.as_view(), name='api_verificacion_carga'),
 
 
 
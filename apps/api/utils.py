@@ -1,11 +1,61 @@
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
 from rest_framework import serializers
+from apps.gestion_inventario.models import Estacion
 from apps.gestion_usuarios.models import Membresia
+from apps.gestion_usuarios.versiones import version_contexto
+from .models import ClaveIdempotencia
+
+
+def resolver_estacion_activa(usuario, estacion_id=None, validar_membresia=True):
+    """
+    Estación activa del usuario para la API, o None si no le corresponde ninguna.
+
+    - Con `estacion_id` (header X-Estacion-ID): exige una membresía ACTIVA del usuario en esa
+      estación; los superusuarios pueden operar en cualquiera que exista.
+    - Con `estacion_id` y `validar_membresia=False` (sesión web, validada al entrar): basta con
+      que la estación exista.
+    - Sin `estacion_id`: la estación de la membresía ACTIVA del usuario.
+
+    El resultado (también el negativo) se cachea por usuario, estación y versión del contexto,
+    que cambia al modificarse sus membresías (ver gestion_usuarios.versiones).
+    """
+    if estacion_id is not None:
+        try:
+            estacion_id = int(estacion_id)
+        except (TypeError, ValueError):
+            return None
 
+    clave = f"api:estacion:{usuario.pk}:{estacion_id or '-'}:{int(validar_membresia)}:{version_contexto(usuario.pk)}"
+    estacion = cache.get(clave)
+    if estacion is None:
+        if estacion_id is not None and (not validar_membresia or usuario.is_superuser):
+            estacion = Estacion.objects.filter(id=estacion_id).first()
+        else:
+            membresias = Membresia.objects.filter(usuario=usuario, estado=Membresia.Estado.ACTIVO)
+            if estacion_id is not None:
+                membresias = membresias.filter(estacion_id=estacion_id)
+            membresia = membresias.select_related('estacion').first()
+            estacion = membresia.estacion if membresia else None
+        # False marca el "sin estación" en caché (None equivale a ausente)
+        cache.set(clave, estacion or False, settings.API_CONTEXTO_CACHE_SEGUNDOS)
+    return estacion or None
 
-def obtener_contexto_bomberil(user):
+
+
+
+def obtener_contexto_bomberil(user, estacion_id=None):
     """
     Lógica centralizada para obtener estación y permisos.
     Retorna un diccionario con la data o lanza ValidationError.
+    Con `estacion_id` exige que la membresía activa sea de esa estación.
+
+    La parte que sale de la membresía (estación, permisos) se cachea por usuario, estación y
+    versión del contexto, que cambia al modificarse sus membresías, roles o permisos
+    (ver gestion_usuarios.versiones): en régimen normal no consulta la base de datos.
     """
     data = {}
     
@@ -19,30 +69,53 @@ def obtener_contexto_bomberil(user):
         'avatar_thumb_small': user.avatar_thumb_small.url if user.avatar_thumb_small else None,
     }
 
-    # 2. Membresía Activa
-    membresia_activa = Membresia.objects.filter(
-        usuario=user, 
-        estado=Membresia.Estado.ACTIVO
-    ).select_related('estacion').prefetch_related('roles__permisos').first()
+    # 2. Membresía Activa (cacheada)
+    clave = f"api:contexto:{user.pk}:{estacion_id or '-'}:{version_contexto(user.pk)}"
+    contexto = cache.get(clave)
+    if contexto is None:
+        contexto = _contexto_membresia(user, estacion_id)
+        # False marca el "sin membresía activa" en caché (None equivale a ausente)
+        cache.set(clave, contexto or False, settings.API_CONTEXTO_CACHE_SEGUNDOS)
 
-    if membresia_activa:
-        data['estacion'] = {
-            'id': membresia_activa.estacion.id,
-            'nombre': membresia_activa.estacion.nombre,
-            'codigo': membresia_activa.estacion.codigo
-        }
-        
-        permisos_set = set()
-        for rol in membresia_activa.roles.all():
-            for permiso in rol.permisos.all():
-                permisos_set.add(permiso.codename)
-        
-        data['permisos'] = list(permisos_set)
-        data['membresia_id'] = membresia_activa.id
-    else:
+    if not contexto:
         # AQUÍ: Si intentan refrescar y ya no tienen membresía, fallará.
         raise serializers.ValidationError(
             {"detail": "Tu estación activa ha sido revocada o finalizada."}
         )
-    
-    return data
\ No newline at end of file
+
+    data.update(contexto)
+    return data
+
+
+def _contexto_membresia(user, estacion_id=None):
+    membresias = Membresia.objects.filter(usuario=user, estado=Membresia.Estado.ACTIVO)
+    if estacion_id is not None:
+        membresias = membresias.filter(estacion_id=estacion_id)
+    membresia_activa = membresias.select_related('estacion').prefetch_related('roles__permisos').first()
+    if membresia_activa is None:
+        return None
+
+    permisos_set = set()
+    for rol in membresia_activa.roles.all():
+        for permiso in rol.permisos.all():
+            permisos_set.add(permiso.codename)
+
+    return {
+        'estacion': {
+            'id': membresia_activa.estacion.id,
+            'nombre': membresia_activa.estacion.nombre,
+            'codigo': membresia_activa.estacion.codigo
+        },
+        'permisos': sorted(permisos_set),
+        'membresia_id': membresia_activa.id,
+    }
+
+
+
+
+def purgar_claves_idempotencia(horas=None):
+    """Elimina las claves de idempotencia que ya no protegen reintentos (más antiguas que su vigencia)."""
+    horas = horas if horas is not None else settings.API_IDEMPOTENCIA_TTL_HORAS
+    limite = timezone.now() - datetime.timedelta(hours=horas)
+    eliminadas, _ = ClaveIdempotencia.objects.filter(fecha_creacion__lt=limite).delete()
+    return eliminadas
@@ -1,28 +1,39 @@
+import asyncio
 import uuid
 import io
-from django.http import HttpResponse
-from django.template.loader import render_to_string
+import json
+from urllib.parse import urlsplit
+from django.http import HttpResponse, StreamingHttpResponse
 from datetime import date
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.dateparse import parse_date
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404, aget_object_or_404
+from asgiref.sync import async_to_sync, sync_to_async
+from django.urls import reverse, resolve, Resolver404
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import IntegrityError, transaction
 from django.db.models import Count, F, Sum, Q, Max, Prefetch
 from django.db.models.functions import Coalesce
 from django.contrib.auth.forms import PasswordResetForm
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.conf import settings
 from PIL import Image
 from rest_framework.views import APIView
+from adrf.views import APIView as AsyncAPIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.utils.urls import replace_query_param
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from xhtml2pdf import pisa
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiJsonRenderer2, OpenApiYamlRenderer, OpenApiYamlRenderer2
 
 from apps.gestion_usuarios.models import Usuario, Membresia
 from apps.gestion_mantenimiento.models import PlanMantenimiento, PlanActivoConfig, OrdenMantenimiento, RegistroMantenimiento
@@ -44,15 +55,49 @@ from apps.gestion_inventario.models import (
     TipoMovimiento,
     Prestamo,
     PrestamoDetalle,
-    Destinatario
+    Destinatario,
+    SesionInventario,
+    CambioSincronizacion
 ) 
-from apps.gestion_voluntarios.models import Voluntario, HistorialCargo, HistorialReconocimiento, HistorialSancion, HistorialCurso
+from apps.gestion_voluntarios.models import Voluntario, HistorialCargo, HistorialReconocimiento, HistorialSancion
 from apps.gestion_medica.models import FichaMedica
 from apps.gestion_documental.models import DocumentoHistorico
+from apps.gestion_inventario.graficos import graficos_inventario
+from apps.gestion_inventario.tiempo_real import flujo_para_peticion
 from apps.gestion_inventario.utils import generar_sku_sugerido, get_or_create_anulado_compartment, get_or_create_extraviado_compartment
+from apps.gestion_inventario.services import (
+    abrir_sesion_inventario,
+    registrar_lecturas_inventario,
+    resumen_sesion_inventario,
+    cerrar_sesion_inventario,
+    cancelar_sesion_inventario,
+    buscar_productos_globales_similares,
+    registrar_cambios_sincronizacion,
+    obtener_cambios_sincronizacion,
+    MAX_CAMBIOS_POR_PAGINA,
+    prestamos_vencidos,
+    filtrar_prestamos_vencidos,
+    planificar_consumo_fefo,
+    aplicar_consumo_fefo,
+    recalcular_valorizacion,
+    resumen_valorizacion,
+    DIMENSIONES_VALORIZACION,
+    cambiar_estado_existencias,
+    ACCIONES_CAMBIO_ESTADO,
+    comparar_cargas
+)
 from .utils import obtener_contexto_bomberil
-from .serializers import ComunaSerializer, ProductoLocalInputSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer
-from .mixins import OrdenValidacionMixin
+from .esquema import FORMATOS, cargar_esquema
+from apps.common.pdf import (
+    HOJA_VIDA, FICHA_MEDICA, LISTO, ERROR, ErrorGeneracionPDF,
+    solicitar_pdf, estado_trabajo, pdf_fallido, respuesta_pdf, respuesta_pdf_pendiente
+)
+from apps.gestion_voluntarios.documentos import html_hoja_vida
+from apps.gestion_medica.documentos import html_ficha_medica
+from .serializers import ComunaSerializer, ProductoLocalInputSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, MovimientoHistorialSerializer
+from .mixins import OrdenValidacionMixin, IdempotenciaMixin
+from .pagination import CursorPaginacion, PARAMETROS_CURSOR, respuesta_paginada
+from .renderers import EventStreamRenderer
 from .permissions import (
     IsEstacionActiva, 
     CanCrearUsuario,
@@ -68,6 +113,7 @@ from .permissions import (
     CanGestionarStockInterno,
     CanGestionarPrestamos,
     CanVerPrestamos,
+    CanGenerarReportesInventario,
     CanVerUbicaciones,
     CanVerProveedores,
     CanVerDocumentos,
@@ -84,18 +130,18 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes,
     description="Devuelve perfil, estación activa y permisos.",
     responses={200: OpenApiTypes.OBJECT}
 )
-class MeView(APIView):
+class MeView(AsyncAPIView):
     """
     Devuelve los datos actuales del usuario (perfil, estación, permisos)
     sin necesidad de refrescar el token. Útil para el inicio de la App.
     """
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         # Reutilizamos la lógica central. Si el usuario perdió su membresía
         # o hay algún problema, la función lanzará ValidationError y DRF
         # responderá con un error 400 automáticamente.
-        data = obtener_contexto_bomberil(request.user)
+        data = await sync_to_async(obtener_contexto_bomberil)(request.user)
         return Response(data)
 
 
@@ -226,6 +272,41 @@ class TestConnectionView(APIView):
 
 
 
+@extend_schema(exclude=True)
+class EsquemaAPIView(APIView):
+    """
+    Sirve el esquema OpenAPI precalculado (ver apps/api/esquema.py) en YAML o, con
+    ?format=json o Accept JSON, en JSON. El ETag es el hash del contenido: los clientes y
+    proxies lo cachean y las revalidaciones responden 304 sin cuerpo.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    # Misma negociación que SpectacularAPIView (YAML por defecto); solo se usa para elegir el archivo
+    renderer_classes = [OpenApiYamlRenderer, OpenApiYamlRenderer2, OpenApiJsonRenderer, OpenApiJsonRenderer2]
+
+    def get(self, request):
+        formato = 'json' if 'json' in request.accepted_renderer.format else 'yaml'
+        esquema = cargar_esquema(formato)
+        if esquema is None:
+            return Response(
+                {"detail": "El esquema no está generado. Ejecute 'python manage.py generar_esquema_api'."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        contenido, hash_esquema = esquema
+        etag = f'"{hash_esquema}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(contenido, content_type=FORMATOS[formato][1])
+            response.headers['Content-Disposition'] = f'inline; filename="{FORMATOS[formato][0]}"'
+        response.headers['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.API_ESQUEMA_CACHE_SEGUNDOS)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+
+
 @extend_schema(
     summary="Alternar tema oscuro",
     request=None,
@@ -441,71 +522,171 @@ class ComunasPorRegionAPIView(APIView):
 
 
 
-# --- VISTAS DE GRÁFICOS (Requieren Estación Activa) ---
+async def _esperar(corrutina):
+    return await corrutina
+
+
+
+
 @extend_schema(
-    summary="Obtener datos del gráfico de existencias por categoría",
+    summary="Ejecutar varias operaciones de la API en una sola petición",
+    request=inline_serializer(
+        name='LoteOperacionesRequest',
+        fields={
+            'operaciones': serializers.ListField(
+                child=serializers.DictField(),
+                help_text="Lista ordenada de {metodo, ruta, cuerpo}."
+            ),
+        }
+    ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioGraficoExistenciasCategoriaAPIView(APIView):
+class LoteOperacionesAPIView(IdempotenciaMixin, APIView):
     """
-    API Endpoint para obtener datos del gráfico de existencias por categoría.
-    Suma Activos y Lotes de Insumo de la estación activa.
+    Ejecuta en orden una lista de operaciones de la API en una sola petición y una sola transacción.
+    Pensado para los flujos de la App que hoy encadenan varias llamadas (crear préstamo, registrar
+    tareas de una orden, etc.) sobre redes móviles con mucha latencia.
+
+    URL: /api/v1/lote/
+    Method: POST
+    Payload:
+    {
+        "operaciones": [
+            {"metodo": "POST", "ruta": "/api/v1/gestion_inventario/prestamos/crear/", "cuerpo": {...}},
+            {"metodo": "GET", "ruta": "/api/v1/gestion_inventario/prestamos/?page_size=5"}
+        ]
+    }
+
+    El token y la estación activa se validan una sola vez para todo el lote; cada operación se
+    despacha a su vista original, con sus mismos permisos, validaciones y auditoría. Si una
+    operación responde con error (>= 400) se revierte el lote completo y las siguientes no se
+    ejecutan (409 con 'aplicado': false). Admite 'Idempotency-Key' para el lote completo.
+    Respuesta: {"aplicado": bool, "resultados": [{"indice", "estado", "respuesta"}, ...]}
     """
-    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
-    
-    def get(self, request, format=None):
-        try:
-            # 1. Obtener Estación Activa de la sesión
-            estacion = request.estacion_activa
+    permission_classes = [IsAuthenticated, IsEstacionActiva]
+    MAX_OPERACIONES = 20
+    METODOS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+    # Solo vistas JSON de la estación: quedan fuera la autenticación, las descargas (PDF),
+    # las subidas multipart, el flujo en vivo (SSE) y el propio lote.
+    OPERACIONES_PERMITIDAS = {
+        'users_me',
+        # Inventario: consultas
+        'api_existencia_detalle', 'api_existencia_historial', 'api_catalogo_stock', 'api_existencias_por_producto',
+        'api_buscar_prestables', 'api_destinatarios_list', 'api_historial_prestamos', 'api_verificacion_carga',
+        'api_ubicaciones_list', 'api_compartimentos_list', 'api_proveedores_list',
+        # Inventario: movimientos y préstamos
+        'api_crear_prestamo', 'api_gestionar_devolucion', 'api_recepcion_stock', 'api_ajustar_stock',
+        'api_consumir_stock', 'api_consumir_stock_fefo', 'api_anular_existencia', 'api_baja_existencia',
+        'api_extravio_activo', 'api_cambio_estado_masivo', 'api_inventario_fisico_lecturas',
+        # Mantenimiento
+        'api_ordenes_list', 'api_orden_detalle', 'api_buscar_activo_para_orden', 'api_crear_orden_correctiva',
+        'api_registrar_tarea_orden', 'api_cambiar_estado_orden', 'api_anadir_activo_orden', 'api_quitar_activo_orden',
+    }
 
-            # 2. Agrupar Activos por Categoría
-            # Ruta: Activo -> Producto -> ProductoGlobal -> Categoria -> nombre
-            activos_por_categoria = (
-                Activo.objects
-                .filter(estacion=estacion)
-                .values(nombre_categoria=F('producto__producto_global__categoria__nombre'))
-                .annotate(total=Count('id'))
+    def post(self, request):
+        operaciones = request.data.get('operaciones')
+        if not isinstance(operaciones, list) or not operaciones:
+            return Response({"detail": "Debe enviar una lista 'operaciones' no vacía."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operaciones) > self.MAX_OPERACIONES:
+            return Response(
+                {"detail": f"Se permiten como máximo {self.MAX_OPERACIONES} operaciones por lote."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # 3. Agrupar Lotes por Categoría
-            # Ruta: LoteInsumo -> Producto -> ProductoGlobal -> Categoria -> nombre
-            # NOTA: Para lotes, ¿queremos contar lotes O sumar cantidades?
-            # Generalmente para inventario masivo se suman cantidades.
-            # Si prefieres sumar cantidades, usa Sum('cantidad') en lugar de Count('id').
-            # Por ahora usaremos Count('id') para ser consistentes con Activos (1 activo = 1 unidad).
-            lotes_por_categoria = (
-                LoteInsumo.objects
-                .filter(compartimento__ubicacion__estacion=estacion)
-                .values(nombre_categoria=F('producto__producto_global__categoria__nombre'))
-                .annotate(total=Sum('cantidad')) # Sumamos la cantidad real de insumos
-            )
+        # 1. Validar y resolver todas las rutas antes de ejecutar nada
+        planificadas = []
+        for indice, operacion in enumerate(operaciones):
+            if not isinstance(operacion, dict):
+                return Response({"detail": f"Operación {indice}: formato inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+            metodo = str(operacion.get('metodo', 'GET')).upper()
+            ruta = str(operacion.get('ruta') or '')
+            if metodo not in self.METODOS:
+                return Response({"detail": f"Operación {indice}: método '{metodo}' no soportado."}, status=status.HTTP_400_BAD_REQUEST)
+
+            url = urlsplit(ruta)
+            try:
+                coincidencia = resolve(url.path)
+            except Resolver404:
+                return Response({"detail": f"Operación {indice}: la ruta '{ruta}' no existe."}, status=status.HTTP_400_BAD_REQUEST)
+            if coincidencia.namespace != 'api' or coincidencia.url_name not in self.OPERACIONES_PERMITIDAS:
+                return Response(
+                    {"detail": f"Operación {indice}: la ruta '{ruta}' no se puede ejecutar en lote."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            planificadas.append((metodo, url, coincidencia, operacion.get('cuerpo')))
+
+        # 2. Ejecutar en orden dentro de una transacción; el primer error revierte todo
+        resultados = []
+        with transaction.atomic():
+            for indice, (metodo, url, coincidencia, cuerpo) in enumerate(planificadas):
+                subpeticion = self._construir_subpeticion(request, metodo, url, cuerpo)
+                respuesta = coincidencia.func(subpeticion, *coincidencia.args, **coincidencia.kwargs)
+                if asyncio.iscoroutine(respuesta):
+                    # Vista async (lecturas): sus consultas vuelven a este hilo, dentro de la transacción
+                    respuesta = async_to_sync(_esperar)(respuesta)
+                resultados.append({
+                    "indice": indice,
+                    "estado": respuesta.status_code,
+                    "respuesta": getattr(respuesta, 'data', None),
+                })
+                if respuesta.status_code >= 400:
+                    transaction.set_rollback(True)
+                    return Response({
+                        "detail": f"La operación {indice} falló; no se aplicó ninguna operación del lote.",
+                        "aplicado": False,
+                        "resultados": resultados,
+                    }, status=status.HTTP_409_CONFLICT)
+
+        return Response({"aplicado": True, "resultados": resultados}, status=status.HTTP_200_OK)
 
-            # 4. Combinar resultados en un diccionario para sumarlos
-            conteo_final = {}
+    def _construir_subpeticion(self, request, metodo, url, cuerpo):
+        """
+        HttpRequest de una operación del lote. Hereda cabeceras, sesión y usuario de la petición
+        contenedora; el usuario va "forzado" para que DRF no vuelva a validar el JWT, y la estación
+        ya resuelta hace que IsEstacionActiva no repita la consulta.
+        """
+        contenido = json.dumps(cuerpo, cls=DjangoJSONEncoder).encode('utf-8') if cuerpo is not None else b''
+        subpeticion = WSGIRequest({
+            **request.META,
+            'REQUEST_METHOD': metodo,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(contenido)),
+            'wsgi.input': io.BytesIO(contenido),
+        })
+        # La Idempotency-Key protege al lote completo, no a cada operación
+        subpeticion.META.pop('HTTP_IDEMPOTENCY_KEY', None)
+        subpeticion.user = request.user
+        subpeticion.session = request.session
+        subpeticion.estacion_activa = request.estacion_activa
+        subpeticion._force_auth_user = request.user
+        subpeticion._force_auth_token = request.auth
+        return subpeticion
 
-            # Procesar Activos
-            for item in activos_por_categoria:
-                cat = item['nombre_categoria']
-                total = item['total']
-                conteo_final[cat] = conteo_final.get(cat, 0) + total
 
-            # Procesar Lotes (sumándolos a lo que ya exista)
-            for item in lotes_por_categoria:
-                cat = item['nombre_categoria']
-                total = item['total'] or 0 # Asegurar que no sea None si Sum devuelve null
-                conteo_final[cat] = conteo_final.get(cat, 0) + total
 
-            # 5. Formatear para Chart.js (labels y data separados)
-            labels = list(conteo_final.keys())
-            values = list(conteo_final.values())
 
-            data = {
-                "labels": labels,
-                "values": values
-            }
+# --- VISTAS DE GRÁFICOS (Requieren Estación Activa) ---
+# Las tres vistas leen de graficos_inventario: una consulta UNION ALL para todas las series,
+# cacheada por estación e invalidada al escribir en el inventario.
+@extend_schema(
+    summary="Obtener todos los gráficos de inventario",
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioGraficosAPIView(AsyncAPIView):
+    """
+    Gráficos de la pantalla de inicio en una sola llamada.
+    URL: /api/v1/gestion_inventario/graficos/
+    Responde { "categorias": {labels, values}, "estados": {labels, values} }.
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
 
-            return Response(data)
-        
+    async def get(self, request, format=None):
+        try:
+            return Response(await sync_to_async(graficos_inventario)(request.estacion_activa.id))
         except Exception as e:
             return Response(
                 {'error': f'Error generando gráfico: {str(e)}'}, 
@@ -516,48 +697,44 @@ class InventarioGraficoExistenciasCategoriaAPIView(APIView):
 
 
 @extend_schema(
-    summary="Obtener datos del gráfico de estado general del inventario",
+    summary="Obtener datos del gráfico de existencias por categoría",
     responses=OpenApiTypes.OBJECT
 )
-class InventarioGraficoEstadosAPIView(APIView):
+class InventarioGraficoExistenciasCategoriaAPIView(AsyncAPIView):
     """
-    API Endpoint para obtener datos del gráfico de estado general del inventario.
-    Agrupa por TipoEstado (OPERATIVO, NO OPERATIVO, ADMINISTRATIVO, etc.)
+    API Endpoint para obtener datos del gráfico de existencias por categoría.
+    Suma Activos (1 por activo) y la cantidad de los Lotes de Insumo de la estación activa.
     """
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
-
-    def get(self, request, format=None):
+    
+    async def get(self, request, format=None):
         try:
-            estacion = request.estacion_activa
-
-            # Agrupamos por Tipo de Estado
-            # Ruta: Activo -> Estado -> TipoEstado -> nombre
-            activos_por_estado = (
-                Activo.objects.filter(estacion=estacion)
-                .values(nombre_estado=F('estado__tipo_estado__nombre'))
-                .annotate(total=Count('id'))
+            # Formato Chart.js (labels y data separados)
+            return Response((await sync_to_async(graficos_inventario)(request.estacion_activa.id))['categorias'])
+        
+        except Exception as e:
+            return Response(
+                {'error': f'Error generando gráfico: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            # Ruta: LoteInsumo -> Estado -> TipoEstado -> nombre
-            lotes_por_estado = (
-                LoteInsumo.objects.filter(compartimento__ubicacion__estacion=estacion)
-                .values(nombre_estado=F('estado__tipo_estado__nombre'))
-                .annotate(total=Sum('cantidad'))
-            )
 
-            conteo_final = {}
-            for item in activos_por_estado:
-                 cat = item['nombre_estado'] or "Sin Estado" # Manejo de posibles nulos
-                 conteo_final[cat] = conteo_final.get(cat, 0) + item['total']
 
-            for item in lotes_por_estado:
-                 cat = item['nombre_estado'] or "Sin Estado"
-                 conteo_final[cat] = conteo_final.get(cat, 0) + (item['total'] or 0)
 
-            return Response({
-                "labels": list(conteo_final.keys()),
-                "values": list(conteo_final.values())
-            })
+@extend_schema(
+    summary="Obtener datos del gráfico de estado general del inventario",
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioGraficoEstadosAPIView(AsyncAPIView):
+    """
+    API Endpoint para obtener datos del gráfico de estado general del inventario.
+    Agrupa por TipoEstado (OPERATIVO, NO OPERATIVO, ADMINISTRATIVO, etc.)
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+
+    async def get(self, request, format=None):
+        try:
+            return Response((await sync_to_async(graficos_inventario)(request.estacion_activa.id))['estados'])
         
         except Exception as e:
             return Response(
@@ -606,12 +783,59 @@ class InventarioProductoGlobalSKUAPIView(APIView):
 
 
 
+@extend_schema(
+    summary="Buscar productos globales similares (detección de duplicados)",
+    parameters=[
+        OpenApiParameter("q", OpenApiTypes.STR, description="Nombre oficial en edición"),
+        OpenApiParameter("modelo", OpenApiTypes.STR, required=False),
+        OpenApiParameter("gtin", OpenApiTypes.STR, required=False),
+        OpenApiParameter("excluir", OpenApiTypes.INT, required=False, description="ID a excluir (edición)"),
+    ],
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioProductoGlobalSimilaresAPIView(APIView):
+    """
+    Sugerencias "mientras se escribe" para evitar duplicados en el Catálogo Global.
+    Lo consumen el formulario de creación de la estación, el de core_admin y la App.
+
+    URL: /api/v1/gestion_inventario/catalogo-global/similares/?q=casco bullard&modelo=ustc
+    """
+    # El catálogo global no depende de la estación (core_admin también lo consume)
+    permission_classes = [IsAuthenticated, CanVerCatalogos]
+
+    def get(self, request):
+        excluir = request.query_params.get('excluir')
+        candidatos = buscar_productos_globales_similares(
+            texto=request.query_params.get('q', ''),
+            modelo=request.query_params.get('modelo'),
+            gtin=request.query_params.get('gtin'),
+            excluir_id=int(excluir) if excluir and excluir.isdigit() else None
+        )
+
+        data = [
+            {
+                'id': c['producto'].id,
+                'nombre_oficial': c['producto'].nombre_oficial,
+                'marca': c['producto'].marca.nombre if c['producto'].marca else "Genérico",
+                'modelo': c['producto'].modelo,
+                'gtin': c['producto'].gtin,
+                'categoria': c['producto'].categoria.nombre,
+                'similitud': c['similitud'],
+                'motivo': c['motivo'],
+            }
+            for c in candidatos
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+
+
 @extend_schema(
     summary="Añadir producto al catálogo local",
     request=ProductoLocalInputSerializer,
     responses={201: OpenApiTypes.OBJECT}
 )
-class InventarioAnadirProductoLocalAPIView(AuditoriaMixin, APIView):
+class InventarioAnadirProductoLocalAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint API (POST) para la gestión de inventario local.
     
@@ -851,7 +1075,7 @@ class InventarioBuscarExistenciasPrestablesAPI(APIView):
     ),
     responses={201: OpenApiTypes.OBJECT}
 )
-class InventarioCrearPrestamoAPIView(AuditoriaMixin, APIView):
+class InventarioCrearPrestamoAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint transaccional para crear un Préstamo con múltiples ítems.
     Replica la lógica de CrearPrestamoView (Web).
@@ -1019,18 +1243,28 @@ class InventarioCrearPrestamoAPIView(AuditoriaMixin, APIView):
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
+@extend_schema(parameters=PARAMETROS_CURSOR, responses=respuesta_paginada('DestinatariosPaginados'))
 class InventarioDestinatarioListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarPrestamos]
     def get(self, request):
-        qs = Destinatario.objects.filter(estacion=request.estacion_activa).order_by('nombre_entidad')
-        data = [{"id": d.id, "nombre": d.nombre_entidad} for d in qs]
-        return Response(data, status=status.HTTP_200_OK)
+        qs = Destinatario.objects.filter(estacion=request.estacion_activa)
+        paginador = CursorPaginacion(ordering=('nombre_entidad', 'id'))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+        data = [{"id": d.id, "nombre": d.nombre_entidad} for d in pagina]
+        return paginador.get_paginated_response(data)
 
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
+@extend_schema(
+    parameters=[
+        OpenApiParameter("todos", OpenApiTypes.BOOL, required=False),
+        OpenApiParameter("vencidos", OpenApiTypes.BOOL, required=False, description="Solo préstamos abiertos con la fecha de devolución vencida."),
+        OpenApiParameter("search", OpenApiTypes.STR, required=False),
+        *PARAMETROS_CURSOR,
+    ],
+    responses=respuesta_paginada('PrestamosPaginados', total_vencidos=serializers.IntegerField())
+)
 class InventarioHistorialPrestamosAPIView(APIView):
     """
     Lista el historial de préstamos de la estación.
@@ -1039,13 +1273,16 @@ class InventarioHistorialPrestamosAPIView(APIView):
     URL: /api/v1/inventario/prestamos/
     Params: 
       - ?todos=true (Muestra también completados/vencidos)
+      - ?vencidos=true (Solo préstamos abiertos atrasados)
       - ?search=NombreDestinatario
+      - ?cursor=...&page_size=25 (Paginación por cursor, ver campo 'next')
     """
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerPrestamos]
 
     def get(self, request):
         estacion = request.estacion_activa
         mostrar_todos = request.query_params.get('todos') == 'true'
+        solo_vencidos = request.query_params.get('vencidos') == 'true'
         query = request.query_params.get('search', '').strip()
 
         # 1. Base Query
@@ -1055,7 +1292,9 @@ class InventarioHistorialPrestamosAPIView(APIView):
         ).prefetch_related('items_prestados') # Para contar items
 
         # 2. Filtros
-        if not mostrar_todos:
+        if solo_vencidos:
+            qs = filtrar_prestamos_vencidos(qs)
+        elif not mostrar_todos:
             # Solo "Vivos": Pendiente o Devuelto Parcial
             qs = qs.filter(estado__in=[
                 Prestamo.EstadoPrestamo.PENDIENTE, 
@@ -1065,12 +1304,13 @@ class InventarioHistorialPrestamosAPIView(APIView):
         if query:
             qs = qs.filter(destinatario__nombre_entidad__icontains=query)
 
-        # Ordenar: Más recientes primero
-        qs = qs.order_by('-fecha_prestamo')
+        # Ordenar: Más recientes primero (id como desempate para un cursor estable)
+        paginador = CursorPaginacion(ordering=('-fecha_prestamo', '-id'))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
 
         # 3. Serialización Manual
         data = []
-        for p in qs:
+        for p in pagina:
             # Conteo rápido de items para mostrar en la tarjeta de la lista
             # (Ej: "3 ítems prestados")
             total_items = p.items_prestados.count()
@@ -1086,10 +1326,14 @@ class InventarioHistorialPrestamosAPIView(APIView):
                 "estado_codigo": p.estado, # "PEN" (Útil para colores en UI: PEN=Yellow, PAR=Orange, COM=Green)
                 "responsable": p.usuario_responsable.get_full_name if p.usuario_responsable else "Sistema",
                 "total_items": total_items,
+                "vencido": p.esta_vencido,
+                "fecha_devolucion_esperada": p.fecha_devolucion_esperada.isoformat() if p.fecha_devolucion_esperada else None,
                 "notas": p.notas_prestamo
             })
 
-        return Response(data, status=status.HTTP_200_OK)
+        # Contador para el badge de la App (range scan sobre el índice parcial de préstamos abiertos)
+        total_vencidos = prestamos_vencidos(estacion).count()
+        return paginador.get_paginated_response(data, total_vencidos=total_vencidos)
 
 
 
@@ -1114,7 +1358,7 @@ class InventarioHistorialPrestamosAPIView(APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioGestionarDevolucionAPIView(AuditoriaMixin, APIView):
+class InventarioGestionarDevolucionAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para gestionar la devolución de un préstamo.
     GET: Retorna el detalle del préstamo y el saldo pendiente de cada ítem.
@@ -1363,14 +1607,18 @@ class InventarioGestionarDevolucionAPIView(AuditoriaMixin, APIView):
 
 
 @extend_schema(responses=OpenApiTypes.OBJECT)
-class InventarioDetalleExistenciaAPIView(APIView):
+class InventarioDetalleExistenciaAPIView(AsyncAPIView):
     """
     Endpoint para consultar el detalle de una existencia escaneando su código.
     URL: /api/v1/inventario/existencias/detalle/?codigo=ABC-123
+
+    Incluye los últimos movimientos y, si hay más, 'historial_siguiente' con el cursor
+    para seguir leyendo en el historial paginado de la existencia.
     """
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+    MOVIMIENTOS_RECIENTES = 20
 
-    def get(self, request):
+    async def get(self, request):
         codigo = request.query_params.get('codigo')
         
         if not codigo:
@@ -1388,7 +1636,7 @@ class InventarioDetalleExistenciaAPIView(APIView):
         # 1. INTENTO DE BÚSQUEDA: ACTIVO SERIALIZADO
         # ---------------------------------------------------------
         # Filtramos Activo por codigo_activo y estación
-        activo = Activo.objects.filter(
+        activo = await Activo.objects.filter(
             codigo_activo=codigo, 
             estacion=estacion
         ).select_related(
@@ -1396,10 +1644,11 @@ class InventarioDetalleExistenciaAPIView(APIView):
             'compartimento__ubicacion', 
             'estado', 
             'proveedor'
-        ).first()
+        ).afirst()
 
         if activo:
-            data_response = self._construir_data_activo(activo)
+            # Estadísticas de uso y mantenimiento: varias consultas agregadas, en un hilo aparte
+            data_response = await sync_to_async(self._construir_data_activo)(activo)
             item_obj = activo
             tipo_item = 'activo'
 
@@ -1408,7 +1657,7 @@ class InventarioDetalleExistenciaAPIView(APIView):
         # ---------------------------------------------------------
         else:
             # Filtramos LoteInsumo por codigo_lote
-            lote = LoteInsumo.objects.filter(
+            lote = await LoteInsumo.objects.filter(
                 codigo_lote=codigo,
                 # La relación de lote a estación pasa por Ubicación -> Compartimento
                 compartimento__ubicacion__estacion=estacion
@@ -1416,7 +1665,7 @@ class InventarioDetalleExistenciaAPIView(APIView):
                 'producto__producto_global__marca', 
                 'compartimento__ubicacion', 
                 'estado'
-            ).first()
+            ).afirst()
 
             if lote:
                 data_response = self._construir_data_lote(lote)
@@ -1434,22 +1683,28 @@ class InventarioDetalleExistenciaAPIView(APIView):
         # Filtro dinámico en MovimientoInventario
         filtro_mov = Q(activo=item_obj) if tipo_item == 'activo' else Q(lote_insumo=item_obj)
         
-        movimientos = MovimientoInventario.objects.filter(
+        # Misma clave de orden que el historial paginado, para continuar desde el último entregado
+        movimientos = [m async for m in MovimientoInventario.objects.filter(
             estacion=estacion
         ).filter(filtro_mov).select_related(
             'usuario', 'compartimento_origen__ubicacion', 'compartimento_destino__ubicacion'
-        ).order_by('-fecha_hora')[:20]
-
-        data_response['historial_movimientos'] = [
-            {
-                "id": m.id,
-                "fecha": m.fecha_hora.isoformat(),
-                "tipo": m.get_tipo_movimiento_display(),
-                "usuario": m.usuario.get_full_name if m.usuario else "Sistema",
-                "origen": str(m.compartimento_origen) if m.compartimento_origen else "N/A",
-                "destino": str(m.compartimento_destino) if m.compartimento_destino else "Externo/Baja",
-            } for m in movimientos
-        ]
+        ).order_by('-fecha_hora', '-id')[:self.MOVIMIENTOS_RECIENTES + 1]]
+
+        hay_mas = len(movimientos) > self.MOVIMIENTOS_RECIENTES
+        movimientos = movimientos[:self.MOVIMIENTOS_RECIENTES]
+        data_response['historial_movimientos'] = MovimientoHistorialSerializer(movimientos, many=True).data
+
+        # Enlace a la página siguiente del historial completo (null si ya se entregó todo)
+        data_response['historial_siguiente'] = None
+        if hay_mas:
+            paginador = CursorPaginacion(ordering=InventarioHistorialExistenciaAPIView.ordering)
+            url = request.build_absolute_uri(
+                reverse('api:api_existencia_historial', kwargs={'tipo_item': tipo_item, 'item_id': item_obj.id})
+            )
+            ultimo = movimientos[-1]
+            data_response['historial_siguiente'] = replace_query_param(
+                url, paginador.cursor_query_param, paginador.encode_cursor([ultimo.fecha_hora, ultimo.id])
+            )
 
         return Response(data_response, status=status.HTTP_200_OK)
 
@@ -1539,17 +1794,148 @@ class InventarioDetalleExistenciaAPIView(APIView):
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
-class InventarioCatalogoStockAPIView(APIView):
+@extend_schema(
+    summary="Historial de movimientos de una existencia",
+    parameters=PARAMETROS_CURSOR,
+    responses=respuesta_paginada('HistorialExistenciaPaginado')
+)
+class InventarioHistorialExistenciaAPIView(APIView):
+    """
+    Historial completo de movimientos de un activo o lote, paginado por cursor.
+    URL: /api/v1/gestion_inventario/existencias/<activo|lote>/<uuid>/movimientos/?cursor=...
+
+    Ordenado por (fecha_hora desc, id desc) sobre los índices parciales por existencia de
+    MovimientoInventario: cada página cuesta lo mismo aunque el activo tenga años de historial.
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+    ordering = ('-fecha_hora', '-id')
+
+    def get(self, request, tipo_item, item_id):
+        estacion = request.estacion_activa
+
+        if tipo_item == 'activo':
+            item = get_object_or_404(Activo, id=item_id, estacion=estacion)
+            filtro_mov = Q(activo=item)
+        elif tipo_item == 'lote':
+            item = get_object_or_404(LoteInsumo, id=item_id, compartimento__ubicacion__estacion=estacion)
+            filtro_mov = Q(lote_insumo=item)
+        else:
+            return Response({"detail": "Tipo de existencia no válido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        movimientos = MovimientoInventario.objects.filter(
+            estacion=estacion
+        ).filter(filtro_mov).select_related(
+            'usuario', 'compartimento_origen__ubicacion', 'compartimento_destino__ubicacion'
+        )
+
+        paginador = CursorPaginacion(ordering=self.ordering)
+        pagina = paginador.paginate_queryset(movimientos, request, view=self)
+        return paginador.get_paginated_response(MovimientoHistorialSerializer(pagina, many=True).data)
+
+
+
+
+
+@extend_schema(
+    summary="Resolver varios códigos escaneados",
+    request=inline_serializer(
+        name='ResolverCodigosRequest',
+        fields={'codigos': serializers.ListField(child=serializers.CharField())}
+    ),
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioResolverCodigosAPIView(APIView):
+    """
+    Resuelve en una sola petición los códigos escaneados (activos y lotes) de la estación.
+    URL: /api/v1/gestion_inventario/existencias/resolver/
+    Payload: { "codigos": ["E1-ACT-00001", "E1-LOT-00042", ...] }
+
+    Pensado para escanear un compartimento completo: una consulta `= ANY(arreglo)` por tabla
+    sobre los índices únicos de código (activo: estación + código; lote: código), y registros
+    compactos sin estadísticas ni movimientos (para eso está el detalle por código).
+    Responde { "resultados": [...], "no_encontrados": [...] } en el orden recibido.
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+    MAX_CODIGOS = 500
+
+    def post(self, request):
+        codigos = request.data.get('codigos')
+        if not isinstance(codigos, list) or not codigos:
+            return Response({"detail": "Debe proporcionar una lista 'codigos'."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(codigos) > self.MAX_CODIGOS:
+            return Response({"detail": f"Máximo {self.MAX_CODIGOS} códigos por petición."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Sin vacíos ni repetidos, conservando el orden de escaneo
+        codigos = list(dict.fromkeys(str(c).strip() for c in codigos if str(c or '').strip()))
+        estacion = request.estacion_activa
+
+        encontrados = {}
+        for fila in Activo.objects.filter(estacion=estacion, codigo_activo__any=codigos).values(
+            'id', 'codigo_activo', 'numero_serie_fabricante', 'producto__sku',
+            'producto__producto_global__nombre_oficial', 'estado__nombre',
+            'compartimento_id', 'compartimento__nombre', 'compartimento__ubicacion__nombre',
+        ):
+            encontrados[fila['codigo_activo']] = {
+                "tipo_existencia": "ACTIVO",
+                "id": fila['id'],
+                "codigo": fila['codigo_activo'],
+                "sku": fila['producto__sku'] or "N/A",
+                "nombre": fila['producto__producto_global__nombre_oficial'],
+                "serie": fila['numero_serie_fabricante'] or "S/N",
+                "cantidad": 1,
+                "estado": fila['estado__nombre'],
+                "compartimento_id": fila['compartimento_id'],
+                "ubicacion": self._ubicacion(fila),
+            }
+
+        # Como en el detalle por código, un activo tiene prioridad sobre un lote con el mismo código
+        pendientes = [c for c in codigos if c not in encontrados]
+        if pendientes:
+            for fila in LoteInsumo.objects.filter(
+                compartimento__ubicacion__estacion=estacion, codigo_lote__any=pendientes
+            ).values(
+                'id', 'codigo_lote', 'cantidad', 'fecha_expiracion', 'producto__sku',
+                'producto__producto_global__nombre_oficial', 'estado__nombre',
+                'compartimento_id', 'compartimento__nombre', 'compartimento__ubicacion__nombre',
+            ):
+                encontrados[fila['codigo_lote']] = {
+                    "tipo_existencia": "LOTE",
+                    "id": fila['id'],
+                    "codigo": fila['codigo_lote'],
+                    "sku": fila['producto__sku'] or "N/A",
+                    "nombre": fila['producto__producto_global__nombre_oficial'],
+                    "cantidad": fila['cantidad'],
+                    "vencimiento": fila['fecha_expiracion'],
+                    "estado": fila['estado__nombre'],
+                    "compartimento_id": fila['compartimento_id'],
+                    "ubicacion": self._ubicacion(fila),
+                }
+
+        return Response({
+            "resultados": [encontrados[c] for c in codigos if c in encontrados],
+            "no_encontrados": [c for c in codigos if c not in encontrados],
+        })
+
+    @staticmethod
+    def _ubicacion(fila):
+        if not fila['compartimento_id']:
+            return "Sin Ubicación"
+        return f"{fila['compartimento__ubicacion__nombre']} > {fila['compartimento__nombre']}"
+
+
+
+
+@extend_schema(parameters=PARAMETROS_CURSOR, responses=respuesta_paginada('CatalogoStockPaginado'))
+class InventarioCatalogoStockAPIView(AsyncAPIView):
     """
     Endpoint para listar el catálogo local FILTRADO por existencias positivas.
     Ideal para la vista principal de "Mi Inventario" en la App.
     
-    URL: /api/v1/inventario/catalogo/stock/
+    URL: /api/v1/inventario/catalogo/stock/?search=...&cursor=...
     """
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerCatalogos]
 
-    def get(self, request):
+    async def get(self, request):
         estacion = request.estacion_activa
         busqueda = request.query_params.get('search', '').strip()
 
@@ -1588,9 +1974,13 @@ class InventarioCatalogoStockAPIView(APIView):
             Q(es_serializado=False, cantidad_insumos__gt=0)
         ).distinct()
 
-        # 5. Construcción de Respuesta JSON ligera para móvil
+        # 5. Página actual (orden alfabético, id como desempate)
+        paginador = CursorPaginacion(ordering=('producto_global__nombre_oficial', 'id'))
+        pagina = await paginador.apaginate_queryset(productos_con_stock, request, view=self)
+
+        # 6. Construcción de Respuesta JSON ligera para móvil
         data = []
-        for p in productos_con_stock:
+        for p in pagina:
             # Determinamos la cantidad real a mostrar según el tipo
             stock_real = p.cantidad_activos if p.es_serializado else p.cantidad_insumos
             
@@ -1611,13 +2001,13 @@ class InventarioCatalogoStockAPIView(APIView):
                 "critico": p.stock_critico > 0 and stock_real <= p.stock_critico # Flag para pintar en rojo en la app
             })
 
-        return Response(data, status=status.HTTP_200_OK)
+        return paginador.get_paginated_response(data)
 
 
 
 
 @extend_schema(responses=OpenApiTypes.OBJECT)
-class InventarioExistenciasPorProductoAPIView(APIView):
+class InventarioExistenciasPorProductoAPIView(AsyncAPIView):
     """
     Lista las existencias físicas (Activos o Lotes) asociadas a un Producto del catálogo local.
     
@@ -1625,7 +2015,7 @@ class InventarioExistenciasPorProductoAPIView(APIView):
     """
     permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
 
-    def get(self, request):
+    async def get(self, request):
         producto_id = request.query_params.get('producto')
         
         if not producto_id:
@@ -1637,7 +2027,7 @@ class InventarioExistenciasPorProductoAPIView(APIView):
         estacion = request.estacion_activa
 
         # 1. Obtener el producto padre asegurando que pertenezca a la estación activa
-        producto = get_object_or_404(Producto, id=producto_id, estacion=estacion)
+        producto = await aget_object_or_404(Producto, id=producto_id, estacion=estacion)
 
         data = []
 
@@ -1655,7 +2045,7 @@ class InventarioExistenciasPorProductoAPIView(APIView):
                 'asignado_a'
             ).order_by('estado__nombre', 'compartimento__ubicacion__nombre')
 
-            for activo in activos:
+            async for activo in activos:
                 data.append({
                     "id": activo.id, # UUID
                     "tipo": "ACTIVO",
@@ -1681,7 +2071,7 @@ class InventarioExistenciasPorProductoAPIView(APIView):
                 'compartimento__ubicacion'
             ).exclude(cantidad=0).order_by('fecha_expiracion', 'estado__nombre') # Prioridad a lo que vence pronto
 
-            for lote in lotes:
+            async for lote in lotes:
                 vencimiento = lote.fecha_expiracion.isoformat() if lote.fecha_expiracion else None
                 
                 data.append({
@@ -1726,7 +2116,7 @@ class InventarioExistenciasPorProductoAPIView(APIView):
     ),
     responses={201: OpenApiTypes.OBJECT}
 )
-class InventarioRecepcionStockAPIView(AuditoriaMixin, APIView):
+class InventarioRecepcionStockAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint transaccional para procesar la recepción de stock (Activos y Lotes).
     Replica la lógica de RecepcionStockView web.
@@ -2000,7 +2390,7 @@ class InventarioCompartimentoListAPIView(APIView):
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
+@extend_schema(parameters=PARAMETROS_CURSOR, responses=respuesta_paginada('ProveedoresPaginados'))
 class InventarioProveedorListAPIView(APIView):
     """
     Lista proveedores disponibles para la estación.
@@ -2024,6 +2414,9 @@ class InventarioProveedorListAPIView(APIView):
         if query:
             qs = qs.filter(nombre__icontains=query)
 
+        paginador = CursorPaginacion(ordering=('nombre', 'id'))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+
         data = [
             {
                 "id": p.id,
@@ -2031,9 +2424,9 @@ class InventarioProveedorListAPIView(APIView):
                 "rut": p.rut,
                 "es_local": p.estacion_creadora_id == estacion.id # Flag útil para UI
             }
-            for p in qs.order_by('nombre')
+            for p in pagina
         ]
-        return Response(data, status=status.HTTP_200_OK)
+        return paginador.get_paginated_response(data)
 
 
 
@@ -2050,7 +2443,7 @@ class InventarioProveedorListAPIView(APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioAnularExistenciaAPIView(AuditoriaMixin, APIView):
+class InventarioAnularExistenciaAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para anular una existencia (Corrección de error de ingreso).
     Mueve el ítem a una ubicación administrativa 'ANULADO' y ajusta el stock a 0.
@@ -2171,7 +2564,7 @@ class InventarioAnularExistenciaAPIView(AuditoriaMixin, APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioBajaExistenciaAPIView(AuditoriaMixin, APIView):
+class InventarioBajaExistenciaAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para Dar de Baja una existencia (Fin de vida útil, daño irreparable, etc.).
     
@@ -2288,7 +2681,7 @@ class InventarioBajaExistenciaAPIView(AuditoriaMixin, APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioExtraviarActivoAPIView(AuditoriaMixin, APIView):
+class InventarioExtraviarActivoAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para reportar un ACTIVO como extraviado.
     Maneja la lógica compleja de cierre de préstamos si el activo estaba prestado.
@@ -2408,6 +2801,102 @@ class InventarioExtraviarActivoAPIView(AuditoriaMixin, APIView):
 
 
 
+@extend_schema(
+    summary="Cambio de estado masivo (anular / baja / extravío / mantenimiento)",
+    request=inline_serializer(
+        name='CambioEstadoMasivoRequest',
+        fields={
+            'accion': serializers.ChoiceField(choices=list(ACCIONES_CAMBIO_ESTADO)),
+            'activos': serializers.ListField(child=serializers.UUIDField(), required=False),
+            'lotes': serializers.ListField(child=serializers.UUIDField(), required=False),
+            'notas': serializers.CharField(required=False),
+            'parcial': serializers.BooleanField(required=False, default=False),
+        }
+    ),
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioCambioEstadoMasivoAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
+    """
+    Aplica la misma transición de estado a muchas existencias (p.ej. todo el equipo de un
+    carro dañado en un incendio) en una sola operación. Mismas reglas de estado que los
+    endpoints unitarios; los lotes no admiten 'extraviado'. 'revision', 'reparacion' y
+    'habilitar' solo cambian el estado (no descuentan stock); 'habilitar' rechaza los activos
+    con una orden de mantenimiento abierta.
+
+    Sin 'parcial', basta una existencia inválida para que no se aplique nada (409 con el
+    detalle en 'rechazados'). Con "parcial": true se aplican las válidas.
+
+    URL: /api/v1/gestion_inventario/movimientos/cambio-estado-masivo/
+    Method: POST
+    Payload:
+    {
+        "accion": "anular" | "baja" | "extraviado" | "revision" | "reparacion" | "habilitar",
+        "activos": ["uuid", ...],
+        "lotes": ["uuid", ...],
+        "notas": "Daño por fuego en incendio estructural",
+        "parcial": false
+    }
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarBajasStock]
+
+    def post(self, request):
+        estacion = request.estacion_activa
+
+        # --- PUENTE AUDITORÍA ---
+        if not request.session.get('active_estacion_id'):
+            request.session['active_estacion_id'] = estacion.id
+
+        accion = request.data.get('accion')
+        activos = request.data.get('activos') or []
+        lotes = request.data.get('lotes') or []
+        notas = request.data.get('notas', '')
+        parcial = bool(request.data.get('parcial', False))
+
+        if not isinstance(activos, list) or not isinstance(lotes, list):
+            return Response({"detail": "'activos' y 'lotes' deben ser listas de IDs."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            activos = [uuid.UUID(str(i)) for i in activos]
+            lotes = [uuid.UUID(str(i)) for i in lotes]
+        except ValueError:
+            return Response({"detail": "IDs de existencia inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultado = cambiar_estado_existencias(
+                accion, estacion, request.user, activo_ids=activos, lote_ids=lotes, notas=notas, parcial=parcial
+            )
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        except Estado.DoesNotExist:
+            estado = ACCIONES_CAMBIO_ESTADO[accion]['estado']
+            return Response({"detail": f"Error crítico: Estado '{estado}' no configurado."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not resultado['aplicado']:
+            return Response(
+                {"detail": "Ninguna existencia fue modificada.", "rechazados": resultado['rechazados']},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # Un único registro de auditoría que resume la operación
+        total = len(resultado['activos']) + len(resultado['lotes'])
+        self.auditar(
+            verbo=f"aplicó '{ACCIONES_CAMBIO_ESTADO[accion]['estado']}' en bloque a",
+            objetivo=estacion,
+            objetivo_repr=f"{total} existencia(s) de {estacion.nombre}",
+            detalles={
+                'accion': accion,
+                'motivo': notas,
+                'activos': [a['codigo'] for a in resultado['activos']],
+                'lotes': [l['codigo'] for l in resultado['lotes']],
+                'rechazados': len(resultado['rechazados']),
+                'origen_accion': 'APP MÓVIL'
+            }
+        )
+
+        return Response(resultado, status=status.HTTP_200_OK)
+
+
+
+
 @extend_schema(
     summary="Ajuste Manual de Stock",
     request=inline_serializer(
@@ -2420,7 +2909,7 @@ class InventarioExtraviarActivoAPIView(AuditoriaMixin, APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioAjustarStockAPIView(AuditoriaMixin, APIView):
+class InventarioAjustarStockAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para ajustar manualmente la cantidad de un Lote (Inventario Cíclico).
     
@@ -2531,7 +3020,7 @@ class InventarioAjustarStockAPIView(AuditoriaMixin, APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class InventarioConsumirStockAPIView(AuditoriaMixin, APIView):
+class InventarioConsumirStockAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para registrar consumo de stock (Salida de lotes).
     
@@ -2629,25 +3118,500 @@ class InventarioConsumirStockAPIView(AuditoriaMixin, APIView):
 
 
 
-# --- VISTAS DE GESTIÓN DE MANTENIMIENTO ---
 @extend_schema(
-    parameters=[
-        OpenApiParameter("q", OpenApiTypes.STR),
-        OpenApiParameter("estado", OpenApiTypes.STR, required=False),
-        OpenApiParameter("plan_id", OpenApiTypes.INT, required=False),
-        OpenApiParameter("orden_id", OpenApiTypes.INT, required=False),
-    ],
+    summary="Consumo de stock por vencimiento (FEFO)",
+    request=inline_serializer(
+        name='ConsumoFEFORequest',
+        fields={
+            'producto_id': serializers.IntegerField(),
+            'cantidad': serializers.IntegerField(),
+            'notas': serializers.CharField(required=False),
+            'aplicar': serializers.BooleanField(required=False, default=False),
+            'incluir_vencidos': serializers.BooleanField(required=False, default=False),
+        }
+    ),
     responses=OpenApiTypes.OBJECT
 )
-class MantenimientoBuscarActivoParaPlanAPIView(APIView):
+class InventarioConsumoFEFOAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
-    API DRF: Busca activos de la estación que NO estén ya en el plan actual.
-    GET params: q (búsqueda), plan_id
+    Reparte el consumo de un producto (insumo) entre sus lotes DISPONIBLES de la estación,
+    tomando primero los que vencen antes. Sin 'aplicar' solo devuelve la propuesta; con
+    "aplicar": true descuenta el stock (bajo bloqueo) y registra una SALIDA por lote.
+
+    URL: /api/v1/gestion_inventario/movimientos/consumir-fefo/
+    Method: POST
+    Payload:
+    {
+        "producto_id": 12,
+        "cantidad": 40,
+        "notas": "Reposición tras incendio estructural",
+        "aplicar": true
+    }
     """
-    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarPlanes]
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarStockInterno]
 
-    def get(self, request, *args, **kwargs):
-        query = request.GET.get('q', '').strip()
+    def post(self, request):
+        estacion = request.estacion_activa
+
+        # --- PUENTE AUDITORÍA ---
+        if not request.session.get('active_estacion_id'):
+            request.session['active_estacion_id'] = estacion.id
+
+        producto_id = request.data.get('producto_id')
+        cantidad = request.data.get('cantidad')
+        notas = request.data.get('notas', '')
+        aplicar = request.data.get('aplicar') in (True, 'true')
+        incluir_vencidos = request.data.get('incluir_vencidos') in (True, 'true')
+
+        if not producto_id or cantidad is None:
+            return Response({"detail": "Faltan datos (producto_id, cantidad)."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cantidad = int(cantidad)
+            if cantidad <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({"detail": "La cantidad a consumir debe ser mayor a 0."}, status=status.HTTP_400_BAD_REQUEST)
+
+        producto = get_object_or_404(Producto.objects.select_related('producto_global'), id=producto_id, estacion=estacion)
+        if producto.es_serializado:
+            return Response({"detail": "El consumo FEFO solo aplica a insumos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if not aplicar:
+                plan = planificar_consumo_fefo(producto, cantidad, estacion, incluir_vencidos=incluir_vencidos)
+            else:
+                with transaction.atomic():
+                    plan = aplicar_consumo_fefo(producto, cantidad, estacion, request.user, notas=notas, incluir_vencidos=incluir_vencidos)
+                    self.auditar(
+                        verbo=f"registró el consumo interno (FEFO) de {cantidad} unidad(es) de",
+                        objetivo=producto,
+                        objetivo_repr=producto.producto_global.nombre_oficial,
+                        detalles={
+                            'cantidad_consumida': cantidad,
+                            'lotes': {lote.codigo_lote: tomar for lote, tomar in plan['asignaciones']},
+                            'motivo_uso': notas,
+                            'origen_accion': 'APP MÓVIL'
+                        }
+                    )
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            "aplicado": aplicar,
+            "solicitado": plan['solicitado'],
+            "asignado": plan['asignado'],
+            "faltante": plan['faltante'],
+            "lotes": [
+                {
+                    "id": lote.id,
+                    "codigo": lote.codigo_lote,
+                    "fecha_expiracion": lote.fecha_expiracion,
+                    "ubicacion": f"{lote.compartimento.ubicacion.nombre} > {lote.compartimento.nombre}",
+                    # Stock del lote (ya descontado si se aplicó el consumo)
+                    "stock_lote": lote.cantidad,
+                    "cantidad": tomar,
+                }
+                for lote, tomar in plan['asignaciones']
+            ]
+        }, status=status.HTTP_200_OK)
+
+
+
+
+# --- INVENTARIO FÍSICO (TOMA DE INVENTARIO) ---
+@extend_schema(
+    summary="Abrir sesión de inventario físico",
+    request=inline_serializer(
+        name='AbrirSesionInventarioRequest',
+        fields={
+            'ubicacion_id': serializers.UUIDField(),
+            'notas': serializers.CharField(required=False)
+        }
+    ),
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioAbrirSesionConteoAPIView(AuditoriaMixin, APIView):
+    """
+    Abre una sesión de toma de inventario sobre una ubicación completa.
+    Congela lo esperado en ese momento; luego la App envía lecturas QR por lotes.
+
+    URL: /api/v1/gestion_inventario/inventario-fisico/abrir/
+    Method: POST
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarStockInterno]
+
+    def post(self, request):
+        estacion = request.estacion_activa
+
+        # --- PUENTE AUDITORÍA ---
+        if not request.session.get('active_estacion_id'):
+            request.session['active_estacion_id'] = estacion.id
+
+        ubicacion_id = request.data.get('ubicacion_id')
+        if not ubicacion_id:
+            return Response({"detail": "Falta el ID de la ubicación."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ubicacion = get_object_or_404(Ubicacion, id=ubicacion_id, estacion=estacion)
+
+        try:
+            sesion = abrir_sesion_inventario(estacion, ubicacion, request.user, notas=request.data.get('notas'))
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_409_CONFLICT)
+
+        resumen = resumen_sesion_inventario(sesion)
+
+        self.auditar(
+            verbo="abrió una sesión de inventario físico en",
+            objetivo=ubicacion,
+            objetivo_repr=ubicacion.nombre,
+            detalles={
+                'sesion_id': sesion.id,
+                'items_esperados': resumen['esperados'],
+                'origen_accion': 'APP MÓVIL'
+            }
+        )
+
+        return Response({
+            "message": "Sesión de inventario abierta.",
+            "sesion_id": sesion.id,
+            "resumen": resumen
+        }, status=status.HTTP_201_CREATED)
+
+
+
+
+@extend_schema(
+    summary="Registrar lecturas QR de inventario físico",
+    request=inline_serializer(
+        name='LecturasInventarioRequest',
+        fields={
+            'lecturas': serializers.ListField(child=inline_serializer(
+                name='LecturaInventarioItem',
+                fields={
+                    'codigo': serializers.CharField(),
+                    'cantidad': serializers.IntegerField(required=False, min_value=0)
+                }
+            ))
+        }
+    ),
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioRegistrarLecturasConteoAPIView(APIView):
+    """
+    Recibe un lote de lecturas QR (cientos por petición) y actualiza el diff de la sesión.
+    Las lecturas son idempotentes: reenviar el mismo lote no duplica conteos.
+
+    URL: /api/v1/gestion_inventario/inventario-fisico/<sesion_id>/lecturas/
+    Method: POST
+    Payload:
+    {
+        "lecturas": [
+            {"codigo": "E001-ACT-00012"},
+            {"codigo": "E001-LOT-00003", "cantidad": 40}
+        ]
+    }
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarStockInterno]
+
+    def post(self, request, sesion_id):
+        estacion = request.estacion_activa
+        sesion = get_object_or_404(SesionInventario, id=sesion_id, estacion=estacion)
+
+        lecturas = request.data.get('lecturas')
+        if not isinstance(lecturas, list) or not lecturas:
+            return Response({"detail": "Debe enviar una lista de lecturas."}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(l, dict) for l in lecturas):
+            return Response({"detail": "Formato de lectura inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultado = registrar_lecturas_inventario(sesion, lecturas, request.user)
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultado['resumen'] = resumen_sesion_inventario(sesion)
+        return Response(resultado, status=status.HTTP_200_OK)
+
+
+
+
+@extend_schema(summary="Estado (diff) de una sesión de inventario físico", responses=OpenApiTypes.OBJECT)
+class InventarioSesionConteoDetalleAPIView(APIView):
+    """
+    Devuelve el diff acumulado de la sesión: esperados, encontrados, faltantes,
+    diferencias de cantidad e ítems inesperados (con detalle por ítem).
+
+    URL: /api/v1/gestion_inventario/inventario-fisico/<sesion_id>/
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+
+    def get(self, request, sesion_id):
+        estacion = request.estacion_activa
+        sesion = get_object_or_404(
+            SesionInventario.objects.select_related('ubicacion', 'usuario_apertura'),
+            id=sesion_id, estacion=estacion
+        )
+
+        return Response({
+            "id": sesion.id,
+            "ubicacion": sesion.ubicacion.nombre,
+            "ubicacion_id": str(sesion.ubicacion_id),
+            "estado": sesion.get_estado_display(),
+            "estado_codigo": sesion.estado,
+            "fecha_apertura": sesion.fecha_apertura.strftime('%d/%m/%Y %H:%M'),
+            "abierta_por": sesion.usuario_apertura.get_full_name if sesion.usuario_apertura else None,
+            "resumen": resumen_sesion_inventario(sesion, incluir_detalle=True)
+        }, status=status.HTTP_200_OK)
+
+
+
+
+@extend_schema(
+    summary="Cerrar o cancelar sesión de inventario físico",
+    request=inline_serializer(
+        name='CerrarSesionInventarioRequest',
+        fields={'accion': serializers.ChoiceField(choices=['cerrar', 'cancelar'])}
+    ),
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioCerrarSesionConteoAPIView(AuditoriaMixin, APIView):
+    """
+    Cierra la sesión aplicando los resultados en bloque (extravíos y ajustes),
+    o la cancela sin tocar el inventario.
+
+    URL: /api/v1/gestion_inventario/inventario-fisico/<sesion_id>/cerrar/
+    Method: POST
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarStockInterno]
+
+    def post(self, request, sesion_id):
+        estacion = request.estacion_activa
+
+        # --- PUENTE AUDITORÍA ---
+        if not request.session.get('active_estacion_id'):
+            request.session['active_estacion_id'] = estacion.id
+
+        sesion = get_object_or_404(SesionInventario.objects.select_related('ubicacion'), id=sesion_id, estacion=estacion)
+        accion = request.data.get('accion', 'cerrar')
+
+        try:
+            if accion == 'cancelar':
+                cancelar_sesion_inventario(sesion, request.user)
+                self.auditar(
+                    verbo="canceló la sesión de inventario físico de",
+                    objetivo=sesion.ubicacion,
+                    objetivo_repr=sesion.ubicacion.nombre,
+                    detalles={'sesion_id': sesion.id, 'origen_accion': 'APP MÓVIL'}
+                )
+                return Response({"message": "Sesión de inventario cancelada."}, status=status.HTTP_200_OK)
+
+            if accion != 'cerrar':
+                return Response({"detail": "Acción no válida (use cerrar o cancelar)."}, status=status.HTTP_400_BAD_REQUEST)
+
+            resultado = cerrar_sesion_inventario(sesion, request.user)
+
+        except DjangoValidationError as e:
+            return Response({"detail": e.messages[0]}, status=status.HTTP_409_CONFLICT)
+        except Estado.DoesNotExist:
+            return Response({"detail": "Error crítico: Estado 'EXTRAVIADO' no configurado."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Un único registro de auditoría con el resumen (no uno por ítem)
+        self.auditar(
+            verbo="cerró la sesión de inventario físico de",
+            objetivo=sesion.ubicacion,
+            objetivo_repr=sesion.ubicacion.nombre,
+            detalles={
+                'sesion_id': sesion.id,
+                'esperados': resultado['esperados'],
+                'encontrados': resultado['encontrados'],
+                'inesperados': resultado['inesperados'],
+                'activos_extraviados': resultado['activos_extraviados'],
+                'lotes_ajustados': resultado['lotes_ajustados'],
+                'origen_accion': 'APP MÓVIL'
+            }
+        )
+
+        return Response({
+            "message": "Inventario cerrado y aplicado correctamente.",
+            "resumen": resultado
+        }, status=status.HTTP_200_OK)
+
+
+
+
+# --- SINCRONIZACIÓN INCREMENTAL (APP MÓVIL) ---
+
+@extend_schema(
+    summary="Feed de cambios para sincronización incremental",
+    parameters=[
+        OpenApiParameter("updated_since", OpenApiTypes.STR, required=False, description="Cursor devuelto por la llamada anterior. Omitir en la primera sincronización."),
+        OpenApiParameter("limit", OpenApiTypes.INT, required=False, description=f"Máximo de cambios por respuesta (tope {MAX_CAMBIOS_POR_PAGINA})."),
+    ],
+    responses=inline_serializer(
+        name='FeedSincronizacionResponse',
+        fields={
+            'cursor': serializers.CharField(),
+            'hay_mas': serializers.BooleanField(),
+            'requiere_resync': serializers.BooleanField(),
+            'actualizados': serializers.DictField(child=serializers.ListField(child=serializers.DictField())),
+            'eliminados': serializers.DictField(child=serializers.ListField(child=serializers.CharField())),
+        }
+    )
+)
+class InventarioSincronizacionAPIView(APIView):
+    """
+    Feed incremental (upserts + tombstones) de Producto, ProductoGlobal, Activo, LoteInsumo,
+    Ubicacion, Compartimento y Destinatario, ordenado por la secuencia de la bitácora.
+
+    URL: /api/v1/gestion_inventario/sync/?updated_since=<cursor>&limit=500
+    Flujo de la App:
+      1. Sin cursor -> requiere_resync=true y el cursor actual. Descargar los listados completos
+         y guardar ese cursor (pedirlo ANTES de la descarga: los cambios intermedios se repiten, no se pierden).
+      2. Con cursor -> aplicar 'actualizados' y 'eliminados', guardar el nuevo 'cursor' y repetir
+         mientras hay_mas=true.
+      3. requiere_resync=true en cualquier momento -> volver al paso 1.
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+
+    def get(self, request):
+        # Un cursor ausente o ilegible se trata igual que uno vencido: resincronizar
+        cursor = request.query_params.get('updated_since', '').strip()
+        desde = int(cursor) if cursor.isdigit() else None
+
+        try:
+            limite = int(request.query_params.get('limit', MAX_CAMBIOS_POR_PAGINA))
+        except ValueError:
+            limite = MAX_CAMBIOS_POR_PAGINA
+
+        feed = obtener_cambios_sincronizacion(request.estacion_activa, desde, limite=limite)
+        feed['cursor'] = str(feed['cursor'])
+        return Response(feed, status=status.HTTP_200_OK)
+
+
+
+
+# --- VALORIZACIÓN DEL INVENTARIO ---
+
+@extend_schema(
+    summary="Valorización del inventario de la estación",
+    parameters=[
+        OpenApiParameter("agrupar_por", OpenApiTypes.STR, required=False, enum=list(DIMENSIONES_VALORIZACION), description="Dimensión de agrupación (por defecto 'categoria')."),
+        OpenApiParameter("incluir_bajas", OpenApiTypes.BOOL, required=False, description="Incluir existencias anuladas y dadas de baja."),
+    ],
+    responses=inline_serializer(
+        name='ValorizacionInventarioResponse',
+        fields={
+            'agrupado_por': serializers.CharField(),
+            'grupos': serializers.ListField(child=serializers.DictField()),
+            'totales': serializers.DictField(),
+        }
+    )
+)
+class InventarioValorizacionAPIView(APIView):
+    """
+    Valor del inventario (unidades x costo de compra) agrupado por categoría, ubicación,
+    estado o producto. Se lee del resumen precalculado ValorizacionInventario.
+
+    URL: /api/v1/gestion_inventario/valorizacion/?agrupar_por=ubicacion
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGenerarReportesInventario]
+
+    def get(self, request):
+        agrupar_por = request.query_params.get('agrupar_por', 'categoria')
+        if agrupar_por not in DIMENSIONES_VALORIZACION:
+            return Response(
+                {"detail": f"Agrupación no válida. Opciones: {', '.join(DIMENSIONES_VALORIZACION)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        incluir_bajas = request.query_params.get('incluir_bajas') == 'true'
+
+        reporte = resumen_valorizacion(request.estacion_activa, agrupar_por, incluir_sin_valor=incluir_bajas)
+        return Response(reporte, status=status.HTTP_200_OK)
+
+
+
+@extend_schema(
+    summary="Canal en vivo del inventario (SSE)",
+    description=(
+        "Flujo text/event-stream. Al conectar envía 'snapshot' con {estado: {activos, insumos}} "
+        "de toda la estación; luego 'estados' (totales absolutos de los estados que cambiaron) y "
+        "'movimientos' (resumen de los movimientos registrados). La conexión se cierra cada "
+        "INVENTARIO_TIEMPO_REAL_DURACION segundos y el cliente debe reconectar. Con el servidor "
+        "en modo WSGI solo se envía el snapshot y el cliente reconecta tras ese intervalo (long-poll)."
+    ),
+    responses={(200, 'text/event-stream'): OpenApiTypes.STR}
+)
+class InventarioEnVivoAPIView(APIView):
+    """
+    Canal push por estación para reemplazar el polling de los gráficos del dashboard.
+
+    URL: /api/v1/gestion_inventario/en-vivo/
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerStock]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        flujo = flujo_para_peticion(request._request, request.estacion_activa.id)
+        respuesta = StreamingHttpResponse(flujo, content_type='text/event-stream')
+        respuesta['Cache-Control'] = 'no-cache'
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
+
+
+
+
+@extend_schema(
+    summary="Verificación de carga de vehículos",
+    parameters=[OpenApiParameter("ubicacion", OpenApiTypes.UUID, required=False, description="Limitar a un vehículo")],
+    responses=OpenApiTypes.OBJECT
+)
+class InventarioVerificacionCargaAPIView(APIView):
+    """
+    Compara la plantilla de carga de cada vehículo de la estación (o de uno solo) con sus
+    existencias reales. Pensado para la revisión en el cambio de guardia desde la App.
+
+    URL: /api/v1/gestion_inventario/vehiculos/verificacion-carga/?ubicacion=<uuid>
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanVerUbicaciones]
+
+    def get(self, request):
+        ubicacion_id = request.query_params.get('ubicacion')
+        ubicacion_ids = None
+        if ubicacion_id:
+            try:
+                ubicacion_ids = [uuid.UUID(ubicacion_id)]
+            except ValueError:
+                return Response({"detail": "ID de ubicación inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        vehiculos = comparar_cargas(request.estacion_activa, ubicacion_ids)
+        return Response({
+            "total": len(vehiculos),
+            "completos": sum(1 for v in vehiculos if v['completo']),
+            "vehiculos": vehiculos,
+        }, status=status.HTTP_200_OK)
+
+
+
+
+
+# --- VISTAS DE GESTIÓN DE MANTENIMIENTO ---
+@extend_schema(
+    parameters=[
+        OpenApiParameter("q", OpenApiTypes.STR),
+        OpenApiParameter("estado", OpenApiTypes.STR, required=False),
+        OpenApiParameter("plan_id", OpenApiTypes.INT, required=False),
+        OpenApiParameter("orden_id", OpenApiTypes.INT, required=False),
+    ],
+    responses=OpenApiTypes.OBJECT
+)
+class MantenimientoBuscarActivoParaPlanAPIView(APIView):
+    """
+    API DRF: Busca activos de la estación que NO estén ya en el plan actual.
+    GET params: q (búsqueda), plan_id
+    """
+    permission_classes = [IsAuthenticated, IsEstacionActiva, CanGestionarPlanes]
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
         plan_id = request.GET.get('plan_id')
         estacion = request.estacion_activa
 
@@ -2919,7 +3883,11 @@ class MantenimientoCambiarEstadoOrdenAPIView(OrdenValidacionMixin, AuditoriaMixi
                     # Marcar masivamente todos los activos involucrados como 'EN REPARACIÓN'
                     try:
                         estado_reparacion = Estado.objects.get(nombre__iexact="EN REPARACIÓN")
-                        orden.activos_afectados.update(estado=estado_reparacion)
+                        orden.activos_afectados.update(estado=estado_reparacion, updated_at=timezone.now())
+                        registrar_cambios_sincronizacion(
+                            CambioSincronizacion.Modelo.ACTIVO, orden.activos_afectados.values_list('id', flat=True), estacion.id
+                        )
+                        recalcular_valorizacion(orden.activos_afectados.values_list('producto_id', flat=True))
                     except Estado.DoesNotExist:
                         pass # Opcional: Loguear advertencia de configuración faltante
 
@@ -2954,7 +3922,11 @@ class MantenimientoCambiarEstadoOrdenAPIView(OrdenValidacionMixin, AuditoriaMixi
                     # Nota: En implementaciones complejas, esto podría depender del resultado individual de cada activo.
                     try:
                         estado_disponible = Estado.objects.get(nombre__iexact="DISPONIBLE")
-                        orden.activos_afectados.update(estado=estado_disponible)
+                        orden.activos_afectados.update(estado=estado_disponible, updated_at=timezone.now())
+                        registrar_cambios_sincronizacion(
+                            CambioSincronizacion.Modelo.ACTIVO, orden.activos_afectados.values_list('id', flat=True), estacion.id
+                        )
+                        recalcular_valorizacion(orden.activos_afectados.values_list('producto_id', flat=True))
                     except Estado.DoesNotExist:
                         pass
 
@@ -2968,7 +3940,11 @@ class MantenimientoCambiarEstadoOrdenAPIView(OrdenValidacionMixin, AuditoriaMixi
                     # Efecto Secundario: Liberación de Activos (Revertir bloqueo)
                     try:
                         estado_disponible = Estado.objects.get(nombre__iexact="DISPONIBLE")
-                        orden.activos_afectados.update(estado=estado_disponible)
+                        orden.activos_afectados.update(estado=estado_disponible, updated_at=timezone.now())
+                        registrar_cambios_sincronizacion(
+                            CambioSincronizacion.Modelo.ACTIVO, orden.activos_afectados.values_list('id', flat=True), estacion.id
+                        )
+                        recalcular_valorizacion(orden.activos_afectados.values_list('producto_id', flat=True))
                     except Estado.DoesNotExist:
                         pass
 
@@ -3007,7 +3983,7 @@ class MantenimientoCambiarEstadoOrdenAPIView(OrdenValidacionMixin, AuditoriaMixi
     ),
     responses=OpenApiTypes.OBJECT
 )
-class MantenimientoRegistrarTareaAPIView(OrdenValidacionMixin, APIView):
+class MantenimientoRegistrarTareaAPIView(IdempotenciaMixin, OrdenValidacionMixin, APIView):
     """
     Endpoint API encargado del registro granular de actividades de mantenimiento.
     
@@ -3358,8 +4334,9 @@ class MantenimientoQuitarActivoOrdenAPIView(OrdenValidacionMixin, APIView):
         OpenApiParameter("estado", OpenApiTypes.STR, required=False),
         OpenApiParameter("plan_id", OpenApiTypes.INT, required=False),
         OpenApiParameter("orden_id", OpenApiTypes.INT, required=False),
+        *PARAMETROS_CURSOR,
     ],
-    responses=OpenApiTypes.OBJECT
+    responses=respuesta_paginada('OrdenesPaginadas')
 )
 class MantenimientoOrdenListAPIView(APIView):
     """
@@ -3381,16 +4358,19 @@ class MantenimientoOrdenListAPIView(APIView):
         )
 
         # Filtro de Estado usando las constantes del modelo
+        # (el cursor requiere campos no nulos: el historial se ordena por fecha programada, no de cierre)
         if filtro_estado == 'historial':
             qs = qs.filter(estado__in=[
                 OrdenMantenimiento.EstadoOrden.REALIZADA,
                 OrdenMantenimiento.EstadoOrden.CANCELADA
-            ]).order_by('-fecha_cierre', '-fecha_programada')
+            ])
+            paginador = CursorPaginacion(ordering=('-fecha_programada', '-id'))
         else:
             qs = qs.filter(estado__in=[
                 OrdenMantenimiento.EstadoOrden.PENDIENTE,
                 OrdenMantenimiento.EstadoOrden.EN_CURSO
-            ]).order_by('fecha_programada')
+            ])
+            paginador = CursorPaginacion(ordering=('fecha_programada', 'id'))
 
         # Búsqueda
         if query:
@@ -3402,10 +4382,13 @@ class MantenimientoOrdenListAPIView(APIView):
                     Q(tipo_orden__icontains=query)
                 )
 
+        qs = qs.annotate(total_activos_afectados=Count('activos_afectados'))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+
         data = []
         hoy = timezone.now().date()
 
-        for orden in qs[:50]:
+        for orden in pagina:
             # Corrección de tipos fecha (Datetime vs Date)
             es_vencido = False
             if orden.estado != OrdenMantenimiento.EstadoOrden.REALIZADA and orden.fecha_programada:
@@ -3432,10 +4415,10 @@ class MantenimientoOrdenListAPIView(APIView):
                 "responsable": orden.responsable.get_full_name if orden.responsable else "Sin asignar",
                 "es_responsable": (orden.responsable == request.user),
                 "es_vencido": es_vencido,
-                "activos_count": orden.activos_afectados.count()
+                "activos_count": orden.total_activos_afectados
             })
 
-        return Response(data, status=status.HTTP_200_OK)
+        return paginador.get_paginated_response(data)
 
 
 
@@ -3452,7 +4435,7 @@ class MantenimientoOrdenListAPIView(APIView):
     ),
     responses=OpenApiTypes.OBJECT
 )
-class MantenimientoOrdenCorrectivaCreateAPIView(AuditoriaMixin, APIView):
+class MantenimientoOrdenCorrectivaCreateAPIView(IdempotenciaMixin, AuditoriaMixin, APIView):
     """
     Endpoint para crear una Orden de Mantenimiento Correctiva.
     
@@ -3608,7 +4591,7 @@ class MantenimientoOrdenDetalleAPIView(APIView):
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
+@extend_schema(parameters=PARAMETROS_CURSOR, responses=respuesta_paginada('UsuariosPaginados'))
 class UsuarioListAPIView(APIView):
     """
     Endpoint unificado para listar usuarios (Voluntarios) de la estación activa.
@@ -3645,12 +4628,13 @@ class UsuarioListAPIView(APIView):
         if rol_id and rol_id.isdigit():
             qs = qs.filter(roles__id=int(rol_id))
 
-        # Ordenar alfabéticamente
-        qs = qs.order_by('usuario__first_name', 'usuario__last_name').distinct()
+        # Ordenar alfabéticamente (id de membresía como desempate para el cursor)
+        paginador = CursorPaginacion(ordering=('usuario__first_name', 'usuario__last_name', 'id'))
+        pagina = paginador.paginate_queryset(qs.distinct(), request, view=self)
 
         # 4. Serialización
         data = []
-        for m in qs[:50]: # Límite de 50 para no saturar la lista móvil
+        for m in pagina:
             roles_nombres = [r.nombre for r in m.roles.all()]
             
             # Intentamos obtener avatar si existe
@@ -3672,7 +4656,7 @@ class UsuarioListAPIView(APIView):
                 "descripcion_corta": f"{', '.join(roles_nombres[:2])}" if roles_nombres else "Sin rol asignado"
             })
 
-        return Response(data, status=status.HTTP_200_OK)
+        return paginador.get_paginated_response(data)
 
 
 
@@ -4011,7 +4995,7 @@ class UsuarioFichaMedicaAPIView(AuditoriaMixin, APIView):
 
 
 
-@extend_schema(responses=OpenApiTypes.OBJECT)
+@extend_schema(parameters=PARAMETROS_CURSOR, responses=respuesta_paginada('DocumentosPaginados'))
 class DocumentoHistoricoListAPIView(APIView):
     """
     Lista los documentos históricos de la estación para la biblioteca digital móvil.
@@ -4043,12 +5027,13 @@ class DocumentoHistoricoListAPIView(APIView):
                     Q(ubicacion_fisica__icontains=query)
                 )
 
-            # 4. Ordenamiento
-            qs = qs.order_by('-fecha_documento')
+            # 4. Ordenamiento y página actual
+            paginador = CursorPaginacion(ordering=('-fecha_documento', '-id'))
+            pagina = paginador.paginate_queryset(qs, request, view=self)
 
             # 5. Serialización
             data = []
-            for doc in qs[:50]: # Limitamos a 50 para no saturar la app (paginación simple)
+            for doc in pagina:
                 
                 # Obtener URL del archivo (S3 genera la firma automática aquí si usas django-storages)
                 archivo_url = doc.archivo.url if doc.archivo else None
@@ -4078,179 +5063,176 @@ class DocumentoHistoricoListAPIView(APIView):
                     "es_confidencial": doc.es_confidencial
                 })
 
-            return Response(data, status=status.HTTP_200_OK)
+            return paginador.get_paginated_response(data)
 
+        except NotFound:
+            raise
         except Exception as e:
             return Response({"detail": f"Error al cargar documentos: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 
 
+def _autenticar_token_url(request):
+    """
+    Autenticación manual por el JWT del parámetro ?token= (descargas abiertas en el navegador,
+    que no envía el header). Asigna request.user; devuelve la respuesta 401 si el token no sirve.
+    """
+    token = request.query_params.get('token')
+    if not token:
+        return Response({'error': 'Token no proporcionado.'}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        auth = JWTAuthentication()
+        validated_token = auth.get_validated_token(token)
+        request.user = auth.get_user(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return Response({'error': 'Token inválido o expirado.'}, status=status.HTTP_401_UNAUTHORIZED)
+    return None
+
+
+def _respuesta_pdf_en_curso(request, trabajo):
+    if pdf_fallido(trabajo):
+        # No se reintenta hasta que pase DOCUMENTOS_PDF_REINTENTO_SEGUNDOS o cambien los datos
+        return Response({'error': 'Error interno al generar el PDF.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # La URL de estado conserva el token para que el navegador o la App puedan consultarla tal cual
+    url_estado = request.build_absolute_uri(reverse('api:api_documento_pdf_estado', args=[trabajo]))
+    url_estado = replace_query_param(url_estado, 'token', request.query_params.get('token'))
+    return respuesta_pdf_pendiente(request, trabajo, url_estado)
+
+
+PARAMETROS_DESCARGA_PDF = [OpenApiParameter("token", OpenApiTypes.STR, location=OpenApiParameter.QUERY)]
+VERBOS_DESCARGA_PDF = {
+    HOJA_VIDA: "descargó su propia hoja de vida (PDF)",
+    FICHA_MEDICA: "descargó su propia ficha clínica (PDF)",
+}
+RESPUESTAS_DESCARGA_PDF = {
+    200: OpenApiTypes.BINARY,
+    202: OpenApiResponse(description="El PDF se está generando: {trabajo, estado, url} para consultar su estado."),
+}
+
+
 @extend_schema(
     summary="Descargar PDF",
-    parameters=[OpenApiParameter("token", OpenApiTypes.STR, location=OpenApiParameter.QUERY)],
-    responses={200: OpenApiTypes.BINARY}
+    parameters=PARAMETROS_DESCARGA_PDF,
+    responses=RESPUESTAS_DESCARGA_PDF
 )
 class DescargarHojaVidaPropiaAPIView(AuditoriaMixin, APIView):
     """
     [Opción Token-URL] Permite descargar PDF enviando el token como parámetro GET.
     URL: /api/v1/.../?token=eyJhbGci...
+    Si el PDF de los datos actuales ya está generado se entrega de inmediato; si no, se genera en
+    segundo plano y se responde 202 con el trabajo a consultar (ver apps/common/pdf.py).
     """
     # 1. Quitamos IsAuthenticated automático porque el navegador no envía Header
     permission_classes = [] 
 
     def get(self, request):
         # 2. Autenticación Manual por Query Param
-        token = request.query_params.get('token')
-        if not token:
-            return Response({'error': 'Token no proporcionado.'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        try:
-            # Validamos el JWT manualmente
-            auth = JWTAuthentication()
-            validated_token = auth.get_validated_token(token)
-            user = auth.get_user(validated_token)
-            request.user = user # Asignamos el usuario a la request
-            
-            # Verificar Estación Activa (Manual o vía lógica interna)
-            # Como no hay sesión, asumimos la estación activa basada en membresía o parámetro
-            # Para simplificar, obtenemos la estación del usuario si es necesario, 
-            # o permitimos la descarga si el usuario es válido.
-            
-        except (InvalidToken, AuthenticationFailed):
-             return Response({'error': 'Token inválido o expirado.'}, status=status.HTTP_401_UNAUTHORIZED)
+        error = _autenticar_token_url(request)
+        if error:
+            return error
 
-        # 3. Lógica de Negocio (Igual que antes)
+        # 3. Lógica de Negocio
         try:
             voluntario = Voluntario.objects.get(usuario=request.user)
-            membresia = Membresia.objects.filter(usuario=request.user, estado='ACTIVO').first()
-            cargo_actual_obj = HistorialCargo.objects.filter(voluntario=voluntario, fecha_fin__isnull=True).first()
-
-            context = {
-                'voluntario': voluntario,
-                'membresia': membresia,
-                'cargo_actual': cargo_actual_obj,
-                'request': request,
-                'cargos': HistorialCargo.objects.filter(voluntario=voluntario).order_by('-fecha_inicio'),
-                'reconocimientos': HistorialReconocimiento.objects.filter(voluntario=voluntario).order_by('-fecha_evento'),
-                'sanciones': HistorialSancion.objects.filter(voluntario=voluntario).order_by('-fecha_evento'),
-                'cursos': HistorialCurso.objects.filter(voluntario=voluntario).order_by('-fecha_curso'),
-            }
-
-            html_string = render_to_string("gestion_voluntarios/pages/hoja_vida_pdf.html", context)
-            result = io.BytesIO()
-            pdf = pisa.pisaDocument(io.BytesIO(html_string.encode("UTF-8")), result)
+        except Voluntario.DoesNotExist:
+            return Response({'error': 'Sin perfil de voluntario.'}, status=status.HTTP_404_NOT_FOUND)
 
-            if not pdf.err:
-                self.auditar(
-                    verbo="descargó su propia hoja de vida (PDF)",
-                    objetivo=request.user,
-                    detalles={'origen': 'APP MÓVIL (Browser)'}
-                )
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'attachment; filename="Hoja_Vida_{request.user.rut}.pdf"'
-                return response
-            
+        membresia = Membresia.objects.select_related('estacion').filter(usuario=request.user, estado='ACTIVO').first()
+        nombre = f"Hoja_Vida_{request.user.rut}.pdf"
+        try:
+            ruta, trabajo = solicitar_pdf(HOJA_VIDA, voluntario.pk, html_hoja_vida(voluntario, membresia), nombre)
+        except ErrorGeneracionPDF:
             return Response({'error': 'Error interno PDF.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        except Voluntario.DoesNotExist:
-            return Response({'error': 'Sin perfil de voluntario.'}, status=status.HTTP_404_NOT_FOUND)
+        if ruta is None:
+            return _respuesta_pdf_en_curso(request, trabajo)
+
+        self.auditar(
+            verbo=VERBOS_DESCARGA_PDF[HOJA_VIDA],
+            objetivo=request.user,
+            detalles={'origen': 'APP MÓVIL (Browser)'}
+        )
+        return respuesta_pdf(ruta, nombre)
 
 
 
 
 @extend_schema(
     summary="Descargar PDF",
-    parameters=[OpenApiParameter("token", OpenApiTypes.STR, location=OpenApiParameter.QUERY)],
-    responses={200: OpenApiTypes.BINARY}
+    parameters=PARAMETROS_DESCARGA_PDF,
+    responses=RESPUESTAS_DESCARGA_PDF
 )
 class DescargarFichaMedicaPropiaAPIView(AuditoriaMixin, APIView):
     """
     [Opción Token-URL] Genera y descarga el PDF de la Ficha Médica.
-    Reutiliza la plantilla HTML de la web pero la convierte a PDF en el servidor.
+    Reutiliza la plantilla HTML de la web pero la convierte a PDF en segundo plano
+    (ver apps/common/pdf.py): entrega el PDF si ya está generado o 202 con el trabajo a consultar.
     URL: /api/v1/perfil/ficha-medica/descargar/?token=xxxxx
     """
     permission_classes = [] # Seguridad manual para descarga por navegador
 
     def get(self, request):
-        # ------------------------------------------------------------------
         # 1. AUTENTICACIÓN MANUAL (Token en URL)
-        # ------------------------------------------------------------------
-        token = request.query_params.get('token')
-        if not token:
-            return Response({'error': 'Token no proporcionado.'}, status=status.HTTP_401_UNAUTHORIZED)
-        
+        error = _autenticar_token_url(request)
+        if error:
+            return error
+
+        # 2. OBTENCIÓN DE DATOS Y PDF
         try:
-            auth = JWTAuthentication()
-            validated_token = auth.get_validated_token(token)
-            request.user = auth.get_user(validated_token)
-        except (InvalidToken, TokenError, AuthenticationFailed):
-             return Response({'error': 'Token inválido o expirado.'}, status=status.HTTP_401_UNAUTHORIZED)
-
-        # ------------------------------------------------------------------
-        # 2. OBTENCIÓN DE DATOS (Misma lógica que tu vista Web)
-        # ------------------------------------------------------------------
+            ficha = FichaMedica.objects.get(voluntario__usuario=request.user)
+        except FichaMedica.DoesNotExist:
+            return Response({'error': 'No tienes ficha médica creada.'}, status=status.HTTP_404_NOT_FOUND)
+
+        nombre = f"Ficha_Medica_{request.user.rut}.pdf"
         try:
-            ficha = FichaMedica.objects.select_related(
-                'voluntario', 'voluntario__usuario', 'voluntario__domicilio_comuna', 
-                'grupo_sanguineo', 'sistema_salud'
-            ).prefetch_related(
-                'alergias__alergia', 'enfermedades__enfermedad', 'medicamentos__medicamento', 
-                'cirugias__cirugia', 'voluntario__contactos_emergencia'
-            ).get(voluntario__usuario=request.user)
+            ruta, trabajo = solicitar_pdf(FICHA_MEDICA, ficha.voluntario_id, html_ficha_medica(ficha), nombre)
+        except ErrorGeneracionPDF:
+            return Response({'error': 'Error interno al generar el PDF.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            voluntario = ficha.voluntario
-            
-            # Cálculo de edad
-            fecha_nac = voluntario.fecha_nacimiento or voluntario.usuario.birthdate # Fallback defensivo
-            edad = "S/I"
-            if fecha_nac: 
-                today = date.today()
-                # Corrección para evitar error si fecha_nac es datetime en lugar de date
-                if hasattr(fecha_nac, 'date'):
-                    fecha_nac = fecha_nac.date()
-                edad = today.year - fecha_nac.year - ((today.month, today.day) < (fecha_nac.month, fecha_nac.day))
-
-            context = {
-                'ficha': ficha,
-                'voluntario': voluntario,
-                'edad': edad,
-                'alergias': ficha.alergias.all(),
-                'enfermedades': ficha.enfermedades.all(),
-                'medicamentos': ficha.medicamentos.all(),
-                'cirugias': ficha.cirugias.all(),
-                'contactos': voluntario.contactos_emergencia.all(),
-                'fecha_reporte': date.today(),
-                'request': request # Importante para rutas de imágenes estáticas
-            }
+        if ruta is None:
+            return _respuesta_pdf_en_curso(request, trabajo)
 
-            # ------------------------------------------------------------------
-            # 3. GENERACIÓN PDF (El paso extra necesario)
-            # ------------------------------------------------------------------
-            # Renderizamos el HTML a un string en memoria
-            html_string = render_to_string("gestion_medica/pages/imprimir_ficha_pdf.html", context)
-            
-            # Convertimos ese string a PDF bytes
-            result = io.BytesIO()
-            pdf = pisa.pisaDocument(io.BytesIO(html_string.encode("UTF-8")), result)
+        self.auditar(
+            verbo=VERBOS_DESCARGA_PDF[FICHA_MEDICA],
+            objetivo=request.user,
+            detalles={'origen': 'APP MÓVIL (Browser)'}
+        )
+        return respuesta_pdf(ruta, nombre)
 
-            if not pdf.err:
-                # Auditoría
-                self.auditar(
-                    verbo="descargó su propia ficha clínica (PDF)",
-                    objetivo=request.user,
-                    detalles={'origen': 'APP MÓVIL (Browser)'}
-                )
-                
-                # Devolvemos el PDF binario
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
-                filename = f"Ficha_Medica_{request.user.rut}.pdf"
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                return response
 
+
+
+@extend_schema(
+    summary="Estado de un PDF en generación",
+    parameters=PARAMETROS_DESCARGA_PDF,
+    responses={**RESPUESTAS_DESCARGA_PDF, 404: OpenApiResponse(description="Trabajo inexistente, expirado o de otro usuario.")}
+)
+class DocumentoPDFEstadoAPIView(AuditoriaMixin, APIView):
+    """
+    [Opción Token-URL] Consulta un trabajo de generación de PDF propio (hoja de vida o ficha
+    médica). Entrega el PDF cuando está listo; mientras tanto responde 202.
+    """
+    permission_classes = [] # Seguridad manual para descarga por navegador
+
+    def get(self, request, trabajo):
+        error = _autenticar_token_url(request)
+        if error:
+            return error
+
+        datos = estado_trabajo(trabajo)
+        voluntario_id = Voluntario.objects.filter(usuario=request.user).values_list('pk', flat=True).first()
+        if datos is None or datos['voluntario_id'] != str(voluntario_id):
+            return Response({'error': 'Trabajo no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if datos['estado'] == ERROR:
             return Response({'error': 'Error interno al generar el PDF.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if datos['estado'] != LISTO:
+            return _respuesta_pdf_en_curso(request, trabajo)
 
-        except FichaMedica.DoesNotExist:
-            return Response({'error': 'No tienes ficha médica creada.'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            return Response({'error': f'Error inesperado: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        self.auditar(
+            verbo=VERBOS_DESCARGA_PDF[datos['tipo']],
+            objetivo=request.user,
+            detalles={'origen': 'APP MÓVIL (Browser)'}
+        )
+        return respuesta_pdf(datos['ruta'], datos['nombre'])
\ No newline at end of file
@@ -1,3 +1,7 @@
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 
 class SysPermissionMixin:
@@ -47,4 +51,88 @@ class ImagenPreviewMixin:
         elif hasattr(obj, 'imagen') and obj.imagen:
             return format_html('<img src="{}" width="50" height="50" style="object-fit:cover; border-radius:4px;" />', obj.imagen.url)
         return "-"
-    mostrar_preview.short_description = "Vista Previa"
\ No newline at end of file
+    mostrar_preview.short_description = "Vista Previa"
+
+
+
+
+class PaginadorConteoEstimado(Paginator):
+    """
+    Paginador del admin que, en tablas grandes de PostgreSQL, reemplaza el COUNT(*) exacto por
+    la estimación del planificador: las estadísticas de la tabla (pg_class.reltuples) si el
+    listado no tiene filtros, o las filas estimadas por EXPLAIN si los tiene.
+
+    Bajo `umbral_conteo_exacto` filas estimadas se cuenta de forma exacta (es barato). Sobre él,
+    el total y la cantidad de páginas son aproximados: las últimas páginas pueden venir vacías.
+    """
+    umbral_conteo_exacto = 10000
+
+    @cached_property
+    def count(self):
+        estimado = estimar_filas(self.object_list)
+        if estimado is None or estimado < self.umbral_conteo_exacto:
+            return super().count
+        return estimado
+
+
+def estimar_filas(queryset):
+    """Filas estimadas por PostgreSQL para el queryset, o None si no hay estimación disponible."""
+    conexion = connections[queryset.db]
+    if conexion.vendor != 'postgresql':
+        return None
+
+    with conexion.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [conexion.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            fila = cursor.fetchone()
+            # reltuples vale -1 en tablas que aún no se han analizado
+            estimado = fila[0] if fila else -1
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            estimado = plan[0]['Plan']['Plan Rows']
+    return int(estimado) if estimado >= 0 else None
+
+
+class FiltroValoresRecientes(admin.AllValuesFieldListFilter):
+    """
+    Variante acotada de AllValuesFieldListFilter: ofrece los valores presentes en los
+    `muestra` registros más recientes en vez de un SELECT DISTINCT sobre toda la tabla.
+    Pensado para columnas de texto libre de baja cardinalidad (p.ej. el verbo de la auditoría).
+    """
+    muestra = 5000
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        recientes = model_admin.get_queryset(request).order_by('-pk').values_list(field_path, flat=True)[:self.muestra]
+        self.lookup_choices = sorted(set(recientes), key=lambda valor: (valor is None, valor))
+
+
+class AdminRendimientoMixin:
+    """
+    Modo rendimiento para los ModelAdmin de tablas grandes (auditoría, movimientos, existencias).
+    Se activa agregándolo a la herencia del ModelAdmin y declarando en cada uno
+    `list_select_related` con las relaciones de su `list_display`. El mixin:
+
+    1. Usa conteos estimados (PaginadorConteoEstimado) y no calcula el total sin filtros.
+    2. Muestra como raw_id toda FK o M2M que no tenga autocompletado, para que ningún
+       formulario cargue una tabla completa en un <select>.
+
+    Los filtros de la lista deben ser acotados: FK a catálogos pequeños, fechas o
+    FiltroValoresRecientes; y conviene no usar date_hierarchy, que recorre la tabla entera
+    para armar la navegación por años.
+    """
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        cubiertos = set(self.autocomplete_fields) | set(self.raw_id_fields)
+        self.raw_id_fields = tuple(self.raw_id_fields) + tuple(
+            campo.name for campo in model._meta.get_fields()
+            if campo.concrete and (campo.many_to_one or campo.one_to_one or campo.many_to_many) and campo.name not in cubiertos
+        )
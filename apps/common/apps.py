@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.common'
+
+    def ready(self):
+        # Registra los lookups personalizados (p.ej. campo__any)
+        from . import lookups  # noqa: F401
@@ -0,0 +1,23 @@
+from django.db.models import CharField, Lookup
+
+
+@CharField.register_lookup
+class EnArreglo(Lookup):
+    """
+    `campo__any=[...]` -> "campo" = ANY(%s), con la lista como un único parámetro de tipo arreglo.
+
+    A diferencia de `__in` (un parámetro por valor), el SQL es el mismo sin importar cuántos
+    valores lleguen: con cientos de códigos escaneados la consulta no crece ni cambia de forma
+    y sigue usando el índice del campo. Solo PostgreSQL.
+    """
+    lookup_name = 'any'
+    # La lista va tal cual al driver (psycopg la adapta a arreglo), sin convertir cada valor
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} = ANY({rhs})", [*lhs_params, *rhs_params]
+
+    def get_db_prep_lookup(self, value, connection):
+        return ('%s', [list(value)])
@@ -0,0 +1,120 @@
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import _get_random_filename
+
+try:
+    import brotli
+except ImportError:  # Brotli es opcional: sin él solo se negocia gzip
+    brotli = None
+
+
+_re_codificacion = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+
+
+def codificaciones_aceptadas(accept_encoding):
+    """{codificación: q} del header Accept-Encoding (q=0 significa rechazada)."""
+    aceptadas = {}
+    for parte in accept_encoding.lower().split(','):
+        coincidencia = _re_codificacion.match(parte)
+        if not coincidencia:
+            continue
+        try:
+            aceptadas[coincidencia.group(1)] = float(coincidencia.group(2) or 1)
+        except ValueError:
+            continue
+    return aceptadas
+
+
+def elegir_codificacion(accept_encoding):
+    """'br', 'gzip' o None según lo que acepta el cliente (a igual q se prefiere brotli)."""
+    aceptadas = codificaciones_aceptadas(accept_encoding)
+    comodin = aceptadas.get('*', 0)
+    candidatas = [('br', 1)] if brotli is not None else []
+    candidatas.append(('gzip', 0))
+    mejor = max(
+        ((aceptadas.get(nombre, comodin), preferencia, nombre) for nombre, preferencia in candidatas),
+        default=(0, 0, None),
+    )
+    return mejor[2] if mejor[0] > 0 else None
+
+
+def comprimir_gzip(contenido, nivel, max_random_bytes=100):
+    # Igual que django.utils.text.compress_string (relleno aleatorio en el nombre de archivo del
+    # encabezado gzip, mitigación de BREACH), pero con nivel configurable.
+    comprimido = memoryview(gzip.compress(contenido, compresslevel=nivel, mtime=0))
+    encabezado = bytearray(comprimido[:10])
+    encabezado[3] = gzip.FNAME
+    return bytes(encabezado) + _get_random_filename(max_random_bytes) + b"\x00" + comprimido[10:]
+
+
+
+
+class CompresionRespuestaMiddleware:
+    """
+    Comprime con brotli o gzip (negociado por Accept-Encoding) las respuestas dinámicas: JSON
+    de la API y páginas HTML. Whitenoise ya sirve los estáticos precomprimidos.
+
+    Solo comprime respuestas completas (no streaming: SSE, descargas y exportaciones se envían
+    tal cual, sin retener chunks), de al menos COMPRESION_TAMANO_MINIMO bytes y cuyo
+    Content-Type esté en COMPRESION_TIPOS, por lo que PDFs, imágenes y otros formatos ya
+    comprimidos quedan fuera. Los niveles se ajustan con COMPRESION_NIVEL_GZIP/BROTLI.
+    """
+
+    # Soporta ambos modos para no forzar un salto de hilo por petición bajo ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._comprimir(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._comprimir(request, await self.get_response(request))
+
+    def _comprimir(self, request, response):
+        if not settings.COMPRESION_RESPUESTAS or not self._comprimible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codificacion = elegir_codificacion(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        if codificacion == 'br':
+            comprimido = brotli.compress(response.content, quality=settings.COMPRESION_NIVEL_BROTLI)
+        else:
+            comprimido = comprimir_gzip(response.content, settings.COMPRESION_NIVEL_GZIP)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response.headers['Content-Length'] = str(len(comprimido))
+        response.headers['Content-Encoding'] = codificacion
+        # Un ETag fuerte pasa a débil: el cuerpo ya no es byte a byte el original (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+    def _comprimible(self, response):
+        if response.streaming or response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if tipo not in settings.COMPRESION_TIPOS:
+            return False
+        return len(response.content) >= settings.COMPRESION_TAMANO_MINIMO
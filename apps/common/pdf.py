@@ -0,0 +1,157 @@
+"""
+PDFs de voluntarios (hoja de vida, ficha médica) generados en segundo plano y cacheados por contenido.
+
+Armar el HTML del documento (consultas y plantilla) es barato; convertirlo con xhtml2pdf cuesta
+segundos de CPU, así que esa parte sale de la petición:
+- Cada PDF se identifica por el hash SHA-256 de su HTML y VERSION_PDF. El HTML ya refleja los
+  datos de origen y la plantilla, por lo que cualquier cambio en ellos produce otro hash.
+- Los PDFs se guardan en el almacenamiento privado "documentos_privados" (nunca en el media
+  público): documentos_pdf/<tipo>/<voluntario>/<hash>.pdf.
+  Si ya existe se entrega de inmediato; si no, se encola tarea_generar_pdf y el cliente recibe el
+  id del trabajo (el mismo hash) para consultar su estado o repetir la descarga.
+- Las señales de gestion_voluntarios y gestion_medica borran los PDFs del voluntario cuando cambian
+  sus registros (invalidar_documentos), así no se acumulan versiones obsoletas.
+
+El estado de los trabajos vive en la caché por defecto, que debe ser compartida con el worker
+(REDIS_URL). Con DOCUMENTOS_PDF_ASINCRONO=False (desarrollo sin worker) el PDF se genera en la
+misma petición.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from xhtml2pdf import pisa
+
+from apps.gestion_voluntarios.utils import link_callback
+
+# Subir al cambiar la conversión (xhtml2pdf, link_callback, recursos estáticos de las plantillas)
+VERSION_PDF = 1
+
+HOJA_VIDA = 'hoja_vida'
+FICHA_MEDICA = 'ficha_medica'
+
+PENDIENTE = 'pendiente'
+LISTO = 'listo'
+ERROR = 'error'
+
+DIRECTORIO = 'documentos_pdf'
+
+
+def _almacenamiento():
+    return storages["documentos_privados"]
+
+
+class ErrorGeneracionPDF(Exception):
+    """xhtml2pdf no pudo convertir el documento."""
+
+
+def _directorio(tipo, voluntario_id):
+    return f"{DIRECTORIO}/{tipo}/{voluntario_id}"
+
+
+def _clave_trabajo(trabajo):
+    return f"pdf:trabajo:{trabajo}"
+
+
+def html_a_pdf(html):
+    resultado = io.BytesIO()
+    pdf = pisa.pisaDocument(src=io.BytesIO(html.encode("UTF-8")), dest=resultado, link_callback=link_callback)
+    if pdf.err:
+        raise ErrorGeneracionPDF(f"xhtml2pdf reportó {pdf.err} errores.")
+    return resultado.getvalue()
+
+
+def guardar_pdf(ruta, html):
+    """Convierte el HTML y guarda el PDF en la ruta indicada (si otro proceso no lo hizo antes)."""
+    if not _almacenamiento().exists(ruta):
+        _almacenamiento().save(ruta, ContentFile(html_a_pdf(html)))
+
+
+def id_trabajo(tipo, html):
+    """Hash del documento: identifica tanto el PDF guardado como su trabajo de generación."""
+    return hashlib.sha256(f"{VERSION_PDF}:{tipo}:{html}".encode("UTF-8")).hexdigest()
+
+
+def solicitar_pdf(tipo, voluntario_id, html, nombre):
+    """
+    Pide el PDF del HTML indicado. Devuelve (ruta, trabajo): la ruta en el almacenamiento si el
+    PDF ya está generado, o None si está en generación o falló; en ese caso el estado se consulta
+    con estado_trabajo(trabajo). Puede lanzar ErrorGeneracionPDF en modo síncrono.
+    """
+    trabajo = id_trabajo(tipo, html)
+    ruta = f"{_directorio(tipo, voluntario_id)}/{trabajo}.pdf"
+    if _almacenamiento().exists(ruta):
+        return ruta, trabajo
+
+    if not settings.DOCUMENTOS_PDF_ASINCRONO:
+        guardar_pdf(ruta, html)
+        return ruta, trabajo
+
+    datos = {'tipo': tipo, 'voluntario_id': str(voluntario_id), 'ruta': ruta, 'nombre': nombre, 'estado': PENDIENTE}
+    # add: las peticiones repetidas mientras el trabajo sigue en curso no lo vuelven a encolar. Un
+    # trabajo fallido tampoco: su estado ERROR dura DOCUMENTOS_PDF_REINTENTO_SEGUNDOS y recién al
+    # expirar se reintenta (antes, solo si cambian los datos, porque cambia el hash)
+    if cache.add(_clave_trabajo(trabajo), datos, settings.DOCUMENTOS_PDF_TRABAJO_SEGUNDOS):
+        from .tasks import tarea_generar_pdf
+        tarea_generar_pdf.delay(trabajo, ruta, html)
+    return None, trabajo
+
+
+def estado_trabajo(trabajo):
+    """Datos del trabajo (tipo, voluntario_id, ruta, nombre, estado) o None si no existe o expiró."""
+    datos = cache.get(_clave_trabajo(trabajo))
+    if datos is not None and datos['estado'] == PENDIENTE and _almacenamiento().exists(datos['ruta']):
+        datos['estado'] = LISTO
+    return datos
+
+
+def pdf_fallido(trabajo):
+    """True si la última conversión del trabajo falló y aún no corresponde reintentarla."""
+    datos = cache.get(_clave_trabajo(trabajo))
+    return datos is not None and datos['estado'] == ERROR
+
+
+def marcar_error(trabajo):
+    datos = cache.get(_clave_trabajo(trabajo))
+    if datos is not None:
+        datos['estado'] = ERROR
+        cache.set(_clave_trabajo(trabajo), datos, settings.DOCUMENTOS_PDF_REINTENTO_SEGUNDOS)
+
+
+def invalidar_documentos(voluntario_id, *tipos):
+    """Borra, al confirmar la transacción, los PDFs generados del voluntario para los tipos indicados."""
+    def borrar():
+        for tipo in tipos:
+            directorio = _directorio(tipo, voluntario_id)
+            try:
+                _subdirectorios, archivos = _almacenamiento().listdir(directorio)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for archivo in archivos:
+                _almacenamiento().delete(f"{directorio}/{archivo}")
+
+    if voluntario_id:
+        transaction.on_commit(borrar)
+
+
+def respuesta_pdf(ruta, nombre, como_adjunto=True):
+    return FileResponse(
+        _almacenamiento().open(ruta, 'rb'), content_type='application/pdf',
+        as_attachment=como_adjunto, filename=nombre
+    )
+
+
+def respuesta_pdf_pendiente(request, trabajo, url_estado=None):
+    """
+    202 mientras el PDF se genera. Los navegadores reciben una página que vuelve a pedir la misma
+    URL cada pocos segundos; los clientes de la API, el id del trabajo y la URL para consultarlo.
+    """
+    if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+        return HttpResponse(render_to_string("documento_generando.html", {'segundos': 3}), status=202)
+    return JsonResponse({'trabajo': trabajo, 'estado': PENDIENTE, 'url': url_estado}, status=202)
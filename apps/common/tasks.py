@@ -0,0 +1,27 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from .pdf import ErrorGeneracionPDF, guardar_pdf, marcar_error
+
+logger = get_task_logger(__name__)
+
+@shared_task(bind=True, max_retries=2)
+def tarea_generar_pdf(self, trabajo, ruta, html):
+    """
+    Convierte a PDF el HTML de un documento de voluntario (hoja de vida, ficha médica) y lo
+    guarda en el almacenamiento, donde lo encuentran las descargas (ver apps/common/pdf.py).
+    """
+    try:
+        guardar_pdf(ruta, html)
+        return ruta
+
+    except ErrorGeneracionPDF as e:
+        # Reintentar no cambia el resultado: se informa el error al cliente que consulta el trabajo
+        logger.error(f"Error al generar el PDF {ruta}: {e}")
+        marcar_error(trabajo)
+
+    except Exception as e:
+        logger.error(f"Error al guardar el PDF {ruta}: {e}")
+        if self.request.retries >= self.max_retries:
+            marcar_error(trabajo)
+            raise
+        raise self.retry(exc=e, countdown=10)
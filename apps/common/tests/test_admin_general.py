@@ -98,4 +98,28 @@ class AdminConfigurationTest(TestCase):
         else:
             print(f"RESUMEN: {tested_count} modelos verificados exitosamente.")
             print("El panel de administración está 100% operativo.")
-            print("="*60)
\ No newline at end of file
+            print("="*60)
+
+
+
+class AdminRendimientoTest(TestCase):
+    """Conteos del admin en modo rendimiento."""
+
+    def test_conteo_estimado_sobre_el_umbral(self):
+        from django.db import connection
+        from apps.common.admin_mixins import PaginadorConteoEstimado
+        from apps.gestion_usuarios.models import RegistroActividad
+
+        RegistroActividad.objects.bulk_create([RegistroActividad(verbo=f"accion {i % 3}") for i in range(40)])
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {RegistroActividad._meta.db_table}")
+        qs = RegistroActividad.objects.order_by('-id')
+
+        # Bajo el umbral se cuenta exacto; sobre él, se usa la estimación sin COUNT(*)
+        self.assertEqual(PaginadorConteoEstimado(qs.filter(verbo="accion 0"), 25).count, 14)
+
+        class PaginadorUmbralBajo(PaginadorConteoEstimado):
+            umbral_conteo_exacto = 10
+
+        with self.assertNumQueries(1):
+            self.assertEqual(PaginadorUmbralBajo(qs, 25).count, 40)
@@ -0,0 +1,34 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.common.middleware import CompresionRespuestaMiddleware, elegir_codificacion
+
+
+class CompresionRespuestaTest(SimpleTestCase):
+    """Compresión negociada de respuestas dinámicas."""
+
+    def _procesar(self, respuesta, accept_encoding='gzip, br'):
+        peticion = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompresionRespuestaMiddleware(lambda request: respuesta)(peticion)
+
+    def test_negociacion(self):
+        self.assertEqual(elegir_codificacion('gzip, deflate, br'), 'br')
+        self.assertEqual(elegir_codificacion('br;q=0, gzip'), 'gzip')
+        self.assertEqual(elegir_codificacion('gzip;q=0.5, br;q=0.1'), 'gzip')
+        self.assertIsNone(elegir_codificacion('identity'))
+
+    def test_comprime_json_grande(self):
+        cuerpo = b'{"results": [' + b'{"sku": "HACHA-001"},' * 200 + b'{}]}'
+        respuesta = self._procesar(HttpResponse(cuerpo, content_type='application/json'), 'gzip')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        self.assertEqual(gzip.decompress(respuesta.content), cuerpo)
+
+    def test_no_comprime_pdf_pequenas_ni_streaming(self):
+        pdf = self._procesar(HttpResponse(b'%PDF' * 1000, content_type='application/pdf'))
+        pequena = self._procesar(HttpResponse(b'{}', content_type='application/json'))
+        flujo = self._procesar(StreamingHttpResponse(iter([b'data: x\n\n'] * 500), content_type='text/event-stream'))
+        for respuesta in (pdf, pequena, flujo):
+            self.assertFalse(respuesta.has_header('Content-Encoding'))
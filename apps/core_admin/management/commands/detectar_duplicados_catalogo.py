@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.gestion_inventario.services import agrupar_productos_globales_duplicados, trigram_disponible
+
+
+class Command(BaseCommand):
+    """
+    Proceso batch de curación del Catálogo Global.
+    Agrupa los ProductoGlobal con nombres similares en clusters de posibles duplicados
+    para que un administrador los revise y fusione desde core_admin.
+
+    Uso: python manage.py detectar_duplicados_catalogo --umbral 0.5 [--json]
+    """
+    help = "Agrupa productos globales con nombre similar (posibles duplicados) para su curación."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=float, default=0.5, help="Similitud mínima (0..1) para agrupar dos productos.")
+        parser.add_argument('--json', action='store_true', help="Emitir los clusters en formato JSON.")
+
+    def handle(self, *args, **options):
+        umbral = options['umbral']
+        if not trigram_disponible():
+            self.stderr.write(self.style.WARNING(
+                "pg_trgm no está disponible: se usará la comparación por pares en Python (lento en catálogos grandes)."
+            ))
+
+        clusters = agrupar_productos_globales_duplicados(umbral=umbral)
+
+        if options['json']:
+            data = [
+                [{'id': pid, 'nombre_oficial': nombre, 'marca': marca, 'modelo': modelo} for pid, nombre, marca, modelo in cluster]
+                for cluster in clusters
+            ]
+            self.stdout.write(json.dumps(data, ensure_ascii=False, indent=2))
+            return
+
+        if not clusters:
+            self.stdout.write(self.style.SUCCESS("No se detectaron posibles duplicados."))
+            return
+
+        for i, cluster in enumerate(clusters, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Cluster #{i} ({len(cluster)} productos)"))
+            for pid, nombre, marca, modelo in cluster:
+                self.stdout.write(f"  [{pid}] {nombre} | {marca or 'Genérico'} {modelo or ''}".rstrip())
+
+        self.stdout.write(self.style.SUCCESS(f"{len(clusters)} cluster(s) de posibles duplicados detectados."))
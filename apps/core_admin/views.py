@@ -19,6 +19,7 @@ from .mixins import SuperuserRequiredMixin, PermisosMatrixMixin
 from .forms import EstacionForm, ProductoGlobalForm, UsuarioCreationForm, UsuarioChangeForm, AsignarMembresiaForm, RolGlobalForm, MarcaForm, CategoriaForm
 from apps.gestion_inventario.models import Estacion, Ubicacion, Vehiculo, Prestamo, Compartimento, Categoria, Marca, ProductoGlobal, Producto, Activo, LoteInsumo, MovimientoInventario
 from apps.gestion_usuarios.models import Membresia, Rol
+from apps.gestion_usuarios.versiones import invalidar_contexto_usuarios
 from core.settings import DEFAULT_FROM_EMAIL
 
 
@@ -729,6 +730,8 @@ class UsuarioFinalizarMembresiasView(SuperuserRequiredMixin, View):
                     estado='FINALIZADO',
                     fecha_fin=timezone.now().date()
                 )
+                # update() no emite señales: se invalida a mano el contexto cacheado del usuario
+                invalidar_contexto_usuarios(usuario.pk)
                 messages.success(
                     request, 
                     f"Se han finalizado {cantidad} membresía(s) activa(s) para {usuario.get_full_name}."
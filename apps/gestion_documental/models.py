@@ -117,6 +117,10 @@ class DocumentoHistorico(models.Model):
         verbose_name = "Documento Histórico"
         verbose_name_plural = "Documentos Históricos"
         ordering = ['-fecha_documento'] # Ordenar por fecha del documento, del más nuevo al más viejo
+        indexes = [
+            # Biblioteca digital paginada por cursor en la App
+            models.Index(fields=['estacion', '-fecha_documento', '-id'], name='gd_documento_est_fecha_idx'),
+        ]
 
         default_permissions = []
         permissions = [
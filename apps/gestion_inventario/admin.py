@@ -4,9 +4,11 @@ from .models import (
     TipoUbicacion, Ubicacion, Marca, TipoVehiculo, Vehiculo, Compartimento,
     Proveedor, ContactoProveedor, Categoria, ProductoGlobal, Producto,
     Activo, RegistroUsoActivo, LoteInsumo, Destinatario,
-    Prestamo, PrestamoDetalle, MovimientoInventario
+    Prestamo, PrestamoDetalle, MovimientoInventario,
+    SesionInventario, ConteoInventario, OcupacionCompartimento, CambioSincronizacion,
+    ValorizacionInventario, PlantillaCarga, ItemPlantillaCarga
 )
-from apps.common.admin_mixins import ImagenPreviewMixin, SysPermissionMixin
+from apps.common.admin_mixins import AdminRendimientoMixin, ImagenPreviewMixin, SysPermissionMixin
 
 
 # --- CONFIGURACIÓN DE TABLAS MAESTRAS / SIMPLE ---
@@ -135,7 +137,7 @@ class ProductoAdmin(SysPermissionMixin, admin.ModelAdmin):
 # --- ACTIVOS Y LOTES (INVENTARIO REAL) ---
 
 @admin.register(Activo)
-class ActivoAdmin(SysPermissionMixin, ImagenPreviewMixin, admin.ModelAdmin):
+class ActivoAdmin(AdminRendimientoMixin, SysPermissionMixin, ImagenPreviewMixin, admin.ModelAdmin):
     list_display = (
         'codigo_activo', 
         'get_producto_nombre', 
@@ -145,6 +147,7 @@ class ActivoAdmin(SysPermissionMixin, ImagenPreviewMixin, admin.ModelAdmin):
         'fin_vida_util'
     )
     list_filter = ('estacion', 'estado', 'producto__producto_global__categoria')
+    list_select_related = ('producto__producto_global', 'estacion', 'estado', 'compartimento')
     search_fields = ('codigo_activo', 'numero_serie_fabricante', 'producto__producto_global__nombre_oficial')
     readonly_fields = ('codigo_activo', 'fin_vida_util_calculada', 'imagen_thumb_medium', 'imagen_thumb_small')
     autocomplete_fields = ['producto', 'estacion', 'compartimento', 'proveedor', 'asignado_a']
@@ -173,9 +176,10 @@ class ActivoAdmin(SysPermissionMixin, ImagenPreviewMixin, admin.ModelAdmin):
     get_producto_nombre.admin_order_field = 'producto__producto_global__nombre_oficial'
 
 @admin.register(LoteInsumo)
-class LoteInsumoAdmin(SysPermissionMixin, admin.ModelAdmin):
+class LoteInsumoAdmin(AdminRendimientoMixin, SysPermissionMixin, admin.ModelAdmin):
     list_display = ('codigo_lote', 'get_producto_nombre', 'cantidad', 'fecha_expiracion', 'compartimento')
     list_filter = ('estado', 'fecha_expiracion')
+    list_select_related = ('producto__producto_global', 'compartimento')
     search_fields = ('codigo_lote', 'numero_lote_fabricante', 'producto__producto_global__nombre_oficial')
     readonly_fields = ('codigo_lote',)
     autocomplete_fields = ['producto', 'compartimento', 'estado']
@@ -217,12 +221,12 @@ class PrestamoAdmin(SysPermissionMixin, admin.ModelAdmin):
     date_hierarchy = 'fecha_prestamo'
 
 @admin.register(MovimientoInventario)
-class MovimientoInventarioAdmin(SysPermissionMixin, admin.ModelAdmin):
+class MovimientoInventarioAdmin(AdminRendimientoMixin, SysPermissionMixin, admin.ModelAdmin):
     list_display = ('tipo_movimiento', 'fecha_hora', 'estacion', 'cantidad_movida', 'get_item_nombre')
     list_filter = ('tipo_movimiento', 'estacion', 'fecha_hora')
+    list_select_related = ('estacion', 'activo', 'lote_insumo')
     search_fields = ('activo__codigo_activo', 'lote_insumo__codigo_lote')
     autocomplete_fields = ['usuario', 'estacion', 'proveedor_origen', 'compartimento_origen', 'compartimento_destino', 'activo', 'lote_insumo']
-    date_hierarchy = 'fecha_hora'
 
     def get_item_nombre(self, obj):
         if obj.activo:
@@ -230,4 +234,61 @@ class MovimientoInventarioAdmin(SysPermissionMixin, admin.ModelAdmin):
         elif obj.lote_insumo:
             return f"Lote: {obj.lote_insumo.codigo_lote}"
         return "-"
-    get_item_nombre.short_description = "Item Afectado"
\ No newline at end of file
+    get_item_nombre.short_description = "Item Afectado"
+
+
+# --- INVENTARIO FÍSICO ---
+
+class ConteoInventarioInline(SysPermissionMixin, admin.TabularInline):
+    model = ConteoInventario
+    extra = 0
+    raw_id_fields = ['activo', 'lote_insumo', 'compartimento_esperado', 'usuario_ultima_lectura']
+    fields = ('activo', 'lote_insumo', 'es_esperado', 'cantidad_esperada', 'cantidad_contada', 'fecha_ultima_lectura')
+
+@admin.register(SesionInventario)
+class SesionInventarioAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('id', 'ubicacion', 'estacion', 'estado', 'fecha_apertura', 'fecha_cierre', 'usuario_apertura')
+    list_filter = ('estado', 'estacion')
+    search_fields = ('ubicacion__nombre',)
+    inlines = [ConteoInventarioInline]
+    autocomplete_fields = ['estacion', 'ubicacion', 'usuario_apertura', 'usuario_cierre']
+    date_hierarchy = 'fecha_apertura'
+
+@admin.register(OcupacionCompartimento)
+class OcupacionCompartimentoAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('compartimento', 'total_activos', 'total_lotes', 'total_cantidad_insumos', 'updated_at')
+    list_select_related = ('compartimento',)
+    search_fields = ('compartimento__codigo', 'compartimento__nombre')
+    readonly_fields = ('compartimento', 'total_activos', 'total_lotes', 'total_cantidad_insumos', 'updated_at')
+
+@admin.register(CambioSincronizacion)
+class CambioSincronizacionAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('id', 'modelo', 'objeto_id', 'operacion', 'estacion', 'fecha')
+    list_filter = ('modelo', 'operacion')
+    search_fields = ('objeto_id',)
+    raw_id_fields = ('estacion',)
+    show_full_result_count = False
+
+@admin.register(ValorizacionInventario)
+class ValorizacionInventarioAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('producto', 'ubicacion', 'estado', 'cantidad_activos', 'cantidad_insumos', 'valor_total', 'updated_at')
+    list_select_related = ('producto__producto_global', 'producto__estacion', 'ubicacion', 'estado')
+    list_filter = ('estado',)
+    search_fields = ('producto__producto_global__nombre_oficial', 'producto__sku')
+    readonly_fields = ('estacion', 'producto', 'ubicacion', 'estado', 'cantidad_activos', 'cantidad_insumos', 'valor_total', 'updated_at')
+
+class ItemPlantillaCargaInline(SysPermissionMixin, admin.TabularInline):
+    model = ItemPlantillaCarga
+    extra = 0
+    raw_id_fields = ['compartimento', 'producto']
+    fields = ('compartimento', 'producto', 'cantidad_requerida')
+
+@admin.register(PlantillaCarga)
+class PlantillaCargaAdmin(SysPermissionMixin, admin.ModelAdmin):
+    list_display = ('ubicacion', 'estacion', 'updated_at')
+    list_select_related = ('ubicacion', 'estacion')
+    list_filter = ('estacion',)
+    search_fields = ('ubicacion__nombre',)
+    raw_id_fields = ('estacion', 'ubicacion')
+    inlines = [ItemPlantillaCargaInline]
+
@@ -697,6 +697,57 @@ class LoteConsumirForm(forms.Form):
 
 
 
+class ConsumoFEFOForm(forms.Form):
+    """
+    Formulario para consumir una cantidad de un producto (insumo) sin elegir lote:
+    el sistema reparte el descuento entre los lotes que vencen primero (FEFO).
+    """
+    cantidad = forms.IntegerField(
+        label="Cantidad a Consumir", min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm text-xl text-center fw-bold', 'style': 'max-width: 200px; margin: 0 auto;'})
+    )
+    notas = forms.CharField(
+        label="Motivo del Consumo (Obligatorio)", required=True,
+        widget=forms.Textarea(attrs={'class': 'form-control form-control-sm text-base color_primario fondo_secundario_variante border-0', 'rows': 3, 'placeholder': 'Ej: Usado en emergencia.'})
+    )
+
+
+
+
+class ItemPlantillaCargaForm(forms.Form):
+    """
+    Formulario para agregar una línea a la plantilla de carga de un vehículo
+    (producto y cantidad esperada en uno de sus compartimentos).
+    """
+    compartimento = forms.ModelChoiceField(
+        queryset=Compartimento.objects.none(),
+        label="Compartimento",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm text-base color_primario fondo_secundario_variante border-0 tom-select-basic'})
+    )
+    producto = forms.ModelChoiceField(
+        queryset=Producto.objects.none(),
+        label="Producto",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm text-base color_primario fondo_secundario_variante border-0 tom-select-basic'})
+    )
+    cantidad_requerida = forms.IntegerField(
+        label="Cantidad", min_value=1, initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm text-base color_primario fondo_secundario_variante border-0'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        ubicacion = kwargs.pop('ubicacion')
+        super().__init__(*args, **kwargs)
+        self.fields['compartimento'].queryset = Compartimento.objects.filter(ubicacion=ubicacion).order_by('nombre')
+        self.fields['producto'].queryset = Producto.objects.filter(
+            estacion_id=ubicacion.estacion_id
+        ).select_related('producto_global').order_by('producto_global__nombre_oficial')
+        self.fields['producto'].label_from_instance = lambda p: f"{p.producto_global.nombre_oficial} ({p.sku or 'sin SKU'})"
+        self.fields['compartimento'].empty_label = "Seleccione Compartimento..."
+        self.fields['producto'].empty_label = "Seleccione Producto..."
+
+
+
+
 class TransferenciaForm(forms.Form):
     """
     Formulario para transferir una existencia (Activo o Lote)
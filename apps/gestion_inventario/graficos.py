@@ -0,0 +1,114 @@
+"""
+Datos de los gráficos de inventario por estación (existencias por categoría y por tipo de estado).
+
+Ambas series salen de una sola consulta: las existencias de Activo (1 por activo) y de
+LoteInsumo (su cantidad) se unen con UNION ALL y se agrupan con GROUPING SETS, una pasada por
+tabla para los dos gráficos. El resultado se cachea por estación.
+
+La clave incluye una versión (como gestion_usuarios/versiones.py): al escribir no se borran
+entradas, se cambia la versión y las antiguas quedan inalcanzables hasta expirar. Así un lector
+concurrente que calculó con los datos anteriores no puede dejarlos cacheados bajo la versión nueva.
+- Por estación: existencias (todo lo que recalcula la valorización: recepciones, consumos,
+  traslados, bajas...) y sus productos.
+- Global: catálogo y estados compartidos por todas las estaciones (categorías, productos
+  globales, estados), y ubicaciones y compartimentos, que pueden mover existencias entre estaciones.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, IntegerField, Value
+
+from .models import Activo, LoteInsumo
+
+SIN_ESTADO = "Sin Estado"
+
+CLAVE_VERSION_GLOBAL = "inventario:graficos:version"
+
+
+def _clave_version_estacion(estacion_id):
+    return f"inventario:graficos:version:{estacion_id}"
+
+
+def _version_graficos(estacion_id):
+    """Versión vigente de los gráficos de la estación (global + propia), en una sola lectura a la caché."""
+    claves = [CLAVE_VERSION_GLOBAL, _clave_version_estacion(estacion_id)]
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            cache.add(clave, time.time_ns(), timeout=None)
+            versiones[clave] = cache.get(clave)
+    return f"{versiones[claves[0]]}.{versiones[claves[1]]}"
+
+
+def _clave_graficos(estacion_id):
+    return f"inventario:graficos:{estacion_id}:{_version_graficos(estacion_id)}"
+
+
+def _calcular_graficos(estacion_id):
+    activos = Activo.objects.filter(estacion_id=estacion_id).values(
+        categoria=F('producto__producto_global__categoria__nombre'),
+        tipo_estado=F('estado__tipo_estado__nombre'),
+        total=Value(1, output_field=IntegerField()),
+    )
+    lotes = LoteInsumo.objects.filter(compartimento__ubicacion__estacion_id=estacion_id).values(
+        categoria=F('producto__producto_global__categoria__nombre'),
+        tipo_estado=F('estado__tipo_estado__nombre'),
+        total=F('cantidad'),
+    )
+    union_sql, params = activos.union(lotes, all=True).query.sql_with_params()
+
+    # GROUPING(categoria) = 0 -> fila de la serie por categoría; 1 -> serie por tipo de estado
+    sql = (
+        "SELECT GROUPING(categoria), categoria, tipo_estado, SUM(total) "
+        f"FROM ({union_sql}) existencias "
+        "GROUP BY GROUPING SETS ((categoria), (tipo_estado)) "
+        "ORDER BY 1, 2, 3"
+    )
+    categorias, estados = {}, {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for por_estado, categoria, tipo_estado, total in cursor.fetchall():
+            if por_estado:
+                estados[tipo_estado or SIN_ESTADO] = estados.get(tipo_estado or SIN_ESTADO, 0) + (total or 0)
+            else:
+                categorias[categoria] = total or 0
+
+    return {
+        'categorias': {'labels': list(categorias), 'values': list(categorias.values())},
+        'estados': {'labels': list(estados), 'values': list(estados.values())},
+    }
+
+
+def graficos_inventario(estacion_id):
+    """{'categorias': {labels, values}, 'estados': {labels, values}} de la estación (cacheado)."""
+    clave = _clave_graficos(estacion_id)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _calcular_graficos(estacion_id)
+        cache.set(clave, datos, settings.INVENTARIO_GRAFICOS_CACHE_SEGUNDOS)
+    return datos
+
+
+def _renovar(claves):
+    cache.set_many({clave: time.time_ns() for clave in claves}, timeout=None)
+
+
+def _renovar_ahora_y_al_confirmar(claves):
+    # Se renueva también al confirmar: una petición concurrente pudo cachear los datos
+    # antiguos con la versión nueva mientras la transacción seguía abierta.
+    _renovar(claves)
+    transaction.on_commit(lambda: _renovar(claves))
+
+
+def invalidar_graficos_inventario(estacion_ids):
+    """Cambia la versión de los gráficos de las estaciones indicadas."""
+    claves = [_clave_version_estacion(estacion_id) for estacion_id in set(estacion_ids) if estacion_id]
+    if claves:
+        _renovar_ahora_y_al_confirmar(claves)
+
+
+def invalidar_graficos_global():
+    """Cambia la versión de los gráficos de todas las estaciones."""
+    _renovar_ahora_y_al_confirmar([CLAVE_VERSION_GLOBAL])
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from apps.gestion_inventario.models import Compartimento
+from apps.gestion_inventario.services import verificar_ocupacion_compartimentos
+
+
+class Command(BaseCommand):
+    """
+    Control de consistencia de la ocupación precalculada (OcupacionCompartimento).
+    Compara el resumen con el conteo en vivo de Activos y Lotes y, con --reparar,
+    reescribe los compartimentos desalineados (p.ej. tras cargas SQL manuales).
+
+    Uso: python manage.py verificar_ocupacion_inventario [--reparar]
+    """
+    help = "Verifica (y opcionalmente repara) la ocupación precalculada por compartimento."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Recalcular los compartimentos con diferencias.")
+
+    def handle(self, *args, **options):
+        reparar = options['reparar']
+        diferencias = verificar_ocupacion_compartimentos(reparar=reparar)
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("La ocupación precalculada está consistente."))
+            return
+
+        nombres = dict(
+            Compartimento.objects.filter(id__in=[d[0] for d in diferencias]).values_list('id', 'codigo')
+        )
+        for comp_id, guardado, real in diferencias:
+            self.stdout.write(
+                f"  {nombres.get(comp_id, comp_id)}: guardado (activos, lotes, insumos)={guardado} | real={real}"
+            )
+
+        if reparar:
+            self.stdout.write(self.style.SUCCESS(f"{len(diferencias)} compartimento(s) recalculados."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(diferencias)} compartimento(s) con diferencias. Ejecute con --reparar para corregirlos."
+            ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.gestion_inventario.services import verificar_valorizacion
+
+
+class Command(BaseCommand):
+    """
+    Control de consistencia de la valorización precalculada (ValorizacionInventario).
+    Compara el resumen con el cálculo en vivo (unidades x costo de compra) y, con --reparar,
+    recalcula los productos desalineados (p.ej. tras cargas SQL manuales).
+
+    Uso: python manage.py verificar_valorizacion_inventario [--reparar]
+    """
+    help = "Verifica (y opcionalmente repara) la valorización precalculada del inventario."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help="Recalcular los productos con diferencias.")
+
+    def handle(self, *args, **options):
+        reparar = options['reparar']
+        diferencias = verificar_valorizacion(reparar=reparar)
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("La valorización precalculada está consistente."))
+            return
+
+        for (prod_id, ubic_id, estado_id), guardado, real in diferencias:
+            self.stdout.write(
+                f"  producto={prod_id} ubicacion={ubic_id} estado={estado_id}: "
+                f"guardado (activos, insumos, valor)={guardado} | real={real}"
+            )
+
+        productos = len({clave[0] for clave, _, _ in diferencias})
+        if reparar:
+            self.stdout.write(self.style.SUCCESS(f"{productos} producto(s) recalculados."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{productos} producto(s) con diferencias. Ejecute con --reparar para corregirlos."
+            ))
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0006_remove_destinatario_creado_por'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('ABI', 'Abierta'), ('CER', 'Cerrada'), ('CAN', 'Cancelada')], default='ABI', max_length=3)),
+                ('fecha_apertura', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Apertura')),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Cierre')),
+                ('notas', models.TextField(blank=True, null=True, verbose_name='Notas')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sesiones_inventario', to='gestion_inventario.estacion')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sesiones_inventario', to='gestion_inventario.ubicacion', verbose_name='Ubicación auditada')),
+                ('usuario_apertura', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sesiones_inventario_abiertas', to=settings.AUTH_USER_MODEL)),
+                ('usuario_cierre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sesiones_inventario_cerradas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Sesión de Inventario Físico',
+                'verbose_name_plural': 'Sesiones de Inventario Físico',
+                'ordering': ['-fecha_apertura'],
+                'permissions': [('sys_view_sesioninventario', 'System: Puede ver Sesiones de Inventario Físico'), ('sys_add_sesioninventario', 'System: Puede agregar Sesiones de Inventario Físico'), ('sys_change_sesioninventario', 'System: Puede cambiar Sesiones de Inventario Físico'), ('sys_delete_sesioninventario', 'System: Puede eliminar Sesiones de Inventario Físico')],
+                'default_permissions': [],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConteoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('es_esperado', models.BooleanField(default=True, help_text='Falso si el ítem se escaneó pero no figuraba en la ubicación al abrir la sesión.')),
+                ('cantidad_esperada', models.PositiveIntegerField(default=0)),
+                ('cantidad_contada', models.PositiveIntegerField(default=0)),
+                ('fecha_ultima_lectura', models.DateTimeField(blank=True, null=True)),
+                ('activo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conteos_inventario', to='gestion_inventario.activo')),
+                ('compartimento_esperado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion_inventario.compartimento')),
+                ('lote_insumo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conteos_inventario', to='gestion_inventario.loteinsumo')),
+                ('usuario_ultima_lectura', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('sesion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conteos', to='gestion_inventario.sesioninventario')),
+            ],
+            options={
+                'verbose_name': 'Conteo de Inventario Físico',
+                'verbose_name_plural': 'Conteos de Inventario Físico',
+                'permissions': [('sys_view_conteoinventario', 'System: Puede ver Conteos de Inventario Físico'), ('sys_add_conteoinventario', 'System: Puede agregar Conteos de Inventario Físico'), ('sys_change_conteoinventario', 'System: Puede cambiar Conteos de Inventario Físico'), ('sys_delete_conteoinventario', 'System: Puede eliminar Conteos de Inventario Físico')],
+                'default_permissions': [],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='sesioninventario',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'ABI')), fields=('ubicacion',), name='unique_sesion_abierta_por_ubicacion'),
+        ),
+        migrations.AddConstraint(
+            model_name='conteoinventario',
+            constraint=models.UniqueConstraint(fields=('sesion', 'activo'), name='unique_conteo_activo_por_sesion'),
+        ),
+        migrations.AddConstraint(
+            model_name='conteoinventario',
+            constraint=models.UniqueConstraint(fields=('sesion', 'lote_insumo'), name='unique_conteo_lote_por_sesion'),
+        ),
+    ]
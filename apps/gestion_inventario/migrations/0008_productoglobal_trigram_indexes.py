@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Índices GIN (gin_trgm_ops) para la búsqueda de duplicados en el Catálogo Global.
+# Se crean solo si la extensión pg_trgm está disponible en el servidor: en motores
+# sin soporte (o instancias sin contrib) la migración no hace nada y el servicio
+# de búsqueda usa su fallback.
+INDICES = [
+    ('gi_productoglobal_nombre_trgm', 'nombre_oficial'),
+    ('gi_productoglobal_modelo_trgm', 'modelo'),
+]
+
+
+def crear_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+
+    tabla = apps.get_model('gestion_inventario', 'ProductoGlobal')._meta.db_table
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for nombre, columna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{nombre}" ON "{tabla}" USING gin ("{columna}" gin_trgm_ops)'
+        )
+
+
+def eliminar_indices_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre, _ in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{nombre}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0007_sesioninventario_conteoinventario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices_trigram, eliminar_indices_trigram),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_ocupacion(apps, schema_editor):
+    """Carga inicial del resumen a partir del stock existente (un GROUP BY por tabla)."""
+    Activo = apps.get_model('gestion_inventario', 'Activo')
+    LoteInsumo = apps.get_model('gestion_inventario', 'LoteInsumo')
+    OcupacionCompartimento = apps.get_model('gestion_inventario', 'OcupacionCompartimento')
+
+    datos = {}
+    for comp_id, total in Activo.objects.order_by().values_list('compartimento_id').annotate(total=Count('id')):
+        datos[comp_id] = [total, 0, 0]
+    for comp_id, total, cantidad in LoteInsumo.objects.order_by().values_list('compartimento_id').annotate(total=Count('id'), cantidad=Sum('cantidad')):
+        fila = datos.setdefault(comp_id, [0, 0, 0])
+        fila[1], fila[2] = total, cantidad or 0
+
+    OcupacionCompartimento.objects.bulk_create([
+        OcupacionCompartimento(compartimento_id=comp_id, total_activos=a, total_lotes=l, total_cantidad_insumos=c)
+        for comp_id, (a, l, c) in datos.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0008_productoglobal_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionCompartimento',
+            fields=[
+                ('compartimento', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ocupacion', serialize=False, to='gestion_inventario.compartimento')),
+                ('total_activos', models.PositiveIntegerField(default=0)),
+                ('total_lotes', models.PositiveIntegerField(default=0)),
+                ('total_cantidad_insumos', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Compartimento',
+                'verbose_name_plural': 'Ocupación de Compartimentos',
+                'permissions': [('sys_view_ocupacioncompartimento', 'System: Puede ver Ocupación de Compartimentos'), ('sys_add_ocupacioncompartimento', 'System: Puede agregar Ocupación de Compartimentos'), ('sys_change_ocupacioncompartimento', 'System: Puede cambiar Ocupación de Compartimentos'), ('sys_delete_ocupacioncompartimento', 'System: Puede eliminar Ocupación de Compartimentos')],
+                'default_permissions': [],
+            },
+        ),
+        migrations.RunPython(poblar_ocupacion, migrations.RunPython.noop),
+    ]
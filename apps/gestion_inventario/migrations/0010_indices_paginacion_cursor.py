@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0009_ocupacioncompartimento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['estacion', '-fecha_prestamo', '-id'], name='gi_prestamo_est_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(fields=['nombre', 'id'], name='gi_proveedor_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0010_indices_paginacion_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioSincronizacion',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('modelo', models.CharField(choices=[('productoglobal', 'Producto Global'), ('producto', 'Producto'), ('activo', 'Activo'), ('lote', 'Lote de Insumo'), ('ubicacion', 'Ubicación'), ('compartimento', 'Compartimento'), ('destinatario', 'Destinatario')], max_length=20)),
+                ('objeto_id', models.CharField(max_length=36)),
+                ('operacion', models.CharField(choices=[('U', 'Creado/Actualizado'), ('D', 'Eliminado')], default='U', max_length=1)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('estacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inventario.estacion')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Sincronización',
+                'verbose_name_plural': 'Cambios de Sincronización',
+                'permissions': [('sys_view_cambiosincronizacion', 'System: Puede ver Cambios de Sincronización'), ('sys_add_cambiosincronizacion', 'System: Puede agregar Cambios de Sincronización'), ('sys_change_cambiosincronizacion', 'System: Puede cambiar Cambios de Sincronización'), ('sys_delete_cambiosincronizacion', 'System: Puede eliminar Cambios de Sincronización')],
+                'default_permissions': [],
+                'indexes': [models.Index(fields=['estacion', 'id'], name='gi_cambiosync_est_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def marcar_vencidos_existentes(apps, schema_editor):
+    Prestamo = apps.get_model('gestion_inventario', 'Prestamo')
+    Prestamo.objects.filter(
+        estado__in=['PEN', 'PAR'], fecha_devolucion_esperada__lt=timezone.localdate()
+    ).update(esta_vencido=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0011_cambiosincronizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prestamo',
+            name='esta_vencido',
+            field=models.BooleanField(default=False, help_text='Préstamo abierto que superó su fecha de devolución esperada.', verbose_name='Vencido'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(condition=models.Q(('estado__in', ['PEN', 'PAR']), ('fecha_devolucion_esperada__isnull', False)), fields=['estacion', 'fecha_devolucion_esperada'], name='gi_prestamo_abierto_vence_idx'),
+        ),
+        migrations.RunPython(marcar_vencidos_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0012_prestamo_vencido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loteinsumo',
+            index=models.Index(fields=['producto', 'estado', 'fecha_expiracion'], name='gi_lote_fefo_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_valorizacion(apps, schema_editor):
+    """Carga inicial de la valorización a partir del stock existente (un GROUP BY por tabla)."""
+    Activo = apps.get_model('gestion_inventario', 'Activo')
+    LoteInsumo = apps.get_model('gestion_inventario', 'LoteInsumo')
+    Producto = apps.get_model('gestion_inventario', 'Producto')
+    ValorizacionInventario = apps.get_model('gestion_inventario', 'ValorizacionInventario')
+
+    campos = ('producto_id', 'compartimento__ubicacion_id', 'estado_id', 'compartimento__ubicacion__estacion_id')
+    datos = {}
+    for prod_id, ubic_id, estado_id, estacion_id, total in Activo.objects.order_by().values_list(*campos).annotate(total=Count('id')):
+        datos[(prod_id, ubic_id, estado_id)] = [estacion_id, total, 0]
+    for prod_id, ubic_id, estado_id, estacion_id, total in (
+        LoteInsumo.objects.filter(cantidad__gt=0).order_by().values_list(*campos).annotate(total=Sum('cantidad'))
+    ):
+        datos.setdefault((prod_id, ubic_id, estado_id), [estacion_id, 0, 0])[2] = total
+
+    costos = dict(Producto.objects.values_list('id', 'costo_compra'))
+    ValorizacionInventario.objects.bulk_create([
+        ValorizacionInventario(
+            estacion_id=estacion_id, producto_id=prod_id, ubicacion_id=ubic_id, estado_id=estado_id,
+            cantidad_activos=activos, cantidad_insumos=insumos,
+            valor_total=(activos + insumos) * (costos.get(prod_id) or 0)
+        )
+        for (prod_id, ubic_id, estado_id), (estacion_id, activos, insumos) in datos.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0013_lote_indice_fefo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValorizacionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_activos', models.PositiveIntegerField(default=0)),
+                ('cantidad_insumos', models.PositiveIntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=0, default=0, help_text='Unidades x costo de compra del producto (0 si no tiene costo).', max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inventario.estacion')),
+                ('estado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inventario.estado')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valorizaciones', to='gestion_inventario.producto')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inventario.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Valorización de Inventario',
+                'verbose_name_plural': 'Valorizaciones de Inventario',
+                'permissions': [('sys_view_valorizacioninventario', 'System: Puede ver Valorizaciones de Inventario'), ('sys_add_valorizacioninventario', 'System: Puede agregar Valorizaciones de Inventario'), ('sys_change_valorizacioninventario', 'System: Puede cambiar Valorizaciones de Inventario'), ('sys_delete_valorizacioninventario', 'System: Puede eliminar Valorizaciones de Inventario')],
+                'default_permissions': [],
+                'indexes': [models.Index(fields=['estacion', 'estado'], name='gi_valorizacion_est_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'ubicacion', 'estado'), name='gi_valorizacion_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_valorizacion, migrations.RunPython.noop),
+    ]
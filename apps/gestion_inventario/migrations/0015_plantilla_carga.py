@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0014_valorizacion_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlantillaCarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notas', models.TextField(blank=True, null=True, verbose_name='Notas')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plantillas_carga', to='gestion_inventario.estacion')),
+                ('ubicacion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plantilla_carga', to='gestion_inventario.ubicacion', verbose_name='Vehículo')),
+            ],
+            options={
+                'verbose_name': 'Plantilla de Carga',
+                'verbose_name_plural': 'Plantillas de Carga',
+                'permissions': [('sys_view_plantillacarga', 'System: Puede ver Plantillas de Carga'), ('sys_add_plantillacarga', 'System: Puede agregar Plantillas de Carga'), ('sys_change_plantillacarga', 'System: Puede cambiar Plantillas de Carga'), ('sys_delete_plantillacarga', 'System: Puede eliminar Plantillas de Carga')],
+                'default_permissions': [],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemPlantillaCarga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_requerida', models.PositiveIntegerField(default=1, verbose_name='Cantidad requerida')),
+                ('compartimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_plantilla_carga', to='gestion_inventario.compartimento')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items_plantilla_carga', to='gestion_inventario.producto')),
+                ('plantilla', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='gestion_inventario.plantillacarga')),
+            ],
+            options={
+                'verbose_name': 'Ítem de Plantilla de Carga',
+                'verbose_name_plural': 'Ítems de Plantillas de Carga',
+                'permissions': [('sys_view_itemplantillacarga', 'System: Puede ver Ítems de Plantillas de Carga'), ('sys_add_itemplantillacarga', 'System: Puede agregar Ítems de Plantillas de Carga'), ('sys_change_itemplantillacarga', 'System: Puede cambiar Ítems de Plantillas de Carga'), ('sys_delete_itemplantillacarga', 'System: Puede eliminar Ítems de Plantillas de Carga')],
+                'default_permissions': [],
+                'constraints': [models.UniqueConstraint(fields=('plantilla', 'compartimento', 'producto'), name='gi_item_plantilla_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0015_plantilla_carga'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(condition=models.Q(('activo__isnull', False)), fields=['activo', '-fecha_hora', '-id'], name='gi_mov_activo_hist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(condition=models.Q(('lote_insumo__isnull', False)), fields=['lote_insumo', '-fecha_hora', '-id'], name='gi_mov_lote_hist_idx'),
+        ),
+    ]
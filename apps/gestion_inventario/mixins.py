@@ -41,6 +41,19 @@ class UbicacionMixin:
 
 
 
+# Mensajes amigables según el estado que impide la operación (compartidos con los cambios masivos)
+MENSAJES_ESTADO_BLOQUEANTE = {
+    'ANULADO POR ERROR': "Este registro está anulado y no admite modificaciones.",
+    'DE BAJA': "Este ítem ya fue dado de baja del inventario permanentemente.",
+    'EXTRAVIADO': "No se puede operar sobre un ítem reportado como extraviado.",
+    'EN PRÉSTAMO EXTERNO': "Esta acción no se puede realizar porque el ítem está prestado.",
+    'EN REPARACIÓN': "El ítem se encuentra en mantenimiento/reparación.",
+    'PENDIENTE REVISIÓN': "El ítem debe ser revisado antes de realizar esta acción.",
+    'EN TRÁNSITO': "El ítem está siendo trasladado y no está disponible."
+}
+MENSAJE_ESTADO_BLOQUEANTE_DEFECTO = "El ítem no está disponible para realizar esta operación en este momento."
+
+
 class InventoryStateValidatorMixin:
     """
     Mixin para validar reglas de negocio basadas en el estado del ítem.
@@ -54,22 +67,8 @@ class InventoryStateValidatorMixin:
         current_state = item.estado.nombre
         
         if current_state not in allowed_states:
-            # Diccionario de mensajes amigables según el estado actual (el obstáculo)
-            errores_amigables = {
-                'ANULADO POR ERROR': "Este registro está anulado y no admite modificaciones.",
-                'DE BAJA': "Este ítem ya fue dado de baja del inventario permanentemente.",
-                'EXTRAVIADO': "No se puede operar sobre un ítem reportado como extraviado.",
-                'EN PRÉSTAMO EXTERNO': "Esta acción no se puede realizar porque el ítem está prestado.",
-                'EN REPARACIÓN': "El ítem se encuentra en mantenimiento/reparación.",
-                'PENDIENTE REVISIÓN': "El ítem debe ser revisado antes de realizar esta acción.",
-                'EN TRÁNSITO': "El ítem está siendo trasladado y no está disponible."
-            }
-            
-            # Mensaje por defecto si el estado no está en la lista
-            msg = errores_amigables.get(
-                current_state, 
-                "El ítem no está disponible para realizar esta operación en este momento."
-            )
+            # Mensaje amigable según el estado actual (el obstáculo), o uno por defecto
+            msg = MENSAJES_ESTADO_BLOQUEANTE.get(current_state, MENSAJE_ESTADO_BLOQUEANTE_DEFECTO)
             
             messages.warning(self.request, msg)
             return False
@@ -359,6 +359,40 @@ class Compartimento(models.Model):
 
 
 
+class OcupacionCompartimento(models.Model):
+    '''
+    (Local) Resumen precalculado de existencias por compartimento. Lo mantienen las señales de
+    Activo/LoteInsumo/MovimientoInventario y los procesos masivos; los totales de una Ubicación
+    se derivan sumando sus compartimentos.
+    '''
+    compartimento = models.OneToOneField(Compartimento, on_delete=models.CASCADE, primary_key=True, related_name='ocupacion')
+    total_activos = models.PositiveIntegerField(default=0)
+    total_lotes = models.PositiveIntegerField(default=0)
+    total_cantidad_insumos = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Ocupación de Compartimento"
+        verbose_name_plural = "Ocupación de Compartimentos"
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_ocupacioncompartimento", "System: Puede ver Ocupación de Compartimentos"),
+            ("sys_add_ocupacioncompartimento", "System: Puede agregar Ocupación de Compartimentos"),
+            ("sys_change_ocupacioncompartimento", "System: Puede cambiar Ocupación de Compartimentos"),
+            ("sys_delete_ocupacioncompartimento", "System: Puede eliminar Ocupación de Compartimentos"),
+        ]
+
+    @property
+    def total_existencias(self):
+        return self.total_activos + self.total_cantidad_insumos
+
+    def __str__(self):
+        return f"{self.compartimento_id}: {self.total_activos} activos / {self.total_cantidad_insumos} insumos"
+
+
+
+
 # INVENTARIO
 class Proveedor(models.Model):
     '''(Global) Modelo para registrar proveedores de existencias. Los proveedores son los que entregan/prestan/donan equipos para que las compañías los usen'''
@@ -380,6 +414,9 @@ class Proveedor(models.Model):
         verbose_name = "Proveedor"
         verbose_name_plural = "Proveedores"
         ordering = ['nombre']
+        indexes = [
+            models.Index(fields=['nombre', 'id'], name='gi_proveedor_nombre_idx'),
+        ]
 
         default_permissions = []
         permissions = [
@@ -755,6 +792,10 @@ class LoteInsumo(models.Model):
     class Meta:
         verbose_name = "Lote de Insumo"
         verbose_name_plural = "Lotes de Insumos"
+        indexes = [
+            # Selección FEFO: lotes de un producto en un estado, ordenados por vencimiento
+            models.Index(fields=['producto', 'estado', 'fecha_expiracion'], name='gi_lote_fefo_idx'),
+        ]
 
         default_permissions = []
         permissions = [
@@ -876,6 +917,9 @@ class Prestamo(models.Model):
         COMPLETADO = 'COM', 'Completado'
         VENCIDO = 'VEN', 'Vencido' # (Opcional, se puede calcular)
 
+    # Estados con ítems aún fuera de la estación (los únicos que pueden vencer)
+    ESTADOS_ABIERTOS = [EstadoPrestamo.PENDIENTE, EstadoPrestamo.DEVUELTO_PARCIAL]
+
     estacion = models.ForeignKey(Estacion, on_delete=models.PROTECT, related_name='prestamos_realizados')
     usuario_responsable = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name='prestamos_gestionados')
     destinatario = models.ForeignKey(Destinatario, on_delete=models.PROTECT, related_name='prestamos_recibidos')
@@ -884,6 +928,7 @@ class Prestamo(models.Model):
     fecha_devolucion_esperada = models.DateField(blank=True, null=True, verbose_name="Fecha Devolución Esperada")
     estado = models.CharField(max_length=3, choices=EstadoPrestamo.choices, default=EstadoPrestamo.PENDIENTE)
     notas_prestamo = models.TextField(blank=True, null=True, verbose_name="Notas/Motivo del Préstamo")
+    esta_vencido = models.BooleanField(default=False, verbose_name="Vencido", help_text="Préstamo abierto que superó su fecha de devolución esperada.")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -892,6 +937,17 @@ class Prestamo(models.Model):
         verbose_name = "Préstamo"
         verbose_name_plural = "Préstamos"
         ordering = ['-fecha_prestamo']
+        indexes = [
+            # Historial paginado por cursor en la App
+            models.Index(fields=['estacion', '-fecha_prestamo', '-id'], name='gi_prestamo_est_fecha_idx'),
+            # Índice parcial: solo préstamos abiertos con fecha comprometida, ordenados por vencimiento.
+            # Filtro y contador de vencidos = un range scan, sin importar el volumen del historial.
+            models.Index(
+                fields=['estacion', 'fecha_devolucion_esperada'],
+                condition=models.Q(estado__in=['PEN', 'PAR'], fecha_devolucion_esperada__isnull=False),
+                name='gi_prestamo_abierto_vence_idx'
+            ),
+        ]
 
         default_permissions = []
         permissions = [
@@ -901,6 +957,20 @@ class Prestamo(models.Model):
             ("sys_delete_prestamo", "System: Puede eliminar Préstamos"),
         ]
 
+    def save(self, *args, **kwargs):
+        # Mantener la marca de vencido coherente en cada guardado (cierre, cambio de fecha, etc.).
+        # La tarea diaria cubre el paso del tiempo en préstamos que nadie vuelve a guardar.
+        vencido = (
+            self.estado in self.ESTADOS_ABIERTOS
+            and self.fecha_devolucion_esperada is not None
+            and self.fecha_devolucion_esperada < timezone.localdate()
+        )
+        if vencido != self.esta_vencido:
+            self.esta_vencido = vencido
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'esta_vencido'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Préstamo a {self.destinatario.nombre_entidad} ({self.get_estado_display()})"
 
@@ -1000,6 +1070,20 @@ class MovimientoInventario(models.Model):
         verbose_name = "Movimiento de Inventario"
         verbose_name_plural = "Movimientos de Inventario"
         ordering = ['-fecha_hora']
+        indexes = [
+            # Historial por existencia paginado por cursor: cada página es un range scan del índice,
+            # sin importar cuántos años de movimientos acumule el activo o lote.
+            models.Index(
+                fields=['activo', '-fecha_hora', '-id'],
+                condition=models.Q(activo__isnull=False),
+                name='gi_mov_activo_hist_idx'
+            ),
+            models.Index(
+                fields=['lote_insumo', '-fecha_hora', '-id'],
+                condition=models.Q(lote_insumo__isnull=False),
+                name='gi_mov_lote_hist_idx'
+            ),
+        ]
 
         default_permissions = []
         permissions = [
@@ -1021,4 +1105,250 @@ class MovimientoInventario(models.Model):
         if not self.activo and not self.lote_insumo:
             raise ValidationError("El movimiento debe estar asociado a un Activo o a un Lote de Insumo.")
         if self.activo and self.lote_insumo:
-            raise ValidationError("El movimiento no puede estar asociado a un Activo Y a un Lote de Insumo simultáneamente.")
\ No newline at end of file
+            raise ValidationError("El movimiento no puede estar asociado a un Activo Y a un Lote de Insumo simultáneamente.")
+
+
+
+# TOMA DE INVENTARIO FÍSICO
+class SesionInventario(models.Model):
+    """
+    (Local) Sesión de toma de inventario físico sobre una Ubicación.
+    Al abrirse se congela una "foto" de lo esperado (ConteoInventario con cantidad_esperada);
+    las lecturas QR de la App van completando cantidad_contada hasta el cierre.
+    """
+    class EstadoSesion(models.TextChoices):
+        ABIERTA = 'ABI', 'Abierta'
+        CERRADA = 'CER', 'Cerrada'
+        CANCELADA = 'CAN', 'Cancelada'
+
+    estacion = models.ForeignKey(Estacion, on_delete=models.PROTECT, related_name='sesiones_inventario')
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.PROTECT, related_name='sesiones_inventario', verbose_name="Ubicación auditada")
+    estado = models.CharField(max_length=3, choices=EstadoSesion.choices, default=EstadoSesion.ABIERTA)
+    usuario_apertura = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='sesiones_inventario_abiertas')
+    usuario_cierre = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='sesiones_inventario_cerradas')
+    fecha_apertura = models.DateTimeField(default=timezone.now, verbose_name="Fecha de Apertura")
+    fecha_cierre = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Cierre")
+    notas = models.TextField(blank=True, null=True, verbose_name="Notas")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sesión de Inventario Físico"
+        verbose_name_plural = "Sesiones de Inventario Físico"
+        ordering = ['-fecha_apertura']
+        constraints = [
+            # Una sola sesión abierta por ubicación: dos conteos simultáneos se pisarían.
+            models.UniqueConstraint(
+                fields=['ubicacion'],
+                condition=models.Q(estado='ABI'),
+                name='unique_sesion_abierta_por_ubicacion'
+            )
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_sesioninventario", "System: Puede ver Sesiones de Inventario Físico"),
+            ("sys_add_sesioninventario", "System: Puede agregar Sesiones de Inventario Físico"),
+            ("sys_change_sesioninventario", "System: Puede cambiar Sesiones de Inventario Físico"),
+            ("sys_delete_sesioninventario", "System: Puede eliminar Sesiones de Inventario Físico"),
+        ]
+
+    def __str__(self):
+        return f"Inventario {self.ubicacion.nombre} ({self.get_estado_display()}) {self.fecha_apertura.strftime('%d/%m/%Y')}"
+
+
+
+
+class ConteoInventario(models.Model):
+    """
+    (Local) Línea de una SesionInventario. Existe una fila por existencia (Activo o Lote):
+    - Esperada: creada al abrir la sesión con la cantidad registrada en sistema.
+    - Inesperada: creada al escanear algo que no estaba en la foto inicial.
+    """
+    sesion = models.ForeignKey(SesionInventario, on_delete=models.CASCADE, related_name='conteos')
+
+    # Uno de estos dos debe estar lleno
+    activo = models.ForeignKey(Activo, on_delete=models.CASCADE, null=True, blank=True, related_name='conteos_inventario')
+    lote_insumo = models.ForeignKey(LoteInsumo, on_delete=models.CASCADE, null=True, blank=True, related_name='conteos_inventario')
+    compartimento_esperado = models.ForeignKey(Compartimento, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    es_esperado = models.BooleanField(default=True, help_text="Falso si el ítem se escaneó pero no figuraba en la ubicación al abrir la sesión.")
+    cantidad_esperada = models.PositiveIntegerField(default=0)
+    cantidad_contada = models.PositiveIntegerField(default=0)
+    fecha_ultima_lectura = models.DateTimeField(null=True, blank=True)
+    usuario_ultima_lectura = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        verbose_name = "Conteo de Inventario Físico"
+        verbose_name_plural = "Conteos de Inventario Físico"
+        constraints = [
+            models.UniqueConstraint(fields=['sesion', 'activo'], name='unique_conteo_activo_por_sesion'),
+            models.UniqueConstraint(fields=['sesion', 'lote_insumo'], name='unique_conteo_lote_por_sesion'),
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_conteoinventario", "System: Puede ver Conteos de Inventario Físico"),
+            ("sys_add_conteoinventario", "System: Puede agregar Conteos de Inventario Físico"),
+            ("sys_change_conteoinventario", "System: Puede cambiar Conteos de Inventario Físico"),
+            ("sys_delete_conteoinventario", "System: Puede eliminar Conteos de Inventario Físico"),
+        ]
+
+    @property
+    def diferencia(self):
+        return self.cantidad_contada - self.cantidad_esperada
+
+    def __str__(self):
+        item = self.activo or self.lote_insumo
+        return f"{item}: {self.cantidad_contada}/{self.cantidad_esperada}"
+
+
+
+
+class CambioSincronizacion(models.Model):
+    """
+    (Local/Global) Bitácora append-only de cambios para la sincronización incremental de la App.
+    El id autoincremental actúa como secuencia monótona: el cliente guarda el último id recibido
+    y pide solo lo posterior. estacion=None marca cambios de catálogos globales (ProductoGlobal).
+    """
+    class Modelo(models.TextChoices):
+        PRODUCTO_GLOBAL = 'productoglobal', 'Producto Global'
+        PRODUCTO = 'producto', 'Producto'
+        ACTIVO = 'activo', 'Activo'
+        LOTE = 'lote', 'Lote de Insumo'
+        UBICACION = 'ubicacion', 'Ubicación'
+        COMPARTIMENTO = 'compartimento', 'Compartimento'
+        DESTINATARIO = 'destinatario', 'Destinatario'
+
+    class Operacion(models.TextChoices):
+        UPSERT = 'U', 'Creado/Actualizado'
+        ELIMINADO = 'D', 'Eliminado'
+
+    id = models.BigAutoField(primary_key=True)
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    modelo = models.CharField(max_length=20, choices=Modelo.choices)
+    objeto_id = models.CharField(max_length=36)
+    operacion = models.CharField(max_length=1, choices=Operacion.choices, default=Operacion.UPSERT)
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Cambio de Sincronización"
+        verbose_name_plural = "Cambios de Sincronización"
+        indexes = [
+            models.Index(fields=['estacion', 'id'], name='gi_cambiosync_est_id_idx'),
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_cambiosincronizacion", "System: Puede ver Cambios de Sincronización"),
+            ("sys_add_cambiosincronizacion", "System: Puede agregar Cambios de Sincronización"),
+            ("sys_change_cambiosincronizacion", "System: Puede cambiar Cambios de Sincronización"),
+            ("sys_delete_cambiosincronizacion", "System: Puede eliminar Cambios de Sincronización"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.get_operacion_display()} {self.modelo}:{self.objeto_id}"
+
+
+
+
+class ValorizacionInventario(models.Model):
+    """
+    (Local) Valorización precalculada del inventario: una fila por (producto, ubicación, estado)
+    con las unidades y su valor a costo de compra. Lo mantienen las señales de Activo, LoteInsumo
+    y Producto (cambio de costo) y los procesos masivos; los reportes por categoría, ubicación o
+    estado se obtienen sumando estas filas en lugar de recorrer las existencias.
+    """
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, related_name='+')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='valorizaciones')
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE, related_name='+')
+    estado = models.ForeignKey(Estado, on_delete=models.CASCADE, related_name='+')
+    cantidad_activos = models.PositiveIntegerField(default=0)
+    cantidad_insumos = models.PositiveIntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=16, decimal_places=0, default=0, help_text="Unidades x costo de compra del producto (0 si no tiene costo).")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Valorización de Inventario"
+        verbose_name_plural = "Valorizaciones de Inventario"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'ubicacion', 'estado'], name='gi_valorizacion_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['estacion', 'estado'], name='gi_valorizacion_est_idx'),
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_valorizacioninventario", "System: Puede ver Valorizaciones de Inventario"),
+            ("sys_add_valorizacioninventario", "System: Puede agregar Valorizaciones de Inventario"),
+            ("sys_change_valorizacioninventario", "System: Puede cambiar Valorizaciones de Inventario"),
+            ("sys_delete_valorizacioninventario", "System: Puede eliminar Valorizaciones de Inventario"),
+        ]
+
+    @property
+    def total_unidades(self):
+        return self.cantidad_activos + self.cantidad_insumos
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.ubicacion_id} [{self.estado_id}]: ${self.valor_total}"
+
+
+
+
+class PlantillaCarga(models.Model):
+    """
+    (Local) Dotación esperada de un vehículo: qué productos y cuántas unidades debe llevar cada
+    uno de sus compartimentos. Se compara contra las existencias reales al revisar el carro
+    (p.ej. en el cambio de guardia).
+    """
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, related_name='plantillas_carga')
+    ubicacion = models.OneToOneField(Ubicacion, on_delete=models.CASCADE, related_name='plantilla_carga', verbose_name="Vehículo")
+    notas = models.TextField(blank=True, null=True, verbose_name="Notas")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Plantilla de Carga"
+        verbose_name_plural = "Plantillas de Carga"
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_plantillacarga", "System: Puede ver Plantillas de Carga"),
+            ("sys_add_plantillacarga", "System: Puede agregar Plantillas de Carga"),
+            ("sys_change_plantillacarga", "System: Puede cambiar Plantillas de Carga"),
+            ("sys_delete_plantillacarga", "System: Puede eliminar Plantillas de Carga"),
+        ]
+
+    def __str__(self):
+        return f"Plantilla de carga {self.ubicacion.nombre}"
+
+
+
+
+class ItemPlantillaCarga(models.Model):
+    """
+    (Local) Línea de una plantilla de carga: cantidad requerida de un producto en un compartimento.
+    """
+    plantilla = models.ForeignKey(PlantillaCarga, on_delete=models.CASCADE, related_name='items')
+    compartimento = models.ForeignKey(Compartimento, on_delete=models.CASCADE, related_name='items_plantilla_carga')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='items_plantilla_carga')
+    cantidad_requerida = models.PositiveIntegerField(default=1, verbose_name="Cantidad requerida")
+
+    class Meta:
+        verbose_name = "Ítem de Plantilla de Carga"
+        verbose_name_plural = "Ítems de Plantillas de Carga"
+        constraints = [
+            models.UniqueConstraint(fields=['plantilla', 'compartimento', 'producto'], name='gi_item_plantilla_unico'),
+        ]
+
+        default_permissions = []
+        permissions = [
+            ("sys_view_itemplantillacarga", "System: Puede ver Ítems de Plantillas de Carga"),
+            ("sys_add_itemplantillacarga", "System: Puede agregar Ítems de Plantillas de Carga"),
+            ("sys_change_itemplantillacarga", "System: Puede cambiar Ítems de Plantillas de Carga"),
+            ("sys_delete_itemplantillacarga", "System: Puede eliminar Ítems de Plantillas de Carga"),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad_requerida} x {self.producto_id} en {self.compartimento_id}"
@@ -0,0 +1,1469 @@
+import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F, Exists, OuterRef
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import (
+    Ubicacion,
+    Compartimento,
+    OcupacionCompartimento,
+    Activo,
+    LoteInsumo,
+    Estado,
+    MovimientoInventario,
+    TipoMovimiento,
+    SesionInventario,
+    ConteoInventario,
+    ProductoGlobal,
+    Producto,
+    Destinatario,
+    Prestamo,
+    CambioSincronizacion,
+    ValorizacionInventario,
+    PrestamoDetalle,
+    PlantillaCarga,
+    ItemPlantillaCarga,
+)
+from apps.gestion_mantenimiento.models import OrdenMantenimiento
+from .utils import get_or_create_anulado_compartment, get_or_create_extraviado_compartment
+from .mixins import MENSAJES_ESTADO_BLOQUEANTE, MENSAJE_ESTADO_BLOQUEANTE_DEFECTO
+from .tiempo_real import publicar_estados, publicar_movimientos
+from .graficos import invalidar_graficos_inventario
+
+
+# Estados que no se esperan físicamente en la ubicación (ya salieron del inventario operativo)
+ESTADOS_NO_INVENTARIABLES = ['ANULADO POR ERROR', 'DE BAJA', 'EXTRAVIADO', 'EN PRÉSTAMO EXTERNO']
+
+# Máximo de lecturas QR aceptadas en una sola petición de la App
+MAX_LECTURAS_POR_LOTE = 1000
+
+
+
+
+def abrir_sesion_inventario(estacion, ubicacion, usuario, notas=None):
+    """
+    Abre una sesión de inventario físico y congela la "foto" de lo esperado.
+    Crea una fila ConteoInventario por cada Activo/Lote presente en la ubicación (bulk_create).
+    """
+    if ubicacion.estacion_id != estacion.id:
+        raise ValidationError("La ubicación no pertenece a la estación activa.")
+
+    if SesionInventario.objects.filter(ubicacion=ubicacion, estado=SesionInventario.EstadoSesion.ABIERTA).exists():
+        raise ValidationError("Ya existe una sesión de inventario abierta para esta ubicación.")
+
+    with transaction.atomic():
+        sesion = SesionInventario.objects.create(
+            estacion=estacion,
+            ubicacion=ubicacion,
+            usuario_apertura=usuario,
+            notas=notas
+        )
+
+        activos = (
+            Activo.objects
+            .filter(compartimento__ubicacion=ubicacion)
+            .exclude(estado__nombre__in=ESTADOS_NO_INVENTARIABLES)
+            .values_list('id', 'compartimento_id')
+        )
+        lotes = (
+            LoteInsumo.objects
+            .filter(compartimento__ubicacion=ubicacion, cantidad__gt=0)
+            .exclude(estado__nombre__in=ESTADOS_NO_INVENTARIABLES)
+            .values_list('id', 'compartimento_id', 'cantidad')
+        )
+
+        conteos = [
+            ConteoInventario(sesion=sesion, activo_id=activo_id, compartimento_esperado_id=comp_id, cantidad_esperada=1)
+            for activo_id, comp_id in activos
+        ]
+        conteos += [
+            ConteoInventario(sesion=sesion, lote_insumo_id=lote_id, compartimento_esperado_id=comp_id, cantidad_esperada=cantidad)
+            for lote_id, comp_id, cantidad in lotes
+        ]
+        ConteoInventario.objects.bulk_create(conteos, batch_size=500)
+
+    return sesion
+
+
+
+
+def registrar_lecturas_inventario(sesion, lecturas, usuario):
+    """
+    Procesa un lote de lecturas QR de la App contra la sesión abierta.
+
+    lecturas: lista de dicts {"codigo": "E001-ACT-00001", "cantidad": 10 (opcional, solo lotes)}.
+    - Los códigos se resuelven con una consulta por tabla (codigo_activo / codigo_lote, indexados).
+    - Activo: se marca como contado (1). Lote: 'cantidad' es el total contado; si no se
+      envía, se asume que coincide con lo registrado.
+    - Las lecturas son idempotentes (la última lectura de un ítem manda), por lo que la
+      App puede reintentar un lote completo sin duplicar conteos.
+    """
+    if sesion.estado != SesionInventario.EstadoSesion.ABIERTA:
+        raise ValidationError("La sesión de inventario no está abierta.")
+
+    if len(lecturas) > MAX_LECTURAS_POR_LOTE:
+        raise ValidationError(f"Máximo {MAX_LECTURAS_POR_LOTE} lecturas por envío.")
+
+    # 1. Normalizar (la última lectura de un mismo código prevalece)
+    cantidades = {}
+    for lectura in lecturas:
+        codigo = str(lectura.get('codigo') or '').strip()
+        if not codigo:
+            continue
+        cantidad = lectura.get('cantidad')
+        if cantidad is not None:
+            try:
+                cantidad = int(cantidad)
+            except (TypeError, ValueError):
+                raise ValidationError(f"Cantidad inválida para el código '{codigo}'.")
+            if cantidad < 0:
+                raise ValidationError(f"Cantidad negativa para el código '{codigo}'.")
+        cantidades[codigo] = cantidad
+
+    codigos = list(cantidades)
+
+    # 2. Resolución masiva de códigos (una consulta `= ANY(arreglo)` por tabla)
+    activos = dict(
+        Activo.objects
+        .filter(estacion=sesion.estacion, codigo_activo__any=codigos)
+        .values_list('codigo_activo', 'id')
+    )
+    lotes = {
+        codigo: (lote_id, cantidad)
+        for codigo, lote_id, cantidad in LoteInsumo.objects
+        .filter(compartimento__ubicacion__estacion=sesion.estacion, codigo_lote__any=codigos)
+        .values_list('codigo_lote', 'id', 'cantidad')
+    }
+    no_encontrados = [c for c in codigos if c not in activos and c not in lotes]
+
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        existentes = ConteoInventario.objects.select_for_update().filter(
+            Q(activo_id__in=activos.values()) | Q(lote_insumo_id__in=[v[0] for v in lotes.values()]),
+            sesion=sesion,
+        )
+        por_activo = {}
+        por_lote = {}
+        for conteo in existentes:
+            if conteo.activo_id:
+                por_activo[conteo.activo_id] = conteo
+            else:
+                por_lote[conteo.lote_insumo_id] = conteo
+
+        actualizar, crear = [], []
+
+        for codigo, activo_id in activos.items():
+            conteo = por_activo.get(activo_id)
+            if conteo is None:
+                conteo = ConteoInventario(sesion=sesion, activo_id=activo_id, es_esperado=False, cantidad_esperada=0)
+                crear.append(conteo)
+            else:
+                actualizar.append(conteo)
+            conteo.cantidad_contada = 1
+            conteo.fecha_ultima_lectura = ahora
+            conteo.usuario_ultima_lectura = usuario
+
+        for codigo, (lote_id, cantidad_sistema) in lotes.items():
+            conteo = por_lote.get(lote_id)
+            if conteo is None:
+                conteo = ConteoInventario(sesion=sesion, lote_insumo_id=lote_id, es_esperado=False, cantidad_esperada=0)
+                crear.append(conteo)
+            else:
+                actualizar.append(conteo)
+            cantidad = cantidades[codigo]
+            if cantidad is None:
+                cantidad = conteo.cantidad_esperada if conteo.es_esperado else cantidad_sistema
+            conteo.cantidad_contada = cantidad
+            conteo.fecha_ultima_lectura = ahora
+            conteo.usuario_ultima_lectura = usuario
+
+        if actualizar:
+            ConteoInventario.objects.bulk_update(
+                actualizar, ['cantidad_contada', 'fecha_ultima_lectura', 'usuario_ultima_lectura'], batch_size=500
+            )
+        if crear:
+            ConteoInventario.objects.bulk_create(crear, batch_size=500)
+
+    return {
+        'procesadas': len(activos) + len(lotes),
+        'inesperadas': len(crear),
+        'no_encontradas': no_encontrados,
+    }
+
+
+
+
+def resumen_sesion_inventario(sesion, incluir_detalle=False):
+    """
+    Calcula el diff esperado / encontrado / inesperado de la sesión en una sola consulta agregada.
+    Con incluir_detalle=True agrega las listas de faltantes, diferencias e inesperados.
+    """
+    conteos = ConteoInventario.objects.filter(sesion=sesion)
+    resumen = conteos.aggregate(
+        esperados=Count('id', filter=Q(es_esperado=True)),
+        encontrados=Count('id', filter=Q(es_esperado=True, cantidad_contada__gt=0)),
+        faltantes=Count('id', filter=Q(es_esperado=True, cantidad_contada=0)),
+        con_diferencia=Count('id', filter=Q(es_esperado=True, lote_insumo__isnull=False, cantidad_contada__gt=0) & ~Q(cantidad_contada=F('cantidad_esperada'))),
+        inesperados=Count('id', filter=Q(es_esperado=False)),
+    )
+
+    if incluir_detalle:
+        filas = conteos.filter(
+            Q(es_esperado=False) | ~Q(cantidad_contada=F('cantidad_esperada'))
+        ).select_related(
+            'activo__producto__producto_global',
+            'activo__compartimento',
+            'lote_insumo__producto__producto_global',
+            'lote_insumo__compartimento',
+        )
+
+        faltantes, diferencias, inesperados = [], [], []
+        for conteo in filas:
+            item = conteo.activo or conteo.lote_insumo
+            fila = {
+                'id': str(item.id),
+                'tipo': 'ACTIVO' if conteo.activo_id else 'LOTE',
+                'codigo': conteo.activo.codigo_activo if conteo.activo_id else conteo.lote_insumo.codigo_lote,
+                'nombre': item.producto.producto_global.nombre_oficial,
+                'compartimento': item.compartimento.nombre if item.compartimento else None,
+                'cantidad_esperada': conteo.cantidad_esperada,
+                'cantidad_contada': conteo.cantidad_contada,
+            }
+            if not conteo.es_esperado:
+                inesperados.append(fila)
+            elif conteo.cantidad_contada == 0:
+                faltantes.append(fila)
+            else:
+                diferencias.append(fila)
+
+        resumen.update({'faltantes_detalle': faltantes, 'diferencias_detalle': diferencias, 'inesperados_detalle': inesperados})
+
+    return resumen
+
+
+
+
+def cerrar_sesion_inventario(sesion, usuario):
+    """
+    Cierra la sesión y aplica los resultados del conteo de forma masiva:
+    - Activos esperados no encontrados -> 'EXTRAVIADO' (un UPDATE + movimientos SALIDA).
+    - Lotes con cantidad distinta -> se aplica la diferencia contada - esperada sobre la
+      cantidad actual (bulk_update + movimientos AJUSTE), respetando los consumos registrados
+      durante el conteo.
+    Los ítems inesperados solo se informan; su reubicación queda a criterio del usuario.
+    """
+    with transaction.atomic():
+        sesion = SesionInventario.objects.select_for_update().get(pk=sesion.pk)
+        if sesion.estado != SesionInventario.EstadoSesion.ABIERTA:
+            raise ValidationError("La sesión de inventario no está abierta.")
+
+        estacion = sesion.estacion
+        ahora = timezone.now()
+        nota = f"Inventario físico #{sesion.id} ({sesion.ubicacion.nombre})"
+        movimientos = []
+
+        # A. Activos faltantes -> EXTRAVIADO
+        # Se revalida contra el estado actual: si el activo salió de la ubicación durante el
+        # conteo (préstamo, traslado), ya no corresponde declararlo extraviado.
+        ids_faltantes = ConteoInventario.objects.filter(
+            sesion=sesion, es_esperado=True, activo__isnull=False, cantidad_contada=0
+        ).values('activo_id')
+        activos_faltantes = list(
+            Activo.objects.select_for_update(of=('self',))
+            .filter(id__in=ids_faltantes, compartimento__ubicacion=sesion.ubicacion)
+            .exclude(estado__nombre__in=ESTADOS_NO_INVENTARIABLES)
+            .values_list('id', 'compartimento_id', 'producto_id')
+        )
+
+        if activos_faltantes:
+            estado_extraviado = Estado.objects.get(nombre='EXTRAVIADO')
+            compartimento_limbo = get_or_create_extraviado_compartment(estacion)
+
+            Activo.objects.filter(id__in=[a[0] for a in activos_faltantes]).update(
+                estado=estado_extraviado,
+                compartimento=compartimento_limbo,
+                updated_at=ahora
+            )
+            movimientos += [
+                MovimientoInventario(
+                    tipo_movimiento=TipoMovimiento.SALIDA,
+                    fecha_hora=ahora,
+                    usuario=usuario,
+                    estacion=estacion,
+                    compartimento_origen_id=comp_id,
+                    compartimento_destino=compartimento_limbo,
+                    activo_id=activo_id,
+                    cantidad_movida=-1,
+                    notas=f"{nota}: no encontrado, marcado como extraviado."
+                )
+                for activo_id, comp_id, _ in activos_faltantes
+            ]
+
+        # B. Lotes con diferencia -> AJUSTE por la diferencia del conteo
+        # La diferencia se aplica sobre la cantidad actual y no se fija la contada: las entradas
+        # y consumos registrados mientras la sesión estaba abierta siguen contando. Igual que en A,
+        # se omiten los lotes que salieron de la ubicación o dejaron de ser inventariables.
+        conteos_lotes = {
+            c.lote_insumo_id: c.cantidad_contada - c.cantidad_esperada
+            for c in ConteoInventario.objects.filter(sesion=sesion, es_esperado=True, lote_insumo__isnull=False)
+            .exclude(cantidad_contada=F('cantidad_esperada'))
+        }
+        lotes_ajustados = []
+        for lote in (
+            LoteInsumo.objects.select_for_update(of=('self',))
+            .filter(id__in=list(conteos_lotes), compartimento__ubicacion=sesion.ubicacion)
+            .exclude(estado__nombre__in=ESTADOS_NO_INVENTARIABLES)
+        ):
+            # Sin bajar de cero si el consumo posterior superó lo que se contó
+            nueva_cantidad = max(lote.cantidad + conteos_lotes[lote.id], 0)
+            diferencia = nueva_cantidad - lote.cantidad
+            if diferencia == 0:
+                continue
+            lote.cantidad = nueva_cantidad
+            lote.updated_at = ahora
+            lotes_ajustados.append(lote)
+            movimientos.append(MovimientoInventario(
+                tipo_movimiento=TipoMovimiento.AJUSTE,
+                fecha_hora=ahora,
+                usuario=usuario,
+                estacion=estacion,
+                compartimento_origen_id=lote.compartimento_id,
+                lote_insumo=lote,
+                cantidad_movida=diferencia,
+                notas=f"{nota}: ajuste por conteo."
+            ))
+
+        if lotes_ajustados:
+            LoteInsumo.objects.bulk_update(lotes_ajustados, ['cantidad', 'updated_at'], batch_size=500)
+        if movimientos:
+            MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+            publicar_movimientos(estacion.id, movimientos)
+
+        resumen = resumen_sesion_inventario(sesion)
+
+        # Los UPDATE masivos no disparan señales: se recalculan la ocupación y la valorización
+        # y se anota la bitácora de sincronización a mano
+        if activos_faltantes:
+            registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.ACTIVO, [a[0] for a in activos_faltantes], estacion.id)
+        if lotes_ajustados:
+            registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.LOTE, [lote.id for lote in lotes_ajustados], estacion.id)
+        if activos_faltantes or lotes_ajustados:
+            recalcular_ocupacion_compartimentos(
+                {comp_id for _, comp_id, _ in activos_faltantes}
+                | ({compartimento_limbo.id} if activos_faltantes else set())
+                | {lote.compartimento_id for lote in lotes_ajustados}
+            )
+            recalcular_valorizacion(
+                {prod_id for _, _, prod_id in activos_faltantes} | {lote.producto_id for lote in lotes_ajustados}
+            )
+
+        sesion.estado = SesionInventario.EstadoSesion.CERRADA
+        sesion.fecha_cierre = ahora
+        sesion.usuario_cierre = usuario
+        sesion.save(update_fields=['estado', 'fecha_cierre', 'usuario_cierre', 'updated_at'])
+
+    resumen.update({
+        'activos_extraviados': len(activos_faltantes),
+        'lotes_ajustados': len(lotes_ajustados),
+    })
+    return resumen
+
+
+
+
+def cancelar_sesion_inventario(sesion, usuario):
+    """Descarta una sesión abierta sin aplicar cambios al inventario."""
+    if sesion.estado != SesionInventario.EstadoSesion.ABIERTA:
+        raise ValidationError("La sesión de inventario no está abierta.")
+
+    sesion.estado = SesionInventario.EstadoSesion.CANCELADA
+    sesion.fecha_cierre = timezone.now()
+    sesion.usuario_cierre = usuario
+    sesion.save(update_fields=['estado', 'fecha_cierre', 'usuario_cierre', 'updated_at'])
+    return sesion
+
+
+
+
+# --- DETECCIÓN DE DUPLICADOS EN CATÁLOGO GLOBAL ---
+
+# Umbral mínimo de similitud (0..1) para considerar un candidato
+UMBRAL_SIMILITUD_PRODUCTO = 0.3
+
+_trigram_disponible = None
+
+
+def trigram_disponible():
+    """
+    Indica si la extensión pg_trgm está instalada en la base de datos (se consulta una vez por proceso).
+    En otros motores o sin la extensión, la búsqueda usa un fallback en Python.
+    """
+    global _trigram_disponible
+    if _trigram_disponible is None:
+        from django.db import connection
+        _trigram_disponible = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigram_disponible = cursor.fetchone() is not None
+    return _trigram_disponible
+
+
+def _fijar_umbral_trigram(cursor, parametro, umbral):
+    """
+    Fija un umbral de pg_trgm (los operadores % y %> filtran con él) solo para la transacción
+    en curso: con conexiones persistentes un valor de sesión afectaría a las consultas siguientes.
+    """
+    cursor.execute("SELECT set_config(%s, %s, true)", [parametro, str(umbral)])
+
+
+def _similitud_python(a, b):
+    from difflib import SequenceMatcher
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a.upper(), b.upper()).ratio()
+
+
+def buscar_productos_globales_similares(texto, modelo=None, gtin=None, limite=10, excluir_id=None):
+    """
+    Devuelve candidatos del Catálogo Global parecidos a lo que el usuario está escribiendo,
+    ordenados por similitud descendente: [{'producto': ProductoGlobal, 'similitud': float, 'motivo': str}].
+
+    - GTIN: coincidencia exacta (índice único), siempre primero con similitud 1.0.
+    - Nombre/modelo: pg_trgm (operador de similitud por palabras, servido por índices GIN);
+      sin la extensión se acota con icontains y se ordena con difflib.
+    """
+    from django.db import connection
+    from django.db.models.functions import Greatest
+    from .models import ProductoGlobal
+
+    texto = (texto or '').strip()
+    modelo = (modelo or '').strip()
+    gtin = (gtin or '').strip()
+
+    base = ProductoGlobal.objects.select_related('marca', 'categoria')
+    if excluir_id:
+        base = base.exclude(id=excluir_id)
+
+    resultados = []
+    vistos = set()
+
+    if gtin:
+        for producto in base.filter(gtin=gtin):
+            resultados.append({'producto': producto, 'similitud': 1.0, 'motivo': 'GTIN idéntico'})
+            vistos.add(producto.id)
+
+    terminos = [t for t in (texto, modelo) if len(t) >= 3]
+    if not terminos:
+        return resultados[:limite]
+
+    if trigram_disponible():
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        filtro = Q()
+        similitudes = []
+        for termino in terminos:
+            filtro |= Q(nombre_oficial__trigram_word_similar=termino) | Q(modelo__trigram_word_similar=termino)
+            similitudes += [TrigramWordSimilarity(termino, 'nombre_oficial'), TrigramWordSimilarity(termino, 'modelo')]
+
+        candidatos = (
+            base.filter(filtro)
+            .exclude(id__in=vistos)
+            .annotate(similitud=Greatest(*similitudes))
+            .filter(similitud__gte=UMBRAL_SIMILITUD_PRODUCTO)
+            .order_by('-similitud')[:limite]
+        )
+        # %> filtra con pg_trgm.word_similarity_threshold (0.6 por defecto), no con el umbral propio
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                _fijar_umbral_trigram(cursor, 'pg_trgm.word_similarity_threshold', UMBRAL_SIMILITUD_PRODUCTO)
+            candidatos = list(candidatos)
+        for producto in candidatos:
+            resultados.append({'producto': producto, 'similitud': round(producto.similitud, 3), 'motivo': 'Nombre/modelo similar'})
+    else:
+        filtro = Q()
+        for termino in terminos:
+            for palabra in termino.split()[:3]:
+                if len(palabra) >= 3:
+                    filtro |= Q(nombre_oficial__icontains=palabra) | Q(modelo__icontains=palabra)
+
+        puntuados = []
+        for producto in base.filter(filtro).exclude(id__in=vistos)[:200]:
+            similitud = max(
+                _similitud_python(termino, campo)
+                for termino in terminos
+                for campo in (producto.nombre_oficial, producto.modelo)
+            )
+            if similitud >= UMBRAL_SIMILITUD_PRODUCTO:
+                puntuados.append({'producto': producto, 'similitud': round(similitud, 3), 'motivo': 'Nombre/modelo similar'})
+        puntuados.sort(key=lambda r: r['similitud'], reverse=True)
+        resultados += puntuados
+
+    return resultados[:limite]
+
+
+def agrupar_productos_globales_duplicados(umbral=0.5):
+    """
+    Agrupa el Catálogo Global en clusters de posibles duplicados (para curación en core_admin).
+
+    Con pg_trgm se resuelve con un único self-join sobre el índice GIN (operador %);
+    sin la extensión se compara por pares en Python (solo apto para catálogos pequeños).
+    Retorna una lista de clusters: [[(id, nombre_oficial, marca, modelo), ...], ...].
+    """
+    from django.db import connection
+    from .models import ProductoGlobal
+
+    pares = []
+    if trigram_disponible():
+        tabla = ProductoGlobal._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            _fijar_umbral_trigram(cursor, 'pg_trgm.similarity_threshold', umbral)
+            cursor.execute(
+                f"""
+                SELECT a.id, b.id
+                FROM {tabla} a
+                JOIN {tabla} b
+                  ON a.id < b.id
+                 AND a.nombre_oficial %% b.nombre_oficial
+                """,
+                # Con parámetros (aunque vacíos) el driver convierte %% en el operador %
+                []
+            )
+            pares = cursor.fetchall()
+    else:
+        productos = list(ProductoGlobal.objects.values_list('id', 'nombre_oficial'))
+        for i, (id_a, nombre_a) in enumerate(productos):
+            for id_b, nombre_b in productos[i + 1:]:
+                if _similitud_python(nombre_a, nombre_b) >= umbral:
+                    pares.append((id_a, id_b))
+
+    # Union-Find para consolidar pares en clusters
+    padre = {}
+
+    def raiz(x):
+        padre.setdefault(x, x)
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for a, b in pares:
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            padre[max(ra, rb)] = min(ra, rb)
+
+    grupos = {}
+    for producto_id in padre:
+        grupos.setdefault(raiz(producto_id), []).append(producto_id)
+
+    detalle = {
+        p.id: p for p in ProductoGlobal.objects.select_related('marca').filter(id__in=list(padre))
+    }
+    clusters = []
+    for ids in grupos.values():
+        if len(ids) < 2:
+            continue
+        clusters.append([
+            (pid, detalle[pid].nombre_oficial, detalle[pid].marca.nombre if detalle[pid].marca else None, detalle[pid].modelo)
+            for pid in sorted(ids)
+        ])
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+
+
+
+# --- OCUPACIÓN PRECALCULADA POR COMPARTIMENTO ---
+
+def calcular_ocupacion_en_vivo(compartimento_ids=None):
+    """
+    Agrega en vivo las existencias por compartimento (un GROUP BY por tabla).
+    Retorna {compartimento_id: (total_activos, total_lotes, total_cantidad_insumos)}.
+    Si compartimento_ids es None, calcula para todos los compartimentos con stock.
+    """
+    activos = Activo.objects.all()
+    lotes = LoteInsumo.objects.all()
+    if compartimento_ids is not None:
+        activos = activos.filter(compartimento_id__in=compartimento_ids)
+        lotes = lotes.filter(compartimento_id__in=compartimento_ids)
+
+    datos = {}
+    for comp_id, total in activos.order_by().values_list('compartimento_id').annotate(total=Count('id')):
+        datos[comp_id] = (total, 0, 0)
+    for comp_id, total_lotes, cantidad in (
+        lotes.order_by().values_list('compartimento_id').annotate(total=Count('id'), cantidad=Sum('cantidad'))
+    ):
+        datos[comp_id] = (datos.get(comp_id, (0,))[0], total_lotes, cantidad or 0)
+    return datos
+
+
+
+
+def recalcular_ocupacion_compartimentos(compartimento_ids):
+    """
+    Recalcula la fila de OcupacionCompartimento de los compartimentos indicados.
+
+    Se bloquean las filas del resumen antes de agregar: una transacción concurrente que
+    toque el mismo compartimento espera al commit de la otra y recalcula con sus datos,
+    evitando que el último en escribir deje un total obsoleto.
+    """
+    ids = {c for c in compartimento_ids if c}
+    if not ids:
+        return
+
+    with transaction.atomic():
+        existentes = sorted(Compartimento.objects.filter(id__in=ids).values_list('id', flat=True))
+        if not existentes:
+            return
+
+        OcupacionCompartimento.objects.bulk_create(
+            [OcupacionCompartimento(compartimento_id=comp_id) for comp_id in existentes],
+            ignore_conflicts=True
+        )
+        filas = list(
+            OcupacionCompartimento.objects.select_for_update()
+            .filter(compartimento_id__in=existentes)
+            .order_by('compartimento_id')
+        )
+
+        datos = calcular_ocupacion_en_vivo(existentes)
+        for fila in filas:
+            fila.total_activos, fila.total_lotes, fila.total_cantidad_insumos = datos.get(fila.compartimento_id, (0, 0, 0))
+            fila.updated_at = timezone.now()
+
+        OcupacionCompartimento.objects.bulk_update(
+            filas, ['total_activos', 'total_lotes', 'total_cantidad_insumos', 'updated_at']
+        )
+
+
+
+
+def verificar_ocupacion_compartimentos(reparar=False):
+    """
+    Compara el resumen precalculado con el conteo en vivo de todos los compartimentos.
+    Retorna la lista de diferencias [(compartimento_id, guardado, real)] y, si reparar=True,
+    reescribe las filas afectadas.
+    """
+    reales = calcular_ocupacion_en_vivo()
+    guardados = {
+        comp_id: (activos, lotes, cantidad)
+        for comp_id, activos, lotes, cantidad in OcupacionCompartimento.objects.values_list(
+            'compartimento_id', 'total_activos', 'total_lotes', 'total_cantidad_insumos'
+        )
+    }
+
+    diferencias = []
+    for comp_id in Compartimento.objects.values_list('id', flat=True):
+        real = reales.get(comp_id, (0, 0, 0))
+        guardado = guardados.get(comp_id, (0, 0, 0))
+        if guardado != real:
+            diferencias.append((comp_id, guardado, real))
+
+    if reparar:
+        ids = [d[0] for d in diferencias]
+        for i in range(0, len(ids), 500):
+            recalcular_ocupacion_compartimentos(ids[i:i + 500])
+    return diferencias
+
+
+
+
+
+# --- SINCRONIZACIÓN INCREMENTAL (APP MÓVIL) ---
+
+# Campos que viajan en cada "upsert" del feed, por modelo sincronizado
+CAMPOS_SINCRONIZACION = {
+    CambioSincronizacion.Modelo.PRODUCTO_GLOBAL: (
+        ProductoGlobal, ['id', 'nombre_oficial', 'marca_id', 'marca__nombre', 'modelo', 'gtin', 'categoria_id', 'categoria__nombre', 'imagen_thumb_small', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.PRODUCTO: (
+        Producto, ['id', 'producto_global_id', 'sku', 'es_serializado', 'es_expirable', 'stock_critico', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.ACTIVO: (
+        Activo, ['id', 'producto_id', 'codigo_activo', 'numero_serie_fabricante', 'estado_id', 'estado__nombre', 'compartimento_id', 'fecha_expiracion', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.LOTE: (
+        LoteInsumo, ['id', 'producto_id', 'codigo_lote', 'estado_id', 'estado__nombre', 'compartimento_id', 'cantidad', 'fecha_expiracion', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.UBICACION: (
+        Ubicacion, ['id', 'nombre', 'codigo', 'tipo_ubicacion__nombre', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.COMPARTIMENTO: (
+        Compartimento, ['id', 'ubicacion_id', 'nombre', 'codigo', 'updated_at']
+    ),
+    CambioSincronizacion.Modelo.DESTINATARIO: (
+        Destinatario, ['id', 'nombre_entidad', 'rut_entidad', 'nombre_contacto', 'telefono_contacto', 'updated_at']
+    ),
+}
+
+# Máximo de cambios por respuesta del feed
+MAX_CAMBIOS_POR_PAGINA = 1000
+
+# Los cambios más recientes que este margen aún no se entregan: dos commits concurrentes pueden
+# insertar su bitácora en orden distinto al de sus ids, y el margen evita que el cursor salte uno.
+MARGEN_SINCRONIZACION = datetime.timedelta(seconds=2)
+
+
+def registrar_cambios_sincronizacion(modelo, objeto_ids, estacion_id, eliminado=False):
+    """
+    Anota en la bitácora de sincronización los objetos modificados o eliminados.
+
+    La inserción se difiere al commit de la transacción en curso: así el id (secuencia)
+    se asigna en orden de commit y un rollback no deja cambios fantasma en el feed.
+    """
+    operacion = CambioSincronizacion.Operacion.ELIMINADO if eliminado else CambioSincronizacion.Operacion.UPSERT
+    filas = [
+        CambioSincronizacion(estacion_id=estacion_id, modelo=modelo, objeto_id=str(oid), operacion=operacion)
+        for oid in objeto_ids
+    ]
+
+    def insertar():
+        # La fecha es la de inserción, no la del registro: MARGEN_SINCRONIZACION se mide desde que
+        # el id puede quedar visible. Cada tanda se inserta en su propia transacción (ya fuera de
+        # la original) para que una inserción larga no envejezca las filas de las tandas siguientes.
+        for i in range(0, len(filas), 500):
+            tanda = filas[i:i + 500]
+            ahora = timezone.now()
+            for fila in tanda:
+                fila.fecha = ahora
+            CambioSincronizacion.objects.bulk_create(tanda)
+
+    if filas:
+        transaction.on_commit(insertar)
+
+
+def cursor_sincronizacion_actual():
+    """Último id de la bitácora que ya es seguro entregar (respeta el margen de commits concurrentes)."""
+    ultimo = (
+        CambioSincronizacion.objects.filter(fecha__lte=timezone.now() - MARGEN_SINCRONIZACION)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    return ultimo or 0
+
+
+def obtener_cambios_sincronizacion(estacion, desde, limite=MAX_CAMBIOS_POR_PAGINA):
+    """
+    Feed de cambios posteriores al cursor `desde` para la estación (más los catálogos globales).
+
+    Retorna un dict con:
+    - requiere_resync: True si el cursor quedó fuera de la retención (o es inválido); el cliente
+      debe descargar todo de nuevo y continuar desde el nuevo cursor.
+    - actualizados: {modelo: [registro, ...]} con la última versión de cada objeto.
+    - eliminados: {modelo: [id, ...]} (tombstones).
+    - cursor / hay_mas: para reanudar la descarga.
+    """
+    limite = max(1, min(limite, MAX_CAMBIOS_POR_PAGINA))
+    actual = cursor_sincronizacion_actual()
+    vacio = {'actualizados': {}, 'eliminados': {}, 'hay_mas': False}
+
+    # Un cursor posterior a la secuencia actual (BD restaurada) o anterior al registro más antiguo
+    # conservado significa que se perdieron cambios: se exige resincronización completa.
+    # (La purga nunca borra el último registro, por lo que el mínimo siempre existe.)
+    if desde is None or desde > actual:
+        return {**vacio, 'cursor': actual, 'requiere_resync': True}
+    primero = CambioSincronizacion.objects.order_by('id').values_list('id', flat=True).first()
+    if primero is not None and desde < primero - 1:
+        return {**vacio, 'cursor': actual, 'requiere_resync': True}
+
+    filas = list(
+        CambioSincronizacion.objects
+        .filter(Q(estacion=estacion) | Q(estacion__isnull=True), id__gt=desde, id__lte=actual)
+        .order_by('id')
+        .values_list('id', 'modelo', 'objeto_id', 'operacion')[:limite + 1]
+    )
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    # Sin más páginas el cursor avanza hasta la secuencia global, aunque los últimos cambios
+    # sean de otras estaciones: así un cliente inactivo no queda atrás de la retención.
+    cursor = filas[-1][0] if hay_mas else actual
+
+    # Se conserva solo la última operación de cada objeto dentro de la página
+    ultima_operacion = {}
+    for _, modelo, objeto_id, operacion in filas:
+        ultima_operacion[(modelo, objeto_id)] = operacion
+
+    ids_por_modelo = {}
+    eliminados = {}
+    for (modelo, objeto_id), operacion in ultima_operacion.items():
+        if operacion == CambioSincronizacion.Operacion.ELIMINADO:
+            eliminados.setdefault(modelo, []).append(objeto_id)
+        else:
+            ids_por_modelo.setdefault(modelo, []).append(objeto_id)
+
+    # Una consulta por modelo para materializar los upserts
+    actualizados = {}
+    for modelo, ids in ids_por_modelo.items():
+        clase, campos = CAMPOS_SINCRONIZACION[modelo]
+        registros = list(clase.objects.filter(pk__in=ids).values(*campos))
+        for registro in registros:
+            if registro.get('imagen_thumb_small'):
+                registro['imagen_thumb_small'] = default_storage.url(registro['imagen_thumb_small'])
+        actualizados[modelo] = registros
+
+        # Si el objeto ya no existe (se borró en una página posterior) se informa como eliminado
+        encontrados = {str(r['id']) for r in registros}
+        faltantes = [oid for oid in ids if oid not in encontrados]
+        if faltantes:
+            eliminados.setdefault(modelo, []).extend(faltantes)
+
+    return {
+        'cursor': cursor,
+        'hay_mas': hay_mas,
+        'requiere_resync': False,
+        'actualizados': actualizados,
+        'eliminados': eliminados,
+    }
+
+
+def purgar_cambios_sincronizacion(dias=None):
+    """
+    Elimina la bitácora más antigua que la retención configurada. El registro más reciente
+    nunca se borra: su id sirve de referencia para detectar cursores que quedaron atrás.
+    """
+    dias = dias if dias is not None else settings.INVENTARIO_SYNC_RETENCION_DIAS
+    ultimo = CambioSincronizacion.objects.order_by('-id').values_list('id', flat=True).first()
+    if ultimo is None:
+        return 0
+    limite = timezone.now() - datetime.timedelta(days=dias)
+    eliminados, _ = CambioSincronizacion.objects.filter(fecha__lt=limite, id__lt=ultimo).delete()
+    return eliminados
+
+
+
+
+
+# --- PRÉSTAMOS VENCIDOS ---
+
+def filtrar_prestamos_vencidos(queryset, hoy=None):
+    """
+    Restringe un queryset de Prestamo a los abiertos cuya fecha de devolución ya pasó.
+    El filtro coincide con el índice parcial gi_prestamo_abierto_vence_idx, por lo que
+    (acotado a una estación) el listado y el .count() se resuelven con un range scan del índice.
+    """
+    hoy = hoy or timezone.localdate()
+    return queryset.filter(
+        estado__in=Prestamo.ESTADOS_ABIERTOS,
+        fecha_devolucion_esperada__isnull=False,
+        fecha_devolucion_esperada__lt=hoy,
+    )
+
+
+def prestamos_vencidos(estacion, hoy=None):
+    """Préstamos vencidos de la estación (ver filtrar_prestamos_vencidos)."""
+    return filtrar_prestamos_vencidos(Prestamo.objects.filter(estacion=estacion), hoy)
+
+
+def marcar_prestamos_vencidos(hoy=None):
+    """
+    Marca en un único UPDATE los préstamos abiertos que vencieron desde la última ejecución.
+    Retorna la cantidad de préstamos marcados.
+    """
+    nuevos_vencidos = filtrar_prestamos_vencidos(Prestamo.objects.filter(esta_vencido=False), hoy)
+    return nuevos_vencidos.update(esta_vencido=True, updated_at=timezone.now())
+
+
+
+
+
+# --- CONSUMO FEFO (First Expired, First Out) ---
+
+def planificar_consumo_fefo(producto, cantidad, estacion, incluir_vencidos=False, bloquear=False):
+    """
+    Calcula de qué lotes DISPONIBLES de la estación descontar `cantidad` unidades de un
+    producto, tomando primero los que vencen antes (los lotes sin fecha de expiración van al
+    final). La búsqueda usa el índice gi_lote_fefo_idx (producto, estado, fecha_expiracion).
+
+    Por defecto no se proponen lotes ya vencidos. Con `bloquear=True` los lotes candidatos
+    quedan bloqueados (SELECT ... FOR UPDATE) hasta el fin de la transacción en curso.
+
+    Retorna un dict con 'solicitado', 'asignado', 'faltante' y 'asignaciones', una lista
+    de tuplas (lote, cantidad_a_descontar) en orden FEFO.
+    """
+    if producto.es_serializado:
+        raise ValidationError("La selección FEFO solo aplica a insumos (productos no serializados).")
+    if cantidad <= 0:
+        raise ValidationError("La cantidad a consumir debe ser mayor a 0.")
+
+    estado_disponible = Estado.objects.get(nombre='DISPONIBLE')
+    lotes = LoteInsumo.objects.filter(
+        producto=producto,
+        estado=estado_disponible,
+        cantidad__gt=0,
+        compartimento__ubicacion__estacion=estacion,
+    )
+    if not incluir_vencidos:
+        lotes = lotes.filter(Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gte=timezone.localdate()))
+    lotes = lotes.select_related('compartimento__ubicacion').order_by(
+        F('fecha_expiracion').asc(nulls_last=True),
+        F('fecha_recepcion').asc(nulls_last=True),
+        'created_at',
+    )
+    if bloquear:
+        lotes = lotes.select_for_update(of=('self',))
+
+    asignaciones = []
+    pendiente = cantidad
+    for lote in lotes:
+        if pendiente == 0:
+            break
+        tomar = min(lote.cantidad, pendiente)
+        asignaciones.append((lote, tomar))
+        pendiente -= tomar
+
+    return {
+        'solicitado': cantidad,
+        'asignado': cantidad - pendiente,
+        'faltante': pendiente,
+        'asignaciones': asignaciones,
+    }
+
+
+def aplicar_consumo_fefo(producto, cantidad, estacion, usuario, notas='', incluir_vencidos=False):
+    """
+    Registra el consumo de `cantidad` unidades de un producto repartido entre sus lotes
+    según FEFO, en una sola transacción:
+    - El plan se recalcula con los lotes bloqueados, por lo que dos consumos simultáneos
+      del mismo producto no pueden descontar el mismo stock.
+    - Si el stock disponible no alcanza no se consume nada (ValidationError).
+    - Descuento en un bulk_update y un movimiento SALIDA por lote en un bulk_create.
+    Retorna el plan aplicado (ver planificar_consumo_fefo).
+    """
+    with transaction.atomic():
+        plan = planificar_consumo_fefo(producto, cantidad, estacion, incluir_vencidos=incluir_vencidos, bloquear=True)
+        if plan['faltante']:
+            raise ValidationError(f"Stock insuficiente. Disponible: {plan['asignado']}, Solicitado: {cantidad}.")
+
+        ahora = timezone.now()
+        lotes = []
+        movimientos = []
+        for lote, tomar in plan['asignaciones']:
+            lote.cantidad -= tomar
+            lote.updated_at = ahora
+            lotes.append(lote)
+            movimientos.append(MovimientoInventario(
+                tipo_movimiento=TipoMovimiento.SALIDA,
+                fecha_hora=ahora,
+                usuario=usuario,
+                estacion=estacion,
+                compartimento_origen_id=lote.compartimento_id,
+                lote_insumo=lote,
+                cantidad_movida=-tomar,
+                notas=notas
+            ))
+
+        LoteInsumo.objects.bulk_update(lotes, ['cantidad', 'updated_at'], batch_size=500)
+        MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+        publicar_movimientos(estacion.id, movimientos)
+
+        # bulk_update no dispara señales
+        registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.LOTE, [lote.id for lote in lotes], estacion.id)
+        recalcular_ocupacion_compartimentos({lote.compartimento_id for lote in lotes})
+        recalcular_valorizacion({producto.id}, {lote.compartimento_id for lote in lotes})
+
+    return plan
+
+
+
+
+
+# --- VALORIZACIÓN PRECALCULADA (ValorizacionInventario) ---
+
+# Estados que ya no forman parte del patrimonio de la estación: se mantienen en el resumen,
+# pero los reportes los excluyen salvo que se pidan explícitamente
+ESTADOS_SIN_VALOR = ['ANULADO POR ERROR', 'DE BAJA']
+
+# Dimensiones de agrupación de los reportes -> (campo clave, campo nombre) sobre ValorizacionInventario
+DIMENSIONES_VALORIZACION = {
+    'categoria': ('producto__producto_global__categoria_id', 'producto__producto_global__categoria__nombre'),
+    'ubicacion': ('ubicacion_id', 'ubicacion__nombre'),
+    'estado': ('estado_id', 'estado__nombre'),
+    'producto': ('producto_id', 'producto__producto_global__nombre_oficial'),
+}
+
+
+def calcular_valorizacion_en_vivo(producto_ids=None, ubicacion_ids=None):
+    """
+    Agrega en vivo las existencias por (producto, ubicación, estado) (un GROUP BY por tabla).
+    Retorna {(producto_id, ubicacion_id, estado_id): [estacion_id, cantidad_activos, cantidad_insumos]}.
+    """
+    activos = Activo.objects.all()
+    lotes = LoteInsumo.objects.filter(cantidad__gt=0)
+    if producto_ids is not None:
+        activos = activos.filter(producto_id__in=producto_ids)
+        lotes = lotes.filter(producto_id__in=producto_ids)
+    if ubicacion_ids is not None:
+        activos = activos.filter(compartimento__ubicacion_id__in=ubicacion_ids)
+        lotes = lotes.filter(compartimento__ubicacion_id__in=ubicacion_ids)
+
+    campos = ('producto_id', 'compartimento__ubicacion_id', 'estado_id', 'compartimento__ubicacion__estacion_id')
+    datos = {}
+    for prod_id, ubic_id, estado_id, estacion_id, total in activos.order_by().values_list(*campos).annotate(total=Count('id')):
+        datos[(prod_id, ubic_id, estado_id)] = [estacion_id, total, 0]
+    for prod_id, ubic_id, estado_id, estacion_id, total in lotes.order_by().values_list(*campos).annotate(total=Sum('cantidad')):
+        datos.setdefault((prod_id, ubic_id, estado_id), [estacion_id, 0, 0])[2] = total
+    return datos
+
+
+def recalcular_valorizacion(producto_ids, compartimento_ids=None):
+    """
+    Recalcula las filas de ValorizacionInventario de los productos indicados, opcionalmente
+    acotadas a las ubicaciones de ciertos compartimentos: los grupos con stock se insertan o
+    actualizan (upsert) y los que quedaron vacíos se eliminan.
+
+    Como en recalcular_ocupacion_compartimentos, las filas existentes se bloquean antes de
+    agregar para que dos transacciones sobre el mismo producto no se pisen.
+    """
+    producto_ids = {p for p in producto_ids if p}
+    if not producto_ids:
+        return
+    ubicacion_ids = None
+    if compartimento_ids is not None:
+        ubicacion_ids = set(
+            Compartimento.objects.filter(id__in={c for c in compartimento_ids if c}).values_list('ubicacion_id', flat=True)
+        )
+        if not ubicacion_ids:
+            return
+
+    with transaction.atomic():
+        alcance = ValorizacionInventario.objects.filter(producto_id__in=producto_ids)
+        if ubicacion_ids is not None:
+            alcance = alcance.filter(ubicacion_id__in=ubicacion_ids)
+        existentes = list(
+            alcance.select_for_update().order_by('id').values_list('id', 'producto_id', 'ubicacion_id', 'estado_id', 'estacion_id')
+        )
+
+        datos = calcular_valorizacion_en_vivo(producto_ids, ubicacion_ids)
+        costos = dict(Producto.objects.filter(id__in=producto_ids).values_list('id', 'costo_compra'))
+        ahora = timezone.now()
+
+        if datos:
+            ValorizacionInventario.objects.bulk_create(
+                [
+                    ValorizacionInventario(
+                        estacion_id=estacion_id, producto_id=prod_id, ubicacion_id=ubic_id, estado_id=estado_id,
+                        cantidad_activos=activos, cantidad_insumos=insumos,
+                        valor_total=(activos + insumos) * (costos.get(prod_id) or 0),
+                        updated_at=ahora
+                    )
+                    for (prod_id, ubic_id, estado_id), (estacion_id, activos, insumos) in datos.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['producto', 'ubicacion', 'estado'],
+                update_fields=['estacion', 'cantidad_activos', 'cantidad_insumos', 'valor_total', 'updated_at'],
+                batch_size=500
+            )
+
+        vacias = [fila_id for fila_id, prod_id, ubic_id, estado_id, _ in existentes if (prod_id, ubic_id, estado_id) not in datos]
+        if vacias:
+            ValorizacionInventario.objects.filter(id__in=vacias).delete()
+
+        # Canal en vivo: totales de los estados tocados (antes o después) en cada estación
+        publicar_estados(
+            {(estacion_id, estado_id) for _, _, _, estado_id, estacion_id in existentes}
+            | {(estacion_id, estado_id) for (_, _, estado_id), (estacion_id, _, _) in datos.items()}
+        )
+        # Gráficos cacheados de las estaciones tocadas
+        invalidar_graficos_inventario(
+            {estacion_id for *_, estacion_id in existentes} | {estacion_id for estacion_id, _, _ in datos.values()}
+        )
+
+
+
+
+def verificar_valorizacion(reparar=False):
+    """
+    Compara la valorización precalculada con el cálculo en vivo de todo el inventario.
+    Retorna la lista de diferencias [((producto_id, ubicacion_id, estado_id), guardado, real)]
+    con tuplas (activos, insumos, valor) y, si reparar=True, recalcula los productos afectados.
+    """
+    costos = dict(Producto.objects.values_list('id', 'costo_compra'))
+    reales = {
+        clave: (activos, insumos, (activos + insumos) * (costos.get(clave[0]) or 0))
+        for clave, (_, activos, insumos) in calcular_valorizacion_en_vivo().items()
+    }
+    guardados = {
+        (prod_id, ubic_id, estado_id): (activos, insumos, valor)
+        for prod_id, ubic_id, estado_id, activos, insumos, valor in ValorizacionInventario.objects.values_list(
+            'producto_id', 'ubicacion_id', 'estado_id', 'cantidad_activos', 'cantidad_insumos', 'valor_total'
+        )
+    }
+
+    diferencias = []
+    for clave in set(reales) | set(guardados):
+        real = reales.get(clave, (0, 0, 0))
+        guardado = guardados.get(clave, (0, 0, 0))
+        if guardado != real:
+            diferencias.append((clave, guardado, real))
+
+    if reparar:
+        productos = sorted({clave[0] for clave, _, _ in diferencias})
+        for i in range(0, len(productos), 500):
+            recalcular_valorizacion(productos[i:i + 500])
+    return diferencias
+
+
+
+
+def resumen_valorizacion(estacion, agrupar_por='categoria', incluir_sin_valor=False):
+    """
+    Valor del inventario de la estación agrupado por 'categoria', 'ubicacion', 'estado' o
+    'producto', leído del resumen precalculado (un GROUP BY sobre pocas filas).
+    Por defecto excluye los estados de ESTADOS_SIN_VALOR.
+
+    Retorna {'agrupado_por', 'grupos': [{clave, nombre, activos, insumos, valor}],
+    'totales': {activos, insumos, valor, unidades_sin_costo}}.
+    """
+    if agrupar_por not in DIMENSIONES_VALORIZACION:
+        raise ValidationError(f"Agrupación no válida. Opciones: {', '.join(DIMENSIONES_VALORIZACION)}.")
+    campo_clave, campo_nombre = DIMENSIONES_VALORIZACION[agrupar_por]
+
+    filas = ValorizacionInventario.objects.filter(estacion=estacion)
+    if not incluir_sin_valor:
+        filas = filas.exclude(estado__nombre__in=ESTADOS_SIN_VALOR)
+
+    metricas = {
+        'activos': Sum('cantidad_activos'),
+        'insumos': Sum('cantidad_insumos'),
+        'valor': Sum('valor_total'),
+    }
+    grupos = list(
+        filas.values(clave=F(campo_clave), nombre=F(campo_nombre))
+        .annotate(**metricas)
+        .order_by('-valor', 'nombre')
+    )
+    totales = filas.aggregate(
+        **metricas,
+        unidades_sin_costo=Sum(F('cantidad_activos') + F('cantidad_insumos'), filter=Q(producto__costo_compra__isnull=True)),
+    )
+    return {
+        'agrupado_por': agrupar_por,
+        'grupos': grupos,
+        'totales': {campo: valor or 0 for campo, valor in totales.items()},
+    }
+
+
+
+
+# --- CAMBIO DE ESTADO MASIVO (anular / baja / extravío / mantenimiento) ---
+
+# Máximo de existencias por operación masiva
+MAX_EXISTENCIAS_CAMBIO_MASIVO = 500
+
+# Mismas reglas que las vistas unitarias (AnularExistenciaView, BajaExistenciaView, ExtraviadoExistenciaView)
+# y que las órdenes de mantenimiento. Las acciones que no retiran existencias solo cambian el
+# estado: el ítem sigue en su compartimento con su cantidad y el movimiento queda en cero.
+ACCIONES_CAMBIO_ESTADO = {
+    'anular': {
+        'estado': 'ANULADO POR ERROR',
+        'permitidos': ['DISPONIBLE'],
+        'tipo_movimiento': TipoMovimiento.AJUSTE,
+        'admite_lotes': True,
+        'retira_existencias': True,
+        'nota': "Anulación por error de ingreso",
+    },
+    'baja': {
+        'estado': 'DE BAJA',
+        'permitidos': ['DISPONIBLE', 'PENDIENTE REVISIÓN', 'EN REPARACIÓN'],
+        'tipo_movimiento': TipoMovimiento.SALIDA,
+        'admite_lotes': True,
+        'retira_existencias': True,
+        'nota': "Baja",
+    },
+    'extraviado': {
+        'estado': 'EXTRAVIADO',
+        'permitidos': ['DISPONIBLE', 'PENDIENTE REVISIÓN', 'EN REPARACIÓN', 'EN PRÉSTAMO EXTERNO'],
+        'tipo_movimiento': TipoMovimiento.SALIDA,
+        'admite_lotes': False,
+        'retira_existencias': True,
+        'nota': "Extravío reportado",
+    },
+    'revision': {
+        'estado': 'PENDIENTE REVISIÓN',
+        'permitidos': ['DISPONIBLE'],
+        'tipo_movimiento': TipoMovimiento.AJUSTE,
+        'admite_lotes': True,
+        'retira_existencias': False,
+        'nota': "Enviado a revisión",
+    },
+    'reparacion': {
+        'estado': 'EN REPARACIÓN',
+        'permitidos': ['DISPONIBLE', 'PENDIENTE REVISIÓN'],
+        'tipo_movimiento': TipoMovimiento.AJUSTE,
+        'admite_lotes': True,
+        'retira_existencias': False,
+        'nota': "Enviado a reparación",
+    },
+    # Los activos con una orden de mantenimiento abierta no se liberan: la orden lo hace al cerrarse
+    'habilitar': {
+        'estado': 'DISPONIBLE',
+        'permitidos': ['PENDIENTE REVISIÓN', 'EN REPARACIÓN'],
+        'tipo_movimiento': TipoMovimiento.AJUSTE,
+        'admite_lotes': True,
+        'retira_existencias': False,
+        'nota': "Habilitado tras revisión o reparación",
+    },
+}
+
+
+def cambiar_estado_existencias(accion, estacion, usuario, activo_ids=(), lote_ids=(), notas='', parcial=False):
+    """
+    Aplica una misma transición de estado (ver ACCIONES_CAMBIO_ESTADO) a muchas existencias
+    en una sola transacción: las reglas de estado se validan con una consulta por tabla, se
+    ejecuta un UPDATE por tabla y los movimientos se insertan en bloque.
+
+    Si alguna existencia no cumple las reglas no se aplica nada (aplicado=False), salvo que
+    `parcial` sea True, en cuyo caso se procesan las válidas y el resto se informa.
+
+    Retorna {'aplicado', 'activos': [...], 'lotes': [...], 'rechazados': [{tipo, id, codigo, motivo}]}.
+    """
+    if accion not in ACCIONES_CAMBIO_ESTADO:
+        raise ValidationError(f"Acción no válida. Opciones: {', '.join(ACCIONES_CAMBIO_ESTADO)}.")
+    regla = ACCIONES_CAMBIO_ESTADO[accion]
+
+    activo_ids = {str(i) for i in activo_ids}
+    lote_ids = {str(i) for i in lote_ids}
+    if not activo_ids and not lote_ids:
+        raise ValidationError("Debe indicar al menos una existencia.")
+    if len(activo_ids) + len(lote_ids) > MAX_EXISTENCIAS_CAMBIO_MASIVO:
+        raise ValidationError(f"Máximo {MAX_EXISTENCIAS_CAMBIO_MASIVO} existencias por operación.")
+    if lote_ids and not regla['admite_lotes']:
+        raise ValidationError("Para reportar pérdidas en Lotes/Insumos, utilice el ajuste de stock.")
+
+    with transaction.atomic():
+        # 1. Validación por conjuntos: una consulta (con bloqueo) por tabla
+        activos = list(
+            Activo.objects.select_for_update(of=('self',))
+            .filter(id__in=activo_ids, estacion=estacion)
+            .values_list('id', 'codigo_activo', 'estado__nombre', 'compartimento_id', 'producto_id')
+        )
+        lotes = list(
+            LoteInsumo.objects.select_for_update(of=('self',))
+            .filter(id__in=lote_ids, compartimento__ubicacion__estacion=estacion)
+            .values_list('id', 'codigo_lote', 'estado__nombre', 'compartimento_id', 'producto_id', 'cantidad')
+        )
+
+        rechazados = []
+        for tipo, solicitados, filas in (('ACTIVO', activo_ids, activos), ('LOTE', lote_ids, lotes)):
+            encontrados = {str(fila[0]) for fila in filas}
+            rechazados += [
+                {'tipo': tipo, 'id': item_id, 'codigo': None, 'motivo': "No existe en la estación activa."}
+                for item_id in sorted(solicitados - encontrados)
+            ]
+            rechazados += [
+                {
+                    'tipo': tipo, 'id': str(fila[0]), 'codigo': fila[1],
+                    'motivo': MENSAJES_ESTADO_BLOQUEANTE.get(fila[2], MENSAJE_ESTADO_BLOQUEANTE_DEFECTO)
+                }
+                for fila in filas if fila[2] not in regla['permitidos']
+            ]
+        if accion == 'habilitar' and activos:
+            en_mantenimiento = set(
+                OrdenMantenimiento.objects.filter(
+                    activos_afectados__in=[a[0] for a in activos if a[2] in regla['permitidos']],
+                    estado__in=[OrdenMantenimiento.EstadoOrden.PENDIENTE, OrdenMantenimiento.EstadoOrden.EN_CURSO],
+                ).values_list('activos_afectados', flat=True)
+            )
+            rechazados += [
+                {'tipo': 'ACTIVO', 'id': str(a[0]), 'codigo': a[1], 'motivo': "Tiene una orden de mantenimiento abierta."}
+                for a in activos if a[0] in en_mantenimiento
+            ]
+            activos = [a for a in activos if a[0] not in en_mantenimiento]
+
+        resultado = {'aplicado': False, 'activos': [], 'lotes': [], 'rechazados': rechazados}
+        if rechazados and not parcial:
+            return resultado
+
+        activos = [a for a in activos if a[2] in regla['permitidos']]
+        lotes = [l for l in lotes if l[2] in regla['permitidos']]
+        if not activos and not lotes:
+            return resultado
+
+        # 2. Un UPDATE por tabla
+        ahora = timezone.now()
+        estado_destino = Estado.objects.get(nombre=regla['estado'])
+        compartimento_destino = None
+        if accion == 'anular':
+            compartimento_destino = get_or_create_anulado_compartment(estacion)
+        elif accion == 'extraviado':
+            compartimento_destino = get_or_create_extraviado_compartment(estacion)
+
+        cambios = {'estado': estado_destino, 'updated_at': ahora}
+        if compartimento_destino:
+            cambios['compartimento'] = compartimento_destino
+        if activos:
+            Activo.objects.filter(id__in=[a[0] for a in activos]).update(**cambios)
+        if lotes:
+            if regla['retira_existencias']:
+                cambios['cantidad'] = 0
+            LoteInsumo.objects.filter(id__in=[l[0] for l in lotes]).update(**cambios)
+
+        # 3. Movimientos en bloque
+        nota = f"{regla['nota']}: {notas}" if notas else f"{regla['nota']}."
+        prestados = [a[0] for a in activos if a[2] == 'EN PRÉSTAMO EXTERNO']
+        movimientos = [
+            MovimientoInventario(
+                tipo_movimiento=regla['tipo_movimiento'],
+                fecha_hora=ahora,
+                usuario=usuario,
+                estacion=estacion,
+                # Un activo prestado ya había salido del almacén físico: no se descuenta de nuevo
+                compartimento_origen_id=None if estado == 'EN PRÉSTAMO EXTERNO' else comp_id,
+                compartimento_destino=compartimento_destino,
+                activo_id=activo_id,
+                cantidad_movida=-1 if regla['retira_existencias'] and estado != 'EN PRÉSTAMO EXTERNO' else 0,
+                notas=nota
+            )
+            for activo_id, _, estado, comp_id, _ in activos
+        ] + [
+            MovimientoInventario(
+                tipo_movimiento=regla['tipo_movimiento'],
+                fecha_hora=ahora,
+                usuario=usuario,
+                estacion=estacion,
+                compartimento_origen_id=comp_id,
+                compartimento_destino=compartimento_destino,
+                lote_insumo_id=lote_id,
+                cantidad_movida=-cantidad if regla['retira_existencias'] else 0,
+                notas=nota
+            )
+            for lote_id, _, _, comp_id, _, cantidad in lotes
+        ]
+        MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+        publicar_movimientos(estacion.id, movimientos)
+
+        # 4. Préstamos: los activos extraviados estando prestados saldan su línea y, si era la
+        # última pendiente, cierran el préstamo
+        if prestados:
+            abiertos = PrestamoDetalle.objects.filter(activo_id__in=prestados, prestamo__estado__in=Prestamo.ESTADOS_ABIERTOS)
+            prestamo_ids = set(abiertos.values_list('prestamo_id', flat=True))
+            abiertos.update(cantidad_extraviada=1, fecha_ultima_devolucion=ahora)
+            pendientes = PrestamoDetalle.objects.filter(
+                prestamo=OuterRef('pk'), cantidad_prestada__gt=F('cantidad_devuelta') + F('cantidad_extraviada')
+            )
+            Prestamo.objects.filter(id__in=prestamo_ids).exclude(Exists(pendientes)).update(
+                estado=Prestamo.EstadoPrestamo.COMPLETADO, esta_vencido=False, updated_at=ahora
+            )
+
+        # 5. Los UPDATE masivos no disparan señales: resúmenes y bitácora de sincronización a mano
+        if activos:
+            registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.ACTIVO, [a[0] for a in activos], estacion.id)
+        if lotes:
+            registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.LOTE, [l[0] for l in lotes], estacion.id)
+        recalcular_ocupacion_compartimentos(
+            {a[3] for a in activos} | {l[3] for l in lotes}
+            | ({compartimento_destino.id} if compartimento_destino else set())
+        )
+        recalcular_valorizacion({a[4] for a in activos} | {l[4] for l in lotes})
+
+    resultado.update({
+        'aplicado': True,
+        'activos': [{'id': str(a[0]), 'codigo': a[1], 'estado_previo': a[2]} for a in activos],
+        'lotes': [{'id': str(l[0]), 'codigo': l[1], 'estado_previo': l[2], 'cantidad': l[5]} for l in lotes],
+    })
+    return resultado
+
+
+
+
+# --- PLANTILLAS DE CARGA DE VEHÍCULOS ---
+
+# Solo cuenta como "cargado" lo que está listo para usarse: disponible y no vencido
+ESTADOS_CARGA_VALIDA = ['DISPONIBLE']
+
+
+def existencias_por_compartimento(ubicacion_ids, hoy=None):
+    """
+    Unidades utilizables por (compartimento, producto) en las ubicaciones indicadas.
+    Una sola consulta agrupada (UNION ALL de activos y lotes), sin importar cuántas ubicaciones sean.
+    """
+    hoy = hoy or timezone.localdate()
+    vigente = Q(fecha_expiracion__isnull=True) | Q(fecha_expiracion__gte=hoy)
+    activos = (
+        Activo.objects.filter(vigente, compartimento__ubicacion_id__in=ubicacion_ids, estado__nombre__in=ESTADOS_CARGA_VALIDA)
+        .values('compartimento_id', 'producto_id').annotate(unidades=Count('id')).order_by()
+    )
+    lotes = (
+        LoteInsumo.objects.filter(vigente, compartimento__ubicacion_id__in=ubicacion_ids, estado__nombre__in=ESTADOS_CARGA_VALIDA, cantidad__gt=0)
+        .values('compartimento_id', 'producto_id').annotate(unidades=Sum('cantidad')).order_by()
+    )
+    existencias = {}
+    for fila in activos.union(lotes, all=True):
+        clave = (fila['compartimento_id'], fila['producto_id'])
+        existencias[clave] = existencias.get(clave, 0) + fila['unidades']
+    return existencias
+
+
+def comparar_cargas(estacion, ubicacion_ids=None, hoy=None):
+    """
+    Compara las plantillas de carga de la estación (o solo de los vehículos indicados) con las
+    existencias reales. Usa dos consultas en total: las líneas de las plantillas y el stock
+    agrupado de todos los vehículos involucrados.
+
+    Retorna una lista por vehículo:
+    {'ubicacion_id', 'ubicacion', 'completo', 'lineas_faltantes', 'unidades_faltantes',
+     'lineas': [{item_id, compartimento_id, compartimento, producto_id, producto, requerido, actual, diferencia, faltante}]}
+    """
+    items = (
+        ItemPlantillaCarga.objects.filter(plantilla__estacion=estacion)
+        .select_related('plantilla__ubicacion', 'compartimento', 'producto__producto_global')
+        .order_by('plantilla__ubicacion__nombre', 'compartimento__nombre', 'producto__producto_global__nombre_oficial')
+    )
+    if ubicacion_ids is not None:
+        items = items.filter(plantilla__ubicacion_id__in=ubicacion_ids)
+    items = list(items)
+    if not items:
+        return []
+
+    existencias = existencias_por_compartimento({i.plantilla.ubicacion_id for i in items}, hoy)
+
+    vehiculos = {}
+    for item in items:
+        ubicacion = item.plantilla.ubicacion
+        vehiculo = vehiculos.setdefault(ubicacion.id, {
+            'ubicacion_id': ubicacion.id,
+            'ubicacion': ubicacion.nombre,
+            'completo': True,
+            'lineas_faltantes': 0,
+            'unidades_faltantes': 0,
+            'lineas': [],
+        })
+        actual = existencias.get((item.compartimento_id, item.producto_id), 0)
+        diferencia = actual - item.cantidad_requerida
+        if diferencia < 0:
+            vehiculo['completo'] = False
+            vehiculo['lineas_faltantes'] += 1
+            vehiculo['unidades_faltantes'] -= diferencia
+        vehiculo['lineas'].append({
+            'item_id': item.id,
+            'compartimento_id': item.compartimento_id,
+            'compartimento': item.compartimento.nombre,
+            'producto_id': item.producto_id,
+            'producto': item.producto.producto_global.nombre_oficial,
+            'requerido': item.cantidad_requerida,
+            'actual': actual,
+            'diferencia': diferencia,
+            'faltante': max(0, -diferencia),
+        })
+    return list(vehiculos.values())
+
+
+def crear_plantilla_desde_carga(ubicacion):
+    """
+    Crea (o reemplaza) la plantilla de carga de un vehículo tomando como referencia lo que lleva
+    hoy: una línea por cada (compartimento, producto) con existencias utilizables.
+    """
+    with transaction.atomic():
+        plantilla, _ = PlantillaCarga.objects.get_or_create(ubicacion=ubicacion, defaults={'estacion_id': ubicacion.estacion_id})
+        plantilla.items.all().delete()
+        ItemPlantillaCarga.objects.bulk_create([
+            ItemPlantillaCarga(plantilla=plantilla, compartimento_id=comp_id, producto_id=prod_id, cantidad_requerida=unidades)
+            for (comp_id, prod_id), unidades in existencias_por_compartimento([ubicacion.id]).items()
+        ])
+        plantilla.save(update_fields=['updated_at'])
+    return plantilla
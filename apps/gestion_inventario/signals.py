@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.db.models import Sum
 from django.dispatch import receiver
-from .models import Ubicacion, Compartimento, ProductoGlobal, Activo, RegistroUsoActivo
+from .models import (
+    Ubicacion, Compartimento, Categoria, ProductoGlobal, Producto, Activo, LoteInsumo, Destinatario,
+    Estado, TipoEstado, RegistroUsoActivo, CambioSincronizacion, MovimientoInventario
+)
+from .graficos import invalidar_graficos_global, invalidar_graficos_inventario
+from .services import recalcular_ocupacion_compartimentos, recalcular_valorizacion, registrar_cambios_sincronizacion, CAMPOS_SINCRONIZACION
+from .tiempo_real import publicar_movimientos
 
 
 @receiver(post_save, sender=Ubicacion)
@@ -69,4 +75,180 @@ def on_registro_uso_delete(sender, instance, **kwargs):
     Se dispara después de ELIMINAR un RegistroUsoActivo.
     """
     # Llama a la función de recálculo
-    recalcular_horas_totales_activo(instance.activo.id)
\ No newline at end of file
+    recalcular_horas_totales_activo(instance.activo.id)
+
+
+
+
+# --- OCUPACIÓN PRECALCULADA (OcupacionCompartimento) ---
+# Se guarda el compartimento/cantidad con que se cargó la instancia para saber, al guardar,
+# si la existencia cambió de lugar (hay que recalcular origen y destino) o si no afecta.
+
+def _estado_ocupacion(instance):
+    return (instance.__dict__.get('compartimento_id'), instance.__dict__.get('cantidad'))
+
+
+@receiver(post_init, sender=Activo)
+@receiver(post_init, sender=LoteInsumo)
+def registrar_ocupacion_original(sender, instance, **kwargs):
+    instance._ocupacion_original = _estado_ocupacion(instance)
+
+
+@receiver(post_save, sender=Activo)
+@receiver(post_save, sender=LoteInsumo)
+def actualizar_ocupacion_existencia(sender, instance, created, raw, update_fields=None, **kwargs):
+    """
+    Recalcula la ocupación de los compartimentos afectados cuando una existencia se crea,
+    cambia de compartimento o (en lotes) cambia de cantidad.
+    """
+    if raw:
+        return
+    if update_fields is not None and not {'compartimento', 'compartimento_id', 'cantidad'} & set(update_fields):
+        return
+
+    original = instance._ocupacion_original
+    actual = _estado_ocupacion(instance)
+    if created or original != actual:
+        recalcular_ocupacion_compartimentos({original[0], actual[0]})
+    instance._ocupacion_original = actual
+
+
+@receiver(post_delete, sender=Activo)
+@receiver(post_delete, sender=LoteInsumo)
+def descontar_ocupacion_existencia(sender, instance, **kwargs):
+    recalcular_ocupacion_compartimentos({instance.compartimento_id})
+
+
+
+
+# --- VALORIZACIÓN PRECALCULADA (ValorizacionInventario) ---
+# Igual que con la ocupación, se guarda la clave (producto, compartimento, estado) y la cantidad
+# con que se cargó la instancia para recalcular solo los grupos de origen y destino.
+
+CAMPOS_VALORIZACION = {'producto', 'producto_id', 'compartimento', 'compartimento_id', 'estado', 'estado_id', 'cantidad'}
+
+
+def _estado_valorizacion(instance):
+    datos = instance.__dict__
+    return (datos.get('producto_id'), datos.get('compartimento_id'), datos.get('estado_id'), datos.get('cantidad'))
+
+
+@receiver(post_init, sender=Activo)
+@receiver(post_init, sender=LoteInsumo)
+def registrar_valorizacion_original(sender, instance, **kwargs):
+    instance._valorizacion_original = _estado_valorizacion(instance)
+
+
+@receiver(post_save, sender=Activo)
+@receiver(post_save, sender=LoteInsumo)
+def actualizar_valorizacion_existencia(sender, instance, created, raw, update_fields=None, **kwargs):
+    """
+    Recalcula la valorización de los grupos afectados cuando una existencia se crea (recepción),
+    cambia de estado (baja, anulación, extravío), de lugar (traslado) o de cantidad (consumo, ajuste).
+    """
+    if raw:
+        return
+    if update_fields is not None and not CAMPOS_VALORIZACION & set(update_fields):
+        return
+
+    original = instance._valorizacion_original
+    actual = _estado_valorizacion(instance)
+    if created or original != actual:
+        recalcular_valorizacion({original[0], actual[0]}, {original[1], actual[1]})
+    instance._valorizacion_original = actual
+
+
+@receiver(post_delete, sender=Activo)
+@receiver(post_delete, sender=LoteInsumo)
+def descontar_valorizacion_existencia(sender, instance, **kwargs):
+    recalcular_valorizacion({instance.producto_id}, {instance.compartimento_id})
+
+
+@receiver(post_init, sender=Producto)
+def registrar_costo_original(sender, instance, **kwargs):
+    instance._costo_original = instance.__dict__.get('costo_compra')
+
+
+@receiver(post_save, sender=Producto)
+def revalorizar_producto(sender, instance, created, raw, **kwargs):
+    """Un cambio de costo de compra revaloriza todas las existencias del producto."""
+    if raw or created:
+        return
+    if instance.costo_compra != instance._costo_original:
+        recalcular_valorizacion({instance.pk})
+    instance._costo_original = instance.costo_compra
+
+
+
+
+# --- GRÁFICOS DE INVENTARIO (graficos) ---
+# Las existencias invalidan los gráficos a través de recalcular_valorizacion; aquí se cubre lo
+# que cambia su agrupación sin tocar existencias.
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_graficos_producto(sender, instance, raw=False, **kwargs):
+    """El producto global del producto (y con él su categoría) decide en qué barra se cuenta."""
+    if not raw:
+        invalidar_graficos_inventario([instance.estacion_id])
+
+
+def invalidar_graficos_compartidos(sender, instance, created=False, raw=False, **kwargs):
+    # Un registro recién creado todavía no tiene existencias asociadas
+    if not raw and not created:
+        invalidar_graficos_global()
+
+
+for modelo_grafico in (Categoria, ProductoGlobal, Estado, TipoEstado, Ubicacion, Compartimento):
+    post_save.connect(invalidar_graficos_compartidos, sender=modelo_grafico, dispatch_uid=f'graficos_save_{modelo_grafico.__name__}')
+    post_delete.connect(invalidar_graficos_compartidos, sender=modelo_grafico, dispatch_uid=f'graficos_delete_{modelo_grafico.__name__}')
+
+
+
+
+# --- CANAL EN VIVO (tiempo_real) ---
+
+@receiver(post_save, sender=MovimientoInventario)
+def publicar_movimiento_en_vivo(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        publicar_movimientos(instance.estacion_id, [instance])
+
+
+
+
+# --- BITÁCORA DE SINCRONIZACIÓN MÓVIL (CambioSincronizacion) ---
+# Modelo sincronizado -> (clave del feed, función que obtiene la estación dueña; None = global)
+MODELOS_SINCRONIZADOS = {
+    ProductoGlobal: (CambioSincronizacion.Modelo.PRODUCTO_GLOBAL, lambda obj: None),
+    Producto: (CambioSincronizacion.Modelo.PRODUCTO, lambda obj: obj.estacion_id),
+    Activo: (CambioSincronizacion.Modelo.ACTIVO, lambda obj: obj.estacion_id),
+    LoteInsumo: (CambioSincronizacion.Modelo.LOTE, lambda obj: obj.producto.estacion_id),
+    Ubicacion: (CambioSincronizacion.Modelo.UBICACION, lambda obj: obj.estacion_id),
+    Compartimento: (CambioSincronizacion.Modelo.COMPARTIMENTO, lambda obj: obj.ubicacion.estacion_id),
+    Destinatario: (CambioSincronizacion.Modelo.DESTINATARIO, lambda obj: obj.estacion_id),
+}
+
+# Campos del modelo que viajan en el feed: un save que no toca ninguno no genera cambio
+CAMPOS_RELEVANTES_SINCRONIZACION = {
+    modelo: {campo.split('__')[0] for campo in campos} | {campo.split('__')[0].removesuffix('_id') for campo in campos}
+    for modelo, (_, campos) in CAMPOS_SINCRONIZACION.items()
+}
+
+
+def registrar_cambio_sincronizacion(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    modelo, obtener_estacion = MODELOS_SINCRONIZADOS[sender]
+    if update_fields and not set(update_fields) & CAMPOS_RELEVANTES_SINCRONIZACION[modelo]:
+        return
+    registrar_cambios_sincronizacion(modelo, [instance.pk], obtener_estacion(instance))
+
+
+def registrar_eliminacion_sincronizacion(sender, instance, **kwargs):
+    modelo, obtener_estacion = MODELOS_SINCRONIZADOS[sender]
+    registrar_cambios_sincronizacion(modelo, [instance.pk], obtener_estacion(instance), eliminado=True)
+
+
+for modelo_sincronizado in MODELOS_SINCRONIZADOS:
+    post_save.connect(registrar_cambio_sincronizacion, sender=modelo_sincronizado, dispatch_uid=f'sync_save_{modelo_sincronizado.__name__}')
+    post_delete.connect(registrar_eliminacion_sincronizacion, sender=modelo_sincronizado, dispatch_uid=f'sync_delete_{modelo_sincronizado.__name__}')
@@ -129,4 +129,50 @@ document.addEventListener('DOMContentLoaded', function () {
         },
     });
     }
+
+    // ACTUALIZACIÓN EN VIVO (SSE)
+    // El servidor envía un 'snapshot' al conectar y luego solo los estados que cambian,
+    // con totales absolutos: basta con reemplazar y volver a sumar.
+    const urlEnVivo = window.dashboardConfig?.urlEnVivo;
+    if (urlEnVivo && window.EventSource) {
+        var totalesPorEstado = {};
+
+        function total(nombre) {
+            var t = totalesPorEstado[nombre];
+            return t ? t.activos + t.insumos : 0;
+        }
+
+        function fijarKpi(id, valor) {
+            var el = document.getElementById(id);
+            if (el) el.textContent = valor.toLocaleString('es-CL');
+        }
+
+        function refrescarDashboard() {
+            var valores = [
+                total('DISPONIBLE'),
+                total('EN PRÉSTAMO EXTERNO'),
+                total('EN PREPARACIÓN'),
+                total('EN TRÁNSITO'),
+                total('PENDIENTE REVISIÓN'),
+                total('EN REPARACIÓN')
+            ];
+            fijarKpi('kpi-total-operativas', valores[0]);
+            fijarKpi('kpi-total-prestamo', valores[1]);
+            fijarKpi('kpi-total-no-operativas', valores[2] + valores[3] + valores[4] + valores[5]);
+            if (myPieChart) {
+                myPieChart.data.datasets[0].data = valores;
+                myPieChart.update();
+            }
+        }
+
+        var fuente = new EventSource(urlEnVivo);
+        fuente.addEventListener('snapshot', function (e) {
+            totalesPorEstado = JSON.parse(e.data);
+            refrescarDashboard();
+        });
+        fuente.addEventListener('estados', function (e) {
+            Object.assign(totalesPorEstado, JSON.parse(e.data));
+            refrescarDashboard();
+        });
+    }
 });
\ No newline at end of file
@@ -0,0 +1,72 @@
+// Sugerencias de posibles duplicados al crear/editar un Producto Global.
+// Consulta la API de similitud mientras el usuario escribe (con debounce) y muestra
+// los candidatos bajo el campo "Nombre Oficial". No bloquea el guardado.
+document.addEventListener('DOMContentLoaded', function () {
+    const config = window.sugerenciasProductoConfig;
+    if (!config?.url) {
+        return;
+    }
+
+    const inputNombre = document.getElementById(config.nombreId);
+    const inputModelo = document.getElementById(config.modeloId);
+    const inputGtin = document.getElementById(config.gtinId);
+    const contenedor = document.getElementById(config.contenedorId);
+    if (!inputNombre || !contenedor) {
+        return;
+    }
+
+    let temporizador = null;
+    let ultimaConsulta = '';
+
+    function escapar(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto ?? '';
+        return div.innerHTML;
+    }
+
+    function renderizar(candidatos) {
+        if (!candidatos.length) {
+            contenedor.innerHTML = '';
+            return;
+        }
+        const filas = candidatos.map(c => `
+            <li class="d-flex justify-content-between">
+                <span>${escapar(c.nombre_oficial)} <span class="text-muted">(${escapar(c.marca)}${c.modelo ? ' ' + escapar(c.modelo) : ''})</span></span>
+                <span class="badge bg-warning text-dark">${Math.round(c.similitud * 100)}%</span>
+            </li>`).join('');
+        contenedor.innerHTML = `
+            <div class="alert alert-warning text-xs py-2 mb-0">
+                <i class="fas fa-exclamation-triangle me-1"></i>
+                Posibles duplicados en el catálogo. Verifique antes de crear uno nuevo:
+                <ul class="list-unstyled mb-0 mt-1">${filas}</ul>
+            </div>`;
+    }
+
+    function consultar() {
+        const params = new URLSearchParams({
+            q: inputNombre.value.trim(),
+            modelo: inputModelo?.value.trim() || '',
+            gtin: inputGtin?.value.trim() || '',
+        });
+        if (config.excluir) {
+            params.set('excluir', config.excluir);
+        }
+        const consulta = params.toString();
+        if (consulta === ultimaConsulta) {
+            return;
+        }
+        ultimaConsulta = consulta;
+
+        fetch(`${config.url}?${consulta}`, { credentials: 'same-origin' })
+            .then(r => r.ok ? r.json() : [])
+            .then(renderizar)
+            .catch(() => { contenedor.innerHTML = ''; });
+    }
+
+    [inputNombre, inputModelo, inputGtin].forEach(el => {
+        el?.addEventListener('input', function () {
+            clearTimeout(temporizador);
+            temporizador = setTimeout(consultar, 300);
+        });
+    });
+});
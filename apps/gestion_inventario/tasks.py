@@ -0,0 +1,38 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from .services import purgar_cambios_sincronizacion, marcar_prestamos_vencidos
+
+logger = get_task_logger(__name__)
+
+@shared_task(bind=True, max_retries=3)
+def tarea_purgar_cambios_sincronizacion(self):
+    """
+    Tarea programada (Beat) que recorta la bitácora de sincronización móvil
+    a la retención configurada (INVENTARIO_SYNC_RETENCION_DIAS).
+    """
+    try:
+        eliminados = purgar_cambios_sincronizacion()
+        mensaje = f"Bitácora de sincronización purgada: {eliminados} registros eliminados."
+        logger.info(mensaje)
+        return mensaje
+
+    except Exception as e:
+        logger.error(f"Error al purgar la bitácora de sincronización: {e}")
+        raise self.retry(exc=e, countdown=60 * 5)
+
+
+@shared_task(bind=True, max_retries=3)
+def tarea_marcar_prestamos_vencidos(self):
+    """
+    Tarea programada (Beat) que marca como vencidos los préstamos abiertos
+    cuya fecha de devolución esperada ya pasó (un solo UPDATE).
+    """
+    try:
+        marcados = marcar_prestamos_vencidos()
+        mensaje = f"Préstamos vencidos: {marcados} marcados."
+        logger.info(mensaje)
+        return mensaje
+
+    except Exception as e:
+        logger.error(f"Error al marcar préstamos vencidos: {e}")
+        raise self.retry(exc=e, countdown=60 * 5)
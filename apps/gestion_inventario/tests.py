@@ -1,3 +1,556 @@
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
 from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from .models import (
+    Estacion, Comuna, Region, Ubicacion, TipoUbicacion, Compartimento,
+    Categoria, ProductoGlobal, Producto, Activo, LoteInsumo,
+    TipoEstado, Estado, Proveedor, MovimientoInventario, TipoMovimiento,
+    SesionInventario, OcupacionCompartimento, CambioSincronizacion, Destinatario, Prestamo, PrestamoDetalle
+)
+from .services import (
+    abrir_sesion_inventario,
+    registrar_lecturas_inventario,
+    resumen_sesion_inventario,
+    cerrar_sesion_inventario,
+    buscar_productos_globales_similares,
+    agrupar_productos_globales_duplicados,
+    verificar_ocupacion_compartimentos,
+    obtener_cambios_sincronizacion,
+    registrar_cambios_sincronizacion,
+    cursor_sincronizacion_actual,
+    purgar_cambios_sincronizacion,
+    prestamos_vencidos,
+    marcar_prestamos_vencidos,
+    planificar_consumo_fefo,
+    aplicar_consumo_fefo,
+    resumen_valorizacion,
+    verificar_valorizacion,
+    cambiar_estado_existencias,
+    comparar_cargas,
+    crear_plantilla_desde_carga
+)
+from .tiempo_real import flujo_eventos
+
+User = get_user_model()
+
+
+class InventarioBaseTestCase(TestCase):
+    """
+    Datos mínimos de inventario compartidos por las pruebas del módulo.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='inventario@bomberos.cl', rut='11111111-1', first_name='Test', last_name='Inventario')
+
+        region = Region.objects.create(nombre="Tarapacá")
+        comuna = Comuna.objects.create(nombre="Iquique", region=region)
+        self.estacion = Estacion.objects.create(nombre="Primera Compañía", comuna=comuna)
+
+        tipo_ubic = TipoUbicacion.objects.create(nombre="Bodega")
+        self.ubicacion = Ubicacion.objects.create(nombre="Bodega Central", estacion=self.estacion, tipo_ubicacion=tipo_ubic)
+        self.compartimento = Compartimento.objects.get(ubicacion=self.ubicacion, nombre="General")
+        self.proveedor = Proveedor.objects.create(nombre="Proveedor Test", rut="11222333-K")
+
+        operativo = TipoEstado.objects.create(nombre="OPERATIVO")
+        no_operativo = TipoEstado.objects.create(nombre="NO OPERATIVO")
+        self.disponible = Estado.objects.create(nombre="DISPONIBLE", tipo_estado=operativo)
+        self.extraviado = Estado.objects.create(nombre="EXTRAVIADO", tipo_estado=no_operativo)
+
+        categoria = Categoria.objects.create(nombre="Rescate", codigo="RES")
+        pg_activo = ProductoGlobal.objects.create(nombre_oficial="Hacha Pulaski", categoria=categoria)
+        pg_insumo = ProductoGlobal.objects.create(nombre_oficial="Gasa Estéril", categoria=categoria)
+        self.producto_activo = Producto.objects.create(producto_global=pg_activo, estacion=self.estacion, sku="HAC-01", es_serializado=True)
+        self.producto_insumo = Producto.objects.create(producto_global=pg_insumo, estacion=self.estacion, sku="GAS-01")
+
+    def crear_activo(self):
+        return Activo.objects.create(
+            producto=self.producto_activo, estacion=self.estacion, estado=self.disponible,
+            compartimento=self.compartimento, proveedor=self.proveedor
+        )
+
+    def crear_lote(self, cantidad):
+        return LoteInsumo.objects.create(
+            producto=self.producto_insumo, estado=self.disponible,
+            compartimento=self.compartimento, cantidad=cantidad
+        )
+
+
+
+
+class SesionInventarioTest(InventarioBaseTestCase):
+    """
+    Pruebas del flujo de toma de inventario físico (apertura, lecturas por lote y cierre).
+    """
+
+    def test_diff_y_cierre_aplica_extravios_y_ajustes(self):
+        """CP-INV-01: El cierre marca faltantes como extraviados y ajusta lotes contados."""
+        encontrado = self.crear_activo()
+        perdido = self.crear_activo()
+        lote = self.crear_lote(cantidad=50)
+
+        sesion = abrir_sesion_inventario(self.estacion, self.ubicacion, self.user)
+        self.assertEqual(resumen_sesion_inventario(sesion)['esperados'], 3)
+
+        resultado = registrar_lecturas_inventario(sesion, [
+            {'codigo': encontrado.codigo_activo},
+            {'codigo': lote.codigo_lote, 'cantidad': 45},
+            {'codigo': 'NO-EXISTE-001'},
+        ], self.user)
+        self.assertEqual(resultado['procesadas'], 2)
+        self.assertEqual(resultado['no_encontradas'], ['NO-EXISTE-001'])
+
+        resumen = resumen_sesion_inventario(sesion, incluir_detalle=True)
+        self.assertEqual(resumen['faltantes'], 1)
+        self.assertEqual(resumen['con_diferencia'], 1)
+        self.assertEqual(resumen['faltantes_detalle'][0]['codigo'], perdido.codigo_activo)
+
+        cierre = cerrar_sesion_inventario(sesion, self.user)
+        self.assertEqual(cierre['activos_extraviados'], 1)
+        self.assertEqual(cierre['lotes_ajustados'], 1)
+
+        perdido.refresh_from_db()
+        lote.refresh_from_db()
+        encontrado.refresh_from_db()
+        self.assertEqual(perdido.estado, self.extraviado)
+        self.assertEqual(encontrado.estado, self.disponible)
+        self.assertEqual(lote.cantidad, 45)
+        self.assertTrue(MovimientoInventario.objects.filter(lote_insumo=lote, tipo_movimiento=TipoMovimiento.AJUSTE, cantidad_movida=-5).exists())
+        self.assertEqual(SesionInventario.objects.get(pk=sesion.pk).estado, SesionInventario.EstadoSesion.CERRADA)
+
+    def test_cierre_ajusta_lotes_por_diferencia(self):
+        """CP-INV-14: El ajuste de lotes respeta los consumos hechos durante el conteo y omite los lotes trasladados."""
+        lote = self.crear_lote(cantidad=50)
+        trasladado = self.crear_lote(cantidad=10)
+        sesion = abrir_sesion_inventario(self.estacion, self.ubicacion, self.user)
+        registrar_lecturas_inventario(sesion, [
+            {'codigo': lote.codigo_lote, 'cantidad': 45},
+            {'codigo': trasladado.codigo_lote, 'cantidad': 8},
+        ], self.user)
+
+        # Consumo de 10 unidades y traslado a otra ubicación mientras la sesión sigue abierta
+        lote.cantidad = 40
+        lote.save(update_fields=['cantidad', 'updated_at'])
+        otra = Ubicacion.objects.create(nombre="Carro B-1", estacion=self.estacion, tipo_ubicacion=self.ubicacion.tipo_ubicacion)
+        trasladado.compartimento = Compartimento.objects.get(ubicacion=otra, nombre="General")
+        trasladado.save()
+
+        cierre = cerrar_sesion_inventario(sesion, self.user)
+        self.assertEqual(cierre['lotes_ajustados'], 1)
+        lote.refresh_from_db()
+        trasladado.refresh_from_db()
+        self.assertEqual(lote.cantidad, 35)
+        self.assertEqual(trasladado.cantidad, 10)
+
+    def test_lecturas_idempotentes_e_inesperados(self):
+        """CP-INV-02: Reenviar un lote no duplica conteos; ítems ajenos a la ubicación se marcan inesperados."""
+        activo = self.crear_activo()
+        sesion = abrir_sesion_inventario(self.estacion, self.ubicacion, self.user)
+
+        # Activo creado después de abrir la sesión (no figuraba en la foto inicial)
+        intruso = self.crear_activo()
+
+        lecturas = [{'codigo': activo.codigo_activo}, {'codigo': intruso.codigo_activo}]
+        registrar_lecturas_inventario(sesion, lecturas, self.user)
+        registrar_lecturas_inventario(sesion, lecturas, self.user)
+
+        resumen = resumen_sesion_inventario(sesion)
+        self.assertEqual(resumen['encontrados'], 1)
+        self.assertEqual(resumen['inesperados'], 1)
+        self.assertEqual(sesion.conteos.count(), 2)
+
+
+
+
+class ProductoGlobalSimilaresTest(InventarioBaseTestCase):
+    """
+    Pruebas del servicio de detección de duplicados del Catálogo Global.
+    """
+
+    def test_candidatos_ordenados_y_gtin_exacto(self):
+        """CP-INV-03: GTIN idéntico encabeza la lista y los nombres parecidos se sugieren."""
+        categoria = Categoria.objects.get(codigo="RES")
+        casco = ProductoGlobal.objects.create(nombre_oficial="Casco Bullard", categoria=categoria)
+        casco_ustc = ProductoGlobal.objects.create(nombre_oficial="CASCO BULLARD USTC", categoria=categoria, gtin="7801234567890")
+
+        candidatos = buscar_productos_globales_similares("Casco Bulard", gtin="7801234567890")
+        ids = [c['producto'].id for c in candidatos]
+
+        self.assertEqual(ids[0], casco_ustc.id)
+        self.assertEqual(candidatos[0]['similitud'], 1.0)
+        self.assertIn(casco.id, ids)
+        self.assertNotIn(self.producto_activo.producto_global_id, ids)
+
+        clusters = agrupar_productos_globales_duplicados(umbral=0.5)
+        self.assertTrue(any({casco.id, casco_ustc.id} <= {p[0] for p in cluster} for cluster in clusters))
+
+
+
+
+class OcupacionCompartimentoTest(InventarioBaseTestCase):
+    """
+    Pruebas del resumen precalculado de ocupación por compartimento.
+    """
+
+    def test_resumen_sigue_altas_traslados_y_cierre_masivo(self):
+        """CP-INV-04: La ocupación se mantiene con saves individuales y con el cierre masivo de inventario."""
+        otro = Compartimento.objects.create(nombre="Estante A", ubicacion=self.ubicacion)
+        activo = self.crear_activo()
+        perdido = self.crear_activo()
+        lote = self.crear_lote(cantidad=30)
+
+        ocupacion = OcupacionCompartimento.objects.get(compartimento=self.compartimento)
+        self.assertEqual((ocupacion.total_activos, ocupacion.total_lotes, ocupacion.total_cantidad_insumos), (2, 1, 30))
+
+        # Traslado: descuenta en origen y suma en destino
+        activo.compartimento = otro
+        activo.save()
+        lote.cantidad = 25
+        lote.save(update_fields=['cantidad', 'updated_at'])
+        self.assertEqual(OcupacionCompartimento.objects.get(compartimento=otro).total_activos, 1)
+        ocupacion.refresh_from_db()
+        self.assertEqual((ocupacion.total_activos, ocupacion.total_cantidad_insumos), (1, 25))
+
+        # El cierre usa UPDATE/bulk_update (sin señales) y debe recalcular igualmente
+        sesion = abrir_sesion_inventario(self.estacion, self.ubicacion, self.user)
+        registrar_lecturas_inventario(sesion, [{'codigo': activo.codigo_activo}, {'codigo': lote.codigo_lote, 'cantidad': 20}], self.user)
+        cerrar_sesion_inventario(sesion, self.user)
+
+        ocupacion.refresh_from_db()
+        self.assertEqual((ocupacion.total_activos, ocupacion.total_cantidad_insumos), (0, 20))
+        perdido.refresh_from_db()
+        self.assertEqual(OcupacionCompartimento.objects.get(compartimento=perdido.compartimento).total_activos, 1)
+        self.assertEqual(verificar_ocupacion_compartimentos(), [])
+
+    def test_verificacion_detecta_y_repara_desfase(self):
+        """CP-INV-05: El control de consistencia detecta un resumen alterado y lo repara."""
+        self.crear_lote(cantidad=10)
+        OcupacionCompartimento.objects.filter(compartimento=self.compartimento).update(total_cantidad_insumos=99)
+
+        diferencias = verificar_ocupacion_compartimentos(reparar=True)
+        self.assertEqual(diferencias, [(self.compartimento.id, (0, 1, 99), (0, 1, 10))])
+        self.assertEqual(OcupacionCompartimento.objects.get(compartimento=self.compartimento).total_cantidad_insumos, 10)
+        self.assertEqual(verificar_ocupacion_compartimentos(), [])
+
+
+
+
+class SincronizacionMovilTest(InventarioBaseTestCase):
+    """
+    Pruebas del feed incremental (upserts/tombstones) para la App móvil.
+    """
+
+    def _feed(self, desde):
+        # Los cambios recién anotados quedan fuera por el margen de commits concurrentes
+        CambioSincronizacion.objects.update(fecha=timezone.now() - timedelta(minutes=1))
+        return obtener_cambios_sincronizacion(self.estacion, desde)
+
+    def test_feed_entrega_upserts_tombstones_y_resync(self):
+        """CP-INV-06: El feed colapsa cambios por objeto, informa eliminaciones y exige resync al vencer la retención."""
+        inicial = self._feed(None)
+        self.assertTrue(inicial['requiere_resync'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activo = self.crear_activo()
+            activo.notas_adicionales = "Revisado"
+            activo.save(update_fields=['notas_adicionales'])  # Campo fuera del feed: no genera cambio
+            lote = self.crear_lote(cantidad=5)
+            lote_id = str(lote.id)
+            lote.delete()
+
+        feed = self._feed(inicial['cursor'])
+        self.assertFalse(feed['requiere_resync'])
+        self.assertEqual([a['codigo_activo'] for a in feed['actualizados']['activo']], [activo.codigo_activo])
+        self.assertEqual(feed['eliminados']['lote'], [lote_id])
+        self.assertEqual(self._feed(feed['cursor'])['actualizados'], {})
+
+        # Retención: se purga todo lo antiguo salvo el último registro; el cursor inicial queda atrás
+        CambioSincronizacion.objects.update(fecha=timezone.now() - timedelta(days=365))
+        purgar_cambios_sincronizacion(dias=30)
+        self.assertEqual(CambioSincronizacion.objects.count(), 1)
+        self.assertTrue(obtener_cambios_sincronizacion(self.estacion, inicial['cursor'])['requiere_resync'])
+        self.assertFalse(obtener_cambios_sincronizacion(self.estacion, feed['cursor'])['requiere_resync'])
+
+    def test_insercion_fija_la_fecha_del_cambio(self):
+        """CP-INV-16: Un cambio registrado al inicio de una transacción larga toma la fecha del commit, no la del registro."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            registrar_cambios_sincronizacion(CambioSincronizacion.Modelo.UBICACION, [self.ubicacion.id], self.estacion.id)
+        CambioSincronizacion.objects.update(fecha=timezone.now() - timedelta(minutes=1))
+        cursor = cursor_sincronizacion_actual()
+
+        # La transacción tarda en confirmar: al insertar, el registro ya es más antiguo que el margen
+        time.sleep(0.05)
+        antes_del_commit = timezone.now()
+        for callback in callbacks:
+            if callback.__module__ == 'apps.gestion_inventario.services':
+                callback()
+
+        cambio = CambioSincronizacion.objects.latest('id')
+        self.assertGreaterEqual(cambio.fecha, antes_del_commit)
+        self.assertEqual(cursor_sincronizacion_actual(), cursor)
+
+
+
+
+class PrestamoVencidoTest(InventarioBaseTestCase):
+    """
+    Pruebas del marcado de préstamos vencidos.
+    """
+
+    def test_tarea_marca_vencidos_y_cierre_limpia_marca(self):
+        """CP-INV-07: La tarea marca en bloque los préstamos abiertos atrasados; completarlos quita la marca."""
+        destinatario = Destinatario.objects.create(estacion=self.estacion, nombre_entidad="Clínica Test")
+        hoy = timezone.localdate()
+        abierto = Prestamo.objects.create(estacion=self.estacion, usuario_responsable=self.user, destinatario=destinatario, fecha_devolucion_esperada=hoy)
+        cerrado = Prestamo.objects.create(estacion=self.estacion, usuario_responsable=self.user, destinatario=destinatario,
+                                          fecha_devolucion_esperada=hoy, estado=Prestamo.EstadoPrestamo.COMPLETADO)
+        self.assertFalse(abierto.esta_vencido)
+
+        # Pasa el tiempo sin que nadie guarde el préstamo
+        manana = hoy + timedelta(days=1)
+        self.assertEqual(prestamos_vencidos(self.estacion, hoy=manana).count(), 1)
+        self.assertEqual(marcar_prestamos_vencidos(hoy=manana), 1)
+        self.assertEqual(marcar_prestamos_vencidos(hoy=manana), 0)
+
+        abierto.refresh_from_db()
+        cerrado.refresh_from_db()
+        self.assertTrue(abierto.esta_vencido)
+        self.assertFalse(cerrado.esta_vencido)
+
+        Prestamo.objects.filter(pk=abierto.pk).update(fecha_devolucion_esperada=hoy - timedelta(days=3))
+        abierto.refresh_from_db()
+        abierto.estado = Prestamo.EstadoPrestamo.COMPLETADO
+        abierto.save(update_fields=['estado', 'updated_at'])
+        abierto.refresh_from_db()
+        self.assertFalse(abierto.esta_vencido)
+
+
+
+
+class ConsumoFEFOTest(InventarioBaseTestCase):
+    """
+    Pruebas de la selección de lotes por vencimiento (FEFO).
+    """
+
+    def test_plan_y_aplicacion_respetan_orden_de_vencimiento(self):
+        """CP-INV-08: Se consume primero lo que vence antes, sin lotes vencidos; sin stock suficiente no se toca nada."""
+        hoy = timezone.localdate()
+        vencido = self.crear_lote(10)
+        tardio = self.crear_lote(10)
+        temprano = self.crear_lote(5)
+        sin_fecha = self.crear_lote(10)
+        LoteInsumo.objects.filter(pk=vencido.pk).update(fecha_expiracion=hoy - timedelta(days=1))
+        LoteInsumo.objects.filter(pk=tardio.pk).update(fecha_expiracion=hoy + timedelta(days=60))
+        LoteInsumo.objects.filter(pk=temprano.pk).update(fecha_expiracion=hoy + timedelta(days=5))
+
+        plan = planificar_consumo_fefo(self.producto_insumo, 12, self.estacion)
+        self.assertEqual([(lote.pk, n) for lote, n in plan['asignaciones']], [(temprano.pk, 5), (tardio.pk, 7)])
+
+        with self.assertRaises(ValidationError):
+            aplicar_consumo_fefo(self.producto_insumo, 26, self.estacion, self.user)
+        self.assertEqual(MovimientoInventario.objects.count(), 0)
+
+        aplicar_consumo_fefo(self.producto_insumo, 20, self.estacion, self.user, notas="Incendio")
+        cantidades = dict(LoteInsumo.objects.values_list('pk', 'cantidad'))
+        self.assertEqual(cantidades[temprano.pk], 0)
+        self.assertEqual(cantidades[tardio.pk], 0)
+        self.assertEqual(cantidades[sin_fecha.pk], 5)
+        self.assertEqual(cantidades[vencido.pk], 10)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento=TipoMovimiento.SALIDA).count(), 3)
+        self.assertEqual(self.compartimento.ocupacion.total_cantidad_insumos, 15)
+
+
+
+
+class ValorizacionInventarioTest(InventarioBaseTestCase):
+    """
+    Pruebas de la valorización precalculada del inventario.
+    """
+
+    def test_resumen_se_mantiene_con_recepcion_consumo_baja_y_costo(self):
+        """CP-INV-09: La valorización refleja altas, consumos, bajas y cambios de costo sin recorrer existencias."""
+        Producto.objects.filter(pk=self.producto_activo.pk).update(costo_compra=50000)
+        self.producto_insumo.costo_compra = 1000
+        self.producto_insumo.save()
+
+        activo = self.crear_activo()
+        self.crear_activo()
+        lote = self.crear_lote(30)
+
+        reporte = resumen_valorizacion(self.estacion, 'categoria')
+        self.assertEqual(reporte['totales']['valor'], 2 * 50000 + 30 * 1000)
+        self.assertEqual(reporte['grupos'][0]['nombre'], "Rescate")
+
+        # Consumo y cambio de costo
+        lote.cantidad = 10
+        lote.save(update_fields=['cantidad', 'updated_at'])
+        self.producto_insumo.costo_compra = 2000
+        self.producto_insumo.save(update_fields=['costo_compra'])
+
+        # Baja: sale del valor patrimonial pero se conserva en el resumen
+        de_baja = Estado.objects.create(nombre="DE BAJA", tipo_estado=self.extraviado.tipo_estado)
+        activo.estado = de_baja
+        activo.save()
+
+        self.assertEqual(resumen_valorizacion(self.estacion)['totales']['valor'], 50000 + 10 * 2000)
+        por_estado = resumen_valorizacion(self.estacion, 'estado', incluir_sin_valor=True)
+        self.assertEqual({g['nombre']: g['valor'] for g in por_estado['grupos']}, {"DISPONIBLE": 70000, "DE BAJA": 50000})
+
+        lote.delete()
+        self.assertEqual(resumen_valorizacion(self.estacion)['totales']['insumos'], 0)
+        self.assertEqual(verificar_valorizacion(), [])
+
+
+
+
+class InventarioEnVivoTest(InventarioBaseTestCase):
+    """
+    Pruebas del canal en vivo del inventario (sin Redis: modo long-poll).
+    """
+
+    def test_flujo_entrega_snapshot_por_estado_y_cierra(self):
+        """CP-INV-10: Sin Redis el flujo SSE entrega un snapshot de la estación y termina."""
+        self.crear_activo()
+        self.crear_lote(30)
+
+        async def recolectar():
+            return [parte async for parte in flujo_eventos(self.estacion.id, duracion=60)]
+
+        eventos = async_to_sync(recolectar)()
+
+        self.assertEqual(eventos[0], "retry: 60000\n\n")
+        self.assertEqual(len(eventos), 2)
+        cabecera, datos = eventos[1].strip().split("\n")
+        self.assertEqual(cabecera, "event: snapshot")
+        self.assertEqual(json.loads(datos[len("data: "):]), {"DISPONIBLE": {"activos": 1, "insumos": 30}})
+
+
+
+
+class CambioEstadoMasivoTest(InventarioBaseTestCase):
+    """
+    Pruebas del cambio de estado masivo de existencias.
+    """
+
+    def test_todo_o_nada_y_modo_parcial(self):
+        """CP-INV-11: Una existencia inválida bloquea el lote completo salvo en modo parcial."""
+        Estado.objects.create(nombre="DE BAJA", tipo_estado=self.extraviado.tipo_estado)
+        activo = self.crear_activo()
+        perdido = self.crear_activo()
+        perdido.estado = self.extraviado
+        perdido.save()
+        lote = self.crear_lote(20)
+
+        kwargs = {'activo_ids': [activo.id, perdido.id], 'lote_ids': [lote.id], 'notas': "Incendio"}
+        resultado = cambiar_estado_existencias('baja', self.estacion, self.user, **kwargs)
+        self.assertFalse(resultado['aplicado'])
+        self.assertEqual([r['id'] for r in resultado['rechazados']], [str(perdido.id)])
+        self.assertEqual(MovimientoInventario.objects.count(), 0)
+
+        resultado = cambiar_estado_existencias('baja', self.estacion, self.user, parcial=True, **kwargs)
+        self.assertTrue(resultado['aplicado'])
+        activo.refresh_from_db()
+        lote.refresh_from_db()
+        self.assertEqual((activo.estado.nombre, lote.estado.nombre, lote.cantidad), ("DE BAJA", "DE BAJA", 0))
+        self.assertEqual(
+            sorted(MovimientoInventario.objects.values_list('cantidad_movida', flat=True)), [-20, -1]
+        )
+        self.assertEqual(verificar_ocupacion_compartimentos(), [])
+        self.assertEqual(verificar_valorizacion(), [])
+
+        with self.assertRaises(ValidationError):
+            cambiar_estado_existencias('extraviado', self.estacion, self.user, lote_ids=[lote.id])
+
+    def test_transiciones_de_mantenimiento(self):
+        """CP-INV-15: Revisión, reparación y habilitación cambian el estado sin descontar stock y respetan las órdenes abiertas."""
+        from apps.gestion_mantenimiento.models import OrdenMantenimiento
+        no_operativo = self.extraviado.tipo_estado
+        Estado.objects.create(nombre="PENDIENTE REVISIÓN", tipo_estado=no_operativo)
+        Estado.objects.create(nombre="EN REPARACIÓN", tipo_estado=no_operativo)
+        activo = self.crear_activo()
+        lote = self.crear_lote(20)
+
+        cambiar_estado_existencias('revision', self.estacion, self.user, lote_ids=[lote.id])
+        resultado = cambiar_estado_existencias('reparacion', self.estacion, self.user, activo_ids=[activo.id])
+        self.assertTrue(resultado['aplicado'])
+        activo.refresh_from_db()
+        lote.refresh_from_db()
+        self.assertEqual((activo.estado.nombre, activo.compartimento_id), ("EN REPARACIÓN", self.compartimento.id))
+        self.assertEqual((lote.estado.nombre, lote.cantidad), ("PENDIENTE REVISIÓN", 20))
+        self.assertEqual(set(MovimientoInventario.objects.values_list('cantidad_movida', flat=True)), {0})
+
+        orden = OrdenMantenimiento.objects.create(
+            estacion=self.estacion, fecha_programada=timezone.now(), estado=OrdenMantenimiento.EstadoOrden.EN_CURSO
+        )
+        orden.activos_afectados.add(activo)
+        kwargs = {'activo_ids': [activo.id], 'lote_ids': [lote.id]}
+        resultado = cambiar_estado_existencias('habilitar', self.estacion, self.user, **kwargs)
+        self.assertFalse(resultado['aplicado'])
+        self.assertEqual([r['id'] for r in resultado['rechazados']], [str(activo.id)])
+
+        orden.estado = OrdenMantenimiento.EstadoOrden.REALIZADA
+        orden.save()
+        self.assertTrue(cambiar_estado_existencias('habilitar', self.estacion, self.user, **kwargs)['aplicado'])
+        activo.refresh_from_db()
+        self.assertEqual(activo.estado, self.disponible)
+        self.assertEqual(verificar_valorizacion(), [])
+
+    def test_extravio_de_prestados_cierra_el_prestamo(self):
+        """CP-INV-12: Extraviar en bloque activos prestados salda sus líneas y cierra el préstamo."""
+        prestado = Estado.objects.create(nombre="EN PRÉSTAMO EXTERNO", tipo_estado=self.extraviado.tipo_estado)
+        destinatario = Destinatario.objects.create(estacion=self.estacion, nombre_entidad="Clínica Test")
+        prestamo = Prestamo.objects.create(estacion=self.estacion, usuario_responsable=self.user, destinatario=destinatario)
+        activos = [self.crear_activo(), self.crear_activo()]
+        for activo in activos:
+            activo.estado = prestado
+            activo.save()
+            PrestamoDetalle.objects.create(prestamo=prestamo, activo=activo)
+
+        resultado = cambiar_estado_existencias('extraviado', self.estacion, self.user, activo_ids=[activos[0].id])
+        self.assertTrue(resultado['aplicado'])
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.estado, Prestamo.EstadoPrestamo.PENDIENTE)
+
+        cambiar_estado_existencias('extraviado', self.estacion, self.user, activo_ids=[activos[1].id])
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.estado, Prestamo.EstadoPrestamo.COMPLETADO)
+        self.assertEqual(set(MovimientoInventario.objects.values_list('cantidad_movida', flat=True)), {0})
+
+
+
+
+class PlantillaCargaTest(InventarioBaseTestCase):
+    """
+    Pruebas de las plantillas de carga de vehículos y su comparación con el stock real.
+    """
+
+    def test_plantilla_desde_carga_y_diferencias_en_lote(self):
+        """CP-INV-13: La revisión de todos los vehículos usa dos consultas y detecta faltantes."""
+        otro = Ubicacion.objects.create(nombre="B-2", estacion=self.estacion, tipo_ubicacion=self.ubicacion.tipo_ubicacion)
+        self.crear_activo()
+        lote = self.crear_lote(10)
+        LoteInsumo.objects.create(
+            producto=self.producto_insumo, estado=self.disponible, cantidad=5,
+            compartimento=Compartimento.objects.get(ubicacion=otro, nombre="General")
+        )
+        crear_plantilla_desde_carga(self.ubicacion)
+        crear_plantilla_desde_carga(otro)
+
+        with self.assertNumQueries(2):
+            resultados = comparar_cargas(self.estacion)
+        self.assertEqual(len(resultados), 2)
+        self.assertTrue(all(r['completo'] for r in resultados))
 
-# Create your tests here.
+        # Consumo parcial y lote vencido: ya no cuentan como carga
+        lote.cantidad = 4
+        lote.fecha_expiracion = timezone.localdate() - timedelta(days=1)
+        lote.save()
+        resultado = comparar_cargas(self.estacion, [self.ubicacion.id])[0]
+        self.assertFalse(resultado['completo'])
+        self.assertEqual((resultado['lineas_faltantes'], resultado['unidades_faltantes']), (1, 10))
@@ -0,0 +1,189 @@
+"""
+Canal en vivo del inventario por estación (Server-Sent Events sobre Redis pub/sub).
+
+Quien escribe en el inventario publica deltas compactos en el canal de la estación al
+confirmar la transacción; las conexiones SSE abiertas (dashboard web y App) los reenvían
+tal cual, por lo que los clientes se actualizan sin volver a ejecutar las agregaciones.
+
+Eventos:
+- 'snapshot': al conectar, totales por estado de toda la estación (desde ValorizacionInventario).
+- 'estados': totales absolutos de los estados que cambiaron (idempotente: reemplaza, no suma).
+- 'movimientos': resumen de los movimientos de inventario recién registrados.
+
+Si no hay un Redis configurado (p.ej. broker en memoria durante las pruebas) la publicación
+se omite y el flujo solo entrega el snapshot, degradando a un long-poll. Lo mismo ocurre bajo
+WSGI (ver flujo_para_peticion): solo el modo ASGI mantiene las conexiones abiertas.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import ValorizacionInventario
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se envía un comentario SSE para mantener viva la conexión (proxies, balanceadores)
+INTERVALO_LATIDO = 15
+
+_cliente = None
+
+
+
+
+def canal_estacion(estacion_id):
+    return f"inventario:estacion:{estacion_id}"
+
+
+def _url_redis():
+    """URL del Redis del canal en vivo, o None si no está configurado."""
+    url = getattr(settings, 'INVENTARIO_TIEMPO_REAL_REDIS_URL', '') or ''
+    return url if url.startswith(('redis://', 'rediss://', 'unix://')) else None
+
+
+def _cliente_redis():
+    """Cliente Redis compartido por el proceso (para publicar), o None si no está configurado."""
+    global _cliente
+    url = _url_redis()
+    if url is None:
+        return None
+    if _cliente is None:
+        import redis
+        _cliente = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=5)
+    return _cliente
+
+
+def _publicar(estacion_id, evento, datos):
+    cliente = _cliente_redis()
+    if cliente is None or not estacion_id:
+        return
+    try:
+        cliente.publish(canal_estacion(estacion_id), json.dumps({'evento': evento, 'datos': datos}, default=str))
+    except Exception as e:
+        # El canal en vivo es un acelerador: nunca debe hacer fallar una operación de inventario
+        logger.warning(f"No se pudo publicar el evento '{evento}' de la estación {estacion_id}: {e}")
+
+
+
+
+def totales_por_estado(estacion_id, estado_ids=None):
+    """{nombre_estado: {'activos': n, 'insumos': n}} de la estación, leído del resumen precalculado."""
+    filas = ValorizacionInventario.objects.filter(estacion_id=estacion_id)
+    if estado_ids is not None:
+        filas = filas.filter(estado_id__in=estado_ids)
+    return {
+        fila['estado__nombre']: {'activos': fila['activos'], 'insumos': fila['insumos']}
+        for fila in filas.values('estado__nombre').annotate(
+            activos=Sum('cantidad_activos'), insumos=Sum('cantidad_insumos')
+        ).order_by()
+    }
+
+
+def publicar_estados(pares):
+    """
+    Publica, al confirmar la transacción, los totales actualizados de los estados afectados.
+    `pares` es un conjunto de (estacion_id, estado_id). Los estados que quedaron sin existencias
+    se publican en cero.
+    """
+    if _cliente_redis() is None or not pares:
+        return
+    por_estacion = {}
+    for estacion_id, estado_id in pares:
+        por_estacion.setdefault(estacion_id, set()).add(estado_id)
+
+    def enviar():
+        from .models import Estado
+        for estacion_id, estado_ids in por_estacion.items():
+            datos = {nombre: {'activos': 0, 'insumos': 0} for nombre in Estado.objects.filter(id__in=estado_ids).values_list('nombre', flat=True)}
+            datos.update(totales_por_estado(estacion_id, estado_ids))
+            _publicar(estacion_id, 'estados', datos)
+
+    transaction.on_commit(enviar)
+
+
+def publicar_movimientos(estacion_id, movimientos):
+    """Publica, al confirmar la transacción, un resumen compacto de los movimientos registrados."""
+    if _cliente_redis() is None or not movimientos:
+        return
+    datos = [
+        {'tipo': m.tipo_movimiento, 'cantidad': m.cantidad_movida, 'fecha': m.fecha_hora}
+        for m in movimientos
+    ]
+    transaction.on_commit(lambda: _publicar(estacion_id, 'movimientos', datos))
+
+
+
+
+def _formato_sse(evento, datos):
+    return f"event: {evento}\ndata: {json.dumps(datos, default=str, separators=(',', ':'))}\n\n"
+
+
+def flujo_snapshot(estacion_id, duracion=None):
+    """Long-poll: un único snapshot y reconexión del cliente tras `duracion` segundos."""
+    duracion = duracion or settings.INVENTARIO_TIEMPO_REAL_DURACION
+    yield f"retry: {duracion * 1000}\n\n"
+    yield _formato_sse('snapshot', totales_por_estado(estacion_id))
+
+
+async def flujo_eventos(estacion_id, duracion=None):
+    """
+    Generador SSE asíncrono para una conexión: snapshot inicial y luego los eventos del canal de
+    la estación hasta completar `duracion` segundos. Al cerrar, el EventSource del cliente se
+    reconecta solo (y recibe un snapshot fresco).
+
+    La suscripción usa redis.asyncio: la espera de mensajes no ocupa un hilo, por lo que cada
+    conexión abierta cuesta una corrutina del event loop del worker y su conexión a Redis.
+    """
+    duracion = duracion or settings.INVENTARIO_TIEMPO_REAL_DURACION
+    url = _url_redis()
+
+    # Sin Redis: un único snapshot y reconexión espaciada (long-poll)
+    if url is None:
+        for parte in await sync_to_async(lambda: list(flujo_snapshot(estacion_id, duracion)))():
+            yield parte
+        return
+
+    import redis.asyncio
+
+    cliente = redis.asyncio.Redis.from_url(url, socket_connect_timeout=1)
+    pubsub = cliente.pubsub(ignore_subscribe_messages=True)
+    try:
+        # Se suscribe ANTES de leer el snapshot: un cambio intermedio llega dos veces, nunca se pierde
+        await pubsub.subscribe(canal_estacion(estacion_id))
+        yield "retry: 3000\n\n"
+        yield _formato_sse('snapshot', await sync_to_async(totales_por_estado)(estacion_id))
+
+        limite = time.monotonic() + duracion
+        while time.monotonic() < limite:
+            mensaje = await pubsub.get_message(timeout=INTERVALO_LATIDO)
+            if mensaje is None:
+                yield ": latido\n\n"
+                continue
+            contenido = json.loads(mensaje['data'])
+            yield _formato_sse(contenido['evento'], contenido['datos'])
+    except Exception as e:
+        logger.warning(f"Flujo en vivo de la estación {estacion_id} interrumpido: {e}")
+    finally:
+        # También al desconectarse el cliente (cancelación): la conexión a Redis no queda abierta
+        try:
+            await pubsub.aclose()
+            await cliente.aclose()
+        except Exception:
+            pass
+
+
+def flujo_para_peticion(request, estacion_id):
+    """
+    Flujo SSE según el servidor que atiende la petición (HttpRequest de Django). Bajo WSGI cada
+    conexión abierta ocuparía un hilo de gunicorn durante toda su duración, así que solo se
+    entrega el snapshot (long-poll); el flujo en vivo queda para el modo ASGI, donde la espera
+    no bloquea al worker.
+    """
+    if isinstance(request, ASGIRequest):
+        return flujo_eventos(estacion_id)
+    return flujo_snapshot(estacion_id)
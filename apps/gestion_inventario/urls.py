@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     InventarioInicioView, 
+    InventarioEnVivoView,
     AreaListaView,
     AreaCrearView,
     AreaEditarView,
@@ -25,15 +26,19 @@ from .views import (
     ContactoPersonalizadoEditarView,
     StockActualListView,
     VehiculoListaView,
+    VerificacionCargaView,
+    PlantillaCargaView,
     RecepcionStockView,
     AgregarStockACompartimentoView,
     DetalleExistenciaView,
     AnularExistenciaView,
     AjustarStockLoteView,
     MovimientoInventarioListView,
+    ValorizacionInventarioView,
     BajaExistenciaView,
     ExtraviadoExistenciaView,
     ConsumirStockLoteView,
+    ConsumirStockFEFOView,
     RegistrarUsoActivoView,
     TransferenciaExistenciaView,
     GenerarQRView,
@@ -51,6 +56,8 @@ app_name = 'gestion_inventario'
 urlpatterns = [
     # Página Inicial de la gestión de inventario
     path('', InventarioInicioView.as_view(), name="ruta_inicio"),
+    # Canal en vivo del dashboard (SSE)
+    path('en-vivo/', InventarioEnVivoView.as_view(), name="ruta_inventario_en_vivo"),
 
     # Lista de áreas
     path('areas/', AreaListaView.as_view(), name="ruta_lista_areas"),
@@ -77,6 +84,10 @@ urlpatterns = [
     path('vehiculos/crear/', VehiculoCrearView.as_view(), name='ruta_crear_vehiculo'),
     # Editar Vehículo
     path('vehiculos/<uuid:ubicacion_id>/editar/', VehiculoEditarView.as_view(), name='ruta_editar_vehiculo'),
+    # Revisión de carga de todos los vehículos contra sus plantillas
+    path('vehiculos/verificacion-carga/', VerificacionCargaView.as_view(), name='ruta_verificacion_carga'),
+    # Plantilla de carga de un vehículo (esperado vs. real)
+    path('vehiculos/<uuid:ubicacion_id>/plantilla-carga/', PlantillaCargaView.as_view(), name='ruta_plantilla_carga'),
 
     # Eliminar ubicación
     path('ubicaciones/<uuid:ubicacion_id>/eliminar/', UbicacionDeleteView.as_view(), name='ruta_eliminar_ubicacion'),
@@ -126,6 +137,8 @@ urlpatterns = [
     path('existencia/<str:tipo_item>/<uuid:item_id>/extraviado/', ExtraviadoExistenciaView.as_view(), name='ruta_extraviado_existencia'),
     # Consumir stock (lotes de insumos)
     path('lotes/<uuid:lote_id>/consumir/', ConsumirStockLoteView.as_view(), name='ruta_consumir_stock_lote'),
+    # Consumir stock de un producto repartido por vencimiento (FEFO)
+    path('catalogo-local/producto/<int:pk>/consumir-fefo/', ConsumirStockFEFOView.as_view(), name='ruta_consumir_stock_fefo'),
     # Mover/Trasferir existencias (interno
     path('existencia/<str:tipo_item>/<uuid:item_id>/mover/', TransferenciaExistenciaView.as_view(), name='ruta_mover_existencia'),
     # Registrar horas de uso
@@ -145,6 +158,9 @@ urlpatterns = [
     # Historial de movimientos
     path('movimientos/', MovimientoInventarioListView.as_view(), name='ruta_historial_movimientos'),
 
+    # Reporte de valorización del inventario (precalculado)
+    path('valorizacion/', ValorizacionInventarioView.as_view(), name='ruta_valorizacion_inventario'),
+
     # Generar Código QR: Esta ruta capturará cualquier string (ej: E1-ACT-00123)
     path('generar-qr/<str:codigo>/', GenerarQRView.as_view(), name='ruta_generar_qr'),
     # Imprimir etiquetas QR
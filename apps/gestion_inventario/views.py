@@ -1,16 +1,19 @@
+import csv
 import json
 import datetime
 import qrcode
 import io
 import uuid
+import openpyxl
 from itertools import chain
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db import IntegrityError, transaction
 from django.shortcuts import render, redirect
 from django.views import View
 from django.views.generic import TemplateView, DeleteView, UpdateView, ListView, DetailView, CreateView, FormView
 from django.views.generic.detail import SingleObjectMixin
-from django.http import HttpResponseRedirect, Http404, HttpResponseBadRequest, FileResponse
+from django.http import HttpResponse, HttpResponseRedirect, Http404, HttpResponseBadRequest, FileResponse, StreamingHttpResponse
 from django.db import models
 from django.db.models import Count, Sum, Q, Subquery, OuterRef, ProtectedError, Value, Case, When, CharField, F, Max
 from django.db.models.functions import Coalesce
@@ -18,6 +21,7 @@ from django.urls import reverse, reverse_lazy
 from django.contrib import messages
 from django.shortcuts import get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.exceptions import ValidationError
 from django.db.models.functions import Coalesce
 from dateutil.relativedelta import relativedelta
 from django.db.models.functions import Coalesce, Abs
@@ -31,6 +35,7 @@ from core.settings import (
 from apps.common.mixins import BaseEstacionMixin, AuditoriaMixin, CustomPermissionRequiredMixin
 from .mixins import UbicacionMixin, InventoryStateValidatorMixin, StationInventoryObjectMixin
 from .utils import get_or_create_anulado_compartment, get_or_create_extraviado_compartment
+from .tiempo_real import flujo_para_peticion
 from .models import (
     Estacion, 
     Ubicacion, 
@@ -53,7 +58,9 @@ from .models import (
     Destinatario,
     MovimientoInventario,
     TipoMovimiento,
-    RegistroUsoActivo
+    RegistroUsoActivo,
+    PlantillaCarga,
+    ItemPlantillaCarga
     )
 from .forms import (
     AreaForm, 
@@ -76,6 +83,8 @@ from .forms import (
     BajaExistenciaForm,
     ExtraviadoExistenciaForm,
     LoteConsumirForm,
+    ConsumoFEFOForm,
+    ItemPlantillaCargaForm,
     MovimientoFilterForm,
     RegistroUsoForm,
     TransferenciaForm,
@@ -86,6 +95,16 @@ from .forms import (
     DestinatarioForm,
     EtiquetaFilterForm
     )
+from .services import (
+    prestamos_vencidos,
+    filtrar_prestamos_vencidos,
+    planificar_consumo_fefo,
+    aplicar_consumo_fefo,
+    resumen_valorizacion,
+    DIMENSIONES_VALORIZACION,
+    comparar_cargas,
+    crear_plantilla_desde_carga
+)
 from apps.gestion_mantenimiento.models import PlanActivoConfig, OrdenMantenimiento, RegistroMantenimiento
 
 
@@ -225,11 +244,9 @@ class InventarioInicioView(BaseEstacionMixin, TemplateView):
             estado__nombre='PENDIENTE REVISIÓN'
         )[:5]
 
-        context['alerta_prestamos_atrasados'] = Prestamo.objects.filter(
-            estacion_id=self.estacion_activa_id,
-            fecha_devolucion_esperada__lt=hoy,
-            estado=Prestamo.EstadoPrestamo.PENDIENTE
-        ).select_related('destinatario')[:5]
+        context['alerta_prestamos_atrasados'] = prestamos_vencidos(
+            self.estacion_activa_id, hoy=hoy
+        ).select_related('destinatario').order_by('fecha_devolucion_esperada')[:5]
 
         # 5. Widget de Actividad Reciente
         # Usamos Abs() en la DB para calcular el valor absoluto sin iterar en Python
@@ -250,6 +267,22 @@ class InventarioInicioView(BaseEstacionMixin, TemplateView):
 
 
 
+class InventarioEnVivoView(BaseEstacionMixin, View):
+    """
+    Canal SSE (text/event-stream) con los totales por estado de la estación activa.
+    Lo consume el dashboard de inicio para actualizar tarjetas y gráfico sin recargar ni
+    volver a ejecutar las agregaciones (ver tiempo_real.py).
+    """
+    def get(self, request, *args, **kwargs):
+        respuesta = StreamingHttpResponse(flujo_para_peticion(request, self.estacion_activa_id), content_type='text/event-stream')
+        respuesta['Cache-Control'] = 'no-cache'
+        # Nginx no debe acumular el flujo en su búfer
+        respuesta['X-Accel-Buffering'] = 'no'
+        return respuesta
+
+
+
+
 class AreaListaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
     """
     Vista para listar las Áreas (Ubicaciones) de la estación activa,
@@ -268,11 +301,11 @@ class AreaListaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
             .filter(tipo_ubicacion__nombre=AREA_NOMBRE)
             .annotate(
                 # 1. Contar el número de compartimentos
-                total_compartimentos=Count('compartimento', distinct=True),
-                # 2. Contar el número de Activos únicos
-                total_activos=Count('compartimento__activo', distinct=True),
-                # 3. Sumar la CANTIDAD de todos los Lotes de Insumos
-                total_cantidad_insumos=Coalesce(Sum('compartimento__loteinsumo__cantidad'), 0)
+                total_compartimentos=Count('compartimento'),
+                # 2 y 3. Totales derivados de la ocupación precalculada de cada compartimento
+                # (una fila por compartimento, sin recorrer Activos ni Lotes)
+                total_activos=Coalesce(Sum('compartimento__ocupacion__total_activos'), 0),
+                total_cantidad_insumos=Coalesce(Sum('compartimento__ocupacion__total_cantidad_insumos'), 0)
             )
             .select_related('tipo_ubicacion') # Optimiza la carga del tipo_ubicacion
             .order_by('nombre') # Ordenamos alfabéticamente
@@ -402,8 +435,8 @@ class UbicacionDetalleView(BaseEstacionMixin, CustomPermissionRequiredMixin, Ubi
         ubicacion = self.object
 
         compartimentos_con_stock = Compartimento.objects.filter(ubicacion=ubicacion).annotate(
-            total_activos=Count('activo', distinct=True),
-            total_cantidad_insumos=Coalesce(Sum('loteinsumo__cantidad'), 0)
+            total_activos=Coalesce(F('ocupacion__total_activos'), 0),
+            total_cantidad_insumos=Coalesce(F('ocupacion__total_cantidad_insumos'), 0)
         ).order_by('nombre')
 
         # 4. Calcular el resumen de stock total para el área (Tarjeta Izquierda)
@@ -670,9 +703,9 @@ class VehiculoListaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
                 estacion_id=self.estacion_activa
             )
             .annotate(
-                total_compartimentos=Count('compartimento', distinct=True),
-                total_activos=Count('compartimento__activo', distinct=True),
-                total_cantidad_insumos=Coalesce(Sum('compartimento__loteinsumo__cantidad'), 0)
+                total_compartimentos=Count('compartimento'),
+                total_activos=Coalesce(Sum('compartimento__ocupacion__total_activos'), 0),
+                total_cantidad_insumos=Coalesce(Sum('compartimento__ocupacion__total_cantidad_insumos'), 0)
             )
             # Incluimos detalles del vehículo y su tipo para mostrar en la tabla
             .select_related(
@@ -703,6 +736,145 @@ class VehiculoListaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
 
 
 
+class VerificacionCargaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
+    """
+    Revisión de carga de todos los vehículos de la estación (p.ej. en el cambio de guardia):
+    compara cada plantilla de carga con las existencias reales en dos consultas en total.
+    """
+    permission_required = "gestion_usuarios.accion_gestion_inventario_ver_ubicaciones"
+    template_name = "gestion_inventario/pages/verificacion_carga.html"
+
+    def get(self, request):
+        resultados = comparar_cargas(self.estacion_activa)
+        con_plantilla = {r['ubicacion_id'] for r in resultados}
+        sin_plantilla = (
+            Ubicacion.objects.filter(tipo_ubicacion__nombre__iexact=VEHICULO_NOMBRE, estacion_id=self.estacion_activa_id)
+            .exclude(id__in=con_plantilla).order_by('nombre')
+        )
+        context = {
+            'resultados': resultados,
+            'sin_plantilla': sin_plantilla,
+            'vehiculos_completos': sum(1 for r in resultados if r['completo']),
+        }
+        return render(request, self.template_name, context)
+
+
+
+
+class PlantillaCargaView(BaseEstacionMixin, CustomPermissionRequiredMixin, UbicacionMixin, AuditoriaMixin, View):
+    """
+    Plantilla de carga de un vehículo: muestra cada línea esperada junto a lo que hay realmente
+    y permite (con permiso de gestión de ubicaciones) copiar la carga actual como plantilla,
+    agregar líneas y ajustar o quitar cantidades.
+    """
+    template_name = 'gestion_inventario/pages/plantilla_carga.html'
+    permission_required = "gestion_usuarios.accion_gestion_inventario_ver_ubicaciones"
+    model = Ubicacion
+
+    def get_permission_required(self):
+        # Ver la comparación basta con ver ubicaciones; modificar la plantilla requiere gestionarlas
+        if self.request.method == 'POST':
+            return ("gestion_usuarios.accion_gestion_inventario_gestionar_ubicaciones",)
+        return (self.permission_required,)
+
+    def get_object(self):
+        return get_object_or_404(
+            self.model,
+            id=self.kwargs.get('ubicacion_id'),
+            estacion_id=self.request.session.get('active_estacion_id'),
+            tipo_ubicacion__nombre=VEHICULO_NOMBRE
+        )
+
+    def get_success_url(self):
+        return reverse('gestion_inventario:ruta_plantilla_carga', kwargs={'ubicacion_id': self.object.id})
+
+    def get(self, request, *args, **kwargs):
+        return self.render_pagina(ItemPlantillaCargaForm(ubicacion=self.object))
+
+    def render_pagina(self, form):
+        resultado = comparar_cargas(self.estacion_activa, [self.object.id])
+        context = {
+            'ubicacion': self.object,
+            'plantilla': PlantillaCarga.objects.filter(ubicacion=self.object).first(),
+            'resultado': resultado[0] if resultado else None,
+            'form': form,
+        }
+        return render(self.request, self.template_name, context)
+
+    def post(self, request, *args, **kwargs):
+        accion = request.POST.get('accion')
+
+        if accion == 'copiar_carga_actual':
+            plantilla = crear_plantilla_desde_carga(self.object)
+            self.auditar(
+                verbo="definió la plantilla de carga (desde la carga actual) del vehículo",
+                objetivo=self.object,
+                objetivo_repr=self.object.nombre,
+                detalles={'lineas': plantilla.items.count()}
+            )
+            messages.success(request, "Plantilla creada a partir de la carga actual del vehículo.")
+            return redirect(self.get_success_url())
+
+        if accion == 'agregar':
+            form = ItemPlantillaCargaForm(request.POST, ubicacion=self.object)
+            if not form.is_valid():
+                messages.error(request, "Revisa los datos de la línea a agregar.")
+                return self.render_pagina(form)
+            plantilla, _ = PlantillaCarga.objects.get_or_create(ubicacion=self.object, defaults={'estacion_id': self.estacion_activa_id})
+            ItemPlantillaCarga.objects.update_or_create(
+                plantilla=plantilla,
+                compartimento=form.cleaned_data['compartimento'],
+                producto=form.cleaned_data['producto'],
+                defaults={'cantidad_requerida': form.cleaned_data['cantidad_requerida']}
+            )
+            self.auditar(
+                verbo="agregó una línea a la plantilla de carga del vehículo",
+                objetivo=self.object,
+                objetivo_repr=self.object.nombre,
+                detalles={
+                    'compartimento': form.cleaned_data['compartimento'].nombre,
+                    'producto': form.cleaned_data['producto'].producto_global.nombre_oficial,
+                    'cantidad': form.cleaned_data['cantidad_requerida']
+                }
+            )
+            messages.success(request, "Línea agregada a la plantilla.")
+            return redirect(self.get_success_url())
+
+        if accion == 'guardar':
+            # Campos 'cantidad_<item_id>': 0 quita la línea
+            items = ItemPlantillaCarga.objects.filter(plantilla__ubicacion=self.object)
+            modificados, eliminados = [], []
+            for item in items:
+                valor = request.POST.get(f'cantidad_{item.id}')
+                if valor is None or not valor.isdigit() or int(valor) == item.cantidad_requerida:
+                    continue
+                if int(valor) == 0:
+                    eliminados.append(item.id)
+                else:
+                    item.cantidad_requerida = int(valor)
+                    modificados.append(item)
+            with transaction.atomic():
+                ItemPlantillaCarga.objects.bulk_update(modificados, ['cantidad_requerida'])
+                ItemPlantillaCarga.objects.filter(id__in=eliminados).delete()
+                PlantillaCarga.objects.filter(ubicacion=self.object).update(updated_at=timezone.now())
+            if modificados or eliminados:
+                self.auditar(
+                    verbo="modificó la plantilla de carga del vehículo",
+                    objetivo=self.object,
+                    objetivo_repr=self.object.nombre,
+                    detalles={'lineas_modificadas': len(modificados), 'lineas_eliminadas': len(eliminados)}
+                )
+                messages.success(request, "Plantilla actualizada.")
+            else:
+                messages.warning(request, "No se realizó ningún cambio.")
+            return redirect(self.get_success_url())
+
+        messages.error(request, "Acción no reconocida.")
+        return redirect(self.get_success_url())
+
+
+
+
 class VehiculoCrearView(BaseEstacionMixin, CustomPermissionRequiredMixin, AuditoriaMixin, View):
     """
     Vista para crear un nuevo Vehículo.
@@ -946,8 +1118,8 @@ class CompartimentoListaView(BaseEstacionMixin, CustomPermissionRequiredMixin, V
             'ubicacion', 
             'ubicacion__tipo_ubicacion'
         ).annotate(
-            # 2. Optimización: Contar ítems para mostrar en la lista (opcional pero útil)
-            total_items=Count('activo', distinct=True) + Count('loteinsumo', distinct=True)
+            # 2. Optimización: Conteo de ítems leído desde la ocupación precalculada
+            total_items=Coalesce(F('ocupacion__total_activos') + F('ocupacion__total_lotes'), 0)
         )
 
         # 3. Filtros dinámicos (GET)
@@ -1107,8 +1279,8 @@ class CompartimentoDetalleView(BaseEstacionMixin, CustomPermissionRequiredMixin,
             'ubicacion', 
             'ubicacion__tipo_ubicacion'
         ).annotate(
-            total_activos_calc=Count('activo', distinct=True),
-            total_insumos_calc=Coalesce(Sum('loteinsumo__cantidad'), 0)
+            total_activos_calc=Coalesce(F('ocupacion__total_activos'), 0),
+            total_insumos_calc=Coalesce(F('ocupacion__total_cantidad_insumos'), 0)
         )
 
     def get_context_data(self, **kwargs):
@@ -3045,6 +3217,7 @@ class DetalleExistenciaView(BaseEstacionMixin, CustomPermissionRequiredMixin, Vi
     """
     permission_required = "gestion_usuarios.accion_gestion_inventario_ver_stock"
     template_name = 'gestion_inventario/pages/detalle_existencia.html'
+    MOVIMIENTOS_POR_PAGINA = 50
 
     def get(self, request, tipo_item, item_id):
         context = {}
@@ -3082,18 +3255,33 @@ class DetalleExistenciaView(BaseEstacionMixin, CustomPermissionRequiredMixin, Vi
             raise Http404("Tipo de ítem no válido")
 
         # 2. Contexto Común (Historial de Movimientos)
-        # Traemos los últimos 50 movimientos para la bitácora
+        # Páginas de 50 movimientos por cursor (keyset): "Ver anteriores" continúa desde el último
+        # mostrado (?antes_fecha=...&antes_id=...) usando el índice por existencia, sin OFFSET.
         movimientos = MovimientoInventario.objects.filter(
             estacion=self.estacion_activa
         ).filter(
             Q(activo=item) if tipo_item == 'activo' else Q(lote_insumo=item)
         ).select_related(
             'usuario', 'compartimento_origen', 'compartimento_destino'
-        ).order_by('-fecha_hora')[:50]
+        ).order_by('-fecha_hora', '-id')
+
+        antes_fecha = parse_datetime(request.GET.get('antes_fecha', ''))
+        antes_id = request.GET.get('antes_id', '')
+        paginando = antes_fecha is not None and antes_id.isdigit()
+        if paginando:
+            movimientos = movimientos.filter(
+                Q(fecha_hora__lt=antes_fecha) | Q(fecha_hora=antes_fecha, id__lt=int(antes_id))
+            )
+
+        movimientos = list(movimientos[:self.MOVIMIENTOS_POR_PAGINA + 1])
+        hay_mas = len(movimientos) > self.MOVIMIENTOS_POR_PAGINA
+        movimientos = movimientos[:self.MOVIMIENTOS_POR_PAGINA]
 
         context['item'] = item
         context['tipo_item'] = tipo_item # 'activo' o 'lote' para URLs
         context['historial_movimientos'] = movimientos
+        context['historial_paginando'] = paginando
+        context['historial_siguiente'] = movimientos[-1] if hay_mas else None
         
         return render(request, self.template_name, context)
 
@@ -3711,6 +3899,71 @@ class ConsumirStockLoteView(BaseEstacionMixin, CustomPermissionRequiredMixin, In
 
 
 
+class ConsumirStockFEFOView(BaseEstacionMixin, CustomPermissionRequiredMixin, AuditoriaMixin, FormView):
+    """
+    Consumo de un producto sin elegir lote a mano (ej. reposición tras una emergencia).
+    El primer envío muestra la propuesta FEFO (lotes que vencen primero); al confirmar,
+    el consumo se aplica en bloque sobre los lotes bloqueados (ver aplicar_consumo_fefo).
+    """
+    form_class = ConsumoFEFOForm
+    template_name = 'gestion_inventario/pages/consumir_stock_fefo.html'
+    permission_required = "gestion_usuarios.accion_gestion_inventario_gestionar_stock_interno"
+
+    def dispatch(self, request, *args, **kwargs):
+        # Se usa la sesión directamente: el mixin de estación aún no se ha ejecutado
+        self.producto = get_object_or_404(
+            Producto.objects.select_related('producto_global'),
+            pk=kwargs['pk'],
+            estacion_id=request.session.get('active_estacion_id')
+        )
+        if self.producto.es_serializado:
+            messages.warning(request, "El consumo FEFO solo aplica a insumos. Los activos se gestionan individualmente.")
+            return redirect(self.get_success_url())
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_success_url(self):
+        return reverse('gestion_inventario:ruta_detalle_producto_local', kwargs={'pk': self.producto.pk})
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['producto'] = self.producto
+        return context
+
+    def form_valid(self, form):
+        cantidad = form.cleaned_data['cantidad']
+        notas = form.cleaned_data['notas']
+
+        # 1. Previsualización: se muestra el plan sin modificar el inventario
+        if 'confirmar' not in self.request.POST:
+            plan = planificar_consumo_fefo(self.producto, cantidad, self.estacion_activa)
+            if plan['faltante']:
+                messages.warning(self.request, f"Stock disponible insuficiente: solo se pueden asignar {plan['asignado']} de {cantidad} unidades.")
+            return self.render_to_response(self.get_context_data(form=form, plan=plan))
+
+        # 2. Confirmación: se recalcula y aplica el plan bajo bloqueo
+        try:
+            with transaction.atomic():
+                plan = aplicar_consumo_fefo(self.producto, cantidad, self.estacion_activa, self.request.user, notas=notas)
+                self.auditar(
+                    verbo=f"registró el consumo interno (FEFO) de {cantidad} unidad(es) de",
+                    objetivo=self.producto,
+                    objetivo_repr=self.producto.producto_global.nombre_oficial,
+                    detalles={
+                        'cantidad_consumida': cantidad,
+                        'lotes': {lote.codigo_lote: tomar for lote, tomar in plan['asignaciones']},
+                        'motivo_uso': notas
+                    }
+                )
+        except ValidationError as e:
+            messages.error(self.request, e.messages[0])
+            return self.form_invalid(form)
+
+        messages.success(self.request, f"Se consumieron {cantidad} unidades desde {len(plan['asignaciones'])} lote(s).")
+        return redirect(self.get_success_url())
+
+
+
+
 class RegistrarUsoActivoView(BaseEstacionMixin, CustomPermissionRequiredMixin, StationInventoryObjectMixin, InventoryStateValidatorMixin, AuditoriaMixin, FormView):
     """
     Vista para registrar horas de uso en un Activo Serializado.
@@ -4275,7 +4528,10 @@ class HistorialPrestamosView(BaseEstacionMixin, CustomPermissionRequiredMixin, L
             if data.get('destinatario'):
                 qs = qs.filter(destinatario=data['destinatario'])
             
-            if data.get('estado'):
+            # 'Vencido' no se persiste en 'estado': se resuelve sobre el índice parcial de préstamos abiertos
+            if data.get('estado') == Prestamo.EstadoPrestamo.VENCIDO:
+                qs = filtrar_prestamos_vencidos(qs)
+            elif data.get('estado'):
                 qs = qs.filter(estado=data['estado'])
             
             if data.get('start_date'):
@@ -4292,6 +4548,7 @@ class HistorialPrestamosView(BaseEstacionMixin, CustomPermissionRequiredMixin, L
         """Inyecta el formulario y parámetros de paginación."""
         context = super().get_context_data(**kwargs)
         context['filter_form'] = self.filter_form
+        context['total_vencidos'] = prestamos_vencidos(self.estacion_activa).count()
         # Preservar filtros al cambiar de página
         context['params'] = self.request.GET.urlencode()
         return context
@@ -4866,6 +5123,76 @@ class MovimientoInventarioListView(BaseEstacionMixin, CustomPermissionRequiredMi
 
 
 
+class ValorizacionInventarioView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
+    """
+    Reporte de valorización del inventario (unidades x costo de compra) agrupado por
+    categoría, ubicación, estado o producto. Se lee del resumen precalculado
+    ValorizacionInventario, por lo que no recorre las existencias.
+    Con ?format=csv|excel descarga el mismo reporte.
+    """
+    template_name = 'gestion_inventario/pages/valorizacion_inventario.html'
+    permission_required = "gestion_usuarios.accion_gestion_inventario_generar_reportes"
+
+    ETIQUETAS_DIMENSION = {
+        'categoria': 'Categoría',
+        'ubicacion': 'Ubicación',
+        'estado': 'Estado',
+        'producto': 'Producto',
+    }
+
+    def get(self, request):
+        agrupar_por = request.GET.get('agrupar_por', 'categoria')
+        if agrupar_por not in DIMENSIONES_VALORIZACION:
+            agrupar_por = 'categoria'
+        incluir_sin_valor = request.GET.get('incluir_bajas') == '1'
+
+        reporte = resumen_valorizacion(self.estacion_activa, agrupar_por, incluir_sin_valor=incluir_sin_valor)
+        etiqueta = self.ETIQUETAS_DIMENSION[agrupar_por]
+
+        fmt = request.GET.get('format')
+        if fmt in ('csv', 'excel'):
+            return self._exportar(fmt, reporte, etiqueta)
+
+        return render(request, self.template_name, {
+            'reporte': reporte,
+            'agrupar_por': agrupar_por,
+            'etiqueta_dimension': etiqueta,
+            'dimensiones': self.ETIQUETAS_DIMENSION,
+            'incluir_bajas': incluir_sin_valor,
+        })
+
+    def _exportar(self, fmt, reporte, etiqueta):
+        encabezado = [etiqueta, 'Activos', 'Insumos (unidades)', 'Valor Total']
+        filas = [
+            [g['nombre'] or 'Sin asignar', g['activos'], g['insumos'], int(g['valor'])]
+            for g in reporte['grupos']
+        ]
+        totales = reporte['totales']
+        filas.append(['TOTAL', totales['activos'], totales['insumos'], int(totales['valor'])])
+        filename = f"Valorizacion_{reporte['agrupado_por']}_{timezone.now().strftime('%Y-%m-%d')}"
+
+        if fmt == 'csv':
+            response = HttpResponse(content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            writer = csv.writer(response, delimiter=';')
+            writer.writerow(encabezado)
+            writer.writerows(filas)
+            return response
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Valorización"
+        ws.append(encabezado)
+        for fila in filas:
+            ws.append(fila)
+        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+        wb.save(response)
+        return response
+
+
+
+
 class GenerarQRView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
     """
     Genera un código QR dinámico en formato PNG.
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inventario', '0010_indices_paginacion_cursor'),
+        ('gestion_mantenimiento', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordenmantenimiento',
+            index=models.Index(fields=['estacion', 'fecha_programada', 'id'], name='gm_orden_est_fprog_idx'),
+        ),
+    ]
@@ -237,6 +237,10 @@ class OrdenMantenimiento(models.Model):
         verbose_name = "Orden de Mantenimiento"
         verbose_name_plural = "Órdenes de Mantenimiento"
         ordering = ['-fecha_programada']
+        indexes = [
+            # Bandeja de órdenes paginada por cursor (se recorre en ambos sentidos)
+            models.Index(fields=['estacion', 'fecha_programada', 'id'], name='gm_orden_est_fprog_idx'),
+        ]
 
         default_permissions = []
         permissions = [
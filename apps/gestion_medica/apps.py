@@ -6,6 +6,10 @@ class GestionMedicaConfig(AppConfig):
     name = 'apps.gestion_medica'
     verbose_name = 'Gestión de Fichas Médicas'
 
+    def ready(self):
+        # Invalidación de los PDFs generados al cambiar los registros
+        import apps.gestion_medica.signals
+
     #def ready(self):
     #    from django.db.models.signals import post_migrate
     #    from apps.common.utils import crear_permiso_de_acceso_al_modulo
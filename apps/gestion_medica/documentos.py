@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.template.loader import render_to_string
+
+from .models import FichaMedica
+
+
+def html_ficha_medica(ficha):
+    """HTML de la ficha médica (plantilla del PDF) con los datos actuales del voluntario."""
+    ficha = FichaMedica.objects.select_related(
+        'voluntario', 'voluntario__usuario', 'voluntario__domicilio_comuna',
+        'grupo_sanguineo', 'sistema_salud'
+    ).prefetch_related(
+        'alergias__alergia', 'enfermedades__enfermedad', 'medicamentos__medicamento',
+        'cirugias__cirugia', 'voluntario__contactos_emergencia'
+    ).get(pk=ficha.pk)
+    voluntario = ficha.voluntario
+
+    # Cálculo de edad
+    fecha_nac = voluntario.fecha_nacimiento or voluntario.usuario.birthdate # Fallback defensivo
+    edad = "S/I"
+    if fecha_nac:
+        today = date.today()
+        # Corrección para evitar error si fecha_nac es datetime en lugar de date
+        if hasattr(fecha_nac, 'date'):
+            fecha_nac = fecha_nac.date()
+        edad = today.year - fecha_nac.year - ((today.month, today.day) < (fecha_nac.month, fecha_nac.day))
+
+    return render_to_string("gestion_medica/pages/imprimir_ficha_pdf.html", {
+        'ficha': ficha,
+        'voluntario': voluntario,
+        'edad': edad,
+        'alergias': ficha.alergias.all(),
+        'enfermedades': ficha.enfermedades.all(),
+        'medicamentos': ficha.medicamentos.all(),
+        'cirugias': ficha.cirugias.all(),
+        'contactos': voluntario.contactos_emergencia.all(),
+        'fecha_reporte': date.today(),
+    })
@@ -0,0 +1,34 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from .models import (
+    FichaMedica, FichaMedicaEnfermedad, FichaMedicaMedicamento, FichaMedicaCirugia,
+    FichaMedicaAlergia, ContactoEmergencia
+)
+from apps.common.pdf import FICHA_MEDICA, invalidar_documentos
+
+# Descarta los PDFs de ficha médica ya generados cuando cambian sus datos (ver apps/common/pdf.py).
+
+
+
+@receiver(post_save, sender=FichaMedica)
+@receiver(post_delete, sender=FichaMedica)
+@receiver(post_save, sender=ContactoEmergencia)
+@receiver(post_delete, sender=ContactoEmergencia)
+def invalidar_ficha_medica(sender, instance, **kwargs):
+    invalidar_documentos(instance.voluntario_id, FICHA_MEDICA)
+
+
+
+@receiver(post_save, sender=FichaMedicaEnfermedad)
+@receiver(post_delete, sender=FichaMedicaEnfermedad)
+@receiver(post_save, sender=FichaMedicaMedicamento)
+@receiver(post_delete, sender=FichaMedicaMedicamento)
+@receiver(post_save, sender=FichaMedicaCirugia)
+@receiver(post_delete, sender=FichaMedicaCirugia)
+@receiver(post_save, sender=FichaMedicaAlergia)
+@receiver(post_delete, sender=FichaMedicaAlergia)
+def invalidar_ficha_medica_por_detalle(sender, instance, **kwargs):
+    # Al eliminar la ficha completa sus detalles ya no la encuentran: la invalidó la propia ficha
+    voluntario_id = FichaMedica.objects.filter(pk=instance.ficha_medica_id).values_list('voluntario_id', flat=True).first()
+    invalidar_documentos(voluntario_id, FICHA_MEDICA)
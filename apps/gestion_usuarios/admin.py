@@ -3,9 +3,11 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
+from user_sessions.admin import SessionAdmin
+from user_sessions.models import Session
 
 # Importamos tus mixins comunes
-from apps.common.admin_mixins import SysPermissionMixin, ImagenPreviewMixin
+from apps.common.admin_mixins import SysPermissionMixin, ImagenPreviewMixin, AdminRendimientoMixin, FiltroValoresRecientes
 
 from .models import Usuario, Rol, Membresia, RegistroActividad
 from .forms import CustomUserCreationForm, CustomUserChangeForm
@@ -143,14 +145,15 @@ class MembresiaAdmin(SysPermissionMixin, admin.ModelAdmin):
 # --- REGISTRO DE ACTIVIDAD (AUDITORÍA) ---
 
 @admin.register(RegistroActividad)
-class RegistroActividadAdmin(SysPermissionMixin, admin.ModelAdmin):
+class RegistroActividadAdmin(AdminRendimientoMixin, SysPermissionMixin, admin.ModelAdmin):
     """
     Admin de solo lectura para auditar las acciones del sistema.
+    En modo rendimiento: es la tabla que más crece.
     """
     list_display = ('fecha', 'actor', 'verbo', 'objetivo_repr', 'estacion')
-    list_filter = ('fecha', 'estacion', 'verbo')
+    list_filter = ('fecha', 'estacion', ('verbo', FiltroValoresRecientes))
+    list_select_related = ('actor', 'estacion')
     search_fields = ('actor__rut', 'actor__first_name', 'objetivo_repr', 'detalles')
-    date_hierarchy = 'fecha'
     
     # Todo readonly para preservar la integridad del log
     readonly_fields = [field.name for field in RegistroActividad._meta.fields]
@@ -166,4 +169,14 @@ class RegistroActividadAdmin(SysPermissionMixin, admin.ModelAdmin):
 
 # Opcional: Desregistrar el modelo Group si no lo usas directamente
 # ya que usas tus propios Roles
-admin.site.unregister(Group)
\ No newline at end of file
+admin.site.unregister(Group)
+
+
+# --- SESIONES DE USUARIO ---
+
+# Se reemplaza el admin de user_sessions por su versión en modo rendimiento (una fila por login)
+admin.site.unregister(Session)
+
+@admin.register(Session)
+class SesionUsuarioAdmin(AdminRendimientoMixin, SessionAdmin):
+    pass
@@ -1,9 +1,11 @@
 from django.dispatch import receiver
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.core.files.base import ContentFile
 from PIL import Image
 
-from .models import Usuario
+from .models import Usuario, Membresia, Rol
+from .versiones import invalidar_contexto_usuarios, invalidar_contexto_global
+from apps.gestion_inventario.models import Estacion
 from apps.gestion_voluntarios.models import Voluntario
 from apps.gestion_medica.models import FichaMedica
 
@@ -43,4 +45,75 @@ def crear_perfiles_automaticamente(sender, instance, created, raw, **kwargs):
             # 2. Creamos la Ficha Médica vacía, vinculada al Voluntario
             FichaMedica.objects.create(voluntario=voluntario_perfil)
         except Exception as e:
-            print(f"ERROR en signal crear_perfiles_automaticamente: {e}")
\ No newline at end of file
+            print(f"ERROR en signal crear_perfiles_automaticamente: {e}")
+
+
+
+
+@receiver(post_save, sender=Membresia)
+@receiver(post_delete, sender=Membresia)
+def invalidar_contexto_por_membresia(sender, instance, **kwargs):
+    """
+    Invalida la estación activa (y el contexto de permisos) cacheados del usuario
+    cuando se crea, modifica o elimina una de sus membresías.
+    """
+    invalidar_contexto_usuarios(instance.usuario_id)
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_contexto_por_usuario(sender, instance, created, raw, update_fields=None, **kwargs):
+    """Un cambio en la cuenta (activación, superusuario) puede cambiar a qué estaciones accede."""
+    # El login solo actualiza last_login: no cambia el acceso
+    if created or raw or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    invalidar_contexto_usuarios(instance.pk)
+
+
+@receiver(post_save, sender=Estacion)
+@receiver(post_delete, sender=Estacion)
+def invalidar_contexto_por_estacion(sender, instance, **kwargs):
+    """La estación activa se cachea como objeto: sus cambios invalidan el contexto de todos."""
+    invalidar_contexto_global()
+
+
+@receiver(m2m_changed, sender=Membresia.roles.through)
+def invalidar_contexto_por_roles_membresia(sender, instance, action, reverse, pk_set, **kwargs):
+    """Asignar o quitar roles a una membresía cambia los permisos (y los tokens que los embeben)."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidar_contexto_usuarios(instance.usuario_id)
+    elif pk_set:
+        invalidar_contexto_usuarios(*Membresia.objects.filter(pk__in=pk_set).values_list('usuario_id', flat=True))
+    else:
+        invalidar_contexto_global()
+
+
+@receiver(m2m_changed, sender=Rol.permisos.through)
+def invalidar_contexto_por_permisos_rol(sender, instance, action, reverse, **kwargs):
+    """Editar los permisos de un rol afecta a todos los usuarios que lo tienen asignado."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Cambio hecho desde el lado del permiso: no se sabe qué roles tocó
+        invalidar_contexto_global()
+    else:
+        invalidar_contexto_usuarios(*instance.asignaciones.values_list('usuario_id', flat=True).distinct())
+
+
+@receiver(post_delete, sender=Rol)
+def invalidar_contexto_por_rol(sender, instance, **kwargs):
+    """Al borrar un rol sus asignaciones ya no existen: se invalida el contexto de todos."""
+    invalidar_contexto_global()
+
+
+@receiver(m2m_changed, sender=Usuario.user_permissions.through)
+@receiver(m2m_changed, sender=Usuario.groups.through)
+def invalidar_contexto_por_permisos_usuario(sender, instance, action, reverse, **kwargs):
+    """Permisos directos o grupos del usuario: también forman parte de sus permisos efectivos."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        invalidar_contexto_global()
+    else:
+        invalidar_contexto_usuarios(instance.pk)
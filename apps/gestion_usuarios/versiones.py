@@ -0,0 +1,82 @@
+"""
+Versiones de caché del contexto de acceso de cada usuario (membresías, estación activa, permisos).
+
+Lo que se cachea a partir de membresías o roles incluye en su clave `version_contexto(usuario_id)`.
+Al cambiar esos datos no se borran entradas: se cambia la versión y las claves antiguas quedan
+inalcanzables hasta expirar. Hay dos niveles:
+- Por usuario: sus membresías, los roles asignados, los permisos de esos roles o su cuenta cambiaron.
+- Global: cambió algo compartido por muchos usuarios (estaciones, roles eliminados).
+
+Las versiones viven en la caché por defecto; en producción con varios procesos debe ser una caché
+compartida (REDIS_URL). Con la caché local de cada proceso la invalidación solo alcanza al proceso
+que hizo el cambio y los demás se ponen al día al expirar las entradas (API_CONTEXTO_CACHE_SEGUNDOS).
+Los tokens con permisos embebidos (API_JWT_PERMISOS) llevan la versión y se comparan con ella en
+cualquier proceso, por eso ese modo exige REDIS_URL (core/settings.py).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CLAVE_VERSION_GLOBAL = 'contexto:version'
+
+
+def _clave_version_usuario(usuario_id):
+    return f'contexto:version:{usuario_id}'
+
+
+def version_contexto(usuario_id):
+    """Versión vigente del contexto del usuario (global + propia), en una sola lectura a la caché."""
+    claves = [CLAVE_VERSION_GLOBAL, _clave_version_usuario(usuario_id)]
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            # Primera vez (o expulsada de la caché): cualquier valor nuevo sirve, solo debe no repetirse
+            cache.add(clave, time.time_ns(), timeout=None)
+            versiones[clave] = cache.get(clave)
+    return f"{versiones[claves[0]]}.{versiones[claves[1]]}"
+
+
+def version_contexto_vigente(usuario_id, version):
+    """
+    True si `version` (la de un access token) sigue siendo la del contexto del usuario.
+
+    Una versión ausente de la caché (nunca sembrada o expulsada) no cuenta como cambio: no hay
+    forma de saber si cambió, así que se siembra con la del token y se acepta. Cualquier cambio
+    posterior la renueva igual que siempre.
+    """
+    try:
+        partes = [int(parte) for parte in str(version).split('.')]
+    except ValueError:
+        return False
+    claves = [CLAVE_VERSION_GLOBAL, _clave_version_usuario(usuario_id)]
+    if len(partes) != len(claves):
+        return False
+
+    versiones = cache.get_many(claves)
+    for clave, parte in zip(claves, partes):
+        if clave not in versiones:
+            cache.add(clave, parte, timeout=None)
+            versiones[clave] = cache.get(clave, parte)
+    return [versiones[clave] for clave in claves] == partes
+
+
+def _renovar(claves):
+    cache.set_many({clave: time.time_ns() for clave in claves}, timeout=None)
+
+
+def _renovar_ahora_y_al_confirmar(claves):
+    # Se renueva también al confirmar: una petición concurrente pudo cachear los datos
+    # antiguos con la versión nueva mientras la transacción seguía abierta.
+    _renovar(claves)
+    transaction.on_commit(lambda: _renovar(claves))
+
+
+def invalidar_contexto_usuarios(*usuario_ids):
+    claves = [_clave_version_usuario(usuario_id) for usuario_id in usuario_ids if usuario_id]
+    if claves:
+        _renovar_ahora_y_al_confirmar(claves)
+
+
+def invalidar_contexto_global():
+    _renovar_ahora_y_al_confirmar([CLAVE_VERSION_GLOBAL])
@@ -6,6 +6,10 @@ class GestionVoluntariosConfig(AppConfig):
     name = 'apps.gestion_voluntarios'
     verbose_name = 'Gestión de Voluntarios'
 
+    def ready(self):
+        # Invalidación de los PDFs generados al cambiar los registros
+        import apps.gestion_voluntarios.signals
+
     #def ready(self):
     #    from django.db.models.signals import post_migrate
     #    from apps.common.utils import crear_permiso_de_acceso_al_modulo
@@ -0,0 +1,23 @@
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+from .models import Voluntario, HistorialCargo, HistorialReconocimiento, HistorialSancion
+
+
+def html_hoja_vida(voluntario, membresia=None):
+    """
+    HTML de la hoja de vida (plantilla del PDF) con los datos actuales del voluntario.
+    La membresía indica la compañía que se muestra.
+    """
+    voluntario = Voluntario.objects.select_related(
+        'usuario', 'nacionalidad', 'profesion', 'domicilio_comuna'
+    ).prefetch_related(
+        Prefetch('historial_cargos', queryset=HistorialCargo.objects.select_related('cargo', 'estacion_registra').order_by('-fecha_inicio')),
+        Prefetch('historial_reconocimientos', queryset=HistorialReconocimiento.objects.select_related('tipo_reconocimiento').order_by('-fecha_evento')),
+        Prefetch('historial_sanciones', queryset=HistorialSancion.objects.select_related('estacion_evento').order_by('-fecha_evento')),
+    ).get(pk=voluntario.pk)
+
+    return render_to_string("gestion_voluntarios/pages/hoja_vida_pdf.html", {
+        'voluntario': voluntario,
+        'membresia': membresia,
+    })
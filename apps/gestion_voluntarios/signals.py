@@ -0,0 +1,50 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from .models import Voluntario, HistorialCargo, HistorialReconocimiento, HistorialSancion, HistorialCurso
+from apps.common.pdf import HOJA_VIDA, FICHA_MEDICA, invalidar_documentos
+from apps.gestion_usuarios.models import Usuario, Membresia
+
+# Los PDFs se identifican por el hash de su contenido, así que un cambio nunca entrega uno
+# obsoleto; estas señales descartan los ya generados para que no se acumulen en el almacenamiento.
+
+
+
+@receiver(post_save, sender=Voluntario)
+@receiver(post_delete, sender=Voluntario)
+def invalidar_pdfs_voluntario(sender, instance, **kwargs):
+    """Los datos personales del voluntario aparecen en la hoja de vida y en la ficha médica."""
+    invalidar_documentos(instance.pk, HOJA_VIDA, FICHA_MEDICA)
+
+
+
+@receiver(post_save, sender=HistorialCargo)
+@receiver(post_delete, sender=HistorialCargo)
+@receiver(post_save, sender=HistorialReconocimiento)
+@receiver(post_delete, sender=HistorialReconocimiento)
+@receiver(post_save, sender=HistorialSancion)
+@receiver(post_delete, sender=HistorialSancion)
+@receiver(post_save, sender=HistorialCurso)
+@receiver(post_delete, sender=HistorialCurso)
+def invalidar_hoja_vida_por_historial(sender, instance, **kwargs):
+    invalidar_documentos(instance.voluntario_id, HOJA_VIDA)
+
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_pdfs_usuario(sender, instance, created, update_fields=None, **kwargs):
+    """Nombre, RUT y datos de contacto vienen de la cuenta de usuario."""
+    # El login solo actualiza last_login y un usuario nuevo aún no tiene documentos
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    voluntario_id = Voluntario.objects.filter(usuario=instance).values_list('pk', flat=True).first()
+    invalidar_documentos(voluntario_id, HOJA_VIDA, FICHA_MEDICA)
+
+
+
+@receiver(post_save, sender=Membresia)
+@receiver(post_delete, sender=Membresia)
+def invalidar_hoja_vida_por_membresia(sender, instance, **kwargs):
+    """La hoja de vida muestra la compañía de la membresía."""
+    voluntario_id = Voluntario.objects.filter(usuario_id=instance.usuario_id).values_list('pk', flat=True).first()
+    invalidar_documentos(voluntario_id, HOJA_VIDA)
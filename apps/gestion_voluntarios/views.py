@@ -4,13 +4,11 @@ from django.db.models import Prefetch, Count, Q
 from django.contrib import messages
 import csv
 import json
-import io
 from django.http import HttpResponse, JsonResponse
-from django.template.loader import render_to_string 
 from django.utils import timezone
 import openpyxl
-from xhtml2pdf import pisa
-from .utils import link_callback
+from .documentos import html_hoja_vida
+from apps.common.pdf import HOJA_VIDA, ErrorGeneracionPDF, solicitar_pdf, pdf_fallido, respuesta_pdf, respuesta_pdf_pendiente
 
 from .models import (
     Voluntario, HistorialCargo, Cargo, TipoCargo, Profesion,
@@ -543,32 +541,21 @@ class HojaVidaView(BaseEstacionMixin, CustomPermissionRequiredMixin, View):
             usuario__membresias__estacion=self.estacion_activa
         )
         
-        # Obtenemos datos completos para el reporte (Query limpia)
-        voluntario_full = Voluntario.objects.select_related(
-            'usuario', 'nacionalidad', 'profesion', 'domicilio_comuna'
-        ).prefetch_related(
-            Prefetch('historial_cargos', queryset=HistorialCargo.objects.all().select_related('cargo').order_by('-fecha_inicio')),
-            Prefetch('historial_reconocimientos', queryset=HistorialReconocimiento.objects.all().order_by('-fecha_evento')),
-            Prefetch('historial_sanciones', queryset=HistorialSancion.objects.all().order_by('-fecha_evento')),
-            Prefetch('usuario__membresias', queryset=Membresia.objects.filter(estacion=self.estacion_activa), to_attr='membresia_local_list')
-        ).get(pk=voluntario_check.pk)
+        # El PDF se genera en segundo plano y se cachea por contenido (ver apps/common/pdf.py)
+        membresia = Membresia.objects.select_related('estacion').filter(
+            usuario_id=voluntario_check.usuario_id, estacion=self.estacion_activa
+        ).first()
+        nombre = f"HV_{voluntario_check.usuario.rut}.pdf"
+        try:
+            ruta, trabajo = solicitar_pdf(HOJA_VIDA, voluntario_check.pk, html_hoja_vida(voluntario_check, membresia), nombre)
+        except ErrorGeneracionPDF:
+            ruta = trabajo = None
+
+        if ruta:
+            return respuesta_pdf(ruta, nombre, como_adjunto=False)
+        if trabajo and not pdf_fallido(trabajo):
+            return respuesta_pdf_pendiente(request, trabajo)
 
-        context = {
-            'voluntario': voluntario_full,
-            'membresia': voluntario_full.usuario.membresia_local_list[0] if voluntario_full.usuario.membresia_local_list else None,
-            'cargo_actual': voluntario_full.historial_cargos.filter(fecha_fin__isnull=True).first(),
-            'request': request
-        }
-        
-        html_string = render_to_string("gestion_voluntarios/pages/hoja_vida_pdf.html", context)
-        result = io.BytesIO()
-        pdf = pisa.pisaDocument(src=io.BytesIO(html_string.encode("UTF-8")), dest=result, link_callback=link_callback)
-        
-        if not pdf.err:
-            response = HttpResponse(result.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="HV_{voluntario_full.usuario.rut}.pdf"'
-            return response
-        
         messages.error(request, "No se pudo generar el documento PDF. Por favor contacte a soporte.")
         return redirect('gestion_voluntarios:ruta_ver_voluntario', id=id)
 
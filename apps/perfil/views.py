@@ -4,21 +4,16 @@ from django.contrib import messages
 from django.views import View
 from django.contrib.auth.views import PasswordChangeView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse
-from django.template.loader import render_to_string
 from datetime import date
-import io
-from xhtml2pdf import pisa
 
 from .forms import EditarPerfilForm
 from apps.common.mixins import AuditoriaMixin
+from apps.common.pdf import HOJA_VIDA, ErrorGeneracionPDF, solicitar_pdf, pdf_fallido, respuesta_pdf, respuesta_pdf_pendiente
 
 # Importamos modelos necesarios
 from apps.gestion_usuarios.models import Membresia
-from apps.gestion_voluntarios.models import (
-    Voluntario, HistorialCargo, HistorialReconocimiento, 
-    HistorialSancion, HistorialCurso
-)
+from apps.gestion_voluntarios.models import Voluntario
+from apps.gestion_voluntarios.documentos import html_hoja_vida
 from apps.gestion_medica.models import FichaMedica
 
 
@@ -93,7 +88,8 @@ class DescargarMiHojaVidaView(LoginRequiredMixin, AuditoriaMixin, View):
     Funcionalidad Técnica:
     - Recuperación de perfil de Voluntario asociado a la sesión.
     - Agregación de datos históricos (Cargos, Sanciones, Cursos) y estado actual.
-    - Renderizado de plantilla HTML y conversión a binario PDF utilizando xhtml2pdf (Pisa).
+    - Renderizado de plantilla HTML; la conversión a PDF (xhtml2pdf) corre en segundo plano
+      y se cachea por contenido (ver apps/common/pdf.py).
     - Registro de auditoría de auto-consulta.
     """
 
@@ -104,50 +100,33 @@ class DescargarMiHojaVidaView(LoginRequiredMixin, AuditoriaMixin, View):
             voluntario = Voluntario.objects.get(usuario=request.user)
             
             # 2. Recuperación de Datos Complementarios (Safe Retrieval)
-            # Utilizar .first() para obtener relaciones 1:N que actúan como 1:1 en el contexto actual (Estado actual).
-            # Esto previene excepciones DoesNotExist si la data no está íntegra.
-            membresia = Membresia.objects.filter(usuario=request.user, estado='ACTIVO').first()
-            cargo_actual_obj = HistorialCargo.objects.filter(voluntario=voluntario, fecha_fin__isnull=True).first()
+            # Utilizar .first() para la membresía activa: previene excepciones DoesNotExist si la data no está íntegra.
+            membresia = Membresia.objects.select_related('estacion').filter(usuario=request.user, estado='ACTIVO').first()
+
+            # 3. Solicitud del PDF
+            # La conversión con xhtml2pdf corre en segundo plano y el resultado se cachea por el
+            # hash del contenido (ver apps/common/pdf.py): si ya existe se entrega de inmediato.
+            nombre = f"Hoja_Vida_{request.user.rut}.pdf"
+            ruta, trabajo = solicitar_pdf(HOJA_VIDA, voluntario.pk, html_hoja_vida(voluntario, membresia), nombre)
+
+            # 4. Entrega de Respuesta
+            if ruta is None:
+                if pdf_fallido(trabajo):
+                    raise ErrorGeneracionPDF(trabajo)
+                # Página de espera que vuelve a pedir esta misma URL hasta que el PDF esté listo
+                return respuesta_pdf_pendiente(request, trabajo)
+
+            # --- Auditoría ---
+            self.auditar(
+                verbo="Descargó su hoja de vida",
+                objetivo=request.user,
+                objetivo_repr=request.user.get_full_name,
+                detalles={'accion': 'Visualización Propia Ficha'}
+            )
 
-            # 3. Construcción del Contexto de Reporte
-            context = {
-                'voluntario': voluntario,
-                'membresia': membresia,
-                'cargo_actual': cargo_actual_obj,
-                'request': request, # Inyectar request para resolución de rutas absolutas de imágenes en PDF (static)
-                
-                # Colecciones Históricas (Ordenamiento Cronológico Inverso)
-                'cargos': HistorialCargo.objects.filter(voluntario=voluntario).order_by('-fecha_inicio'),
-                'reconocimientos': HistorialReconocimiento.objects.filter(voluntario=voluntario).order_by('-fecha_evento'),
-                'sanciones': HistorialSancion.objects.filter(voluntario=voluntario).order_by('-fecha_evento'),
-                'cursos': HistorialCurso.objects.filter(voluntario=voluntario).order_by('-fecha_curso'),
-            }
-
-            # 4. Generación de PDF en Memoria
-            # Renderizar plantilla HTML a string.
-            html_string = render_to_string("gestion_voluntarios/pages/hoja_vida_pdf.html", context)
-            
-            # Crear buffer de bytes para el flujo de salida.
-            result = io.BytesIO()
-            # Convertir HTML a PDF.
-            pdf = pisa.pisaDocument(io.BytesIO(html_string.encode("UTF-8")), result)
-
-            # 5. Entrega de Respuesta
-            if not pdf.err:
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
-                # Configurar header para descarga de archivo adjunto con nombre dinámico.
-                response['Content-Disposition'] = f'attachment; filename="Hoja_Vida_{request.user.rut}.pdf"'
-
-                # --- Auditoría ---
-                self.auditar(
-                    verbo="Descargó su hoja de vida",
-                    objetivo=request.user,
-                    objetivo_repr=request.user.get_full_name,
-                    detalles={'accion': 'Visualización Propia Ficha'}
-                )
-
-                return response
-            
+            return respuesta_pdf(ruta, nombre)
+
+        except ErrorGeneracionPDF:
             # Manejo de error en generación de PDF
             messages.error(request, "Error interno al generar el PDF. Contacte a soporte.")
             return redirect('perfil:ver')
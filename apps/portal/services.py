@@ -6,6 +6,7 @@ from apps.gestion_inventario.models import (
     MovimientoInventario, TipoMovimiento, Prestamo, Activo, Producto, RegistroUsoActivo
 )
 from apps.gestion_mantenimiento.models import OrdenMantenimiento
+from apps.gestion_inventario.services import filtrar_prestamos_vencidos
 
 logger = logging.getLogger(__name__)
 
@@ -131,10 +132,8 @@ def obtener_resumen_estacion(estacion, fecha=None):
         fecha_prestamo__range=(inicio_dia, fin_dia)
     ).select_related('destinatario')
 
-    prestamos_vencidos = Prestamo.objects.filter(
-        estacion=estacion,
-        estado__in=['PENDIENTE', 'DEVUELTO_PARCIAL'],
-        fecha_devolucion_esperada__lt=fecha
+    prestamos_vencidos = filtrar_prestamos_vencidos(
+        Prestamo.objects.filter(estacion=estacion), hoy=fecha
     ).select_related('destinatario')
 
     # ==========================================
@@ -2,6 +2,7 @@ from datetime import timedelta
 from pathlib import Path
 import os
 import environ
+from django.core.exceptions import ImproperlyConfigured
 from celery.schedules import crontab
 
 
@@ -29,6 +30,7 @@ DJANGO_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres', # Lookups de similitud (pg_trgm) para el Catálogo Global
 ]
 # Aplicaciones del proyecto
 PROJECT_APPS = [
@@ -61,6 +63,7 @@ INSTALLED_APPS = THIRD_PARTY_APPS + DJANGO_APPS + PROJECT_APPS
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'apps.common.middleware.CompresionRespuestaMiddleware',
     # 'django.contrib.sessions.middleware.SessionMiddleware',
     'user_sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +74,17 @@ MIDDLEWARE = [
     'simple_history.middleware.HistoryRequestMiddleware',
 ]
 
+# Compresión de respuestas dinámicas (apps/common/middleware.py). Los estáticos los comprime Whitenoise.
+COMPRESION_RESPUESTAS = env.bool("COMPRESION_RESPUESTAS", default=True)
+COMPRESION_TAMANO_MINIMO = env.int("COMPRESION_TAMANO_MINIMO", default=1024)  # bytes
+COMPRESION_NIVEL_GZIP = env.int("COMPRESION_NIVEL_GZIP", default=6)  # 1-9
+COMPRESION_NIVEL_BROTLI = env.int("COMPRESION_NIVEL_BROTLI", default=4)  # 0-11 (sobre 5 el costo de CPU crece rápido)
+COMPRESION_TIPOS = (
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/xml', 'text/xml', 'image/svg+xml',
+    'application/vnd.oai.openapi', 'application/vnd.oai.openapi+json',
+)
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -297,6 +311,19 @@ if not DEBUG:
                 "custom_domain": AWS_S3_CUSTOM_DOMAIN,
             },
         },
+        # PDFs con datos personales y médicos (apps/common/pdf.py): fuera del prefijo público
+        # 'media', con ACL privada, sin dominio público y con URLs firmadas. Solo los entregan
+        # las vistas de descarga.
+        "documentos_privados": {
+            "BACKEND": "storages.backends.s3.S3Storage",
+            "OPTIONS": {
+                "bucket_name": AWS_STORAGE_BUCKET_NAME,
+                "location": "privado",
+                "default_acl": "private",
+                "querystring_auth": True,
+                "custom_domain": None,
+            },
+        },
         "staticfiles": {
             "BACKEND": STATICFILES_STORAGE_BACKEND,
         }
@@ -317,6 +344,13 @@ else:
             # Backend por defecto de Django para guardar en disco
             "BACKEND": "django.core.files.storage.FileSystemStorage",
         },
+        # Fuera de MEDIA_ROOT para que /media/ no los sirva (ver apps/common/pdf.py)
+        "documentos_privados": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {
+                "location": BASE_DIR / 'privado',
+            },
+        },
         "staticfiles": {
             "BACKEND": STATICFILES_STORAGE_BACKEND,
         }
@@ -325,10 +359,23 @@ else:
 
 
 # Configuración de Django Rest Framework
+# Serialización JSON de la API: orjson (apps/api/renderers.py, apps/api/parsers.py) o el json estándar de DRF.
+# Benchmark: python manage.py medir_serializacion_json
+API_JSON_ORJSON = env.bool("API_JSON_ORJSON", default=True)
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'apps.api.renderers.ORJSONRenderer' if API_JSON_ORJSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apps.api.parsers.ORJSONParser' if API_JSON_ORJSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',  # Para la Web/Admin
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Para el Móvil
+        'apps.api.authentication.JWTPermisosAuthentication',  # Para el Móvil (JWT de simplejwt + versión de permisos)
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -346,6 +393,10 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Embebe en el access token el mapa de bits de permisos de la estación activa (ver apps/api/authentication.py).
+# Los permisos de la API se resuelven en memoria y el token se rechaza si los roles/membresías cambian.
+API_JWT_PERMISOS = env.bool("API_JWT_PERMISOS", default=False)
+
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Bomberil System API',
@@ -356,17 +407,39 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
-## Configuración de django_redis
-#CACHES = {
-#    "default": {
-#        "BACKEND": "django_redis.cache.RedisCache",
-#        "LOCATION": env.str("REDIS_URL"),
-#        "OPTIONS": {
-#            "CLIENT_CLASS": "django_redis.client.DefaultClient",
-#        }
-#    }
-#}
-#
+# Directorio del esquema OpenAPI precalculado (schema.yml / schema.json, ver apps/api/esquema.py)
+# y cuánto pueden cachearlo clientes y proxies. Se revalida por ETag (hash del contenido).
+API_ESQUEMA_DIR = env.str("API_ESQUEMA_DIR", default=str(BASE_DIR))
+API_ESQUEMA_CACHE_SEGUNDOS = env.int("API_ESQUEMA_CACHE_SEGUNDOS", default=3600)
+
+# Caché compartida entre procesos (Redis). Sin REDIS_URL se usa la memoria local de cada proceso
+# (desarrollo y pruebas); en producción con varios workers debe configurarse para que la
+# invalidación del contexto cacheado alcance a todos.
+REDIS_URL = env.str("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Con una caché por proceso cada worker tendría su propia versión del contexto y rechazaría los
+# tokens con permisos embebidos emitidos por los demás (ver gestion_usuarios/versiones.py)
+if API_JWT_PERMISOS and not REDIS_URL:
+    raise ImproperlyConfigured("API_JWT_PERMISOS requiere una caché compartida: configure REDIS_URL.")
+
+# Segundos que se reutilizan los gráficos de inventario de una estación (se invalidan al escribir en el inventario)
+INVENTARIO_GRAFICOS_CACHE_SEGUNDOS = env.int("INVENTARIO_GRAFICOS_CACHE_SEGUNDOS", default=600)
+
+# Segundos que se reutiliza el contexto de acceso resuelto (estación activa) sin volver a la base de datos
+API_CONTEXTO_CACHE_SEGUNDOS = env.int("API_CONTEXTO_CACHE_SEGUNDOS", default=300)
 
 # Configurar el motor de sesión
 SESSION_ENGINE = 'user_sessions.backends.db'
@@ -389,6 +462,20 @@ CELERY_BROKER_TRANSPORT_OPTIONS = { # Opciones avanzadas de conexión con Redis
     'socket_timeout': 5,
     'retry_on_timeout': True
 }
+# Canal en vivo del inventario (SSE). Reutiliza el Redis de Celery salvo que se indique otro;
+# con un broker que no sea Redis la publicación se desactiva.
+INVENTARIO_TIEMPO_REAL_REDIS_URL = env.str("INVENTARIO_TIEMPO_REAL_REDIS_URL", default=CELERY_BROKER_URL)
+# Segundos que se mantiene abierta cada conexión SSE antes de que el cliente reconecte
+# (debe ser menor al timeout de Gunicorn)
+INVENTARIO_TIEMPO_REAL_DURACION = env.int("INVENTARIO_TIEMPO_REAL_DURACION", default=90)
+# PDFs de hoja de vida y ficha médica (apps/common/pdf.py): se convierten en el worker de Celery
+# y se cachean por contenido. En False se generan dentro de la petición (desarrollo sin worker).
+DOCUMENTOS_PDF_ASINCRONO = env.bool("DOCUMENTOS_PDF_ASINCRONO", default=True)
+# Vigencia del estado de cada trabajo de generación (lo que la App puede consultar)
+DOCUMENTOS_PDF_TRABAJO_SEGUNDOS = env.int("DOCUMENTOS_PDF_TRABAJO_SEGUNDOS", default=600)
+# Tras un error de conversión, segundos antes de volver a intentar el mismo documento
+DOCUMENTOS_PDF_REINTENTO_SEGUNDOS = env.int("DOCUMENTOS_PDF_REINTENTO_SEGUNDOS", default=300)
+
 CELERY_BEAT_SCHEDULE = {
     # 1. Generador de Mantenimiento (00:05 AM)
     'mantenimiento-diario-preventivo': {
@@ -403,8 +490,29 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour=23, minute=30),  # A las 23:30 todos los días
         #'schedule': crontab(minute='*/30'),  # Ejecutar cada 3 minutos (para que no se topen siempre)
     },
+
+    # 3. Marcado de préstamos vencidos (00:10 AM)
+    'prestamos-vencidos-diario': {
+        'task': 'apps.gestion_inventario.tasks.tarea_marcar_prestamos_vencidos',
+        'schedule': crontab(hour=0, minute=10),
+    },
+
+    # 4. Purga de la bitácora de sincronización móvil (03:15 AM)
+    'purgar-bitacora-sincronizacion': {
+        'task': 'apps.gestion_inventario.tasks.tarea_purgar_cambios_sincronizacion',
+        'schedule': crontab(hour=3, minute=15),
+    },
+
+    # 5. Purga de claves de idempotencia vencidas (03:30 AM)
+    'purgar-claves-idempotencia': {
+        'task': 'apps.api.tasks.tarea_purgar_claves_idempotencia',
+        'schedule': crontab(hour=3, minute=30),
+    },
 }
 
+# Horas durante las que un reintento con la misma cabecera Idempotency-Key devuelve la respuesta original
+API_IDEMPOTENCIA_TTL_HORAS = env.int("API_IDEMPOTENCIA_TTL_HORAS", default=24)
+
 # Limita el tamaño del cuerpo de la petición (ej. 10MB)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 
@@ -412,6 +520,8 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 INVENTARIO_UBICACION_AREA_NOMBRE = "ÁREA"
 INVENTARIO_UBICACION_VEHICULO_NOMBRE = "VEHÍCULO"
 INVENTARIO_UBICACION_ADMIN_NOMBRE = "ADMINISTRATIVA"
+# Días que se conserva la bitácora de sincronización de la App (un cursor más antiguo exige resincronizar)
+INVENTARIO_SYNC_RETENCION_DIAS = env.int("INVENTARIO_SYNC_RETENCION_DIAS", default=30)
 
 
 # Configuración de LOGGING solo para Producción
@@ -18,6 +18,11 @@ if [ "$RUN_MIGRATIONS" = "true" ]; then
     echo "Aplicando migraciones..."
     python manage.py migrate
 fi
+# Regenera el esquema OpenAPI precalculado que sirve /api/v1/schema/ (solo si cambió)
+if [ "$GENERAR_ESQUEMA_API" = "true" ]; then
+    echo "Generando esquema OpenAPI..."
+    python manage.py generar_esquema_api
+fi
 # -------------------
 
 exec "$@"
\ No newline at end of file
@@ -6,6 +6,20 @@ import os
 # Dirección y puerto
 bind = "0.0.0.0:8000"
 
+# Modo de servicio
+# - wsgi (por defecto): workers 'gthread' sobre core.wsgi. Cada petición ocupa un hilo durante
+#   toda su duración, incluida la espera a la base de datos.
+# - asgi: workers uvicorn sobre core.asgi. Las lecturas más usadas por la App (MeView, catálogo,
+#   existencias, gráficos, detalle por código) son vistas async: mientras esperan a la base de
+#   datos el worker sigue atendiendo otras peticiones, y un PDF o exportación lento no lo bloquea.
+#   Comparar ambos modos con manage.py prueba_carga_api.
+modo = os.getenv("GUNICORN_MODO", "wsgi").lower()
+if modo == "asgi":
+    wsgi_app = "core.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "core.wsgi:application"
+
 # Workers
 # Fórmula recomendada: (2 x CPUs) + 1
 # Usamos una variable de entorno o un default seguro
@@ -14,7 +28,10 @@ cores = multiprocessing.cpu_count()
 default_workers = int(workers_per_core * cores) + 1
 workers = int(os.getenv("GUNICORN_WORKERS", default_workers))
 
-# Threads (opcional, útil para I/O bound apps)
+# Threads (útil para I/O bound apps)
+# Con más de 1 hilo Gunicorn usa workers 'gthread'. El canal en vivo del inventario (SSE) no
+# depende de esto: bajo wsgi solo entrega un snapshot (long-poll) y las conexiones abiertas
+# quedan para el modo asgi, donde el worker uvicorn las atiende en su event loop.
 threads = int(os.getenv("GUNICORN_THREADS", "1"))
 
 # Timeouts